@@ -84,6 +84,8 @@ def pytest_addoption(parser: Parser) -> None:
     parser.addoption("--remove-workdir", action="store_true", default=False,
                      help="Remove individual working directories from regression tests.")
     parser.addoption("--longtests", action="store_true", default=False, help="Run longer tests.")
+    parser.addoption("--benchmarks", action="store_true", default=False,
+                     help="Run timing benchmarks, which log the timings of the old and new code paths.")
     parser.addoption("--compare-only", action="store_true", default=False, help="Skip running the recipe and do the comparison using the working directories from a previous test run.")
     parser.addoption("--data-directory", action="store", default="/lustre/cv/projects/pipeline-test-data/regression-test-data/", help="Specify directory where larger test data files are stored.")
 
@@ -200,7 +202,7 @@ def pytest_collection_finish(session: Session) -> None:
 
 
 def pytest_collection_modifyitems(config: Config, items: list[Item]) -> None:
-    """Apply auto-marking based on test location and filter slow tests."""
+    """Apply auto-marking based on test location and filter slow tests and benchmarks."""
     # 1) Auto-mark everything based on path and test type
     for item in items:
         _auto_mark(item)
@@ -212,6 +214,13 @@ def pytest_collection_modifyitems(config: Config, items: list[Item]) -> None:
             if "slow" in item.keywords:
                 item.add_marker(skip_slow)
 
+    # 3) Skip timing benchmarks unless --benchmarks
+    if not config.getoption("--benchmarks"):
+        skip_benchmark = pytest.mark.skip(reason="need --benchmarks option to run")
+        for item in items:
+            if "benchmark" in item.keywords:
+                item.add_marker(skip_benchmark)
+
 
 def _auto_mark(item: Item) -> None:
     """Apply marks based on test location (path segments) and node id.
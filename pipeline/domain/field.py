@@ -30,6 +30,10 @@ class Field:
             this field.
         flux_densities: Set of unique flux measurements from setjy.
     """
+    # Incremented whenever any field is named or renamed, so that lookup
+    # tables of fields by name (see MeasurementSet.get_fields) are rebuilt.
+    name_revision = 0
+
     def __init__(
             self,
             field_id: int,
@@ -143,6 +147,7 @@ class Field:
     def name(self, value: str) -> None:
         """Set name of field to given value."""
         self._name = value
+        Field.name_revision += 1
 
     @property
     def ra(self) -> str:
@@ -14,11 +14,13 @@ from typing import TYPE_CHECKING
 import numpy as np
 
 from pipeline import infrastructure
+from pipeline.domain import field as field_module
 from pipeline.domain import measures, spectralwindow
 from pipeline.infrastructure import casa_tools, tablereader, utils
 from pipeline.infrastructure.launcher import current_task_name
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable
     from typing import Callable
 
     from numpy import floating
@@ -29,6 +31,39 @@ if TYPE_CHECKING:
 LOG = infrastructure.logging.get_logger(__name__)
 
 
+class _DomainIndex:
+    """Inverted index from attribute values to the domain objects of a container.
+
+    The index records the container it was built from, its length, and a
+    revision number of the indexed attributes, and is considered stale as soon
+    as any of them changes.
+    """
+
+    def __init__(self, source: Sequence, keys: dict[str, Callable[[object], Iterable]], revision: int = 0) -> None:
+        self.source = source
+        self.length = len(source)
+        self.revision = revision
+        self.items = list(source)
+        self.positions = {name: collections.defaultdict(list) for name in keys}
+        for position, item in enumerate(self.items):
+            for name, key_fn in keys.items():
+                for key in key_fn(item):
+                    self.positions[name][key].append(position)
+
+    def is_current(self, source: Sequence, revision: int = 0) -> bool:
+        """Return True if the index still reflects the given container."""
+        return source is self.source and len(source) == self.length and revision == self.revision
+
+    def select(self, name: str, keys: Iterable) -> set[int]:
+        """Return the positions of the items that have any of the given keys."""
+        lookup = self.positions[name]
+        return {position for key in keys if key in lookup for position in lookup[key]}
+
+    def get(self, name: str, key: object) -> list:
+        """Return the items with the given key, in container order."""
+        return [self.items[position] for position in self.positions[name].get(key, ())]
+
+
 class MeasurementSet:
     """A logical representation of a MeasurementSet (MS).
 
@@ -198,6 +233,18 @@ class MeasurementSet:
         return measures.FileSize(total_bytes,
                                  measures.FileSizeUnits.BYTES)
 
+    def __getstate__(self) -> dict:
+        """Return the state to pickle, leaving out the domain indexes.
+
+        The field name index is validated against the class-level
+        Field.name_revision counter, which restarts in a new process, so
+        pickled indexes could be mistaken for current ones after the context
+        is restored. They are rebuilt on first use instead.
+        """
+        state = self.__dict__.copy()
+        state.pop('_domain_indexes', None)
+        return state
+
     def __str__(self) -> str:
         return 'MeasurementSet({0})'.format(self.name)
 
@@ -296,13 +343,18 @@ class MeasurementSet:
         Returns:
             List of Scan objects for scans in MS matching the given criteria.
         """
-        pool = self.scans
+        if scan_id is None and scan_intent is None and field is None and spw is None:
+            return self.scans
+
+        index = self._get_scans_index()
+        # positions within self.scans of the scans matching each criterion
+        selections = []
 
         if scan_id is not None:
             # encase raw numbers in a tuple
             if not isinstance(scan_id, Sequence):
                 scan_id = (scan_id,)
-            pool = [s for s in pool if s.id in scan_id]
+            selections.append(index.select('id', scan_id))
 
         if scan_intent is not None:
             if isinstance(scan_intent, str):
@@ -310,12 +362,11 @@ class MeasurementSet:
                     # empty string equals all intents for CASA
                     scan_intent = ','.join(self.intents)
                 scan_intent = scan_intent.split(',')
-            scan_intent = set(scan_intent)
-            pool = [s for s in pool if not s.intents.isdisjoint(scan_intent)]
+            selections.append(index.select('intent', set(scan_intent)))
 
         if field is not None:
             fields_with_name = frozenset(self.get_fields(task_arg=field))
-            pool = [s for s in pool if not fields_with_name.isdisjoint(s.fields)]
+            selections.append(index.select('field', fields_with_name))
 
         if spw is not None:
             if not isinstance(spw, Sequence):
@@ -328,11 +379,53 @@ class MeasurementSet:
                 else:
                     spw = spw.split(',')
             spw = {int(i) for i in spw}
-            pool = {scan for scan in pool for scan_spw in scan.spws if scan_spw.id in spw}
+            selections.append(index.select('spw', spw))
+
+        pool = [index.items[position] for position in sorted(set.intersection(*selections))]
+        if spw is not None:
             pool = sorted(pool, key=lambda s: s.id)
 
         return pool
 
+    def _get_domain_index(
+            self,
+            name: str,
+            source: Sequence,
+            keys: dict[str, Callable[[object], Iterable]],
+            revision: int = 0,
+            ) -> _DomainIndex:
+        """
+        Return the named inverted index over a container of domain objects,
+        building it on first use and rebuilding it when it is stale.
+
+        Args:
+            name: Name of the index.
+            source: Container of domain objects to index.
+            keys: Dictionary mapping key names to functions that return the
+                keys of a domain object.
+            revision: Revision number of the indexed attributes; the index is
+                rebuilt when it changes.
+
+        Returns:
+            The inverted index.
+        """
+        # set on first use, as MeasurementSets restored from older pickled
+        # contexts do not have the attribute
+        indexes = self.__dict__.setdefault('_domain_indexes', {})
+        index = indexes.get(name)
+        if index is None or not index.is_current(source, revision):
+            index = indexes[name] = _DomainIndex(source, keys, revision)
+        return index
+
+    def _get_scans_index(self) -> _DomainIndex:
+        """Return the index of the scans by ID, intent, field and spectral window ID."""
+        return self._get_domain_index('scans', self.scans, {
+            'id': lambda scan: (scan.id,),
+            'intent': lambda scan: scan.intents,
+            'field': lambda scan: scan.fields,
+            'spw': lambda scan: {dd.spw.id for dd in scan.data_descriptions},
+        })
+
     def get_data_description(
             self,
             spw: int | spectralwindow.SpectralWindow | None = None,
@@ -351,16 +444,20 @@ class MeasurementSet:
         Returns:
             DataDescription matching the given criteria, or None if no match was found.
         """
+        index = self._get_domain_index('data_descriptions', self.data_descriptions, {
+            'id': lambda dd: (dd.id,),
+            'spw': lambda dd: (dd.spw.id,),
+        })
+
         match = None
         if spw is not None:
             if isinstance(spw, spectralwindow.SpectralWindow):
-                match = [dd for dd in self.data_descriptions
+                match = [dd for dd in index.get('spw', spw.id)
                          if dd.spw is spw]
             elif isinstance(spw, int):
-                match = [dd for dd in self.data_descriptions
-                         if dd.spw.id == spw]
+                match = index.get('spw', spw)
         if id is not None:
-            match = [dd for dd in self.data_descriptions if dd.id == id]
+            match = index.get('id', id)
 
         if match:
             return match[0]
@@ -632,21 +729,31 @@ class MeasurementSet:
         """
         pool = self.fields
 
+        # field names can change, so the index by name is rebuilt on renames
+        index = self._get_domain_index('fields', self.fields, {
+            'id': lambda f: (f.id,),
+            'name': lambda f: (f.name,),
+        }, revision=field_module.Field.name_revision)
+        # positions within self.fields of the fields matching each criterion
+        selections = []
+
         if task_arg not in (None, ''):
             field_id_for_task_arg = utils.field_arg_to_id(self.name, task_arg, self.fields)
-            pool = [f for f in pool if f.id in field_id_for_task_arg]
+            selections.append(index.select('id', field_id_for_task_arg))
 
         if field_id is not None:
             # encase raw numbers in a tuple
             if not isinstance(field_id, Sequence):
                 field_id = (field_id,)
-            pool = [f for f in pool if f.id in field_id]
+            selections.append(index.select('id', field_id))
 
         if name is not None:
             if isinstance(name, str):
                 name = name.split(',')
-            name = set(name)
-            pool = [f for f in pool if f.name in name]
+            selections.append(index.select('name', set(name)))
+
+        if selections:
+            pool = [index.items[position] for position in sorted(set.intersection(*selections))]
 
         if intent is not None:
             if isinstance(intent, str):
@@ -675,8 +782,10 @@ class MeasurementSet:
         """
         if spw_id is not None:
             spw_id = int(spw_id)
-            match = [spw for spw in self.spectral_windows
-                     if spw.id == spw_id]
+            index = self._get_domain_index('spectral_windows', self.spectral_windows, {
+                'id': lambda spw: (spw.id,),
+            })
+            match = index.get('id', spw_id)
             if match:
                 return match[0]
             else:
@@ -734,7 +843,8 @@ class MeasurementSet:
 
         # If requested, filter spws by intent(s).
         if intent is not None:
-            spws = [w for w in spws if not set(intent.split(',')).isdisjoint(w.intents)]
+            intents = set(intent.split(','))
+            spws = [w for w in spws if not intents.isdisjoint(w.intents)]
 
         if not science_windows_only:
             return spws
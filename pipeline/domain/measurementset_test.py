@@ -0,0 +1,168 @@
+"""Tests for the lookups of the MeasurementSet domain object."""
+import collections
+import itertools
+import pickle
+import time
+from collections.abc import Sequence
+
+import pytest
+
+from pipeline.domain import DataDescription, Field, MeasurementSet, Scan
+from pipeline.infrastructure import logging
+from pipeline.infrastructure.utils import conversion
+
+LOG = logging.get_logger(__name__)
+
+# stands in for SpectralWindow, of which the scan lookups only use the ID
+_Spw = collections.namedtuple('_Spw', 'id')
+
+_INTENTS = ('BANDPASS', 'AMPLITUDE', 'PHASE', 'TARGET', 'CHECK', 'ATMOSPHERE', 'POINTING', 'WVR')
+_DIRECTION = {'m0': {'unit': 'rad', 'value': 0.0}, 'm1': {'unit': 'rad', 'value': 0.0}, 'refer': 'J2000',
+              'type': 'direction'}
+
+
+@pytest.fixture
+def casa_field_parsing(monkeypatch):
+    """Parse field selections without msselect, as the synthetic MS does not exist on disk."""
+    monkeypatch.setattr(conversion, 'USE_CASA_PARSING_ROUTINES', False)
+
+
+def _synthetic_ms(nscan, nfield, nspw=16):
+    """MeasurementSet with many scans and fields, each scan observing one field and a subset of spws."""
+    ms = MeasurementSet('synthetic.ms')
+    spws = [_Spw(i) for i in range(nspw)]
+    ms.data_descriptions = [DataDescription(i, spw, 0) for i, spw in enumerate(spws)]
+    ms.fields = [Field(i, 'field_{}'.format(i), i, [], _DIRECTION) for i in range(nfield)]
+    ms.scans = []
+    for scan_id in range(1, nscan + 1):
+        intents = {_INTENTS[scan_id % len(_INTENTS)], _INTENTS[scan_id % 3]}
+        field = ms.fields[scan_id % nfield]
+        field.intents.update(intents)
+        dds = ms.data_descriptions[scan_id % 2::2]
+        ms.scans.append(Scan(id=scan_id, intents=intents, fields=[field], data_descriptions=dds))
+    return ms
+
+
+def _linear_get_scans(ms, scan_id=None, scan_intent=None, field=None, spw=None):
+    """Reference scan lookup filtering the full list of scans per criterion."""
+    pool = ms.scans
+    if scan_id is not None:
+        if not isinstance(scan_id, Sequence):
+            scan_id = (scan_id,)
+        pool = [s for s in pool if s.id in scan_id]
+    if scan_intent is not None:
+        scan_intent = set(scan_intent.split(','))
+        pool = [s for s in pool if not s.intents.isdisjoint(scan_intent)]
+    if field is not None:
+        fields_with_name = frozenset(_linear_get_fields(ms, task_arg=field))
+        pool = [s for s in pool if not fields_with_name.isdisjoint(s.fields)]
+    if spw is not None:
+        spw = {int(i) for i in str(spw).split(',')}
+        pool = sorted({scan for scan in pool for scan_spw in scan.spws if scan_spw.id in spw}, key=lambda s: s.id)
+    return pool
+
+
+def _linear_get_fields(ms, task_arg=None, name=None, intent=None):
+    """Reference field lookup filtering the full list of fields per criterion."""
+    pool = ms.fields
+    if task_arg is not None:
+        field_ids = conversion.field_arg_to_id(ms.name, task_arg, ms.fields)
+        pool = [f for f in pool if f.id in field_ids]
+    if name is not None:
+        pool = [f for f in pool if f.name in set(name.split(','))]
+    if intent is not None:
+        pool = [f for f in pool if not f.intents.isdisjoint(set(intent.split(',')))]
+    return pool
+
+
+def _replay_calibration_queries(ms, get_scans, get_fields, get_data_description):
+    """Replay the domain queries of a calibration recipe: per intent, per spw and per field of that intent."""
+    results = []
+    for intent in ('BANDPASS', 'AMPLITUDE', 'PHASE', 'CHECK', 'TARGET'):
+        for field in get_fields(ms, intent=intent):
+            results.append(get_fields(ms, name=field.name))
+            for spw in range(0, len(ms.data_descriptions), 3):
+                results.append(get_data_description(ms, spw))
+                results.append(get_scans(ms, scan_intent=intent, spw=str(spw)))
+                results.append(get_scans(ms, scan_intent=intent, field=str(field.id), spw=str(spw)))
+        results.append(get_scans(ms, scan_intent=intent))
+    return results
+
+
+def _linear_get_data_description(ms, spw):
+    """Reference data description lookup by spectral window ID."""
+    match = [dd for dd in ms.data_descriptions if dd.spw.id == spw]
+    return match[0] if match else None
+
+
+def test_indexed_queries_match_linear_filters(casa_field_parsing):
+    """Test the indexed lookups against linear filters on a calibration recipe's query mix."""
+    ms = _synthetic_ms(40, 6)
+
+    expected = _replay_calibration_queries(ms, _linear_get_scans, _linear_get_fields, _linear_get_data_description)
+    results = _replay_calibration_queries(ms, MeasurementSet.get_scans, MeasurementSet.get_fields,
+                                          lambda ms, spw: ms.get_data_description(spw=spw))
+
+    assert results == expected
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('nscan, nfield', [(200, 20), (800, 150)])
+def test_indexed_queries_benchmark(casa_field_parsing, nscan, nfield):
+    """Benchmark the indexed lookups against linear filters on a calibration recipe's query mix."""
+    ms = _synthetic_ms(nscan, nfield)
+
+    t0 = time.perf_counter()
+    expected = _replay_calibration_queries(ms, _linear_get_scans, _linear_get_fields, _linear_get_data_description)
+    t_linear = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    results = _replay_calibration_queries(ms, MeasurementSet.get_scans, MeasurementSet.get_fields,
+                                          lambda ms, spw: ms.get_data_description(spw=spw))
+    t_indexed = time.perf_counter() - t0
+    LOG.info('%d domain queries on %d scans and %d fields: linear %.3f s, indexed %.3f s',
+             len(results), nscan, nfield, t_linear, t_indexed)
+
+    assert results == expected
+
+
+def test_get_scans_criteria(casa_field_parsing):
+    """Test combinations of scan criteria against the linear filters."""
+    ms = _synthetic_ms(60, 7)
+    assert ms.get_scans() is ms.scans
+    for scan_id, intent, field, spw in itertools.product((None, 3, [4, 5, 6, 99]), (None, 'PHASE', 'TARGET,CHECK'),
+                                                         (None, '2', '0~3'), (None, '1', '2,3')):
+        assert ms.get_scans(scan_id=scan_id, scan_intent=intent, field=field, spw=spw) == \
+            _linear_get_scans(ms, scan_id=scan_id, scan_intent=intent, field=field, spw=spw)
+
+
+def test_indexes_follow_domain_changes():
+    """Test that the indexes are rebuilt when scans are added, containers replaced, or fields renamed."""
+    ms = _synthetic_ms(20, 4)
+    assert ms.get_scans(scan_id=21) == []
+    assert [f.id for f in ms.get_fields(name='field_2')] == [2]
+
+    new_scan = Scan(id=21, intents={'TARGET'}, fields=[ms.fields[0]], data_descriptions=ms.data_descriptions[:1])
+    ms.scans.append(new_scan)
+    assert ms.get_scans(scan_id=21) == [new_scan]
+
+    ms.fields[2].name = 'renamed'
+    assert ms.get_fields(name='field_2') == []
+    assert ms.get_fields(name='renamed') == [ms.fields[2]]
+
+    spw = _Spw(99)
+    ms.data_descriptions = ms.data_descriptions + [DataDescription(99, spw, 0)]
+    assert ms.get_data_description(spw=99).spw is spw
+
+
+def test_pickle_drops_indexes():
+    """Test that pickled MeasurementSets leave out the domain indexes and rebuild them after loading."""
+    ms = _synthetic_ms(20, 4)
+    assert [f.id for f in ms.get_fields(name='field_2')] == [2]
+    assert '_domain_indexes' in ms.__dict__
+
+    restored = pickle.loads(pickle.dumps(ms))
+    assert '_domain_indexes' not in restored.__dict__
+    assert '_domain_indexes' in ms.__dict__
+    assert [f.id for f in restored.get_fields(name='field_2')] == [2]
+    assert [s.id for s in restored.get_scans(scan_intent='TARGET')] == [s.id for s in ms.get_scans(scan_intent='TARGET')]
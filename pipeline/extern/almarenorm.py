@@ -75,6 +75,8 @@ import warnings
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
 import os
+import shutil
+import tempfile
 from math import *
 from typing import List, Union, Dict
 from datetime import datetime
@@ -191,6 +193,200 @@ def alma_renorm(vis: str, spw: List[int], create_cal_table: bool, threshold: Uni
 
 
 
+class ACPrefetch(object):
+    """
+    Purpose:
+        Store of the autocorrelation data of an MS, read for ACreNorm in
+        one pass per spw instead of one table query per scan, spw and field.
+        The real part of the DATA column (parallel hands only) of all the
+        autocorrelation rows of a spw is read on first use of the spw, in
+        table row order, and indexed by scan and field. For the target
+        scans, whether each cross-correlation row is entirely flagged is
+        also kept, so that fully flagged antennas are found without reading
+        the FLAG column again.
+
+        The data of the spws are kept in memory up to maxBytes in total.
+        Beyond that, the data of further spws are spilled to memory-mapped
+        files in a temporary directory, which is removed by close().
+
+    Inputs:
+        msname : string
+            Name of the MS.
+        msmeta : msmetadata tool
+            Opened on the MS.
+        nAnt : integer
+            Number of antennas of the MS.
+        maxBytes : float
+            Number of bytes of autocorrelation data to keep in memory.
+            Default: 4e9
+        xcscans : list of integers
+            Scans of which the cross-correlation flags are kept.
+            Default: [] (no cross-correlation flags are kept)
+    """
+    # Number of bytes of a column read from the table at once
+    chunkBytes = 64e6
+
+    def __init__(self, msname, msmeta, nAnt, maxBytes=4e9, xcscans=[]):
+        self.msname = msname
+        self.msmeta = msmeta
+        self.nAnt = nAnt
+        self.maxBytes = maxBytes
+        self.xcscans = list(xcscans)
+        self.spilldir = None
+        self.nbytes = 0
+        self.ac = {}  # autocorrelation data and index, keyed by spw
+        self.xc = {}  # cross-correlation flag summary, keyed by spw
+
+    def close(self):
+        self.ac = {}
+        self.xc = {}
+        self.nbytes = 0
+        if self.spilldir is not None:
+            shutil.rmtree(self.spilldir, ignore_errors=True)
+            self.spilldir = None
+
+    def _query(self, tb, spw, where):
+        ddid = str(self.msmeta.datadescids(spw).tolist())
+        return tb.query('DATA_DESC_ID IN '+ddid+' && '+where)
+
+    def _readChunks(self, st, colname, reduce, out=None):
+        # Read a column in chunks of rows, storing reduce(chunk) in out along the row (last) axis
+        nrow = st.nrows()
+        first = reduce(st.getcol(colname, 0, 1))
+        chunkRows = max(1, int(self.chunkBytes // max(1, first.nbytes * 2)))
+        if out is None:
+            out = np.empty(first.shape[:-1] + (nrow,), dtype=first.dtype)
+        for start in range(0, nrow, chunkRows):
+            n = min(chunkRows, nrow-start)
+            out[..., start:start+n] = reduce(st.getcol(colname, start, n))
+        return out
+
+    @staticmethod
+    def _index(*cols):
+        # Map each combination of values of the columns to its row numbers, in row order
+        if len(cols[0]) == 0:
+            return {}
+        order = np.lexsort(cols[::-1])
+        keys = np.stack([col[order] for col in cols])
+        starts = np.flatnonzero(np.any(keys[:, 1:] != keys[:, :-1], axis=0)) + 1
+        groups = np.split(order, starts)
+        return {tuple(int(col[g[0]]) for col in cols): g for g in groups}
+
+    def _allocate(self, spw, shape):
+        # Arrays beyond the memory cap are spilled to a memory-mapped file
+        nbytes = int(np.prod(shape)) * 4
+        if self.nbytes + nbytes <= self.maxBytes:
+            self.nbytes += nbytes
+            return np.empty(shape, dtype=np.float32), False
+        if self.spilldir is None:
+            self.spilldir = tempfile.mkdtemp(prefix=os.path.basename(self.msname.rstrip('/'))+'.acprefetch.',
+                                             dir=os.getcwd())
+        filename = os.path.join(self.spilldir, 'spw'+str(spw)+'.npy')
+        return np.lib.format.open_memmap(filename, mode='w+', dtype=np.float32, shape=shape), True
+
+    def _loadAC(self, spw):
+        t0 = datetime.now()
+        tb = tbtool()
+        tb.open(self.msname)
+        st = self._query(tb, spw, 'ANTENNA1==ANTENNA2')
+        nrow = st.nrows()
+        entry = {'nrow': nrow}
+        if nrow > 0:
+            entry['scan'] = st.getcol('SCAN_NUMBER')
+            entry['field'] = st.getcol('FIELD_ID')
+            entry['state'] = st.getcol('STATE_ID')
+            entry['ant'] = st.getcol('ANTENNA1')
+            shape = st.getcol('DATA', 0, 1).shape
+            ncorr = 2 if shape[0] == 4 else shape[0]
+            data, spilled = self._allocate(spw, (ncorr, shape[1], nrow))
+
+            def parallelHands(d):
+                d = d.real
+                if d.shape[0] == 4:
+                    d = d[0::(d.shape[0]-1), :, :]   # parallel hands only for full pol data
+                return d.astype(np.float32)
+            entry['data'] = self._readChunks(st, 'DATA', parallelHands, out=data)
+            entry['index'] = self._index(entry['scan'], entry['field'])
+            casalog.post('Prefetched '+str(nrow)+' autocorrelation rows of spw='+str(spw)+' ('+str(data.nbytes//1024**2)
+                         +' MiB'+(', spilled to '+self.spilldir if spilled else '')+') in '
+                         +str((datetime.now()-t0).total_seconds())+' s')
+        st.close()
+        tb.close()
+        self.ac[spw] = entry
+        return entry
+
+    def _loadXC(self, spw):
+        t0 = datetime.now()
+        tb = tbtool()
+        tb.open(self.msname)
+        st = self._query(tb, spw, 'ANTENNA1!=ANTENNA2 && SCAN_NUMBER IN '+str([int(s) for s in self.xcscans]))
+        nrow = st.nrows()
+        entry = {'nrow': nrow}
+        if nrow > 0:
+            entry['ant1'] = st.getcol('ANTENNA1')
+            entry['ant2'] = st.getcol('ANTENNA2')
+            entry['flagged'] = self._readChunks(st, 'FLAG', lambda f: np.all(f, axis=(0, 1)))
+            entry['index'] = self._index(st.getcol('SCAN_NUMBER'), st.getcol('FIELD_ID'))
+            casalog.post('Prefetched the flags of '+str(nrow)+' cross-correlation rows of spw='+str(spw)+' in '
+                         +str((datetime.now()-t0).total_seconds())+' s')
+        st.close()
+        tb.close()
+        self.xc[spw] = entry
+        return entry
+
+    @staticmethod
+    def _rows(entry, scans, field):
+        # Row numbers, in table order, of the given scan(s) and field (all fields if None)
+        if entry['nrow'] == 0:
+            return np.array([], dtype=int)
+        scans = [int(s) for s in np.atleast_1d(scans)]
+        groups = [rows for (scan, fld), rows in entry['index'].items()
+                  if scan in scans and (field is None or fld == int(field))]
+        if len(groups) == 0:
+            return np.array([], dtype=int)
+        return np.sort(np.concatenate(groups))
+
+    def getACdata(self, scan, spw, field, rowave=False, stateid=[]):
+        """
+        Equivalent to ACreNorm.getACdata, from the prefetched data.
+        """
+        entry = self.ac.get(spw)
+        if entry is None:
+            entry = self._loadAC(spw)
+        if entry['nrow'] == 0:
+            return None
+        rows = self._rows(entry, scan, field)
+        if len(stateid) > 0 and len(rows) > 0:
+            rows = rows[np.isin(entry['state'][rows], stateid)]
+        # as for the table query, a selection without rows gives an all-NaN average
+        if rowave:
+            # stable sort, as the table query sorted by ANTENNA1
+            rows = rows[np.argsort(entry['ant'][rows], kind='stable')]
+        d = np.asarray(entry['data'][:, :, rows])
+        dsh = d.shape
+        if rowave and dsh[2]%self.nAnt==0:
+            dsh2=(dsh[0],dsh[1],self.nAnt,int(dsh[2]/self.nAnt))
+            d=np.mean(d.reshape(dsh2),3)
+        return d
+
+    def getXCflags(self, scan, spw, field):
+        """
+        Equivalent to ACreNorm.getXCflags, from the prefetched flags. Returns
+        None if the flags of the scan(s) were not prefetched.
+        """
+        if not set(int(s) for s in np.atleast_1d(scan)).issubset(self.xcscans):
+            return None
+        entry = self.xc.get(spw)
+        if entry is None:
+            entry = self._loadXC(spw)
+        rows = self._rows(entry, scan, field)
+        if len(rows) == 0:
+            return list(range(self.nAnt))
+        good = rows[~entry['flagged'][rows]]
+        gdants = set(entry['ant1'][good].tolist()) | set(entry['ant2'][good].tolist())
+        return [iant for iant in range(self.nAnt) if iant not in gdants]
+
+
 class ACreNorm(object):
 
 
@@ -263,6 +459,9 @@ class ACreNorm(object):
         # above the threshold for application      
  
         self.states=[]
+
+        # prefetched autocorrelation data - set up by renormalize
+        self.acprefetch=None
         
         # polynomial fit default for baselining
         self.nfit=5
@@ -324,6 +523,9 @@ class ACreNorm(object):
 
     def close(self):
         self.rnstats=[]
+        if self.acprefetch is not None:
+            self.acprefetch.close()
+            self.acprefetch=None
         self.__del__()
 
     def chanfreqs(self,ispw):
@@ -388,6 +590,9 @@ class ACreNorm(object):
         return BTsysScans
 
     def getACdata(self,scan,spw,field,rowave=False,stateid=[]):
+        if self.acprefetch is not None:
+            return self.acprefetch.getACdata(scan,spw,field,rowave,stateid)
+
         sortlist=''
         if rowave:
             sortlist='ANTENNA1'
@@ -451,6 +656,11 @@ class ACreNorm(object):
     def getXCflags(self,scan,spw,field,datacolumn='FLAG', verbose=False):
         if verbose:
             casalog.post('  Extracting CROSS-correlation flags from spw='+str(spw)+' and scan='+str(scan)+' and field='+str(field))
+
+        if self.acprefetch is not None and datacolumn=='FLAG':
+            aout=self.acprefetch.getXCflags(scan,spw,field)
+            if aout is not None:
+                return aout
             
         mytb.open(self.msname)
 
@@ -829,7 +1039,7 @@ class ACreNorm(object):
             bwdiv='odd', bwthresh=120e6, bwthreshspw={}, checkLineForest=True, nfit=5, useDynamicSegments=True,
             datacolumn='CORRECTED_DATA', createCalTable=False, fillTable=False, docorr=False, docorrThresh=None, usePhaseAC=False,
             antHeuristicsSpectra=True, diagSpectra=True, fthresh=0.01, 
-            verbose=False):
+            prefetchAC=True, prefetchMaxBytes=4e9, verbose=False):
         """
         Purpose:
             This is the main function of the ACreNorm class. It takes the 
@@ -1121,6 +1331,18 @@ class ACreNorm(object):
             Misc.
             -----
 
+            prefetchAC : boolean
+                Read the autocorrelations of each spw (and the flags of the 
+                cross-correlations of the target scans) in one pass, instead
+                of querying the MS for each scan and field. See ACPrefetch.
+                Default: True
+
+            prefetchMaxBytes : float
+                Number of bytes of prefetched autocorrelation data to keep in
+                memory. The data of further spws are spilled to temporary
+                memory-mapped files in the working directory.
+                Default: 4e9
+
             verbose : boolean
                 Print additional messages to the terminal that normally only go
                 into the log file along with some "debug" type statements.
@@ -1377,7 +1599,13 @@ class ACreNorm(object):
                 +', docorrThresh='+str(docorrThresh)+', usePhaseAC='+str(usePhaseAC))
         casalog.post('    antHeuristicsSpectra='+str(antHeuristicsSpectra)+', diagSpectra='+str(diagSpectra) \
                 +', fthresh='+str(fthresh))
-        casalog.post('    verbose='+str(verbose)+')')
+        casalog.post('    prefetchAC='+str(prefetchAC)+', prefetchMaxBytes='+str(prefetchMaxBytes)+', verbose='+str(verbose)+')')
+
+        if prefetchAC:
+            if self.acprefetch is not None:
+                self.acprefetch.close()
+            self.acprefetch=ACPrefetch(self.msname, self.msmeta, self.nAnt, maxBytes=prefetchMaxBytes,
+                                       xcscans=self.msmeta.scansforintent('*TARGET*') if excflagged else [])
 
         # Want to loop over sources so we can disentangle fields and sources and better plot what is happening
         # for mosaics and multi-target observations. 
@@ -2225,6 +2453,11 @@ class ACreNorm(object):
         if createCalTable:
             self.rntb.close()
 
+        # release the prefetched autocorrelation data
+        if self.acprefetch is not None:
+            self.acprefetch.close()
+            self.acprefetch=None
+
         # final log end of the renormalize function
         casalog.post('*** ALMA almarenorm.py ***', 'INFO', 'ReNormalize')   
         casalog.post('*** '+str(self.RNversion)+' ***', 'INFO', 'ReNormalize')   
@@ -0,0 +1,181 @@
+"""Tests for the ACPrefetch class of the pipeline.extern.almarenorm module."""
+import os
+import re
+
+import numpy as np
+import pytest
+
+from . import almarenorm
+from .almarenorm import ACPrefetch
+
+NANT = 3
+NCHAN = 6
+XCSCANS = [3]
+
+
+class _FakeTable:
+    """Table tool of an MS of one spw, holding the columns of the class attribute columns."""
+    columns = {}
+    nqueries = 0
+
+    def __init__(self, columns=None):
+        if columns is not None:
+            self.columns = columns
+
+    def open(self, name):
+        pass
+
+    def query(self, where):
+        _FakeTable.nqueries += 1
+        rows = np.ones(len(self.columns['ANTENNA1']), dtype=bool)
+        if 'ANTENNA1==ANTENNA2' in where:
+            rows &= self.columns['ANTENNA1'] == self.columns['ANTENNA2']
+        if 'ANTENNA1!=ANTENNA2' in where:
+            rows &= self.columns['ANTENNA1'] != self.columns['ANTENNA2']
+        scans = re.search(r'SCAN_NUMBER IN \[([^]]*)\]', where)
+        if scans is not None:
+            rows &= np.isin(self.columns['SCAN_NUMBER'], [int(s) for s in scans.group(1).split(',') if s.strip()])
+        return _FakeTable({name: col[..., rows] for name, col in self.columns.items()})
+
+    def nrows(self):
+        return len(self.columns['ANTENNA1'])
+
+    def getcol(self, name, startrow=0, nrow=-1):
+        col = self.columns[name]
+        stop = col.shape[-1] if nrow < 0 else startrow + nrow
+        return col[..., startrow:stop].copy()
+
+    def close(self):
+        pass
+
+
+class _FakeMsmd:
+    def datadescids(self, spw):
+        return np.array([0])
+
+
+class _FakeLog:
+    def post(self, *args, **kwargs):
+        pass
+
+
+def _ms_columns():
+    """Columns of a mosaic of two fields per scan, with scans 1 (states 0 and 1) and 3, and the antennas of each
+    integration in reverse order."""
+    rng = np.random.default_rng(5)
+    columns = {name: [] for name in ('SCAN_NUMBER', 'FIELD_ID', 'STATE_ID', 'ANTENNA1', 'ANTENNA2')}
+    for scan in (1, 3):
+        for integration in range(4):
+            for field in (0, 1):
+                baselines = [(a1, a2) for a1 in range(NANT) for a2 in range(a1, NANT)][::-1]
+                for a1, a2 in baselines:
+                    for name, value in zip(columns, (scan, field, integration % 2, a1, a2)):
+                        columns[name].append(value)
+    columns = {name: np.array(values) for name, values in columns.items()}
+    nrow = len(columns['ANTENNA1'])
+    columns['DATA'] = (rng.normal(size=(4, NCHAN, nrow)) + 1j * rng.normal(size=(4, NCHAN, nrow))).astype(np.complex64)
+    flag = np.zeros((4, NCHAN, nrow), dtype=bool)
+    # antenna 2 is fully flagged in field 1 of scan 3, and partially flagged elsewhere
+    flag[..., (columns['SCAN_NUMBER'] == 3) & (columns['FIELD_ID'] == 1)
+         & ((columns['ANTENNA1'] == 2) | (columns['ANTENNA2'] == 2))] = True
+    flag[0, 0, columns['ANTENNA2'] == 2] = True
+    columns['FLAG'] = flag
+    return columns
+
+
+def _expected_ac(columns, scans, field, stateid=()):
+    """Average over rows of the parallel hands of the selected autocorrelations, per antenna."""
+    rows = (np.isin(columns['SCAN_NUMBER'], scans) & (columns['ANTENNA1'] == columns['ANTENNA2']))
+    if field is not None:
+        rows &= columns['FIELD_ID'] == field
+    if len(stateid) > 0:
+        rows &= np.isin(columns['STATE_ID'], stateid)
+    data = columns['DATA'].real[[0, 3]]
+    return np.stack([data[..., rows & (columns['ANTENNA1'] == ant)].mean(axis=-1) for ant in range(NANT)], axis=-1)
+
+
+@pytest.fixture
+def prefetch(monkeypatch, tmp_path):
+    columns = _ms_columns()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(_FakeTable, 'columns', columns)
+    monkeypatch.setattr(_FakeTable, 'nqueries', 0)
+    monkeypatch.setattr(almarenorm, 'tbtool', _FakeTable)
+    monkeypatch.setattr(almarenorm, 'casalog', _FakeLog())
+    acprefetch = ACPrefetch('synthetic.ms', _FakeMsmd(), NANT, xcscans=XCSCANS)
+    yield acprefetch, columns
+    acprefetch.close()
+
+
+def test_index_and_rows():
+    """Test that the rows of each (scan, field) are indexed, and selected, in row order."""
+    scan = np.array([3, 1, 3, 1, 1])
+    field = np.array([0, 0, 0, 1, 0])
+    entry = {'nrow': len(scan), 'index': ACPrefetch._index(scan, field)}
+    assert sorted(entry['index']) == [(1, 0), (1, 1), (3, 0)]
+    np.testing.assert_array_equal(entry['index'][(1, 0)], [1, 4])
+    np.testing.assert_array_equal(ACPrefetch._rows(entry, 1, None), [1, 3, 4])
+    np.testing.assert_array_equal(ACPrefetch._rows(entry, [1, 3], 0), [0, 1, 2, 4])
+    assert len(ACPrefetch._rows(entry, 2, None)) == 0
+    assert len(ACPrefetch._rows({'nrow': 0}, 1, None)) == 0
+
+
+@pytest.mark.parametrize('max_bytes', [4e9, 0])
+@pytest.mark.parametrize('scans, field, stateid', [
+    (1, None, []),
+    ([1, 3], 1, []),
+    (1, 0, [1]),
+])
+def test_get_ac_data(prefetch, max_bytes, scans, field, stateid):
+    """Test the row averages of the autocorrelations, in memory and spilled to memory-mapped files."""
+    acprefetch, columns = prefetch
+    acprefetch.maxBytes = max_bytes
+
+    d = acprefetch.getACdata(scans, 0, field, rowave=True, stateid=stateid)
+
+    np.testing.assert_allclose(d, _expected_ac(columns, np.atleast_1d(scans), field, stateid), rtol=1e-6)
+    assert isinstance(acprefetch.ac[0]['data'], np.memmap) == (max_bytes == 0)
+    assert (acprefetch.spilldir is not None) == (max_bytes == 0)
+
+
+def test_get_ac_data_reads_spw_once(prefetch, monkeypatch):
+    """Test that the rows read in chunks are returned in table order, and that the table is queried once per
+    spw."""
+    acprefetch, columns = prefetch
+    monkeypatch.setattr(ACPrefetch, 'chunkBytes', 500)
+    d = acprefetch.getACdata([1, 3], 0, None)
+    acprefetch.getACdata(1, 0, 1, rowave=True)
+
+    rows = columns['ANTENNA1'] == columns['ANTENNA2']
+    np.testing.assert_array_equal(d, columns['DATA'].real[[0, 3]][..., rows])
+    assert _FakeTable.nqueries == 1
+
+
+def test_get_ac_data_empty_selection(prefetch):
+    """Test that a selection without rows gives an all-NaN average, as the table query did."""
+    acprefetch, _ = prefetch
+    with pytest.warns(RuntimeWarning):
+        d = acprefetch.getACdata(1, 0, 0, rowave=True, stateid=[7])
+    assert d.shape == (2, NCHAN, NANT)
+    assert np.isnan(d).all()
+
+
+def test_spill_directory_removed_on_close(prefetch):
+    acprefetch, _ = prefetch
+    acprefetch.maxBytes = 0
+    acprefetch.getACdata(1, 0, None)
+    spilldir = acprefetch.spilldir
+    assert os.path.dirname(spilldir) == os.getcwd()
+    acprefetch.close()
+    assert not os.path.exists(spilldir)
+
+
+def test_get_xc_flags(prefetch):
+    """Test that the antennas with all cross-correlations flagged are found from the prefetched flags."""
+    acprefetch, _ = prefetch
+    assert acprefetch.getXCflags(3, 0, 1) == [2]
+    assert acprefetch.getXCflags(3, 0, 0) == []
+    # scans of which the flags were not prefetched
+    assert acprefetch.getXCflags(1, 0, 0) is None
+    # no rows of the field in the scan
+    assert acprefetch.getXCflags(3, 0, 5) == list(range(NANT))
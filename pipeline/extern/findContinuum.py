@@ -495,7 +495,8 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
                   returnBluePoints=False, removeOutlierBaselineChannels='',
                   enableInitialQuadratic=True, skipCubeNoise=False, 
                   returnMomDiffSNR=False, spectralDynamicRangeBandWidth=None,
-                  tooManyPixels=850, useBaseline='auto'): # 123
+                  tooManyPixels=850, useBaseline='auto', useMomentEngine=True,
+                  verifyMomentEngine=False): # 125
     """
     This function calls functions to:
     1) compute a representative 'mean' spectrum of a dirty cube
@@ -861,6 +862,10 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
         read it from the header)
     window: the smoothing window to apply to the mean spectrum (when nbin>4)
     mom08simultaneous: if True, set moments=[0,8] in one call to immoments instead of two
+    useMomentEngine: if True, read the cube once into a CubeMoments instance, and build the
+        mom0fc and mom8fc images of each iteration from it instead of running immoments
+    verifyMomentEngine: if True, also run immoments and imstat on each iteration, and report
+        the timing and agreement of their results with those of the CubeMoments instance
     """
     executionTimeSeconds = timeUtilities.time()
     if singleContinuum is None and vis == '':
@@ -1377,6 +1382,7 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
         momDiffCode = None
         mom8code = None # mom8code
         momDiffPeak0 = None # necessary in case neither AmendMask or ExtraMask is invoked but LowBW+LowSpread triggers a new range
+    momentEngine = None
     for amendMaskIteration in range(amendMaskIterations+1):
         if amendMaskIteration <= 1: # prevent undefined var if returnSFC=True
             sigmaFindContinuumAtEndOfOriginalIteration = sigmaFindContinuum
@@ -1737,15 +1743,16 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
             mymom0fc = mom0fc[amendMaskIterationName]  # just a short-hand notation for easier use
             removeIfNecessary(mymom8fc)  # in case there was a prior run of findContinuum
             removeIfNecessary(mymom0fc)  # in case there was a prior run of findContinuum
-            if mom08simultaneous:
-                immoments(img, moments=[0,8], chans=selection, outfile=momRoot[amendMaskIterationName])
-            else:
-                if not os.path.exists(mymom8fc):  # save time during development phase
-                    print("Running immoments('%s', moments=[8], chans='%s', outfile='%s')" % (img,selection,mymom8fc))
-                    immoments(img, moments=[8], chans=selection, outfile=mymom8fc)
-                if not os.path.exists(mymom0fc):  # save time during development phase
-                    print("Running immoments('%s', moments=[0], chans='%s', outfile='%s')" % (img,selection,mymom0fc))
-                    immoments(img, moments=[0], chans=selection, outfile=mymom0fc)
+            if useMomentEngine and momentEngine is None:
+                try:
+                    momentEngine = CubeMoments(img, maxBytes=bytes/4)
+                except Exception as e:
+                    casalogPost("Could not read the cube into memory, will run immoments instead: %s" % (e), priority='WARN')
+                    useMomentEngine = False
+            iterationStartTime = timeUtilities.time()
+            makeMom0Mom8fc(img, selection, mymom0fc, mymom8fc, 
+                           momRoot=momRoot[amendMaskIterationName] if mom08simultaneous else '',
+                           momentEngine=momentEngine, verify=verifyMomentEngine)
 
             # To-Do PL2024: if dynamic range of mom0 is high, raise the mom0minsnr mask threshold
             
@@ -1791,7 +1798,8 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
             else:
                 mom8fcSNRMom8, mom8fcPeakOutside, ignore0, ignore1 = imageSNR(mymom8fc, mask=jointMaskTest, returnAllStats=True, 
                                                                               applyMaskToAll=True)
-            mom8fcSum = imstat(mymom8fc, listit=imstatListit)['sum'][0]
+            mom8fcSum = momentImageStatistics(mymom8fc, momentEngine)['sum']
+            casalogPost("%d) Built and assessed the mom0fc and mom8fc images in %.2f sec" % (amendMaskIteration, timeUtilities.time()-iterationStartTime))
             casalogPost("%d) mom8fcMedian = %f, mom8fcScaledMAD = %f,  mom8fcSNRinside = %f, mom8fcSNROutside=%f, mom8fcSum = %f, mom8fcPeak=%f, mom8fcPeakOutside=%f" % (amendMaskIteration, mom8fcMedian, mom8fcMAD, mom8fcSNR, mom8fcSNRMom8, mom8fcSum, mom8fcPeak, mom8fcPeakOutside))
 
             ###############################################
@@ -1888,8 +1896,11 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
                     casalogPost("Running fc.cubeNoiseLevel('%s', pbcube='%s', mask='%s', chans='%s', subimage=%s)" % (img, pbmom, jointMaskTest, selection, subimage))
                     MADCubeOutside, cubeMedian = cubeNoiseLevel(img, pbcube=pbmom, mask=jointMaskTest, chans=selection, subimage=subimage, imageInfo=imageInfo) # no need for jointMaskTestAnnulus since pbmom is passed already
                 mom8fcSNRCube = (mom8fcPeakOutside-mom8fcMedian)/MADCubeOutside
-                npix = imstat(img, listit=imstatListit)['npts']
-                npix = pickFirstElementIfNecessary(npix)   # fix for PIPE-2673
+                if momentEngine is not None:
+                    npix = momentEngine.npts
+                else:
+                    npix = imstat(img, listit=imstatListit)['npts']
+                    npix = pickFirstElementIfNecessary(npix)   # fix for PIPE-2673
                 TenEventSigma = oneEvent(npix, 10)
                 casalogPost("%d pixels yields 10-event sigma = %f,  MAD of cube outside joint mask = %f" % (npix, TenEventSigma, MADCubeOutside))
                 NpixCubeMedian = computeNpixCubeMedian(mom8fcMedian, cubeLevel, MADCubeOutside, mymom8fc, jointMaskTest)
@@ -1936,7 +1947,7 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
                     amendMaskDecision = 'No'
                     sigmaUsedToAmendMask = 0
                 else:
-                    npixels = imstat(mymom8fc, listit=imstatListit)['npts'][0]
+                    npixels = momentImageStatistics(mymom8fc, momentEngine)['npts']
                     mymask = '%s && "%s"<0' % (jointMaskTest,mymom8fc)
                     print("Calling imstat('%s', mask='%s')" % (mymom8fc,mymask))
                     mystats = imstat(mymom8fc, mask=mymask, listit=imstatListit)['npts']
@@ -2282,12 +2293,9 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
                     mom0fcIntersect = mom0fc['.intersect']
                     removeIfNecessary(mom8fcIntersect)
                     removeIfNecessary(mom0fcIntersect)  # in case there was a prior run of findContinuum
-                    if mom08simultaneous:
-                        immoments(img, moments=[0,8], chans=selection, outfile=momRoot['.intersect'])
-                    else:
-                        immoments(img, moments=[8], chans=selection, outfile=mom8fcIntersect)
-                        print("Running immoments('%s', moments=[0], chans='%s', outfile='%s')" % (img,selection,mom0fcIntersect))
-                        immoments(img, moments=[0], chans=selection, outfile=mom0fcIntersect)
+                    makeMom0Mom8fc(img, selection, mom0fcIntersect, mom8fcIntersect, 
+                                   momRoot=momRoot['.intersect'] if mom08simultaneous else '',
+                                   momentEngine=momentEngine, verify=verifyMomentEngine)
                     finalMom8fc = mom8fcIntersect
                     finalMom0fc = mom0fcIntersect
 
@@ -2302,7 +2310,7 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
                         mom8fcSNROutside, mom8fcPeakOutside, ignore0, ignore1 = imageSNR(mom8fcIntersect, mask=jointMaskTest, maskWithAnnulus='', 
                                                                                      useAnnulus=False, returnAllStats=True, applyMaskToAll=True)
                     mom8fcSNRCube = (mom8fcPeakOutside-mom8fcMedian)/MADCubeOutside
-                    mom8fcSum = imstat(mom8fcIntersect, listit=imstatListit)['sum'][0]
+                    mom8fcSum = momentImageStatistics(mom8fcIntersect, momentEngine)['sum']
                     casalogPost("new  mom8fcMedian = %f, mom8fcScaledMAD = %f,  mom8fcSNR = %f, mom8fcSNROutside = %f, mom8fcSum = %f" % (mom8fcMedian, mom8fcMAD, mom8fcSNR, mom8fcSNROutside, mom8fcSum))
                     NpixMom8Median = computeNpixMom8Median(mom8fcMedian, np.max([5.5,TenEventSigma]), mom8fcMAD, mom8fcIntersect, jointMaskTest)
                     NpixMom8MedianBadAtm = computeNpixMom8MedianBadAtm(mom8fcMedian, 8, mom8fcMAD, mom8fcIntersect, jointMaskTest)
@@ -2625,13 +2633,9 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
                     mom0fc[myIntersectName] = mom0fc[amendMaskIterationName] + 'Intersect'
                 removeIfNecessary(mom8fc[myIntersectName])
                 removeIfNecessary(mom0fc[myIntersectName])
-                if mom08simultaneous:
-                    immoments(img, moments=[0,8], chans=selection, outfile=momRoot[myIntersectName])
-                else:
-                    casalogPost("Running immoments('%s', moments=[8], chans='%s', outfile='%s')" % (img,selection, mom8fc[myIntersectName]))
-                    immoments(img, moments=[8], chans=selection, outfile=mom8fc[myIntersectName])
-                    casalogPost("Running immoments('%s', moments=[0], chans='%s', outfile='%s')" % (img, selection, mom0fc[myIntersectName]))
-                    immoments(img, moments=[0], chans=selection, outfile=mom0fc[myIntersectName])
+                makeMom0Mom8fc(img, selection, mom0fc[myIntersectName], mom8fc[myIntersectName], 
+                               momRoot=momRoot[myIntersectName] if mom08simultaneous else '',
+                               momentEngine=momentEngine, verify=verifyMomentEngine)
                 finalMom0fc = mom0fc[myIntersectName]
                 finalMom8fc = mom8fc[myIntersectName]
 
@@ -2646,7 +2650,7 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
                                                                                      returnAllStats=True, applyMaskToAll=True)
                 # need to recalculate mom8fcSNRCube because the numerator has changed
                 mom8fcSNRCube = (mom8fcPeakOutside-mom8fcMedian)/MADCubeOutside
-                mom8fcSum = imstat(mom8fc[myIntersectName], listit=imstatListit)['sum'][0]
+                mom8fcSum = momentImageStatistics(mom8fc[myIntersectName], momentEngine)['sum']
 
                 # create scaled version of mom0fcIntersect
                 mom0fcIntersectScaled = mom0fc[myIntersectName] + '.scaled'
@@ -2956,13 +2960,9 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
                         mom0fc[myIntersectName] = mom0fc[amendMaskIterationName] + 'Intersect'
                     removeIfNecessary(mom8fc[myIntersectName])
                     removeIfNecessary(mom0fc[myIntersectName])
-                    if mom08simultaneous:
-                        immoments(img, moments=[0,8], chans=selection, outfile=momRoot[myIntersectName])
-                    else:
-                        casalogPost("Running immoments('%s', moments=[8], chans='%s', outfile='%s')" % (img,selection, mom8fc[myIntersectName]))
-                        immoments(img, moments=[8], chans=selection, outfile=mom8fc[myIntersectName])
-                        casalogPost("Running immoments('%s', moments=[0], chans='%s', outfile='%s')" % (img, selection, mom0fc[myIntersectName]))
-                        immoments(img, moments=[0], chans=selection, outfile=mom0fc[myIntersectName])
+                    makeMom0Mom8fc(img, selection, mom0fc[myIntersectName], mom8fc[myIntersectName], 
+                                   momRoot=momRoot[myIntersectName] if mom08simultaneous else '',
+                                   momentEngine=momentEngine, verify=verifyMomentEngine)
                     finalMom0fc = mom0fc[myIntersectName]
                     finalMom8fc = mom8fc[myIntersectName]
                     mom8fcSNR, mom8fcPeak, mom8fcMedian, mom8fcMAD = imageSNR(mom8fc[myIntersectName], mask=jointMaskTest, 
@@ -2976,7 +2976,7 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
                                                                                          returnAllStats=True, applyMaskToAll=True)
                     # need to recalculate mom8fcSNRCube because the numerator has changed
                     mom8fcSNRCube = (mom8fcPeakOutside-mom8fcMedian)/MADCubeOutside
-                    mom8fcSum = imstat(mom8fc[myIntersectName], listit=imstatListit)['sum'][0]
+                    mom8fcSum = momentImageStatistics(mom8fc[myIntersectName], momentEngine)['sum']
 
                     # create scaled version of mom0fcIntersect
                     mom0fcIntersectScaled = mom0fc[myIntersectName] + '.scaled'
@@ -3216,6 +3216,259 @@ def findContinuum(img='', pbcube=None, psfcube=None, minbeamfrac=0.3, spw='',
                         return(selection, png, aggregateBandwidth, momDiffSNR)
 # end of findContinuum   
 
+class CubeMoments:
+    """
+    Computes the moment 0 (integrated) and moment 8 (maximum) images of a cube 
+    for any channel selection, and their sums and numbers of unmasked pixels, 
+    as immoments and imstat would, but reading the cube only once.
+    The cube is read in chunks of channels.  The sum, maximum and number of 
+    unmasked values of each spatial pixel over each chunk are kept, so that 
+    the moments of a selection are combined from the chunks it fully covers, 
+    plus the channels at the edges of its ranges.  Those channels are kept in 
+    memory if the cube fits within maxBytes, otherwise they are read again from 
+    the cube.  Masked and non-finite values are excluded, and a pixel of the 
+    moment images is masked if all of its selected values are.
+    This is used by findContinuum to build the mom0fc and mom8fc images on
+    each mask amendment iteration, instead of running immoments and imstat.
+    """
+    def __init__(self, img, chunkChannels=64, maxBytes=None, maxSelections=4):
+        """
+        img: name of the CASA image cube
+        chunkChannels: number of channels read at once
+        maxBytes: keep the channels in memory if they need less than this many
+            bytes (default = a quarter of the memory of the machine)
+        maxSelections: number of channel selections for which the moments are kept
+        """
+        startTime = timeUtilities.time()
+        self.img = img
+        self.chunkChannels = chunkChannels
+        self.maxSelections = maxSelections
+        self.selections = {}  # moments, keyed by tuple of channels
+        self.images = {}  # keys of the images written by writeMoments, keyed by image name
+        if maxBytes is None:
+            maxBytes = getMemorySize() / 4
+        myia = iatool()
+        myia.open(img)
+        self.shape = myia.shape()
+        self.axis = findSpectralAxis(myia)
+        self.nchan = self.shape[self.axis]
+        self.bunit = myia.brightnessunit()
+        mycs = myia.coordsys()
+        myqa = qatool()
+        restfreq = myqa.convert(mycs.restfrequency(), 'Hz')['value'][0]
+        deltaFreq = mycs.increment()['numeric'][self.axis]
+        if restfreq <= 0:
+            restfreq = mycs.referencevalue()['numeric'][self.axis]
+        mycs.done()
+        myqa.done()
+        # immoments integrates over the radio velocity, in km/s
+        self.velocityWidth = abs(299792.458 * deltaFreq / restfreq)
+        planeShape = tuple(np.delete(self.shape, self.axis))
+        self.inMemory = self.nchan * np.prod(planeShape) * 5 <= maxBytes  # 4 bytes per value + 1 byte per mask
+        if self.inMemory:
+            self.values = np.zeros((self.nchan,) + planeShape, dtype=np.float32)
+            self.valid = np.zeros((self.nchan,) + planeShape, dtype=bool)
+        nchunk = (self.nchan + chunkChannels - 1) // chunkChannels
+        self.chunkSum = np.zeros((nchunk,) + planeShape)
+        self.chunkMax = np.full((nchunk,) + planeShape, -np.inf, dtype=np.float32)
+        self.chunkCount = np.zeros((nchunk,) + planeShape, dtype=np.int32)
+        for ichunk in range(nchunk):
+            c0 = ichunk * chunkChannels
+            c1 = min(c0 + chunkChannels, self.nchan) - 1
+            values, valid = self._readChannels(c0, c1, myia)
+            self.chunkSum[ichunk] = values.sum(axis=0, dtype=np.float64)
+            self.chunkMax[ichunk] = np.max(values, axis=0, where=valid, initial=-np.inf)
+            self.chunkCount[ichunk] = np.count_nonzero(valid, axis=0)
+            if self.inMemory:
+                self.values[c0:c1+1] = values
+                self.valid[c0:c1+1] = valid
+        myia.close()
+        self.npts = int(self.chunkCount.sum())
+        casalogPost("CubeMoments: read %d channels of %s in %d chunks in %.2f sec (channels kept in memory: %s)" % (self.nchan, img, nchunk, timeUtilities.time()-startTime, self.inMemory))
+
+    def _readChannels(self, c0, c1, myia=None):
+        """
+        Returns the values of channels c0..c1 (inclusive), with the spectral axis 
+        first and masked and non-finite values set to zero, and a boolean array 
+        which is True for the values that are not masked.
+        """
+        if self.inMemory and myia is None:
+            return self.values[c0:c1+1], self.valid[c0:c1+1]
+        needToClose = myia is None
+        if needToClose:
+            myia = iatool()
+            myia.open(self.img)
+        blc = [0] * len(self.shape)
+        trc = list(np.array(self.shape) - 1)
+        blc[self.axis] = c0
+        trc[self.axis] = c1
+        values = np.moveaxis(myia.getchunk(blc, trc, dropdeg=False), self.axis, 0).astype(np.float32)
+        valid = np.moveaxis(myia.getchunk(blc, trc, dropdeg=False, getmask=True), self.axis, 0)
+        if needToClose:
+            myia.close()
+        valid &= np.isfinite(values)
+        values[~valid] = 0
+        return values, valid
+
+    def _selectedChannels(self, selection):
+        """
+        Returns the sorted array of unique channels of a selection string.  An 
+        empty selection selects all channels, as it does for immoments.
+        """
+        if selection.split(':')[-1].strip() == '':
+            return np.arange(self.nchan)
+        return np.unique(convertSelectionIntoChannelList(selection))
+
+    def moments(self, selection):
+        """
+        Returns a dictionary with the moment 0 image ('mom0'), moment 8 image 
+        ('mom8'), and the mask of the moment images ('mask', True for unmasked 
+        pixels) for the channel selection, as arrays with the shape of the cube 
+        without its spectral axis.
+        selection: channel selection string, e.g. '14~18;50~60', or '' for all
+            channels
+        """
+        channels = self._selectedChannels(selection)
+        key = tuple(channels)
+        if key in self.selections:
+            return self.selections[key]
+        planeShape = self.chunkSum.shape[1:]
+        total = np.zeros(planeShape)
+        peak = np.full(planeShape, -np.inf, dtype=np.float32)
+        count = np.zeros(planeShape, dtype=np.int32)
+        # split the channels into ranges of consecutive channels within a chunk
+        breaks = np.flatnonzero((np.diff(channels) != 1) | (np.diff(channels // self.chunkChannels) != 0)) + 1
+        for rangeChannels in np.split(channels, breaks):
+            c0 = rangeChannels[0]
+            c1 = rangeChannels[-1]
+            ichunk = c0 // self.chunkChannels
+            if len(rangeChannels) == min(self.chunkChannels, self.nchan - ichunk * self.chunkChannels):
+                total += self.chunkSum[ichunk]
+                np.maximum(peak, self.chunkMax[ichunk], out=peak)
+                count += self.chunkCount[ichunk]
+            else:
+                values, valid = self._readChannels(c0, c1)
+                total += values.sum(axis=0, dtype=np.float64)
+                np.maximum(peak, np.max(values, axis=0, where=valid, initial=-np.inf), out=peak)
+                count += np.count_nonzero(valid, axis=0)
+        mask = count > 0
+        result = {'mom0': np.where(mask, total * self.velocityWidth, 0),
+                  'mom8': np.where(mask, peak, 0),
+                  'mask': mask}
+        if len(self.selections) >= self.maxSelections:
+            self.selections.pop(next(iter(self.selections)))
+        self.selections[key] = result
+        return result
+
+    def statistics(self, selection):
+        """
+        Returns a dictionary with the sums of the unmasked pixels of the moment 0 
+        and moment 8 images ('mom0sum', 'mom8sum') and their number ('npts') for 
+        the channel selection, as imstat would report for the images.
+        """
+        result = self.moments(selection)
+        mask = result['mask']
+        return {'mom0sum': np.sum(result['mom0'][mask]), 
+                'mom8sum': np.sum(result['mom8'][mask], dtype=np.float64), 
+                'npts': int(np.count_nonzero(mask))}
+
+    def imageStatistics(self, imagename):
+        """
+        Returns a dictionary with the sum ('sum') and number ('npts') of unmasked 
+        pixels of a moment image written by writeMoments, or None if the image 
+        was not written by writeMoments.
+        """
+        if imagename not in self.images:
+            return None
+        selection, moment = self.images[imagename]
+        stats = self.statistics(selection)
+        return {'sum': stats[moment+'sum'], 'npts': stats['npts']}
+
+    def writeMoments(self, selection, mom0fc='', mom8fc=''):
+        """
+        Writes the moment 0 and/or moment 8 images of the channel selection, 
+        with the coordinate system of the first channel of the cube (as 
+        immoments does, the images keep a spectral axis of length 1).
+        mom0fc: name of the moment 0 image to write (if not '')
+        mom8fc: name of the moment 8 image to write (if not '')
+        """
+        result = self.moments(selection)
+        blc = [0] * len(self.shape)
+        trc = list(np.array(self.shape) - 1)
+        trc[self.axis] = 0
+        myrg = rgtool()
+        region = myrg.box(blc=blc, trc=trc)
+        myrg.done()
+        mask = np.expand_dims(result['mask'], self.axis)
+        myia = iatool()
+        myia.open(self.img)
+        for outfile, moment, unit in [(mom0fc, 'mom0', self.bunit+'.km/s'), (mom8fc, 'mom8', self.bunit)]:
+            if outfile == '':
+                continue
+            removeIfNecessary(outfile)
+            outia = myia.subimage(outfile, region=region, dropdeg=False)
+            outia.putchunk(np.expand_dims(result[moment], self.axis).astype(np.float32))
+            # creates the pixel mask if the cube has none
+            outia.putregion(pixelmask=mask)
+            outia.setbrightnessunit(unit)
+            outia.done()
+            self.images[outfile] = (selection, moment)
+        myia.close()
+
+def makeMom0Mom8fc(img, selection, mom0fc, mom8fc, momRoot='', momentEngine=None, verify=False):
+    """
+    This function is called by findContinuum.
+    Builds the mom0fc and mom8fc images of the channel selection of a cube.
+    momRoot: if not '', then run immoments once with moments=[0,8] and outfile=momRoot,
+        which writes momRoot+'.integrated' (=mom0fc) and momRoot+'.maximum' (=mom8fc)
+    momentEngine: a CubeMoments instance for img; if not None, then write the 
+        images with it instead of running immoments
+    verify: if True and momentEngine is not None, then also run immoments and 
+        imstat, and report the agreement of the sums and numbers of pixels 
+        of the images with those of momentEngine
+    """
+    startTime = timeUtilities.time()
+    if momentEngine is not None:
+        casalogPost("Writing '%s' and '%s' from the in-memory moments of chans='%s'" % (mom0fc, mom8fc, selection))
+        momentEngine.writeMoments(selection, mom0fc=mom0fc, mom8fc=mom8fc)
+        casalogPost("CubeMoments: wrote the moment images in %.2f sec" % (timeUtilities.time()-startTime))
+        if verify:
+            taskMom0fc = mom0fc + '.immoments'
+            taskMom8fc = mom8fc + '.immoments'
+            startTime = timeUtilities.time()
+            makeMom0Mom8fc(img, selection, taskMom0fc, taskMom8fc)
+            taskStats = {moment: imstat(image, listit=imstatListit) for moment, image in [('mom0', taskMom0fc), ('mom8', taskMom8fc)]}
+            casalogPost("CubeMoments: immoments and imstat took %.2f sec" % (timeUtilities.time()-startTime))
+            stats = momentEngine.statistics(selection)
+            for moment in ['mom0', 'mom8']:
+                taskSum = pickFirstElementIfNecessary(taskStats[moment]['sum'])
+                taskNpts = pickFirstElementIfNecessary(taskStats[moment]['npts'])
+                casalogPost("CubeMoments: %s sum = %g (immoments: %g, relative difference %.2e), npts = %d (immoments: %d)" % (moment, stats[moment+'sum'], taskSum, abs(stats[moment+'sum']-taskSum)/max(abs(taskSum), np.finfo(float).tiny), stats['npts'], taskNpts))
+            removeIfNecessary(taskMom0fc)
+            removeIfNecessary(taskMom8fc)
+    elif momRoot != '':
+        casalogPost("Running immoments('%s', moments=[0,8], chans='%s', outfile='%s')" % (img, selection, momRoot))
+        immoments(img, moments=[0,8], chans=selection, outfile=momRoot)
+    else:
+        casalogPost("Running immoments('%s', moments=[8], chans='%s', outfile='%s')" % (img, selection, mom8fc))
+        immoments(img, moments=[8], chans=selection, outfile=mom8fc)
+        casalogPost("Running immoments('%s', moments=[0], chans='%s', outfile='%s')" % (img, selection, mom0fc))
+        immoments(img, moments=[0], chans=selection, outfile=mom0fc)
+
+def momentImageStatistics(imagename, momentEngine=None):
+    """
+    This function is called by findContinuum.
+    Returns the sum and the number of unmasked pixels of a mom0fc or mom8fc 
+    image as a dictionary with keys 'sum' and 'npts': from momentEngine if it 
+    wrote the image, otherwise from imstat.
+    """
+    if momentEngine is not None:
+        stats = momentEngine.imageStatistics(imagename)
+        if stats is not None:
+            return stats
+    stats = imstat(imagename, listit=imstatListit)
+    return {'sum': stats['sum'][0], 'npts': stats['npts'][0]}
+
 def cutSomeNarrowRanges(selection, nkeep=MAX_RANGES_FOR_IMMOMENTS, 
                         delimiter=';'):
     """
@@ -0,0 +1,111 @@
+"""Tests for the CubeMoments class of the pipeline.extern.findContinuum module."""
+import numpy as np
+import pytest
+
+from . import findContinuum
+from .findContinuum import CubeMoments
+
+RESTFREQ = 1.0e11
+DELTAFREQ = 1.0e6
+VELOCITY_WIDTH = 299792.458 * DELTAFREQ / RESTFREQ
+
+
+class _FakeCoordsys:
+    def restfrequency(self):
+        return {'value': np.array([RESTFREQ]), 'unit': 'Hz'}
+
+    def increment(self):
+        return {'numeric': np.array([-1.0e-6, 1.0e-6, 1.0, DELTAFREQ])}
+
+    def referencevalue(self):
+        return {'numeric': np.array([0.0, 0.0, 0.0, RESTFREQ])}
+
+    def done(self):
+        pass
+
+
+class _FakeQuanta:
+    def convert(self, quantity, unit):
+        return quantity
+
+    def done(self):
+        pass
+
+
+class _FakeImage:
+    """Image tool reading the (data, mask) cubes of the class attribute cubes, keyed by image name."""
+    cubes = {}
+
+    def open(self, name):
+        self.name = name
+
+    def shape(self):
+        return list(self.cubes[self.name][0].shape)
+
+    def brightnessunit(self):
+        return 'Jy/beam'
+
+    def coordsys(self):
+        return _FakeCoordsys()
+
+    def getchunk(self, blc, trc, dropdeg=False, getmask=False):
+        data, mask = self.cubes[self.name]
+        region = tuple(slice(b, t + 1) for b, t in zip(blc, trc))
+        return (mask if getmask else data)[region].copy()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def synthetic_cube(monkeypatch):
+    """A 5 x 4 x 1 x 19 cube with non-finite and masked values, and a pixel masked in all channels."""
+    rng = np.random.default_rng(11)
+    data = rng.normal(0.0, 1.0, (5, 4, 1, 19)).astype(np.float32)
+    mask = rng.uniform(size=data.shape) > 0.1
+    data[0, 0, 0, 3] = np.nan
+    data[1, 2, 0, 8] = np.inf
+    mask[4, 3, 0, :] = False
+    monkeypatch.setattr(_FakeImage, 'cubes', {'synthetic.image': (data, mask)})
+    monkeypatch.setattr(findContinuum, 'iatool', _FakeImage)
+    monkeypatch.setattr(findContinuum, 'qatool', _FakeQuanta)
+    monkeypatch.setattr(findContinuum, 'findSpectralAxis', lambda myia: 3)
+    monkeypatch.setattr(findContinuum, 'casalogPost', lambda *args, **kwargs: None)
+    return data, mask
+
+
+def _expected_moments(data, mask, channels):
+    values = data[..., channels].astype(np.float64)
+    valid = mask[..., channels] & np.isfinite(values)
+    unmasked = valid.any(axis=-1)
+    mom0 = np.where(valid, values, 0.0).sum(axis=-1) * VELOCITY_WIDTH
+    mom8 = np.where(valid, values, -np.inf).max(axis=-1)
+    return np.where(unmasked, mom0, 0.0), np.where(unmasked, mom8, 0.0), unmasked
+
+
+@pytest.mark.parametrize('maxBytes', [None, 0])
+@pytest.mark.parametrize('selection, channels', [
+    # full chunk, partial chunk, range across a chunk edge, partial last chunk
+    ('0~3;5;7~12;17~18', [0, 1, 2, 3, 5, 7, 8, 9, 10, 11, 12, 17, 18]),
+    ('spw1:16~18', [16, 17, 18]),
+    ('', list(range(19))),
+])
+def test_moments(synthetic_cube, maxBytes, selection, channels):
+    """Test the moments and statistics of channel selections against the moments of the selected channels,
+    with the channels kept in memory (maxBytes=None) or read again from the cube (maxBytes=0)."""
+    data, mask = synthetic_cube
+    engine = CubeMoments('synthetic.image', chunkChannels=4, maxBytes=maxBytes)
+    assert engine.inMemory == (maxBytes is None)
+    assert engine.npts == np.count_nonzero(mask & np.isfinite(data))
+
+    mom0, mom8, unmasked = _expected_moments(data, mask, channels)
+    result = engine.moments(selection)
+    assert np.array_equal(result['mask'], unmasked)
+    assert not result['mask'][4, 3, 0]
+    assert np.allclose(result['mom0'], mom0, rtol=1e-6, atol=1e-6)
+    assert np.array_equal(result['mom8'], mom8)
+
+    stats = engine.statistics(selection)
+    assert stats['npts'] == np.count_nonzero(unmasked)
+    assert np.isclose(stats['mom0sum'], mom0[unmasked].sum(), rtol=1e-6)
+    assert np.isclose(stats['mom8sum'], mom8[unmasked].sum(), rtol=1e-6)
@@ -128,6 +128,80 @@ class HeuristicsLineFinder(api.Heuristic):
 
         return ranges
 
+    def calculate_batch(self, spectra: np.ndarray, threshold: float = 7.0, tweak: bool = False,
+                        masks: np.ndarray | None = None, edge: list[int] | None = None) -> list[list[int]]:
+        """
+        Invoke line finding algorithm on many spectra at once.
+
+        This is the vectorised equivalent of calling calculate on every row of
+        spectra: the iterative MAD estimate, the line channel selection and the
+        run-length extraction of line ranges are evaluated for all spectra
+        together with array operations. Only the optional tweak of the line
+        ranges, which depends on the few detected lines, loops over spectra.
+
+        Args:
+            spectra: 2-D array of spectra, one spectrum per row.
+            threshold: a factor of threshold of line detection with respect to MAD.
+            tweak: if True, spectral line ranges are extended to cover line edges.
+            masks: 2-D mask array of the same shape as spectra, True for valid
+                   elements. All elements are valid if None.
+            edge: the number of elements in left and right edges of spectrum to be
+                  excluded from line detection.
+        Returns:
+            ranges: A list with, for each spectrum, the start and end indices of its
+                    spectral lines in the order of, e.g., [start1, end1, ..., startN, endN].
+        """
+        _spectra = np.asarray(spectra)
+        nrow, nchan = _spectra.shape
+        if masks is None:
+            mask = np.ones((nrow, nchan), dtype=bool)
+        else:
+            mask = np.array(masks, dtype=bool)
+        if edge is not None:
+            if len(edge) == 1:
+                if edge[0] != 0:
+                    mask[:, :edge[0]] = False
+                    mask[:, -edge[0]:] = False
+                    _edge = (edge[0], nchan-edge[0])
+                else:
+                    _edge = (0, nchan)
+            else:
+                mask[:, :edge[0]] = False
+                if edge[1] != 0:
+                    mask[:, -edge[1]:] = False
+                _edge = (edge[0], nchan-edge[1])
+        else:
+            _edge = (0, nchan)
+
+        previous_lines = np.zeros((nrow, nchan), dtype=bool)
+        previous_mad = np.full(nrow, 1e6)
+        active = np.ones(nrow, dtype=bool)
+        iteration = 0
+        max_iteration = 10
+
+        while iteration <= max_iteration and np.any(active):
+            iteration += 1
+            iteration_mask = mask & ~previous_lines
+            median = _sorted_median(_spectra, iteration_mask)
+            variances = np.abs(_spectra - median[:, np.newaxis])
+
+            ngood = np.count_nonzero(iteration_mask, axis=1)
+            mad = _sorted_median(variances, iteration_mask, nselect=(0.8 * ngood).astype(int))
+
+            lines = mask & (variances > threshold * mad[:, np.newaxis])
+
+            converged = (mad > previous_mad) | np.all(lines == previous_lines, axis=1)
+            update = active & ~converged
+            previous_mad[update] = mad[update]
+            previous_lines[update] = lines[update]
+            active &= ~converged
+
+        ranges = _line_runs(previous_lines)
+        if tweak:
+            ranges = [self.tweak_lines(_spectra[row], r, _edge) if r else r for row, r in enumerate(ranges)]
+
+        return ranges
+
     def tweak_lines(self, spectrum: list[float], ranges: list[int],
                     edge: list[int], n_ignore: int=1) -> list[int]:
         """
@@ -171,3 +245,67 @@ class HeuristicsLineFinder(api.Heuristic):
                     ranges[i+1] = j
                     break
         return ranges
+
+
+def _sorted_median(values: np.ndarray, valid: np.ndarray, nselect: np.ndarray | None = None) -> np.ndarray:
+    """
+    Return the median of the valid elements of each row of a 2-D array.
+
+    If nselect is given, the median of each row is that of its nselect
+    smallest valid elements, i.e. np.median(sorted(valid_values)[:nselect]).
+    Rows without selected elements have a NaN median, like np.median of an
+    empty array.
+
+    Args:
+        values: 2-D array.
+        valid: 2-D boolean array, True for valid elements.
+        nselect: number of smallest valid elements to take per row.
+    Returns:
+        1-D array of medians, in the data type of values.
+    """
+    nrow = values.shape[0]
+    sorted_values = np.sort(np.where(valid, values, np.inf), axis=1)
+    if nselect is None:
+        nselect = np.count_nonzero(valid, axis=1)
+    empty = nselect == 0
+    lower = np.maximum((nselect - 1) // 2, 0)
+    upper = np.maximum(nselect // 2, 0)
+    rows = np.arange(nrow)
+    median = (sorted_values[rows, lower] + sorted_values[rows, upper]) / 2
+    median = np.where(empty, np.nan, median).astype(values.dtype, copy=False)
+    # odd number of elements: the median is the middle element itself
+    odd = (nselect % 2) == 1
+    median[odd] = sorted_values[rows[odd], upper[odd]]
+    return median
+
+
+def _line_runs(lines: np.ndarray) -> list[list[int]]:
+    """
+    Extract the ranges of consecutive line channels of each row of a 2-D mask.
+
+    The selection of ranges follows HeuristicsLineFinder.calculate: runs of
+    at least 2 channels are kept, except the last run of a row, which needs
+    at least 3 channels.
+
+    Args:
+        lines: 2-D boolean array, True for line channels.
+    Returns:
+        A list with, for each row, the start and end indices of the line ranges.
+    """
+    nrow = lines.shape[0]
+    padded = np.zeros((nrow, lines.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = lines
+    step = np.diff(padded, axis=1)
+    start_rows, starts = np.nonzero(step == 1)
+    end_rows, ends = np.nonzero(step == -1)
+    ends = ends - 1
+    length = ends - starts + 1
+
+    is_last = np.ones(len(start_rows), dtype=bool)
+    is_last[:-1] = start_rows[1:] != start_rows[:-1]
+    keep = np.where(is_last, length > 2, length > 1)
+
+    ranges = [[] for _ in range(nrow)]
+    for row, start, end in zip(start_rows[keep], starts[keep], ends[keep]):
+        ranges[row] += [int(start), int(end)]
+    return ranges
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
+import numpy as np
 import pytest
 
 from . linefinder import HeuristicsLineFinder
@@ -78,3 +79,46 @@ def test_tweak_lines(spectrum, ranges, edge, n_ignore, expected) -> NoReturn:
     """
     s = HeuristicsLineFinder()
     assert s.tweak_lines(spectrum, ranges, edge, n_ignore) == expected
+
+
+@pytest.mark.parametrize("tweak, edge",
+                         [
+                             (False, None),
+                             (True, None),
+                             (True, [7, 5]),
+                             (False, [3]),
+                         ])
+def test_linefinder_batch(tweak, edge) -> NoReturn:
+    """
+    Unit test for calculate_batch method.
+
+    calculate_batch should return, for every spectrum, the same line ranges
+    as calculate, including spectra with masked channels and without lines.
+
+    Args:
+        tweak: if True, spectral line ranges are extended to cover line edges.
+        edge: the number of elements in left and right edges of spectrum to be
+              excluded from line detection.
+    Returns:
+        NoReturn
+    Raises:
+        AssertationError if tests fail
+    """
+    rng = np.random.default_rng(29)
+    nchan = 256
+    channels = np.arange(nchan)
+    spectra = [spectrum_0 * 8 + spectrum_0[:16], spectrum_1 * 8 + spectrum_1[:16],
+               spectrum_2 * 8 + spectrum_2[:16], [0.0] * nchan]
+    for _ in range(60):
+        spectrum = rng.normal(size=nchan)
+        for _ in range(rng.integers(0, 4)):
+            center, width, peak = rng.uniform(0, nchan), rng.uniform(1, 20), rng.uniform(0, 10)
+            spectrum += peak * np.exp(-0.5 * ((channels - center) / width) ** 2)
+        spectra.append(spectrum)
+    spectra = np.array(spectra, dtype=np.float32)
+    masks = rng.random(spectra.shape) > 0.05
+    masks[1] = True
+
+    s = HeuristicsLineFinder()
+    expected = [s.calculate(spectrum, 5.0, tweak, mask, edge) for spectrum, mask in zip(spectra, masks)]
+    assert s.calculate_batch(spectra, 5.0, tweak, masks, edge) == expected
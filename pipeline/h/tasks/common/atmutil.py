@@ -4,13 +4,22 @@ Utility module to calculate the atmospheric transmission.
 Examples:
     Calculate using metadata in MeasurementSet
     >>> (freq, trans) = atmutil.get_transmission('M100.ms', antenna_id=1, spw_id=18, doplot=True)
+
+    Calculate from the cached zenith opacities of the atmospheric model
+    >>> spectrum = atmutil.get_opacity_spectrum(altitude=5059.0, pwv=1.2, fcenter=230.5, nchan=480, resolution=0.00390625)
+    >>> trans = spectrum.transmission(atmutil.calc_airmass(60.0))
+    >>> atmutil.get_opacity_cache_statistics()
 """
 from __future__ import annotations
 
+import dataclasses
+import hashlib
 import math
 import os
-from typing import TYPE_CHECKING
+import time
+from typing import TYPE_CHECKING, NamedTuple
 
+import cachetools
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -186,6 +195,271 @@ def get_wet_opacity(at: atmosphere) -> NDArray:
     return wet_opacity
 
 
+# Steps to which the parameters of the atmospheric model are rounded to make
+# the keys of the opacity cache.
+_OPACITY_KEY_STEPS = {
+    'altitude': 1.0,  # m
+    'temperature': 0.01,  # K
+    'pressure': 0.01,  # mbar
+    'humidity': 0.01,  # %
+    'max_altitude': 0.01,  # km
+    'delta_p': 0.01,  # mbar
+    'delta_pm': 1.0e-4,
+    'h0': 0.001,  # km
+    'pwv': 1.0e-4,  # mm
+    'fcenter': 1.0e-9,  # GHz
+    'resolution': 1.0e-12,  # GHz
+}
+
+
+class OpacityKey(NamedTuple):
+    """Parameters of the atmospheric model, rounded to the steps of the opacity cache."""
+
+    altitude: float
+    temperature: float
+    pressure: float
+    humidity: float
+    atmtype: int
+    max_altitude: float
+    delta_p: float
+    delta_pm: float
+    h0: float
+    pwv: float
+    fcenter: float
+    nchan: int
+    resolution: float
+
+    @classmethod
+    def from_params(cls, **params) -> OpacityKey:
+        """Return the key of the given parameters, see get_opacity_spectrum for their description."""
+        def quantise(name, value):
+            step = _OPACITY_KEY_STEPS.get(name)
+            if step is None:
+                return int(value)
+            # round once more to get rid of the floating point error of the multiplication
+            return round(round(float(value) / step) * step, 12)
+        return cls(**{name: quantise(name, value) for name, value in params.items()})
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class OpacitySpectrum:
+    """
+    Zenith opacity spectra of the atmospheric model for a frequency range.
+
+    The arrays are shared by all users of the opacity cache and are read-only.
+
+    Attributes:
+        frequency: Frequency of each channel (unit: GHz).
+        dry_opacity: The integrated zenith dry opacity of each channel.
+        wet_opacity: The integrated zenith wet opacity of each channel.
+        tebbsky: The equivalent black body sky temperature at zenith of each
+            channel (unit: K), or None if it was not computed.
+    """
+
+    frequency: NDArray
+    dry_opacity: NDArray
+    wet_opacity: NDArray
+    tebbsky: NDArray | None = None
+
+    def __post_init__(self):
+        for array in (self.frequency, self.dry_opacity, self.wet_opacity, self.tebbsky):
+            if array is not None:
+                array.flags.writeable = False
+
+    def transmission(self, airmass: float) -> NDArray:
+        """Return the atmospheric transmission at the given relative airmass."""
+        return calc_transmission(airmass, self.dry_opacity, self.wet_opacity)
+
+    def sky_temperature(self, airmass: float) -> NDArray:
+        """Return the equivalent black body sky temperature at the given relative airmass, scaled from zenith."""
+        opacity = self.dry_opacity + self.wet_opacity
+        return self.tebbsky * (1.0 - np.exp(-airmass * opacity)) / (1.0 - np.exp(-opacity))
+
+
+class OpacityCache:
+    """
+    Cache of the zenith opacity spectra of the atmospheric model.
+
+    Spectra are keyed by the site parameters, the PWV and the frequency
+    range, each rounded to a fixed step (see OpacityKey), and are computed
+    with the rounded parameters, such that a cached spectrum is the one that
+    would be computed for its key. Computed spectra are kept in memory, and
+    are saved to files in the cache directory, if any, for reuse by later
+    pipeline processes. The files are kept per version of CASA, whose ATM
+    library computes the spectra.
+
+    Attributes:
+        cache_dir: Directory of the cache files, or None to cache in memory
+            only.
+        hits: Number of spectra found in memory.
+        disk_hits: Number of spectra loaded from the cache directory.
+        misses: Number of spectra computed by the atmosphere tool.
+        compute_time: Time spent computing spectra (unit: s).
+    """
+
+    def __init__(self, cache_dir: str | None = None, maxsize: int = 512):
+        self.cache_dir = cache_dir
+        self._spectra = cachetools.LRUCache(maxsize=maxsize)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.compute_time = 0.0
+
+    def get(self, key: OpacityKey, with_tebbsky: bool = False) -> OpacitySpectrum:
+        """
+        Return the opacity spectra of a key, computing them if they are not cached.
+
+        Args:
+            key: Parameters of the atmospheric model.
+            with_tebbsky: If True, the sky temperature spectrum is needed too.
+
+        Returns:
+            The opacity spectra.
+        """
+        spectrum = self._spectra.get(key)
+        if spectrum is not None and (spectrum.tebbsky is not None or not with_tebbsky):
+            self.hits += 1
+            return spectrum
+
+        spectrum = self._load(key, with_tebbsky)
+        if spectrum is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            t0 = time.perf_counter()
+            spectrum = _compute_opacity_spectrum(key, with_tebbsky)
+            self.compute_time += time.perf_counter() - t0
+            self._save(key, spectrum)
+        self._spectra[key] = spectrum
+        return spectrum
+
+    def statistics(self) -> dict:
+        """Return the numbers of cache hits and misses, the time spent computing spectra and the number of cached
+        spectra."""
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                'compute_time': self.compute_time, 'size': len(self._spectra)}
+
+    def clear(self):
+        """Remove the spectra cached in memory and reset the statistics. Cache files are kept."""
+        self._spectra.clear()
+        self.hits = self.disk_hits = self.misses = 0
+        self.compute_time = 0.0
+
+    def _path(self, key: OpacityKey) -> str:
+        digest = hashlib.sha1(repr(tuple(key)).encode()).hexdigest()
+        return os.path.join(self.cache_dir, _atm_model_version(), digest + '.npz')
+
+    def _load(self, key: OpacityKey, with_tebbsky: bool) -> OpacitySpectrum | None:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if not np.array_equal(data['key'], np.asarray(key, dtype=float)):
+                    return None
+                if with_tebbsky and 'tebbsky' not in data:
+                    return None
+                return OpacitySpectrum(frequency=data['frequency'], dry_opacity=data['dry_opacity'],
+                                       wet_opacity=data['wet_opacity'],
+                                       tebbsky=data['tebbsky'] if 'tebbsky' in data else None)
+        except (OSError, ValueError, KeyError) as e:
+            LOG.debug('Could not read atmospheric opacity cache file %s: %s', path, e)
+            return None
+
+    def _save(self, key: OpacityKey, spectrum: OpacitySpectrum):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        arrays = {'key': np.asarray(key, dtype=float), 'frequency': spectrum.frequency,
+                  'dry_opacity': spectrum.dry_opacity, 'wet_opacity': spectrum.wet_opacity}
+        if spectrum.tebbsky is not None:
+            arrays['tebbsky'] = spectrum.tebbsky
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            LOG.debug('Could not write atmospheric opacity cache file %s: %s', path, e)
+
+
+def _atm_model_version() -> str:
+    """Return the version of CASA, whose ATM library computes the opacity spectra."""
+    return casa_tools.utils.version_string()
+
+
+def _compute_opacity_spectrum(key: OpacityKey, with_tebbsky: bool = False) -> OpacitySpectrum:
+    """Compute the opacity spectra of a key with the atmosphere tool."""
+    myat = casa_tools.atmosphere
+    myqa = casa_tools.quanta
+    init_atm(myat, altitude=key.altitude, temperature=key.temperature, pressure=key.pressure,
+             max_altitude=key.max_altitude, humidity=key.humidity, delta_p=key.delta_p, delta_pm=key.delta_pm,
+             h0=key.h0, atmtype=key.atmtype)
+    init_spw(myat, fcenter=key.fcenter, nchan=key.nchan, resolution=key.resolution)
+    myat.setUserWH2O(myqa.quantity(key.pwv, 'mm'))
+    try:
+        frequency = np.asarray(myqa.convert(myat.getSpectralWindow(0), 'GHz')['value'])
+        dry_opacity = get_dry_opacity(myat)
+        wet_opacity = get_wet_opacity(myat)
+        tebbsky = np.asarray(myat.getTebbSkySpec(spwid=0)[1]['value']) if with_tebbsky else None
+    finally:
+        myat.done()
+    return OpacitySpectrum(frequency=frequency, dry_opacity=dry_opacity, wet_opacity=wet_opacity, tebbsky=tebbsky)
+
+
+# Process-wide opacity cache, in memory only unless the
+# PIPELINE_ATM_CACHE_DIR environment variable names a directory in which
+# to save the spectra for reuse by later pipeline processes.
+OPACITY_CACHE = OpacityCache(os.environ.get('PIPELINE_ATM_CACHE_DIR') or None)
+
+
+def get_opacity_spectrum(altitude: float = 5000.0, temperature: float = 270.0, pressure: float = 560.0,
+                         humidity: float = 20.0, pwv: float = 1.0, fcenter: float = 100.0, nchan: int = 4096,
+                         resolution: float = 0.001, atmtype: int = AtmType.midLatitudeWinter,
+                         max_altitude: float = 48.0, delta_p: float = 10.0, delta_pm: float = 1.2, h0: float = 2.0,
+                         with_tebbsky: bool = False) -> OpacitySpectrum:
+    """
+    Return the zenith opacity spectra of the atmospheric model from the process-wide cache.
+
+    The spectra are computed by the CASA atmosphere tool only if they are not
+    cached yet. The parameters are rounded to the steps of the cache keys
+    before the spectra are computed, e.g. PWV to 0.1 micron. The default
+    values are those of the atmosphere tool, see also init_atm and init_spw.
+
+    Args:
+        altitude: Altitude of the site (unit: m).
+        temperature: Temperature at the ground (unit: K).
+        pressure: Pressure at the ground (unit: mbar).
+        humidity: Relative humidity at the ground (unit: %).
+        pwv: The zenith water vapor column (unit: mm).
+        fcenter: Center frequency of the frequency range (unit: GHz).
+        nchan: Number of channels in the frequency range.
+        resolution: Frequency resolution (unit: GHz/ch).
+        atmtype: AtmType enum that defines a type of atmospheric profile.
+        max_altitude: Top height of atmospheric profile (unit: km).
+        delta_p: Initial step of pressure (unit: mbar).
+        delta_pm: Multiplicative factor of pressure steps.
+        h0: Scale height of water vapor (unit: km).
+        with_tebbsky: If True, also compute the sky temperature spectrum.
+
+    Returns:
+        The opacity spectra, from which the transmission at any airmass can
+        be computed.
+    """
+    key = OpacityKey.from_params(altitude=altitude, temperature=temperature, pressure=pressure, humidity=humidity,
+                                 atmtype=atmtype, max_altitude=max_altitude, delta_p=delta_p, delta_pm=delta_pm,
+                                 h0=h0, pwv=pwv, fcenter=fcenter, nchan=nchan, resolution=resolution)
+    return OPACITY_CACHE.get(key, with_tebbsky=with_tebbsky)
+
+
+def get_opacity_cache_statistics() -> dict:
+    """Return the hit and miss counts of the process-wide opacity cache, see OpacityCache.statistics."""
+    return OPACITY_CACHE.statistics()
+
+
 def _test(pwv: float = 1.0, elevation: float = 45.0) -> NDArray:
     """
     Calculate atmospheric transmission and generate a plot.
@@ -453,7 +727,8 @@ def get_transmission_for_range(vis: str, center_freq: float, nchan: int, resolut
     The atmospheric profile is constructed by default site parameters
     of the function, init_at.
     The median of zenith water vapor column (pwv) is used to calculate
-    the transmission.
+    the transmission. The zenith opacities are taken from the
+    process-wide opacity cache, see get_opacity_spectrum.
 
     Args:
         vis: Path to MeasurementSet.
@@ -486,22 +761,18 @@ def get_transmission_for_range(vis: str, center_freq: float, nchan: int, resolut
 
     altitude = get_altitude(vis)
 
-    myat = casa_tools.atmosphere
-    myqa = casa_tools.quanta
-    init_at(myat, fcenter=center_freq, nchan=nchan, resolution=resolution,
-            altitude=altitude)
-    myat.setUserWH2O(myqa.quantity(pwv, 'mm'))
+    # site parameters default to those of init_at
+    spectrum = get_opacity_spectrum(altitude=altitude, humidity=20.0, temperature=270.0, pressure=560.0,
+                                    atmtype=AtmType.midLatitudeWinter, pwv=pwv, fcenter=center_freq, nchan=nchan,
+                                    resolution=resolution)
 
     airmass = calc_airmass(elevation)
-    dry_opacity = get_dry_opacity(myat)
-    wet_opacity = get_wet_opacity(myat)
-    transmission = calc_transmission(airmass, dry_opacity, wet_opacity)
-    frequency = myqa.convert(myat.getSpectralWindow(0), "GHz")['value']
+    transmission = spectrum.transmission(airmass)
+    frequency = spectrum.frequency.copy()
 
     if doplot:
-        plot(frequency, dry_opacity, wet_opacity, transmission)
+        plot(frequency, spectrum.dry_opacity, spectrum.wet_opacity, transmission)
 
-    myat.done()
     return frequency, transmission
 
 
@@ -14,6 +14,8 @@ from .atmutil import get_dry_opacity, get_wet_opacity
 from .atmutil import _test
 from .atmutil import get_spw_spec, get_median_elevation, get_transmission
 from .atmutil import AtmType
+from .atmutil import OpacityCache, OpacityKey, OpacitySpectrum, get_opacity_spectrum
+from . import atmutil
 
 if TYPE_CHECKING:
     from numpy.typing import NDArray
@@ -269,3 +271,51 @@ def test_get_transmission(antid: int, spwid: int, expected: float):
     """
     _, transmission = get_transmission(vis, antid, spwid)
     assert np.allclose(np.mean(transmission), expected)
+
+
+def test_opacity_cache(tmp_path, monkeypatch):
+    """
+    Test OpacityCache with a synthetic atmospheric model.
+
+    Spectra are computed once per rounded parameters, reused from memory
+    and from the cache directory, and give the transmission of the opacities
+    at any airmass.
+    """
+    computed = []
+
+    def compute(key: OpacityKey, with_tebbsky: bool = False) -> OpacitySpectrum:
+        computed.append((key, with_tebbsky))
+        frequency = key.fcenter + key.resolution * (np.arange(key.nchan) - key.nchan // 2)
+        return OpacitySpectrum(frequency=frequency, dry_opacity=np.full(key.nchan, 0.01),
+                               wet_opacity=0.05 * key.pwv * frequency / key.fcenter,
+                               tebbsky=np.full(key.nchan, 10.0) if with_tebbsky else None)
+
+    monkeypatch.setattr(atmutil, '_compute_opacity_spectrum', compute)
+    monkeypatch.setattr(atmutil, '_atm_model_version', lambda: 'test')
+    cache = OpacityCache(str(tmp_path))
+    monkeypatch.setattr(atmutil, 'OPACITY_CACHE', cache)
+
+    params = dict(altitude=5059.0, pwv=1.23456, fcenter=230.5, nchan=128, resolution=0.0078125)
+    spectrum = get_opacity_spectrum(**params)
+    assert computed[0][0].pwv == 1.2346
+    for airmass in (1.0, calc_airmass(30.0)):
+        assert np.allclose(spectrum.transmission(airmass),
+                           calc_transmission(airmass, spectrum.dry_opacity, spectrum.wet_opacity))
+    with pytest.raises(ValueError):
+        spectrum.wet_opacity[0] = 0.0
+
+    # PWV within the rounding step of the cache key
+    assert get_opacity_spectrum(**dict(params, pwv=1.23459)) is spectrum
+    assert cache.statistics()['hits'] == 1
+    get_opacity_spectrum(**dict(params, pwv=2.0))
+    get_opacity_spectrum(**params, with_tebbsky=True)
+    assert len(computed) == 3
+    assert cache.statistics()['misses'] == 3
+
+    # spectra computed by another process are read from the cache directory
+    cache.clear()
+    reloaded = get_opacity_spectrum(**params, with_tebbsky=True)
+    assert len(computed) == 3
+    assert cache.statistics()['disk_hits'] == 1
+    assert np.array_equal(reloaded.wet_opacity, spectrum.wet_opacity)
+    assert np.allclose(reloaded.sky_temperature(1.0), 10.0)
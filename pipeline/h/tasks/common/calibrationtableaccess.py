@@ -1,4 +1,5 @@
 import copy
+import functools
 import os
 
 import numpy as np
@@ -45,23 +46,160 @@ class CalibrationTableRow:
         return self.rowdata[upfield]
 
 
+class ColumnarCalibrationTableData:
+    """ColumnarCalibrationTableData holds the name of a CASA calibration table
+    and its contents as one array per column. Each column is read on first
+    access, and rows can be selected by spw, field, antenna and time through
+    row indexes grouped by the values of those columns.
+
+    The row-oriented API of CalibrationTableData is supported: rows are
+    created on request from the columns.
+    """
+    # Columns holding one array per row, with the row as the last axis.
+    ARRAY_COLUMNS = ('FPARAM', 'CPARAM', 'PARAMERR', 'FLAG', 'SNR')
+
+    # Columns that rows can be selected by.
+    GROUP_COLUMNS = {'spw': 'SPECTRAL_WINDOW_ID', 'field': 'FIELD_ID', 'antenna': 'ANTENNA1', 'time': 'TIME'}
+
+    def __init__(self, name, columns, read_column):
+        """
+        :param name: name of the calibration table
+        :param columns: names of the columns to hold
+        :param read_column: function returning the data of a column, given
+            its name
+        """
+        self.name = name
+        self.vis = None
+        self.columns = [colname.upper() for colname in columns]
+        self._read_column = read_column
+        self._coldata = {}
+        self._groups = {}
+
+    def setvis(self, vis):
+        self.vis = vis
+
+    @property
+    def nrows(self):
+        if not self.columns:
+            return 0
+        return self._nrows(self.columns[0])
+
+    @property
+    def rows(self):
+        return self.get_rows()
+
+    def get_column(self, colname):
+        """Return the data of a column: an array with the row as the last
+        axis, or a list of per-row arrays for a variable-shaped column.
+        """
+        upcol = colname.upper()
+        if upcol not in self._coldata:
+            if upcol not in self.columns:
+                raise KeyError(colname)
+            self._coldata[upcol] = self._read_column(upcol)
+        return self._coldata[upcol]
+
+    def get_row_values(self, colname, row_ids=None):
+        """Return the values of a column for the given rows (default: all
+        rows), as views into the column data.
+        """
+        upcol = colname.upper()
+        coldata = self.get_column(upcol)
+        if row_ids is None:
+            row_ids = range(self._nrows(upcol))
+        if upcol in self.ARRAY_COLUMNS and isinstance(coldata, np.ndarray):
+            return [coldata[..., i:i+1] for i in row_ids]
+        return [coldata[i] for i in row_ids]
+
+    def get_rows(self, row_ids=None):
+        """Return CalibrationTableRow objects, holding copies of the column
+        data, for the given rows (default: all rows).
+        """
+        if row_ids is None:
+            row_ids = range(self.nrows)
+        coldata = [[copy.copy(value) for value in self.get_row_values(colname, row_ids)]
+                   for colname in self.columns]
+        return [CalibrationTableRow(self.columns, *rowdata) for rowdata in zip(*coldata)]
+
+    def select(self, spw=None, field=None, antenna=None, time=None):
+        """Return the sorted indices of the rows matching all given criteria.
+        Each criterion is a single value or a list of values.
+        """
+        criteria = {'spw': spw, 'field': field, 'antenna': antenna, 'time': time}
+        selected = None
+        for criterion, values in criteria.items():
+            if values is None:
+                continue
+            groups = self._get_groups(self.GROUP_COLUMNS[criterion])
+            if np.isscalar(values):
+                values = [values]
+            matches = [groups[value] for value in set(values) if value in groups]
+            row_ids = np.sort(np.concatenate(matches)) if matches else np.array([], dtype=int)
+            selected = row_ids if selected is None else np.intersect1d(selected, row_ids, assume_unique=True)
+        if selected is None:
+            return np.arange(self.nrows)
+        return selected
+
+    def reload(self, *colnames):
+        """Discard the data of the given columns, e.g. after new flags were
+        written to the table, such that they are read again on next access.
+        """
+        for colname in colnames:
+            upcol = colname.upper()
+            self._coldata.pop(upcol, None)
+            self._groups.pop(upcol, None)
+
+    def subset(self, row_ids):
+        """Return a ColumnarCalibrationTableData holding all columns for the
+        given rows only. The subset does not read from the table.
+        """
+        subset = ColumnarCalibrationTableData(self.name, self.columns, None)
+        subset.setvis(self.vis)
+        for colname in self.columns:
+            coldata = self.get_column(colname)
+            if colname in self.ARRAY_COLUMNS and isinstance(coldata, np.ndarray):
+                subset._coldata[colname] = coldata[..., row_ids]
+            elif isinstance(coldata, list):
+                subset._coldata[colname] = [coldata[i] for i in row_ids]
+            else:
+                subset._coldata[colname] = coldata[row_ids]
+        return subset
+
+    def _get_groups(self, colname):
+        """Return the sorted row indices for each value of a column."""
+        if colname not in self._groups:
+            values, inverse = np.unique(self.get_column(colname), return_inverse=True)
+            order = np.argsort(inverse, kind='stable')
+            bounds = np.cumsum(np.bincount(inverse, minlength=len(values)))[:-1]
+            self._groups[colname] = dict(zip(values.tolist(), np.split(order, bounds)))
+        return self._groups[colname]
+
+    def _nrows(self, colname):
+        coldata = self.get_column(colname)
+        if colname in self.ARRAY_COLUMNS and isinstance(coldata, np.ndarray):
+            return coldata.shape[-1]
+        return len(coldata)
+
+    def __repr__(self):
+        return '<CalibrationTable({name})>'.format(name=self.name)
+
+
 class CalibrationTableDataFiller:
     """CalibrationTableDataFiller contains methods to fill a 
     CalibrationTableData object.
     """
     @staticmethod
     def getcal(caltable, columns=[]):
-        cal = CalibrationTableData(name=caltable)
         if not columns:
             columns = CalibrationTableDataFiller._colnames(caltable)
         # Aug 2012, CASA 3.4, there was a problem reading the WEIGHT column.
         # Not being filled. Leave out for now
         if 'WEIGHT' in columns:
             columns.remove('WEIGHT')
+        cal = ColumnarCalibrationTableData(
+            caltable, columns, functools.partial(CalibrationTableDataFiller._read_column, caltable))
         vis = CalibrationTableDataFiller._readvis(caltable)
         cal.setvis(vis)
-        for row in CalibrationTableDataFiller._read_table(caltable, columns):
-            cal.addrow(columns, *row)
         return cal
 
     @staticmethod
@@ -81,27 +219,14 @@ class CalibrationTableDataFiller:
             return os.path.join(os.path.dirname(caltable), vis)
 
     @staticmethod
-    def _read_table(caltable, columns):
-        """Read the given calibration table.
+    def _read_column(caltable, colname):
+        """Read one column of the given calibration table.
         """
-        LOG.debug('Analysing calibration table %s' % caltable)
+        LOG.debug('Reading column %s of calibration table %s' % (colname, caltable))
         # works for new style calibration tables
         # to do. read in sub-tables ANTENNA, FIELD, HISTORY and SPECRAL_WINDOW
         with casa_tools.TableReader(caltable) as table:
-            coldata = []
-            for colname in columns:
-                if colname in ['FPARAM', 'CPARAM', 'PARAMERR', 'FLAG', 'SNR']:
-                    if table.isvarcol(colname):
-                        coldict = table.getvarcol(colname)
-                        temp = []
-                        for k in range(len(coldict)):
-                            temp.append(coldict['r%s' % (k+1)])
-                    else:
-                        temp = table.getcol(colname)
-                        nrows = np.shape(temp)[-1]
-                        temp = np.array_split(temp, nrows, -1)
-                    coldata.append(temp)
-                else:
-                    coldata.append(table.getcol(colname))
-
-            return list(zip(*coldata))
+            if colname in ColumnarCalibrationTableData.ARRAY_COLUMNS and table.isvarcol(colname):
+                coldict = table.getvarcol(colname)
+                return [coldict['r%s' % (k+1)] for k in range(len(coldict))]
+            return table.getcol(colname)
@@ -0,0 +1,214 @@
+"""Tests for the pipeline.h.tasks.common.calibrationtableaccess module."""
+import time
+
+import numpy as np
+import pytest
+
+from pipeline.infrastructure import casa_tools, logging
+
+from .calibrationtableaccess import CalibrationTableData, CalibrationTableDataFiller, ColumnarCalibrationTableData
+
+LOG = logging.get_logger(__name__)
+
+# Tests that depend on the pipeline-testdata repository
+TEST_DATA_PATH = casa_tools.utils.resolve('pl-unittest/casa_data')
+# Skip tests if CASA cannot resolve to an absolute path
+skip_data_tests = not TEST_DATA_PATH.startswith('/')
+# Create decorator with reason to skip tests
+skip_if_no_data_repo = pytest.mark.skipif(
+    skip_data_tests,
+    reason="The repo pipeline-testdata is not set up for the tests"
+)
+
+GAIN_TABLE = casa_tools.utils.resolve('pl-unittest/uid___A002_Xc46ab2_X15ae_repSPW_spw16_17_small.ms.hifa_'
+                                      'timegaincal.s17_2.spw0.solintinf.gpcal.tbl')
+
+
+def _synthetic_tsys_columns(nant, nspw, nscan, nchan=64, seed=2):
+    """Columns of a synthetic Tsys table, with one row per antenna, spw and scan, each scan on one of 3 fields."""
+    rng = np.random.default_rng(seed)
+    scan, spw, ant = (a.ravel() for a in np.meshgrid(np.arange(nscan), np.arange(nspw), np.arange(nant),
+                                                     indexing='ij'))
+    nrow = len(scan)
+    return {
+        'TIME': 5.0e9 + 600.0 * scan,
+        'FIELD_ID': (scan % 3).astype(np.int32),
+        'SPECTRAL_WINDOW_ID': (2 * spw + 1).astype(np.int32),
+        'ANTENNA1': ant.astype(np.int32),
+        'ANTENNA2': np.full(nrow, -1, dtype=np.int32),
+        'SCAN_NUMBER': (scan + 1).astype(np.int32),
+        'FPARAM': rng.normal(100.0, 5.0, (2, nchan, nrow)),
+        'FLAG': rng.uniform(size=(2, nchan, nrow)) < 0.01,
+    }
+
+
+def _row_based_table(columns):
+    """CalibrationTableData filled row by row, as read before the columnar container."""
+    table = CalibrationTableData('synthetic.tsys.tbl')
+    coldata = [np.array_split(data, data.shape[-1], -1) if data.ndim > 1 else data for data in columns.values()]
+    for row in zip(*coldata):
+        table.addrow(list(columns), *row)
+    return table
+
+
+def _columnar_table(columns, reads=None):
+    """ColumnarCalibrationTableData reading the given columns, recording each read."""
+    def read_column(colname):
+        if reads is not None:
+            reads.append(colname)
+        return columns[colname]
+    return ColumnarCalibrationTableData('synthetic.tsys.tbl', list(columns), read_column)
+
+
+def _assert_rows_equal(rows, expected_rows, columns):
+    assert len(rows) == len(expected_rows)
+    for row, expected in zip(rows, expected_rows):
+        for colname in columns:
+            assert np.array_equal(row.get(colname), expected.get(colname)), colname
+
+
+def test_columnar_rows_match_row_based_table():
+    """Test that the rows created from the columns equal the rows read one by one."""
+    columns = _synthetic_tsys_columns(nant=5, nspw=3, nscan=4)
+    table = _columnar_table(columns)
+
+    assert table.nrows == 60
+    _assert_rows_equal(table.rows, _row_based_table(columns).rows, columns)
+    # rows hold copies of the column data
+    table.rows[0].get('FPARAM')[:] = 0.0
+    assert np.all(table.get_column('FPARAM')[..., 0] != 0.0)
+
+
+def test_select_matches_row_filter():
+    """Test row selections by spw, field, antenna and time against filtering all rows."""
+    columns = _synthetic_tsys_columns(nant=6, nspw=4, nscan=5)
+    table = _columnar_table(columns)
+    rows = _row_based_table(columns).rows
+    times = np.unique(columns['TIME'])
+
+    for spw, field, antenna, time_ in [(3, None, None, None), (5, [0, 2], None, None), (None, {1}, [0, 4], None),
+                                       (7, 1, 3, times[1]), ([1, 99], None, None, times[:2]), (99, None, None, None)]:
+        expected = [i for i, row in enumerate(rows)
+                    if all(values is None or row.get(colname) in ([values] if np.isscalar(values) else list(values))
+                           for colname, values in [('SPECTRAL_WINDOW_ID', spw), ('FIELD_ID', field),
+                                                   ('ANTENNA1', antenna), ('TIME', time_)])]
+        assert list(table.select(spw=spw, field=field, antenna=antenna, time=time_)) == expected
+
+    assert list(table.select()) == list(range(len(rows)))
+
+
+def test_columns_are_read_lazily():
+    """Test that each column is read once, and only when needed."""
+    reads = []
+    table = _columnar_table(_synthetic_tsys_columns(nant=4, nspw=2, nscan=2), reads)
+    assert reads == []
+
+    table.select(spw=1, field=0)
+    table.select(spw=3)
+    assert reads == ['SPECTRAL_WINDOW_ID', 'FIELD_ID']
+
+    table.get_row_values('FLAG', table.select(spw=1))
+    assert reads == ['SPECTRAL_WINDOW_ID', 'FIELD_ID', 'FLAG']
+
+
+def test_reload_rereads_column():
+    """Test that a reloaded column is read again, and its row groups rebuilt."""
+    columns = _synthetic_tsys_columns(nant=4, nspw=2, nscan=2)
+    reads = []
+    table = _columnar_table(columns, reads)
+    table.select(field=0)
+    table.get_column('FLAG')
+
+    columns['FLAG'] = np.ones_like(columns['FLAG'])
+    columns['FIELD_ID'] = columns['FIELD_ID'] + 1
+    table.reload('flag', 'FIELD_ID')
+    assert np.all(table.get_column('FLAG'))
+    assert len(table.select(field=0)) == 0
+    assert reads == ['FIELD_ID', 'FLAG', 'FLAG', 'FIELD_ID']
+
+
+def test_subset_holds_selected_rows():
+    """Test that a subset holds the selected rows of all columns, without reading from the table."""
+    columns = _synthetic_tsys_columns(nant=5, nspw=3, nscan=4)
+    table = _columnar_table(columns)
+    row_ids = table.select(spw=3, field=[0, 1])
+
+    reads = []
+    subset = table.subset(row_ids)
+    subset._read_column = reads.append
+    assert subset.nrows == len(row_ids)
+    _assert_rows_equal(subset.rows, table.get_rows(row_ids), columns)
+    assert list(subset.select(antenna=2)) == [i for i, row_id in enumerate(row_ids) if columns['ANTENNA1'][row_id] == 2]
+    assert reads == []
+
+
+def _row_scan_lookups(row_table, spws):
+    """Reference Tsys spectra lookups per spw and field, scanning all rows of a row based table."""
+    return [[(row.get('ANTENNA1'), row.get('TIME'), row.get('FPARAM')[0, :, 0]) for row in row_table.rows
+             if row.get('SPECTRAL_WINDOW_ID') == spw and row.get('FIELD_ID') in [field]]
+            for spw in spws for field in range(3)]
+
+
+def _columnar_lookups(columns, spws):
+    """Tsys spectra lookups per spw and field, selecting rows on the columns."""
+    table = _columnar_table(columns)
+    return [[(row.get('ANTENNA1'), row.get('TIME'), row.get('FPARAM')[0, :, 0])
+             for row in table.get_rows(table.select(spw=spw, field=[field]))]
+            for spw in spws for field in range(3)]
+
+
+def _assert_lookups_equal(result, expected, nant):
+    """Assert that two sets of Tsys spectra lookups select the same rows and spectra."""
+    assert len(result) == len(expected)
+    for selected, expected_selected in zip(result, expected):
+        assert len(selected) == len(expected_selected) == nant * 2
+        for (ant, time_, spec), (expected_ant, expected_time, expected_spec) in zip(selected, expected_selected):
+            assert ant == expected_ant and time_ == expected_time and np.array_equal(spec, expected_spec)
+
+
+@pytest.mark.parametrize('nant, nspw', [(4, 2), (12, 4)])
+def test_select_matches_row_scans(nant, nspw):
+    """Test per spw and field Tsys spectra lookups on the columns against scanning all rows."""
+    columns = _synthetic_tsys_columns(nant=nant, nspw=nspw, nscan=6)
+    spws = np.unique(columns['SPECTRAL_WINDOW_ID'])
+
+    expected = _row_scan_lookups(_row_based_table(columns), spws)
+    result = _columnar_lookups(columns, spws)
+
+    _assert_lookups_equal(result, expected, nant)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('nant, nspw', [(12, 4), (50, 16)])
+def test_select_benchmark(nant, nspw):
+    """Benchmark per spw and field Tsys spectra lookups on the columns against scanning all rows."""
+    columns = _synthetic_tsys_columns(nant=nant, nspw=nspw, nscan=6)
+    row_table = _row_based_table(columns)
+    spws = np.unique(columns['SPECTRAL_WINDOW_ID'])
+
+    t0 = time.perf_counter()
+    expected = _row_scan_lookups(row_table, spws)
+    t_rows = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    result = _columnar_lookups(columns, spws)
+    t_columnar = time.perf_counter() - t0
+    LOG.info('Tsys lookups of %d spws and 3 fields in %d rows: row scans %.3f s, columnar %.3f s',
+             len(spws), len(columns['TIME']), t_rows, t_columnar)
+
+    _assert_lookups_equal(result, expected, nant)
+
+
+@skip_if_no_data_repo
+def test_getcal_columns():
+    """Test that the table filler reads each column of a caltable as one array."""
+    cal = CalibrationTableDataFiller.getcal(GAIN_TABLE)
+    with casa_tools.TableReader(GAIN_TABLE) as table:
+        nrows = table.nrows()
+        cparam = table.getcol('CPARAM')
+        spws = table.getcol('SPECTRAL_WINDOW_ID')
+
+    assert cal.nrows == nrows
+    assert np.array_equal(cal.get_column('CPARAM'), cparam)
+    assert np.array_equal(cal.rows[-1].get('CPARAM'), cparam[..., -1:])
+    assert list(cal.select(spw=spws[0])) == list(np.flatnonzero(spws == spws[0]))
@@ -0,0 +1,356 @@
+"""Single-pass spectral reduction of CASA image cubes.
+
+Sky plots and moment products of image cubes are traditionally made with one
+``ia.collapse`` or ``immoments`` call per requested function and channel
+selection, each of which reads the whole cube from disk. The reducer in this
+module instead streams the cube once, in chunks of whole spectral planes
+bounded in memory, and accumulates every supported reduction at the same time:
+
+    mean, max, min, sum, mom0, mom8, mom10, per-channel robust RMS
+
+Examples:
+    Reduce the Stokes I continuum channels of a cube and write the moment
+    images that tclean used to write with three immoments calls:
+
+    >>> reduction = reduce_cube('target.image', stokes='I', chans=[(0, 100), (300, 400)])
+    >>> write_moment_image('target.image', 'target.image.mom8_fc', reduction, 'mom8')
+"""
+from __future__ import annotations
+
+import os
+import time
+import warnings
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import cachetools
+import numpy as np
+
+import pipeline.infrastructure as infrastructure
+from pipeline.infrastructure import casa_tools
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+LOG = infrastructure.logging.get_logger(__name__)
+
+# speed of light in km/s, used to convert the channel width to velocity for mom0
+_C_KMS = 299792.458
+
+# scale factor converting the median absolute deviation to a Gaussian sigma
+_MAD_TO_SIGMA = 1.4826
+
+# default upper limit on the memory used by one chunk of spectral planes
+DEFAULT_MAX_CHUNK_BYTES = 512 * 1024 ** 2
+
+# the reductions available from a CubeReduction
+REDUCTIONS = ('mean', 'max', 'min', 'sum', 'mom0', 'mom8', 'mom10')
+
+# recently computed reductions, keyed by image, selection and image modification time
+_REDUCTION_CACHE = cachetools.LRUCache(maxsize=16)
+
+
+@dataclass
+class CubeReduction:
+    """CubeReduction holds the collapsed planes of a single pass over an image cube.
+
+    All planes are masked arrays with the shape of the direction axes. A pixel
+    is masked when none of the selected channels had valid data for it.
+    """
+    sum: np.ma.MaskedArray
+    count: NDArray
+    max: np.ma.MaskedArray
+    min: np.ma.MaskedArray
+    chan_width: float
+    mom0_unit: str
+    channels: NDArray
+    chan_rms: NDArray | None = None
+    timing: dict = field(default_factory=dict)
+
+    @property
+    def mean(self) -> np.ma.MaskedArray:
+        """Mean over the selected channels, as ia.collapse(function='mean')."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sum / np.ma.masked_equal(self.count, 0)
+
+    @property
+    def mom0(self) -> np.ma.MaskedArray:
+        """Integrated value of the spectrum, as immoments(moments=[0])."""
+        return self.sum * self.chan_width
+
+    @property
+    def mom8(self) -> np.ma.MaskedArray:
+        """Maximum value of the spectrum, as immoments(moments=[8])."""
+        return self.max
+
+    @property
+    def mom10(self) -> np.ma.MaskedArray:
+        """Minimum value of the spectrum, as immoments(moments=[10])."""
+        return self.min
+
+    def get(self, function: str) -> np.ma.MaskedArray:
+        """Return the collapsed plane for the given collapse function name."""
+        if function not in REDUCTIONS:
+            raise ValueError(f'Unsupported cube reduction: {function}')
+        return getattr(self, function)
+
+
+class CubeAccumulator:
+    """Accumulate spectral reductions from consecutive chunks of spectral planes.
+
+    The accumulator is independent of the image tool: chunks are passed in as
+    arrays with the spectral axis last, so that the reduction can be fed from
+    any reader (or tested on synthetic data).
+    """
+
+    def __init__(self, plane_shape: tuple[int, ...], robust_rms: bool = False):
+        """Initialize an empty reduction of spectral planes of the given shape.
+
+        Args:
+            plane_shape: Shape of one spectral plane (the direction axes).
+            robust_rms: If True, also compute the MAD-based RMS of each channel.
+        """
+        self._sum = np.zeros(plane_shape, dtype=np.float64)
+        self._count = np.zeros(plane_shape, dtype=np.int64)
+        self._max = np.full(plane_shape, -np.inf, dtype=np.float64)
+        self._min = np.full(plane_shape, np.inf, dtype=np.float64)
+        self._robust_rms = robust_rms
+        self._channels = []
+        self._chan_rms = []
+
+    def add(self, data: NDArray, valid: NDArray, channels: NDArray) -> None:
+        """Add a chunk of spectral planes to the reduction.
+
+        Args:
+            data: Pixel values with shape plane_shape + (nchunk,).
+            valid: Boolean array of the same shape, True for good pixels.
+            channels: Absolute channel indices of the planes in the chunk.
+        """
+        valid = np.logical_and(valid, np.isfinite(data))
+        self._sum += np.where(valid, data, 0.0).sum(axis=-1)
+        self._count += valid.sum(axis=-1)
+        np.fmax(self._max, np.where(valid, data, -np.inf).max(axis=-1), out=self._max)
+        np.fmin(self._min, np.where(valid, data, np.inf).min(axis=-1), out=self._min)
+        self._channels.append(np.asarray(channels))
+
+        if self._robust_rms:
+            nchunk = data.shape[-1]
+            planes = np.where(valid, data, np.nan).reshape(-1, nchunk)
+            with warnings.catch_warnings():
+                # fully masked channels legitimately produce NaN
+                warnings.simplefilter('ignore', category=RuntimeWarning)
+                median = np.nanmedian(planes, axis=0)
+                mad = np.nanmedian(np.abs(planes - median), axis=0)
+            self._chan_rms.append(_MAD_TO_SIGMA * mad)
+
+    def result(self, chan_width: float = 1.0, mom0_unit: str = '') -> CubeReduction:
+        """Return the accumulated reductions.
+
+        Args:
+            chan_width: Absolute channel width used to integrate mom0.
+            mom0_unit: Brightness unit of the mom0 plane.
+
+        Returns:
+            CubeReduction with the collapsed planes.
+        """
+        empty = self._count == 0
+        channels = np.concatenate(self._channels) if self._channels else np.array([], dtype=int)
+        chan_rms = np.concatenate(self._chan_rms) if self._chan_rms else None
+        return CubeReduction(
+            sum=np.ma.array(self._sum, mask=empty),
+            count=self._count,
+            max=np.ma.array(self._max, mask=empty),
+            min=np.ma.array(self._min, mask=empty),
+            chan_width=abs(chan_width),
+            mom0_unit=mom0_unit,
+            channels=channels,
+            chan_rms=chan_rms,
+        )
+
+
+def chunk_channels(chans: list[tuple[int, int]], plane_bytes: int,
+                   max_chunk_bytes: int = DEFAULT_MAX_CHUNK_BYTES) -> list[tuple[int, int]]:
+    """Split inclusive channel ranges into chunks that fit within a memory bound.
+
+    Args:
+        chans: Inclusive (start, stop) channel ranges.
+        plane_bytes: Memory needed to hold one spectral plane and its working copies.
+        max_chunk_bytes: Upper limit on the memory used by a chunk.
+
+    Returns:
+        Inclusive (start, stop) channel ranges of the chunks, in order.
+    """
+    nplanes = max(1, int(max_chunk_bytes // max(plane_bytes, 1)))
+    chunks = []
+    for start, stop in chans:
+        for first in range(start, stop + 1, nplanes):
+            chunks.append((first, min(first + nplanes - 1, stop)))
+    return chunks
+
+
+def reduce_cube(imagename: str, stokes: str | None = None, chans: list[tuple[int, int]] | None = None,
+                robust_rms: bool = False, max_chunk_bytes: int = DEFAULT_MAX_CHUNK_BYTES,
+                use_cache: bool = True) -> CubeReduction:
+    """Compute all spectral reductions of an image cube in one pass.
+
+    Args:
+        imagename: Name of the CASA image.
+        stokes: Stokes plane to reduce. The first plane is used if None or not present.
+        chans: Inclusive (start, stop) channel ranges to reduce. All channels if None.
+        robust_rms: If True, also compute the MAD-based RMS of each selected channel.
+        max_chunk_bytes: Upper limit on the memory used by one chunk of planes.
+        use_cache: If True, reuse a reduction of the same unmodified image and selection.
+
+    Returns:
+        CubeReduction with the collapsed planes.
+    """
+    key = (os.path.abspath(imagename), stokes, tuple(map(tuple, chans)) if chans else None, robust_rms,
+           _image_mtime(imagename))
+    if use_cache and key in _REDUCTION_CACHE:
+        LOG.debug('Reusing cached cube reduction of %s', imagename)
+        return _REDUCTION_CACHE[key]
+
+    t_start = time.perf_counter()
+    with casa_tools.ImageReader(imagename) as image:
+        summary = image.summary(list=False)
+        axisnames = list(summary['axisnames'])
+        shape = list(image.shape())
+        spec_axis = axisnames.index('Frequency')
+        stokes_axis = axisnames.index('Stokes') if 'Stokes' in axisnames else None
+        dir_axes = [i for i in range(len(shape)) if i not in (spec_axis, stokes_axis)]
+
+        stokes_index = _stokes_index(image, stokes) if stokes_axis is not None else 0
+
+        nchan = shape[spec_axis]
+        if not chans:
+            chans = [(0, nchan - 1)]
+        chans = [(max(0, int(start)), min(nchan - 1, int(stop))) for start, stop in chans]
+
+        chan_width, mom0_unit = _mom0_channel_width(image, summary, spec_axis)
+
+        plane_shape = tuple(shape[i] for i in dir_axes)
+        # data, mask and the float64 working copies of the accumulation
+        plane_bytes = int(np.prod(plane_shape)) * (4 + 1 + 3 * 8)
+        chunks = chunk_channels(chans, plane_bytes, max_chunk_bytes)
+
+        accumulator = CubeAccumulator(plane_shape, robust_rms=robust_rms)
+        t_read = 0.0
+        for first, last in chunks:
+            blc = [0] * len(shape)
+            trc = [s - 1 for s in shape]
+            blc[spec_axis], trc[spec_axis] = first, last
+            if stokes_axis is not None:
+                blc[stokes_axis] = trc[stokes_axis] = stokes_index
+
+            t0 = time.perf_counter()
+            data = image.getchunk(blc=blc, trc=trc)
+            valid = image.getchunk(blc=blc, trc=trc, getmask=True)
+            t_read += time.perf_counter() - t0
+
+            # order the axes as (direction..., spectral) and drop the Stokes axis
+            order = dir_axes + [spec_axis] + ([stokes_axis] if stokes_axis is not None else [])
+            data = np.transpose(data, order)
+            valid = np.transpose(valid, order)
+            if stokes_axis is not None:
+                data = data[..., 0]
+                valid = valid[..., 0]
+            accumulator.add(data, valid, np.arange(first, last + 1))
+
+    reduction = accumulator.result(chan_width=chan_width, mom0_unit=mom0_unit)
+    reduction.timing = {'read': t_read, 'total': time.perf_counter() - t_start, 'nchunks': len(chunks)}
+    LOG.debug('Reduced %s (%d channels in %d chunks) in %.3f s (%.3f s reading)', os.path.basename(imagename),
+              len(reduction.channels), len(chunks), reduction.timing['total'], t_read)
+
+    if use_cache:
+        _REDUCTION_CACHE[key] = reduction
+    return reduction
+
+
+def write_moment_image(imagename: str, outfile: str, reduction: CubeReduction, function: str,
+                       stokes: str | None = None) -> None:
+    """Write a collapsed plane of a reduction as a CASA image.
+
+    The output image has the coordinate system of a single spectral plane of
+    the input cube at the centre of the reduced channels, like the images
+    written by immoments.
+
+    Args:
+        imagename: Name of the reduced CASA image, used as coordinate template.
+        outfile: Name of the output image.
+        reduction: Reduction of imagename.
+        function: Reduction to write, e.g. 'mom0' or 'mom8'.
+        stokes: Stokes plane that was reduced.
+    """
+    plane = reduction.get(function)
+    with casa_tools.ImageReader(imagename) as image:
+        summary = image.summary(list=False)
+        axisnames = list(summary['axisnames'])
+        shape = list(image.shape())
+        spec_axis = axisnames.index('Frequency')
+        stokes_axis = axisnames.index('Stokes') if 'Stokes' in axisnames else None
+
+        blc = [0] * len(shape)
+        trc = [s - 1 for s in shape]
+        centre_chan = int(reduction.channels[len(reduction.channels) // 2]) if len(reduction.channels) else 0
+        blc[spec_axis] = trc[spec_axis] = centre_chan
+        if stokes_axis is not None:
+            blc[stokes_axis] = trc[stokes_axis] = _stokes_index(image, stokes)
+
+        rg = casa_tools.regionmanager
+        region = rg.box(blc=blc, trc=trc)
+        outimage = image.subimage(outfile=outfile, region=region, overwrite=True)
+        rg.done()
+
+    try:
+        outshape = outimage.shape()
+        outimage.putchunk(np.ma.getdata(plane).astype(np.float32).reshape(outshape))
+        outimage.putregion(pixelmask=np.invert(np.ma.getmaskarray(plane)).reshape(outshape))
+        if function == 'mom0' and reduction.mom0_unit:
+            outimage.setbrightnessunit(reduction.mom0_unit)
+    finally:
+        outimage.done()
+
+
+def _mom0_channel_width(image, summary: dict, spec_axis: int) -> tuple[float, str]:
+    """Return the channel width and brightness unit used to integrate mom0.
+
+    As immoments, the channel width is expressed as a radio velocity in km/s
+    when the image has a rest frequency, and in spectral axis units otherwise.
+    """
+    brightness_unit = image.brightnessunit()
+    increment = float(summary['incr'][spec_axis])
+    unit = summary['axisunits'][spec_axis]
+
+    cs = image.coordsys()
+    try:
+        restfreq = cs.restfrequency()
+        restfreq_hz = casa_tools.quanta.convert(
+            casa_tools.quanta.quantity(restfreq['value'][0], restfreq['unit']), 'Hz')['value']
+    except Exception:
+        restfreq_hz = 0.0
+    finally:
+        cs.done()
+
+    if restfreq_hz > 0:
+        increment_hz = casa_tools.quanta.convert(casa_tools.quanta.quantity(increment, unit), 'Hz')['value']
+        return abs(_C_KMS * increment_hz / restfreq_hz), f'{brightness_unit}.km/s'
+    return abs(increment), f'{brightness_unit}.{unit}'
+
+
+def _stokes_index(image, stokes: str | None) -> int:
+    """Return the pixel index of a Stokes plane, falling back to the first plane."""
+    cs = image.coordsys()
+    try:
+        stokes_present = list(cs.stokes())
+    finally:
+        cs.done()
+    return stokes_present.index(stokes) if stokes in stokes_present else 0
+
+
+def _image_mtime(imagename: str) -> float:
+    """Return the latest modification time of the files of a CASA image."""
+    try:
+        with os.scandir(imagename) as entries:
+            return max((entry.stat().st_mtime for entry in entries), default=os.path.getmtime(imagename))
+    except OSError:
+        return 0.0
@@ -0,0 +1,116 @@
+import time
+
+import numpy as np
+import pytest
+
+from pipeline.infrastructure import casa_tasks, casa_tools, logging
+
+from .cubereducer import CubeAccumulator, chunk_channels, reduce_cube
+
+LOG = logging.get_logger(__name__)
+
+
+def _synthetic_cube(nx=16, ny=12, nchan=40, seed=1234):
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=(nx, ny, nchan))
+    valid = rng.random(size=data.shape) > 0.1
+    # one fully flagged pixel
+    valid[0, 0, :] = False
+    return data, valid
+
+
+@pytest.mark.parametrize('chunk', [1, 7, 40])
+def test_cube_accumulator_matches_numpy(chunk):
+    """Test that chunked accumulation matches whole-cube masked reductions."""
+    data, valid = _synthetic_cube()
+    accumulator = CubeAccumulator(data.shape[:2], robust_rms=True)
+    for first in range(0, data.shape[2], chunk):
+        sl = slice(first, first + chunk)
+        accumulator.add(data[..., sl], valid[..., sl], np.arange(data.shape[2])[sl])
+    reduction = accumulator.result(chan_width=-2.0)
+
+    expected = np.ma.array(data, mask=~valid)
+    assert np.ma.allclose(reduction.sum, expected.sum(axis=2))
+    assert np.ma.allclose(reduction.mean, expected.mean(axis=2))
+    assert np.ma.allclose(reduction.max, expected.max(axis=2))
+    assert np.ma.allclose(reduction.min, expected.min(axis=2))
+    assert np.ma.allclose(reduction.mom0, 2.0 * expected.sum(axis=2))
+    assert reduction.mean.mask[0, 0]
+    assert np.array_equal(reduction.channels, np.arange(data.shape[2]))
+
+    planes = expected.reshape(-1, data.shape[2])
+    expected_rms = [1.4826 * np.ma.median(np.abs(p.compressed() - np.ma.median(p.compressed())))
+                    for p in planes.T]
+    assert np.allclose(reduction.chan_rms, expected_rms)
+
+
+def test_chunk_channels_respects_memory_bound():
+    """Test that channel ranges are split into chunks within the memory bound."""
+    assert chunk_channels([(0, 9), (20, 24)], plane_bytes=10, max_chunk_bytes=40) == \
+        [(0, 3), (4, 7), (8, 9), (20, 23), (24, 24)]
+    # a plane larger than the bound is still read one plane at a time
+    assert chunk_channels([(0, 2)], plane_bytes=100, max_chunk_bytes=10) == [(0, 0), (1, 1), (2, 2)]
+
+
+def _synthetic_image(tmp_path, nx, ny, nchan):
+    rng = np.random.default_rng(42)
+    imagename = str(tmp_path / 'synthetic.image')
+    image = casa_tools.image
+    image.fromarray(outfile=imagename, pixels=rng.normal(size=(nx, ny, 1, nchan)).astype(np.float32),
+                    overwrite=True)
+    image.done()
+    return imagename
+
+
+def _collapse_and_immoments(imagename, chans, tmp_path):
+    """Reductions of an image made with one collapse or immoments call per function."""
+    chans_str = ';'.join('%d~%d' % c for c in chans)
+    expected = {}
+    with casa_tools.ImageReader(imagename) as image:
+        for function in ('mean', 'max', 'min', 'sum'):
+            collapsed = image.collapse(function=function, axes=3, chans=chans_str)
+            expected[function] = collapsed.getchunk(dropdeg=True)
+            collapsed.done()
+    for moment in (8, 10):
+        outfile = str(tmp_path / f'synthetic.mom{moment}')
+        casa_tasks.immoments(imagename=imagename, moments=[moment], outfile=outfile, chans=chans_str).execute()
+        with casa_tools.ImageReader(outfile) as image:
+            expected[f'mom{moment}'] = image.getchunk(dropdeg=True)
+    return expected
+
+
+def _assert_reduction_equal(reduction, expected):
+    for function, plane in expected.items():
+        assert np.allclose(np.ma.getdata(reduction.get(function)), plane, rtol=1e-5, atol=1e-5), function
+
+
+def test_reduce_cube_matches_collapse_and_immoments(tmp_path):
+    """Test that the single-pass reduction matches per-function collapse/immoments calls."""
+    imagename = _synthetic_image(tmp_path, 32, 32, 120)
+    chans = [(5, 50), (70, 110)]
+    expected = _collapse_and_immoments(imagename, chans, tmp_path)
+
+    reduction = reduce_cube(imagename, chans=chans, use_cache=False, max_chunk_bytes=256 * 1024)
+
+    assert reduction.timing['nchunks'] > 1
+    _assert_reduction_equal(reduction, expected)
+
+
+@pytest.mark.benchmark
+def test_reduce_cube_benchmark(tmp_path):
+    """Benchmark the single-pass reduction against per-function collapse/immoments calls."""
+    nx, ny, nchan = 128, 128, 1000
+    imagename = _synthetic_image(tmp_path, nx, ny, nchan)
+    chans = [(10, 450), (550, 990)]
+
+    t0 = time.perf_counter()
+    expected = _collapse_and_immoments(imagename, chans, tmp_path)
+    t_multipass = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    reduction = reduce_cube(imagename, chans=chans, use_cache=False)
+    t_singlepass = time.perf_counter() - t0
+    LOG.info('Cube reduction of %dx%dx%d: multi-pass %.3f s, single-pass %.3f s (%d chunks)',
+             nx, ny, nchan, t_multipass, t_singlepass, reduction.timing['nchunks'])
+
+    _assert_reduction_equal(reduction, expected)
@@ -22,7 +22,6 @@
 
 import copy
 import os
-import shutil
 import string
 import textwrap
 import traceback
@@ -38,10 +37,12 @@ from scipy.ndimage import binary_dilation, binary_erosion, generate_binary_struc
 import pipeline.infrastructure as infrastructure
 import pipeline.infrastructure.renderer.logger as logger
 import pipeline.infrastructure.utils as utils
-from pipeline.infrastructure import casa_tasks, casa_tools, filenamer
+from pipeline.infrastructure import casa_tools, filenamer
 from pipeline.infrastructure.displays.plotstyle import matplotlibrc_formal
 from pipeline.infrastructure.utils import get_stokes
 
+from .. import cubereducer
+
 LOG = infrastructure.logging.get_logger(__name__)
 
 _valid_chars = "_.%s%s" % (string.ascii_letters, string.digits)
@@ -242,20 +243,19 @@ class SkyDisplay:
             _, _, npol, nchan = image.shape()
             if nchan == 1 and npol == 1:
                 if include_mask:
-                    mdata = np.ma.array(
+                    return np.ma.array(
                         image.getchunk(dropdeg=True), mask=np.invert(image.getchunk(getmask=True, dropdeg=True))
                     )
-                else:
-                    mdata = image.getchunk(dropdeg=True)
-            else:
-                collapsed = image.collapse(function=collapseFunction, axes=2, stokes=stokes_select)
-                if include_mask:
-                    mdata = np.ma.array(
-                        collapsed.getchunk(dropdeg=True), mask=np.invert(collapsed.getchunk(getmask=True, dropdeg=True))
-                    )
-                else:
-                    mdata = collapsed.getchunk(dropdeg=True)
-                collapsed.done()
+                return image.getchunk(dropdeg=True)
+
+        # All collapse functions of a cube are computed in a single pass and cached,
+        # so that plotting several collapsed views of the same cube reads it once.
+        reduction = cubereducer.reduce_cube(imagename, stokes=stokes_select)
+        collapsed = reduction.get(collapseFunction)
+        if include_mask:
+            mdata = collapsed
+        else:
+            mdata = np.ma.getdata(collapsed)
         return mdata
 
     @matplotlibrc_formal
@@ -287,6 +287,10 @@ class SkyDisplay:
         with casa_tools.ImageReader(imagename) as image:
             _, _, npol, nchan = image.shape()
 
+        # collapsed plane and brightness unit taken from a cube reduction, if any
+        reduced_data = None
+        reduced_unit = None
+
         plot_exists_and_keep = os.path.exists(plotfile) and not self.overwrite
         is_single_plane = (nchan == 1 and npol == 1)
 
@@ -312,23 +316,22 @@ class SkyDisplay:
                         if collapseFunction == 'center':
                             collapsed = image.collapse(function='mean', chans=str(
                                 image.summary()['shape'][3]//2), stokes=stokes_select, axes=3)
-                        elif collapseFunction == 'mom0':
-                            # image.collapse does not have a true "mom0" option. "sum" is close, but the
-                            # scaling is different.
-                            # TODO: Switch the whole _plot_panel method to using immoments(?) Though the
-                            #       downside is that images can no longer be made just in memory. They
-                            #       always have to be written to disk.
-                            tmpfile = f'{os.path.basename(imagename)}_mom0_tmp.img'
-                            casa_tasks.immoments(imagename=imagename, moments=[
-                                0], outfile=tmpfile, stokes=stokes_select).execute()
-                            assert os.path.exists(tmpfile)
-                            collapsed = image.newimagefromimage(infile=tmpfile)
-                            shutil.rmtree(tmpfile)
-                        elif collapseFunction == 'mom8':
-                            collapsed = image.collapse(function='max', stokes=stokes_select, axes=3)
-                        else:
+                        elif collapseFunction in cubereducer.REDUCTIONS:
+                            # All collapse functions (including the true "mom0" integral that
+                            # image.collapse does not offer) come from one cached pass over the
+                            # cube, shared by all plots of the same image. The central plane
+                            # only provides the collapsed coordinate system and image metadata.
                             # Note: in case 'max' and non-pbcor image a moment 0 map was written to disk
                             # in the past. With PIPE-558 this is done in hif/tasks/tclean.py tclean._calc_mom0_8()
+                            reduction = cubereducer.reduce_cube(imagename, stokes=stokes_select)
+                            reduced_data = reduction.get(collapseFunction)
+                            if np.ma.getmaskarray(reduced_data).all():
+                                raise ValueError(f'All channels of {imagename} are flagged')
+                            if collapseFunction == 'mom0':
+                                reduced_unit = reduction.mom0_unit
+                            collapsed = image.collapse(function='mean', chans=str(nchan // 2),
+                                                       stokes=stokes_select, axes=3)
+                        else:
                             collapsed = image.collapse(function=collapseFunction, stokes=stokes_select, axes=3)
                     except Exception as ex:
                         LOG.info(ex)
@@ -339,6 +342,8 @@ class SkyDisplay:
                         collapsed_new.set(pixelmask=True, pixels='0')
                         collapsed = collapsed_new.collapse(function='mean', stokes=stokes_select, axes=3)
                         collapsed_new.done()
+                        reduced_data = None
+                        reduced_unit = None
 
         cs = collapsed.coordsys()  # needs to explicitly close later
         coord_names = cs.names()
@@ -367,7 +372,7 @@ class SkyDisplay:
         cs.setunits(type='direction', value='arcsec arcsec')
         coord_units = cs.units()
         coord_refs = cs.referencevalue(format='s')
-        brightness_unit = collapsed.brightnessunit()
+        brightness_unit = reduced_unit if reduced_unit else collapsed.brightnessunit()
         beam_rec = collapsed.restoringbeam()
         if 'major' in beam_rec:
             cqa = casa_tools.quanta
@@ -389,8 +394,12 @@ class SkyDisplay:
 
         LOG.info('Getting data from collapsed image of %s', imagename)
 
-        data = collapsed.getchunk(dropdeg=True)
-        mask = np.invert(collapsed.getchunk(getmask=True, dropdeg=True))
+        if reduced_data is not None:
+            data = np.ma.getdata(reduced_data)
+            mask = np.ma.getmaskarray(reduced_data)
+        else:
+            data = collapsed.getchunk(dropdeg=True)
+            mask = np.invert(collapsed.getchunk(getmask=True, dropdeg=True))
 
         collapsed.done()
         shape = data.shape
@@ -1,3 +1,4 @@
+import collections
 import copy
 import itertools
 import math
@@ -57,14 +58,72 @@ def _log_outlier(msg, level=logging.DEBUG):
         casa_tools.post_to_log(msg)
 
 
+def _unflagged_above(values, flag, threshold):
+    """
+    Return a boolean array marking the values that are not flagged and
+    exceed the threshold. Flagged values are not compared.
+    """
+    return np.greater(values, threshold, out=np.zeros(np.shape(values), bool), where=np.logical_not(flag))
+
+
+def _unflagged_below(values, flag, threshold):
+    """
+    Return a boolean array marking the values that are not flagged and
+    are below the threshold. Flagged values are not compared.
+    """
+    return np.less(values, threshold, out=np.zeros(np.shape(values), bool), where=np.logical_not(flag))
+
+
+def _count_per_quadrant(mask, quadrant):
+    """
+    Return the number of set elements of a channel x baseline mask, for each
+    channel quadrant (given as [start, end] channels) and each baseline.
+    """
+    cumulative = np.concatenate((np.zeros((1, mask.shape[1]), int), np.cumsum(mask, axis=0)))
+    return np.array([cumulative[end] - cumulative[start] for start, end in quadrant])
+
+
+def _too_many_flags(flag, nodata, axis, maxfraction, maxexcessflags):
+    """
+    Evaluate the 'too many flags' rule along the given axis of a view, for
+    all rows (axis=0) or columns (axis=1) at once.
+
+    Returns:
+    Tuple containing the number flagged per row or column, the median
+    number flagged, the fraction flagged per row or column (not counting
+    elements without data), and boolean arrays marking the rows or columns
+    that are not entirely flagged and exceed the maximum fraction,
+    respectively the median number flagged plus the maximum number of
+    excess flags.
+    """
+    num_flagged = np.count_nonzero(flag, axis=axis)
+    median_num_flagged = np.median(num_flagged)
+    num_no_data = np.count_nonzero(nodata, axis=axis)
+    num_valid = np.shape(flag)[axis] - num_no_data
+    fraction_flagged = np.divide(num_flagged - num_no_data, num_valid, out=np.zeros(np.shape(num_flagged)),
+                                 where=num_valid > 0)
+    not_all_flagged = np.logical_not(np.all(flag, axis=axis))
+    too_many = np.logical_and(not_all_flagged, fraction_flagged > maxfraction)
+    excess = np.logical_and(not_all_flagged, num_flagged > median_num_flagged + maxexcessflags)
+    return num_flagged, median_num_flagged, fraction_flagged, too_many, excess
+
+
+def _fraction(count, total):
+    """
+    Return the fractions count / total, or 0 where the total is 0.
+    """
+    return np.divide(count, total, out=np.zeros(np.shape(count)), where=total > 0)
+
+
 class MatrixFlaggerInputs(vdp.StandardInputs):
+    incremental = vdp.VisDependentProperty(default=False)
     prepend = vdp.VisDependentProperty(default='')
     skip_fully_flagged = vdp.VisDependentProperty(default=True)
     use_antenna_names = vdp.VisDependentProperty(default=True)
 
     def __init__(self, context, output_dir=None, vis=None, datatask=None, viewtask=None, flagsettertask=None,
                  rules=None, niter=None, extendfields=None, extendbaseband=None, iter_datatask=None,
-                 use_antenna_names=None, prepend=None, skip_fully_flagged=None):
+                 use_antenna_names=None, prepend=None, skip_fully_flagged=None, incremental=None):
         super().__init__()
 
         # pipeline inputs
@@ -78,6 +137,11 @@ class MatrixFlaggerInputs(vdp.StandardInputs):
         self.extendbaseband = extendbaseband
         self.extendfields = extendfields
         self.flagsettertask = flagsettertask
+        # If True, update the views in place from the newly flagged cells on
+        # each iteration, instead of re-running the datatask and viewtask.
+        # Only valid for views in which each cell is computed independently
+        # from the data underlying that cell.
+        self.incremental = incremental
         self.iter_datatask = iter_datatask
         self.niter = niter
         self.prepend = prepend
@@ -146,10 +210,19 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
         if inputs.extendbaseband:
             LOG.info("{} flagcmds will be extended to include all spws within baseband.".format(inputs.prepend))
 
+        # Update the views in place on each iteration, if requested and if
+        # the flagging commands only flag the data underlying the view.
+        incremental = inputs.incremental is True
+        if incremental and (inputs.extendfields or inputs.extendbaseband):
+            LOG.info("{} flagcmds are extended beyond the flagged view, views will be recomputed on each"
+                     " iteration.".format(inputs.prepend))
+            incremental = False
+
         # Initialize flags, flag_reason, and iteration counter
         flags = []
         flag_reason_plane = {}
         newflags = []
+        newflags_reason = {}
         counter = 1
         include_before = True
         dataresult = None
@@ -162,6 +235,10 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
             if counter == 1:
                 # Always run data task on first iteration
                 dataresult = self._executor.execute(inputs.datatask)
+            elif incremental:
+                # If updating the views in place, the flags are set after the
+                # last iteration, and the data task is not re-run.
+                dataresult.new = False
             elif inputs.iter_datatask is True:
                 # If requested to re-run datatask on iteration, then
                 # run the flag-setting task which modifies the data
@@ -183,8 +260,12 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                 # longer new.
                 dataresult.new = False
 
-            # Create flagging view
-            viewresult = inputs.viewtask(dataresult)
+            # Create flagging view, or update the view of the previous
+            # iteration with the flags found in that iteration.
+            if counter > 1 and incremental:
+                viewresult = self.update_view(viewresult, newflags_reason)
+            else:
+                viewresult = inputs.viewtask(dataresult)
 
             # If a view could be created, continue with flagging
             if viewresult.descriptions():
@@ -234,7 +315,7 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
             if len(newflags) > 0:
 
                 # If datatask needs to be iterated...
-                if inputs.iter_datatask is True:
+                if inputs.iter_datatask is True and not incremental:
 
                     # First set the new flags that were found on the last
                     # iteration. If the "before" summary was not yet created,
@@ -261,7 +342,10 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                         flags, summarize_before=True, summarize_after=True)
 
                 # Create final post-flagging view
-                viewresult = inputs.viewtask(dataresult)
+                if incremental:
+                    viewresult = self.update_view(viewresult, newflags_reason)
+                else:
+                    viewresult = inputs.viewtask(dataresult)
 
                 # Import the post-flagging view into the final result
                 result.importfrom(viewresult)
@@ -273,7 +357,7 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                 # If datatask needs to be iterated, then the "before" summary has
                 # already been done, and the flags have already been set, so only
                 # need to do an "after" summary.
-                if inputs.iter_datatask is True:
+                if inputs.iter_datatask is True and not incremental:
                     _, stats_after = self.set_flags([], summarize_after=True)
                 # If the datatask did not need to be iterated, then no flags
                 # were set yet and no "before" summary was performed yet,
@@ -332,6 +416,29 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
 
         return newflags, newflags_reason
 
+    @staticmethod
+    def update_view(view, flag_reason_planes):
+        """
+        Return a copy of the view results, holding the last view for each
+        description with the cells that were newly flagged according to the
+        given flag reason planes also flagged, as if the flags had been
+        applied to the data and the view recalculated.
+
+        Keyword arguments:
+        view - Results object containing the views to update.
+        flag_reason_planes - dictionary of flag reason plane per description,
+            in which the newly flagged cells have a non-zero flag reason.
+        """
+        updated = copy.copy(view)
+        updated.view = collections.defaultdict(list)
+        updated.flagging = []
+        for description in view.descriptions():
+            image = copy.copy(view.view[description][-1])
+            if description in flag_reason_planes:
+                image.flag = np.logical_or(image.flag, flag_reason_planes[description] > 0)
+            updated.addview(description, image)
+        return updated
+
     def set_flags(self, flags, summarize_before=False, summarize_after=False):
         # Initialize flag commands.
         allflagcmds = []
@@ -523,20 +630,12 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                 # Check limits.
                 mad_max = rule['limit']
 
-                # Create masked array with flagged data masked.
-                data_masked = np.ma.array(np.abs(data - data_median), mask=flag)
-
-                # Create new masked array from masked array with outliers
-                # masked. This should avoid performing a comparison with
-                # flagged data that could include NaNs (that would cause a
-                # RuntimeWarning).
+                # Get indices to flag as the elements that were not already
+                # flagged and exceed the threshold. Flagged data, that could
+                # include NaNs, are not compared.
+                deviation = np.abs(data - data_median)
                 outlier_threshold = mad_max * data_mad
-                data_masked = np.ma.masked_greater(data_masked, outlier_threshold)
-
-                # Get indices to flag as the masked elements that were not
-                # already flagged, i.e. the newly masked elements.
-                new_flag = np.logical_and(np.ma.getmask(data_masked),
-                                          np.logical_not(flag))
+                new_flag = _unflagged_above(deviation, flag, outlier_threshold)
 
                 # No flagged data.
                 if not np.any(new_flag):
@@ -585,12 +684,12 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                     continue
 
                 # Log a debug message with outliers.
-                outliers_as_str = ", ".join(sorted([str(ol) for ol in data_masked[new_flag].data], reverse=True))
+                outliers_as_str = ", ".join(sorted([str(ol) for ol in deviation[new_flag]], reverse=True))
                 msg = ("Outliers found with flagging rule '{}' for {}, spw {}, pol {}{}.\n"
                        "Data: median = {}, MAD = {}. Max MAD threshold = {}, corresponding to {}.\n"
                        "{} outlier(s) found (highest to lowest): {}"
                        "".format(rulename, os.path.basename(table), spw, pol, ants_as_str, data_median, data_mad,
-                                 mad_max, outlier_threshold, len(data_masked[new_flag].data), outliers_as_str))
+                                 mad_max, outlier_threshold, np.count_nonzero(new_flag), outliers_as_str))
                 _log_outlier(msg)
 
                 i2flag = i[new_flag]
@@ -616,32 +715,24 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                 # Check limits.
                 mad_max = rule['limit']
 
-                # Create masked array with flagged data masked.
-                data_masked = np.ma.array(data_median - data, mask=flag)
-
-                # Create new masked array from masked array with outliers
-                # masked. This should avoid performing a comparison with
-                # flagged data that could include NaNs (that would cause a
-                # RuntimeWarning).
+                # Get indices to flag as the elements that were not already
+                # flagged and exceed the threshold. Flagged data, that could
+                # include NaNs, are not compared.
+                deviation = data_median - data
                 outlier_threshold = mad_max * data_mad
-                data_masked = np.ma.masked_greater(data_masked, outlier_threshold)
-
-                # Get indices to flag as the masked elements that were not
-                # already flagged, i.e. the newly masked elements.
-                new_flag = np.logical_and(np.ma.getmask(data_masked),
-                                          np.logical_not(flag))
+                new_flag = _unflagged_above(deviation, flag, outlier_threshold)
 
                 # No flagged data.
                 if not np.any(new_flag):
                     continue
 
                 # Log a debug message with outliers.
-                outliers_as_str = ", ".join(sorted([str(ol) for ol in data_masked[new_flag].data], reverse=True))
+                outliers_as_str = ", ".join(sorted([str(ol) for ol in deviation[new_flag]], reverse=True))
                 msg = ("Outliers found with flagging rule '{}' for {}, spw {}, pol {}.\n"
                        "Data: median = {}, MAD = {}. Max MAD threshold = {}, corresponding to {}.\n"
                        "{} outlier(s) found (highest to lowest): {}"
                        "".format(rulename, os.path.basename(table), spw, pol, data_median, data_mad, mad_max,
-                                 outlier_threshold, len(data_masked[new_flag].data), outliers_as_str))
+                                 outlier_threshold, np.count_nonzero(new_flag), outliers_as_str))
                 _log_outlier(msg)
 
                 i2flag = i[new_flag]
@@ -667,32 +758,24 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                 # Get threshold limit.
                 mad_max = rule['limit']
 
-                # Create masked array with flagged data masked.
-                data_masked = np.ma.array(data - data_median, mask=flag)
-
-                # Create new masked array from masked array with outliers
-                # masked. This should avoid performing a comparison with
-                # flagged data that could include NaNs (that would cause a
-                # RuntimeWarning).
+                # Get indices to flag as the elements that were not already
+                # flagged and exceed the threshold. Flagged data, that could
+                # include NaNs, are not compared.
+                deviation = data - data_median
                 outlier_threshold = mad_max * data_mad
-                data_masked = np.ma.masked_greater(data_masked, outlier_threshold)
-
-                # Get indices to flag as the masked elements that were not
-                # already flagged, i.e. the newly masked elements.
-                new_flag = np.logical_and(np.ma.getmask(data_masked),
-                                          np.logical_not(flag))
+                new_flag = _unflagged_above(deviation, flag, outlier_threshold)
 
                 # No flags
                 if not np.any(new_flag):
                     continue
 
                 # Log a debug message with outliers.
-                outliers_as_str = ", ".join(sorted([str(ol) for ol in data_masked[new_flag].data], reverse=True))
+                outliers_as_str = ", ".join(sorted([str(ol) for ol in deviation[new_flag]], reverse=True))
                 msg = ("Outliers found with flagging rule '{}' for {}, spw {}, pol {}.\n"
                        "Data: median = {}, MAD = {}. Max MAD threshold = {}, corresponding to {}.\n"
                        "{} outlier(s) found (highest to lowest): {}"
                        "".format(rulename, os.path.basename(table), spw, pol, data_median, data_mad, mad_max,
-                                 outlier_threshold, len(data_masked[new_flag].data), outliers_as_str))
+                                 outlier_threshold, np.count_nonzero(new_flag), outliers_as_str))
                 _log_outlier(msg)
 
                 i2flag = i[new_flag]
@@ -718,31 +801,23 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                 # Check limits.
                 limit = rule['limit']
 
-                # Create masked array with flagged data masked.
-                data_masked = np.ma.array(np.abs(data), mask=flag)
-
-                # Create new masked array from masked array with outliers
-                # masked. This should avoid performing a comparison with
-                # flagged data that could include NaNs (that would cause a
-                # RuntimeWarning).
-                data_masked = np.ma.masked_less(data_masked, limit)
-
-                # Get indices to flag as the masked elements that were not
-                # already flagged, i.e. the newly masked elements.
-                new_flag = np.logical_and(np.ma.getmask(data_masked),
-                                          np.logical_not(flag))
+                # Get indices to flag as the elements that were not already
+                # flagged and are below the threshold. Flagged data, that
+                # could include NaNs, are not compared.
+                abs_data = np.abs(data)
+                new_flag = _unflagged_below(abs_data, flag, limit)
 
                 # No flags
                 if not np.any(new_flag):
                     continue
 
                 # Log a debug message with outliers.
-                outliers_as_str = ", ".join(sorted([str(ol) for ol in data_masked[new_flag].data]))
+                outliers_as_str = ", ".join(sorted([str(ol) for ol in abs_data[new_flag]]))
                 msg = ("Outliers found with flagging rule '{}' for {}, spw {}, pol {}.\n"
                        "Minimum threshold = {}.\n"
                        "{} outlier(s) found (lowest to highest): {}"
                        "".format(rulename, os.path.basename(table), spw, pol, limit,
-                                 len(data_masked[new_flag].data), outliers_as_str))
+                                 np.count_nonzero(new_flag), outliers_as_str))
                 _log_outlier(msg)
 
                 i2flag = i[new_flag]
@@ -768,31 +843,23 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                 # Check limits.
                 limit = rule['limit']
 
-                # Create masked array with flagged data masked.
-                data_masked = np.ma.array(np.abs(data), mask=flag)
-
-                # Create new masked array from masked array with outliers
-                # masked. This should avoid performing a comparison with
-                # flagged data that could include NaNs (that would cause a
-                # RuntimeWarning).
-                data_masked = np.ma.masked_greater(data_masked, limit)
-
-                # Get indices to flag as the masked elements that were not
-                # already flagged, i.e. the newly masked elements.
-                new_flag = np.logical_and(np.ma.getmask(data_masked),
-                                          np.logical_not(flag))
+                # Get indices to flag as the elements that were not already
+                # flagged and exceed the threshold. Flagged data, that could
+                # include NaNs, are not compared.
+                abs_data = np.abs(data)
+                new_flag = _unflagged_above(abs_data, flag, limit)
 
                 # No flags
                 if not np.any(new_flag):
                     continue
 
                 # Log a debug message with outliers.
-                outliers_as_str = ", ".join(sorted([str(ol) for ol in data_masked[new_flag].data], reverse=True))
+                outliers_as_str = ", ".join(sorted([str(ol) for ol in abs_data[new_flag]], reverse=True))
                 msg = ("Outliers found with flagging rule '{}' for {}, spw {}, pol {}.\n"
                        "Maximum threshold = {}.\n"
                        "{} outlier(s) found (highest to lowest): {}"
                        "".format(rulename, os.path.basename(table), spw, pol, limit,
-                                 len(data_masked[new_flag].data), outliers_as_str))
+                                 np.count_nonzero(new_flag), outliers_as_str))
                 _log_outlier(msg)
 
                 i2flag = i[new_flag]
@@ -822,39 +889,23 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
 
                 if axis == xtitle.upper().strip():
 
-                    # Compute median number flagged
-                    num_flagged = np.zeros([np.shape(data)[1]], int)
-                    for iy in np.arange(len(ydata)):
-                        num_flagged[iy] = len(data[:, iy][flag[:, iy]])
-                    median_num_flagged = np.median(num_flagged)
+                    # Compute number flagged, fraction flagged and median
+                    # number flagged for all rows; flagging a row does not
+                    # affect the evaluation of the other rows.
+                    num_flagged, median_num_flagged, fraction_flagged, too_many, excess = _too_many_flags(
+                        flag, nodata, 0, maxfraction, maxexcessflags)
 
-                    # look along x axis
-                    for iy in np.arange(len(ydata)):
-                        if all(flag[:, iy]):
-                            continue
+                    # look along x axis, at the rows with too many flags
+                    for iy in np.flatnonzero(np.logical_or(too_many, excess)):
+                        len_flagged = num_flagged[iy]
+                        fractionflagged = fraction_flagged[iy]
 
-                        # Compute fraction flagged
-                        len_data = len(xdata)
-                        len_no_data = len(data[:, iy][nodata[:, iy]])
-                        len_flagged = len(data[:, iy][flag[:, iy]])
-                        fractionflagged = (
-                          float(len_flagged - len_no_data) /
-                          float(len_data - len_no_data))
-                        if fractionflagged > maxfraction:
-                            i2flag = i[:, iy][np.logical_not(flag[:, iy])]
-                            j2flag = j[:, iy][np.logical_not(flag[:, iy])]
-                        else:
-                            i2flag = np.zeros([0], int)
-                            j2flag = np.zeros([0], int)
-
-                        # likewise for maxexcessflags
-                        if len_flagged > median_num_flagged + maxexcessflags:
-                            i2flag = np.concatenate((i2flag, i[:, iy][np.logical_not(flag[:, iy])]))
-                            j2flag = np.concatenate((j2flag, j[:, iy][np.logical_not(flag[:, iy])]))
-
-                        # If row did not have too many flags, skip row.
-                        if len(i2flag) <= 0:
-                            continue
+                        # flag the remaining data in the row, once for
+                        # exceeding the max fraction and once for exceeding
+                        # the max excess flags
+                        nrepeat = int(too_many[iy]) + int(excess[iy])
+                        i2flag = np.tile(i[:, iy][np.logical_not(flag[:, iy])], nrepeat)
+                        j2flag = np.tile(j[:, iy][np.logical_not(flag[:, iy])], nrepeat)
 
                         # Log a debug message about outliers.
                         msg = ("Outliers found with flagging rule '{}' for {}, spw {}, pol {}.\n"
@@ -881,38 +932,23 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
 
                 elif axis == ytitle.upper().strip():
 
-                    # Compute median number flagged
-                    num_flagged = np.zeros([np.shape(data)[0]], int)
-                    for ix in np.arange(len(xdata)):
-                        num_flagged[ix] = len(data[ix, :][flag[ix, :]])
-                    median_num_flagged = np.median(num_flagged)
+                    # Compute number flagged, fraction flagged and median
+                    # number flagged for all columns; flagging a column does
+                    # not affect the evaluation of the other columns.
+                    num_flagged, median_num_flagged, fraction_flagged, too_many, excess = _too_many_flags(
+                        flag, nodata, 1, maxfraction, maxexcessflags)
 
-                    # look along y axis
-                    for ix in np.arange(len(xdata)):
-                        if all(flag[ix, :]):
-                            continue
+                    # look along y axis, at the columns with too many flags
+                    for ix in np.flatnonzero(np.logical_or(too_many, excess)):
+                        len_flagged = num_flagged[ix]
+                        fractionflagged = fraction_flagged[ix]
 
-                        len_data = len(ydata)
-                        len_no_data = len(data[ix, :][nodata[ix, :]])
-                        len_flagged = len(data[ix, :][flag[ix, :]])
-                        fractionflagged = (
-                            float(len_flagged - len_no_data) /
-                            float(len_data - len_no_data))
-                        if fractionflagged > maxfraction:
-                            i2flag = i[ix, :][np.logical_not(flag[ix, :])]
-                            j2flag = j[ix, :][np.logical_not(flag[ix, :])]
-                        else:
-                            i2flag = np.zeros([0], int)
-                            j2flag = np.zeros([0], int)
-
-                        len_flagged = len(data[ix, :][flag[ix, :]])
-                        if len_flagged > median_num_flagged + maxexcessflags:
-                            i2flag = np.concatenate((i2flag, i[ix, :][np.logical_not(flag[ix, :])]))
-                            j2flag = np.concatenate((j2flag, j[ix, :][np.logical_not(flag[ix, :])]))
-
-                        # If no column had too many flags, skip column.
-                        if len(i2flag) <= 0:
-                            continue
+                        # flag the remaining data in the column, once for
+                        # exceeding the max fraction and once for exceeding
+                        # the max excess flags
+                        nrepeat = int(too_many[ix]) + int(excess[ix])
+                        i2flag = np.tile(i[ix, :][np.logical_not(flag[ix, :])], nrepeat)
+                        j2flag = np.tile(j[ix, :][np.logical_not(flag[ix, :])], nrepeat)
 
                         # Log a debug message about outliers.
                         msg = ("Outliers found with flagging rule '{}' for {}, spw {}, pol {}.\n"
@@ -1000,35 +1036,26 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                 lo_limit = rule['lo_limit']
                 hi_limit = rule['hi_limit']
 
-                # Create masked array with flagged data masked.
-                data_masked = np.ma.array(data, mask=flag)
-
-                # Create new masked array from masked array with outliers
-                # masked. This should avoid performing a comparison with
-                # flagged data that could include NaNs (that would cause a
-                # RuntimeWarning).
+                # Get indices to flag as the elements that were not already
+                # flagged and are above the high or below the low threshold.
+                # Flagged data, that could include NaNs, are not compared.
                 outlier_high_threshold = hi_limit * data_median
                 outlier_low_threshold = lo_limit * data_median
-                data_masked = np.ma.masked_greater(data_masked, outlier_high_threshold)
-                data_masked = np.ma.masked_less(data_masked, outlier_low_threshold)
-
-                # Get indices to flag as the masked elements that were not
-                # already flagged, i.e. the newly masked elements.
-                new_flag = np.logical_and(np.ma.getmask(data_masked),
-                                          np.logical_not(flag))
+                new_flag = np.logical_or(_unflagged_above(data, flag, outlier_high_threshold),
+                                         _unflagged_below(data, flag, outlier_low_threshold))
 
                 # No flags
                 if not np.any(new_flag):
                     continue
 
                 # Log a debug message with outliers.
-                outliers_as_str = ", ".join(sorted([str(ol) for ol in data_masked[new_flag].data]))
+                outliers_as_str = ", ".join(sorted([str(ol) for ol in data[new_flag]]))
                 msg = ("Outliers found with flagging rule '{}' for {}, spw {}, pol {}.\n"
                        "Data: median = {}. Low, high nmedian thresholds = {}, {}, corresponding to {}, {}.\n"
                        "{} outlier(s) found (lowest to highest): {}"
                        "".format(rulename, os.path.basename(table), spw, pol, data_median, lo_limit,
                                  hi_limit, outlier_low_threshold, outlier_high_threshold,
-                                 len(data_masked[new_flag].data), outliers_as_str))
+                                 np.count_nonzero(new_flag), outliers_as_str))
                 _log_outlier(msg)
 
                 i2flag = i[new_flag]
@@ -1076,19 +1103,12 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                     if len(valid_ant_data) < minsample:
                         continue
 
-                    # Create masked array with flagged data masked.
-                    ant_data_masked = np.ma.array(data_median - ant_data, mask=ant_flag)
-
-                    # Create new masked array from masked array with outliers
-                    # masked. This should avoid performing a comparison with
-                    # flagged data that could include NaNs (that would cause a
-                    # RuntimeWarning).
+                    # Get indices to flag as the elements that were not
+                    # already flagged and exceed the threshold. Flagged data,
+                    # that could include NaNs, are not compared.
+                    ant_deviation = data_median - ant_data
                     outlier_threshold = mad_max * data_mad
-                    ant_data_masked = np.ma.masked_greater(ant_data_masked, outlier_threshold)
-
-                    # Get indices to flag as the masked elements that were not
-                    # already flagged, i.e. the newly masked elements.
-                    new_flag = np.logical_and(np.ma.getmask(ant_data_masked), np.logical_not(ant_flag))
+                    new_flag = _unflagged_above(ant_deviation, ant_flag, outlier_threshold)
 
                     # If no low outliers were found, skip this antenna.
                     if not np.any(new_flag):
@@ -1129,7 +1149,7 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                             self.flag_reason_index['low outlier']
 
                         # Log a debug message with outliers.
-                        outliers_as_str = ", ".join(sorted([str(ol) for ol in ant_data_masked[new_flag].data]))
+                        outliers_as_str = ", ".join(sorted([str(ol) for ol in ant_deviation[new_flag]]))
                         msg = ("Outliers found with flagging rule '{}' for {}, spw {}, pol {}.\n"
                                "Data: median = {}, MAD = {}. Max MAD threshold = {}, corresponding to {}.\n"
                                "For antenna {}: {} low outlier(s) found, representing {} fraction of its data"
@@ -1186,18 +1206,10 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                 baseline_frac_limit = rule['baseline_frac_limit']
 
                 # find outlier flags first
-                # Create masked array with flagged data masked.
-                data_masked = np.ma.array(np.abs(data - data_median), mask=flag)
-
-                # Create new masked array from masked array with outliers
-                # masked. This should avoid performing a comparison with
-                # flagged data that could include NaNs (that would cause a
-                # RuntimeWarning).
-                data_masked = np.ma.masked_greater(data_masked, hilo_limit * data_mad)
-
-                # Get indices to flag as the masked elements that were not
-                # already flagged, i.e. the newly masked elements.
-                provisional_new_flag = np.logical_and(data_masked.mask, np.logical_not(flag))
+                # Get indices to flag as the elements that were not already
+                # flagged and exceed the threshold. Flagged data, that could
+                # include NaNs, are not compared.
+                provisional_new_flag = _unflagged_above(np.abs(data - data_median), flag, hilo_limit * data_mad)
 
                 # No flagged data.
                 if not np.any(provisional_new_flag):
@@ -1238,29 +1250,36 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                 ]
                 rejected_flagging = np.zeros((nchan, nant), bool)
 
+                # The fractions of provisional new flags to previously
+                # unflagged channels only depend on the provisional new flags
+                # and the previous flags, so these are computed up front for
+                # each quadrant: for each baseline, and for all baselines
+                # involving each antenna.
+                baseline_ids = np.arange(nbaseline)
+                antenna_ids = np.arange(nant)[:, np.newaxis]
+                antenna_baselines = np.logical_or(baseline_ids // nant == antenna_ids,
+                                                  baseline_ids % nant == antenna_ids).astype(int)
+                baseline_new_flag = _count_per_quadrant(provisional_new_flag, quadrant)
+                baseline_new_flag_unfiltered = _count_per_quadrant(provisional_new_flag_unfiltered, quadrant)
+                baseline_unflagged = _count_per_quadrant(np.logical_not(previous_flag), quadrant)
+                antenna_frac = _fraction(baseline_new_flag @ antenna_baselines.T,
+                                         baseline_unflagged @ antenna_baselines.T)
+                antenna_frac_unfiltered = _fraction(baseline_new_flag_unfiltered @ antenna_baselines.T,
+                                                    baseline_unflagged @ antenna_baselines.T)
+                baseline_frac = _fraction(baseline_new_flag, baseline_unflagged)
+                baseline_frac_unfiltered = _fraction(baseline_new_flag_unfiltered, baseline_unflagged)
+
                 for ant in range(nant):
                     # baselines involving this antenna
-                    baselines = np.array([baseline
-                                          for baseline in range(nbaseline)
-                                          if (ant*nant <= baseline < (ant+1)*nant)
-                                          or (baseline % nant == ant)])
+                    baselines = np.flatnonzero(antenna_baselines[ant])
 
                     for iquad in range(4):
                         # first check all baselines involving this antenna in this quadrant,
                         # examining the ratio of the number of provisional new flags
                         # to the number of previously unflagged channels
                         quad_slice = slice(quadrant[iquad][0], quadrant[iquad][1])
-                        num_provisional_new_flag = np.count_nonzero(
-                            provisional_new_flag[quad_slice, baselines])
-                        num_provisional_new_flag_unfiltered = np.count_nonzero(
-                            provisional_new_flag_unfiltered[quad_slice, baselines])
-                        num_previous_unflagged = np.count_nonzero(np.logical_not(
-                            previous_flag[quad_slice, baselines]))
-                        if num_previous_unflagged:
-                            frac = num_provisional_new_flag * 1.0 / num_previous_unflagged
-                            frac_unfiltered = num_provisional_new_flag_unfiltered * 1.0 / num_previous_unflagged
-                        else:
-                            frac = frac_unfiltered = 0.0
+                        frac = antenna_frac[iquad, ant]
+                        frac_unfiltered = antenna_frac_unfiltered[iquad, ant]
 
                         if frac > frac_limit:
                             # Add new flag commands to flag the data underlying the view.
@@ -1314,19 +1333,13 @@ class MatrixFlagger(basetask.StandardTaskTemplate):
                             # mark up these channels in the overall table, adding a correct offset for the quadrant
                             rejected_flagging[rejected_channels + quadrant[iquad][0], ant] = True
 
-                        # if the entire antenna was not flagged, look for individual bad baselines in this quadrant
-                        for baseline in baselines:
-                            num_provisional_new_flag = np.count_nonzero(
-                                provisional_new_flag[quad_slice, baseline])
-                            num_provisional_new_flag_unfiltered = np.count_nonzero(
-                                provisional_new_flag_unfiltered[quad_slice, baseline])
-                            num_previous_unflagged = np.count_nonzero(np.logical_not(
-                                previous_flag[quad_slice, baseline]))
-                            if num_previous_unflagged:
-                                frac = num_provisional_new_flag * 1.0 / num_previous_unflagged
-                                frac_unfiltered = num_provisional_new_flag_unfiltered * 1.0 / num_previous_unflagged
-                            else:
-                                frac = frac_unfiltered = 0.0
+                        # if the entire antenna was not flagged, look for individual bad baselines in this quadrant,
+                        # skipping the baselines below both thresholds
+                        candidates = np.logical_or(baseline_frac[iquad, baselines] > baseline_frac_limit,
+                                                   baseline_frac_unfiltered[iquad, baselines] > baseline_frac_limit)
+                        for baseline in baselines[candidates]:
+                            frac = baseline_frac[iquad, baseline]
+                            frac_unfiltered = baseline_frac_unfiltered[iquad, baseline]
 
                             if frac > baseline_frac_limit:
                                 # Add new flag commands to flag the data underlying the view.
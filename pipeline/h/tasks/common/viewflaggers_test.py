@@ -0,0 +1,137 @@
+"""Tests for the pipeline.h.tasks.common.viewflaggers module."""
+import time
+import types
+
+import numpy as np
+import pytest
+
+from pipeline.infrastructure import logging
+
+from . import commonresultobjects, flaggableviewresults
+from .viewflaggers import MatrixFlagger
+
+LOG = logging.get_logger(__name__)
+
+
+class _SyntheticData:
+    """Per-spw antenna x scan amplitudes and flags, set by the flagging commands of a flagger."""
+    def __init__(self, nant, nscan, nspw, seed=5):
+        rng = np.random.default_rng(seed)
+        self.data = {}
+        self.flag = {}
+        for spw in range(nspw):
+            data = rng.normal(10.0, 1.0, (nant, nscan))
+            # outliers that only stand out once the largest ones are flagged
+            outliers = rng.uniform(size=data.shape) < 0.05
+            data[outliers] *= rng.choice([1.6, 2.5, 6.0, 20.0], np.count_nonzero(outliers))
+            self.data[spw] = data
+            self.flag[spw] = rng.uniform(size=data.shape) < 0.01
+        self.flagcmds = []
+        self.data_reads = 0
+
+    def read(self):
+        """Data task: return a copy of the data and flags."""
+        self.data_reads += 1
+        return types.SimpleNamespace(data={spw: data.copy() for spw, data in self.data.items()},
+                                     flag={spw: flag.copy() for spw, flag in self.flag.items()}, new=True)
+
+    def set_flags(self):
+        """Flag setter task: flag the cell at the antenna and scan of each flagging command."""
+        for flagcmd in self.flagcmds:
+            if not isinstance(flagcmd, str):
+                self.flag[flagcmd.spw][flagcmd.flagcoords[0], flagcmd.flagcoords[1] - 1] = True
+        self.flagcmds.clear()
+        return types.SimpleNamespace(results=[])
+
+
+def _view(dataresult):
+    """View task: one antenna x scan image per spw, in which each cell only depends on the same cell of the data."""
+    view = flaggableviewresults.FlaggableViewResults()
+    for spw, data in dataresult.data.items():
+        axes = [commonresultobjects.ResultAxis(name='Antenna1', units='id', data=np.arange(data.shape[0])),
+                commonresultobjects.ResultAxis(name='Scan', units='', data=np.arange(data.shape[1]) + 1)]
+        view.addview('spw %s' % spw, commonresultobjects.ImageResult(
+            filename='synthetic.ms', data=data, flag=dataresult.flag[spw], axes=axes, datatype='amplitude', spw=spw))
+    return view
+
+
+def _run_flagger(nant, nscan, nspw, incremental):
+    """Run a MatrixFlagger on synthetic data, returning the result, synthetic data and number of iterations."""
+    synthetic = _SyntheticData(nant, nscan, nspw)
+    flagsetter = types.SimpleNamespace(inputs=types.SimpleNamespace(table='synthetic.ms'))
+    flagsetter.flags_to_set = synthetic.flagcmds.extend
+    datatask = object()
+    rules = MatrixFlagger.make_flag_rules(flag_hi=True, fhi_limit=4.0, fhi_minsample=5,
+                                          flag_lo=True, flo_limit=4.0, flo_minsample=5,
+                                          flag_tmf1=True, tmf1_axis='Scan', tmf1_limit=0.5)
+    inputs = types.SimpleNamespace(
+        vis='synthetic.ms', ms=None, prepend='', niter=10, datatask=datatask, viewtask=_view,
+        flagsettertask=flagsetter, rules=rules, extendfields=None, extendbaseband=None, iter_datatask=True,
+        incremental=incremental, skip_fully_flagged=True, use_antenna_names=False)
+    flagger = MatrixFlagger(inputs)
+    flagger._executor = types.SimpleNamespace(
+        execute=lambda task: synthetic.read() if task is datatask else synthetic.set_flags())
+
+    # each iteration flags the views once
+    iterations = []
+    flag_view = flagger.flag_view
+
+    def counted_flag_view(view, rules):
+        iterations.append(view)
+        return flag_view(view, rules)
+    flagger.flag_view = counted_flag_view
+
+    result = flagger.prepare()
+    return result, synthetic, len(iterations)
+
+
+def _assert_flagging_equal(incremental_result, incremental_synthetic, result, synthetic):
+    """Assert that two flagger runs found and set the same flags and produced the same views."""
+    # the same flags were found and set
+    assert [flagcmd.flagcmd for flagcmd in incremental_result.flagcmds()] == \
+        [flagcmd.flagcmd for flagcmd in result.flagcmds()]
+    for spw in synthetic.flag:
+        assert np.array_equal(incremental_synthetic.flag[spw], synthetic.flag[spw])
+
+    # the views of each iteration, including the final post-flagging views, are the same
+    assert sorted(incremental_result.descriptions()) == sorted(result.descriptions())
+    for description in result.descriptions():
+        views = result.view[description]
+        incremental_views = incremental_result.view[description]
+        assert len(incremental_views) == len(views)
+        for view, incremental_view in zip(views, incremental_views):
+            assert np.array_equal(incremental_view.flag, view.flag)
+            assert np.array_equal(incremental_view.data, view.data)
+        assert np.array_equal(incremental_views[-1].flag_reason_plane, views[-1].flag_reason_plane)
+
+
+@pytest.mark.parametrize('nant, nscan, nspw', [(12, 20, 2), (16, 30, 3)])
+def test_incremental_matches_iter_datatask(nant, nscan, nspw):
+    """Test updating the views in place against re-running the data task on each iteration."""
+    result, synthetic, niter = _run_flagger(nant, nscan, nspw, incremental=False)
+    incremental_result, incremental_synthetic, _ = _run_flagger(nant, nscan, nspw, incremental=True)
+
+    # several iterations were needed, but the data were read only once
+    assert niter > 2
+    assert synthetic.data_reads == niter
+    assert incremental_synthetic.data_reads == 1
+
+    _assert_flagging_equal(incremental_result, incremental_synthetic, result, synthetic)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('nant, nscan, nspw', [(12, 20, 2), (43, 60, 8)])
+def test_incremental_benchmark(nant, nscan, nspw):
+    """Benchmark updating the views in place against re-running the data task on each iteration."""
+    t0 = time.perf_counter()
+    result, synthetic, niter = _run_flagger(nant, nscan, nspw, incremental=False)
+    t_iter_datatask = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    incremental_result, incremental_synthetic, _ = _run_flagger(nant, nscan, nspw, incremental=True)
+    t_incremental = time.perf_counter() - t0
+    LOG.info('Flagging %d antennas, %d scans and %d spws in %d iterations: iter_datatask %.3f s with %d data task '
+             'runs, incremental %.3f s with %d data task runs', nant, nscan, nspw, niter, t_iter_datatask,
+             synthetic.data_reads, t_incremental, incremental_synthetic.data_reads)
+
+    _assert_flagging_equal(incremental_result, incremental_synthetic, result, synthetic)
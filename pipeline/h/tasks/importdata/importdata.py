@@ -314,7 +314,7 @@ class ImportData(basetask.StandardTaskTemplate):
 
         rel_to_import = [os.path.relpath(f, abs_output_dir) for f in to_import]
 
-        observing_run = ms_reader.get_observing_run(rel_to_import)
+        observing_run = ms_reader.get_observing_run(rel_to_import, cache_dir=inputs.context.metadata_cache_dir)
         available_data_types = [v.name for v in DataType]
         short_data_types = list(set([v.replace('_ALL', '').replace('_SCIENCE', '')
                                      for v in available_data_types
@@ -7,7 +7,7 @@ import pipeline.infrastructure.logging as logging
 import pipeline.infrastructure.pipelineqa as pqa
 import pipeline.infrastructure.utils as utils
 import pipeline.qa.scorecalculator as qacalc
-from pipeline.infrastructure import casa_tasks, casa_tools
+from pipeline.infrastructure import casa_tools
 from . import importdata
 from ..exportdata import aqua
 
@@ -120,10 +120,9 @@ class ImportDataQAHandler(pqa.QAPlugin):
         for ms in mses:
             bad_scans = collections.defaultdict(list)
 
-            # inspect each MS with flagdata, capturing the dictionary
-            # describing the number of flagged rows
-            flagdata_task = casa_tasks.flagdata(vis=ms.name, mode='summary')
-            flagdata_result = flagdata_task.execute()
+            # retrieve the dictionary describing the number of flagged
+            # visibilities
+            flagdata_result = utils.get_flag_summary(ms.name)
 
             for intent in calibrator_intents:
                 # collect scans with the calibrator intent
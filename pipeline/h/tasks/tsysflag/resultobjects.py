@@ -70,6 +70,11 @@ class TsysflagspectraResults(resultobjects.TsyscalResults,
         resultobjects.TsyscalResults.__init__(self, final, pool, preceding)
         flaggableviewresults.FlaggableViewResults.__init__(self)
 
+        # time spent on evaluating the flagging metric, and on the flagging
+        # views of each spw, in seconds
+        self.metric_time: float = 0.0
+        self.spw_times: dict[int, float] = {}
+
     def merge_with_context(self, context):
         # do nothing, the tsys cal files should already be in the context
         # and we don't want to insert them twice.
@@ -1,7 +1,10 @@
 import collections
+import copy
 import os
 import re
 import string
+import time
+
 import numpy as np
 
 from casatasks.private import flaghelper
@@ -9,6 +12,7 @@ from casatasks.private import flaghelper
 import pipeline.infrastructure as infrastructure
 import pipeline.infrastructure.basetask as basetask
 import pipeline.infrastructure.callibrary as callibrary
+import pipeline.infrastructure.mpihelpers as mpihelpers
 import pipeline.infrastructure.utils as utils
 import pipeline.infrastructure.vdp as vdp
 from pipeline.h.heuristics.tsysnormalize import tsysNormalize
@@ -67,6 +71,22 @@ def _read_tsystemplate(filename, vis):
     return flagcmds
 
 
+def _calculate_spw_views_task(viewtask, tsystable, tsys_spw_id, intent_to_field_ids):
+    """
+    Calculates the flagging views of a TsysflagView for a single Tsys spw,
+    for evaluation on a TaskQueue worker.
+
+    Returns:
+    Tuple containing the TsysflagViewResults with the views for this spw, and
+    the time spent on calculating them in seconds.
+    """
+    t0 = time.perf_counter()
+    viewtask = copy.copy(viewtask)
+    viewtask.result = TsysflagViewResults()
+    viewtask.calculate_spw_views(tsystable, tsys_spw_id, intent_to_field_ids)
+    return viewtask.result, time.perf_counter() - t0
+
+
 class TsysflagInputs(vdp.StandardInputs):
     """
     TsysflagInputs defines the inputs for the Tsysflag pipeline task.
@@ -109,6 +129,7 @@ class TsysflagInputs(vdp.StandardInputs):
     fnm_limit = vdp.VisDependentProperty(default=2.0)
     metric_order = vdp.VisDependentProperty(default='nmedian, derivative, edgechans, fieldshape, birdies, toomany')
     normalize_tsys = vdp.VisDependentProperty(default=False)
+    parallel_spws = vdp.VisDependentProperty(default=False)
     tmf1_limit = vdp.VisDependentProperty(default=0.666)
     tmef1_limit = vdp.VisDependentProperty(default=0.666)
 
@@ -119,7 +140,7 @@ class TsysflagInputs(vdp.StandardInputs):
                  flag_fieldshape=None, ff_refintent=None, ff_max_limit=None,
                  flag_birdies=None, fb_sharps_limit=None,
                  flag_toomany=None, tmf1_limit=None, tmef1_limit=None,
-                 metric_order=None, normalize_tsys=None, filetemplate=None):
+                 metric_order=None, normalize_tsys=None, filetemplate=None, parallel_spws=None):
         super().__init__()
 
         # pipeline inputs
@@ -154,6 +175,11 @@ class TsysflagInputs(vdp.StandardInputs):
         self.tmef1_limit = tmef1_limit
         self.metric_order = metric_order
 
+        # calculate the flagging views of the spws concurrently; separate
+        # from the session-level 'parallel' input of the derived tasks, to
+        # avoid nesting per-spw tasks in the per-MS ones
+        self.parallel_spws = parallel_spws
+
 
 @task_registry.set_equivalent_casa_task('h_tsysflag')
 @task_registry.set_casa_commands_comment('The Tsys calibration and spectral window map is computed.')
@@ -292,8 +318,10 @@ class Tsysflag(basetask.StandardTaskTemplate):
 
             # Create the translation between scan times (which enumerate scans) and field names.
             tsystable = caltableaccess.CalibrationTableDataFiller.getcal(self.inputs.caltable)
-            scan_time_to_field_names: dict[float, str] = {row.get('TIME'): field_id_to_name[row.get('FIELD_ID')]
-                                                          for row in tsystable.rows}
+            scan_time_to_field_names: dict[float, str] = {
+                time: field_id_to_name[field_id]
+                for time, field_id in zip(tsystable.get_column('TIME'), tsystable.get_column('FIELD_ID'))
+            }
 
             # Identify antennas that are fully flagged in all scans in any combination of field/intent/spw.
             fully_flagged_antennas = identify_fully_flagged_antennas_from_flagview(
@@ -397,7 +425,7 @@ class Tsysflag(basetask.StandardTaskTemplate):
 
         return stats_before, stats_after
 
-    def _run_flagging_heuristics(self, tsystable):
+    def _run_flagging_heuristics(self, caltable_to_assess):
         inputs = self.inputs
 
         # Initialize output.
@@ -447,13 +475,22 @@ class Tsysflag(basetask.StandardTaskTemplate):
             if metrics_from_inputs[metric]:
                 ordered_list_metrics_to_evaluate.append(metric)
 
-        # Run flagger for each metric.
+        # Load the tsys caltable to assess once, to be shared by the flagging
+        # views of all metrics; only the flags are re-read between metrics.
+        tsystable = caltableaccess.CalibrationTableDataFiller.getcal(caltable_to_assess)
+        parallel = mpihelpers.parse_parallel_input_parameter(inputs.parallel_spws)
+
+        # Run flagger for each metric. The metrics are evaluated in the
+        # requested order, as each metric is evaluated on the flags raised by
+        # the preceding metrics.
         for metric in ordered_list_metrics_to_evaluate:
-            results[metric] = self._run_flagger(metric, tsystable)
+            results[metric] = self._run_flagger(metric, caltable_to_assess, tsystable, parallel)
+            LOG.info('{} - flag {} took {:.1f} s'.format(os.path.basename(caltable_to_assess), metric,
+                                                         results[metric].metric_time))
 
         return results, ordered_list_metrics_to_evaluate, errmsg
 
-    def _run_flagger(self, metric, caltable_to_assess):
+    def _run_flagger(self, metric, caltable_to_assess, tsystable=None, parallel=False):
         """
         Evaluates the Tsys spectra for a specified flagging metric.
 
@@ -463,21 +500,29 @@ class Tsysflag(basetask.StandardTaskTemplate):
                        'fieldshape', 'birdies', 'toomany'.
         caltable_to_assess -- string : represents the caltable that is to
                               used for assessing required flagging.
+        tsystable   -- ColumnarCalibrationTableData : the loaded caltable to
+                       assess, shared between metrics. If not set, the
+                       caltable is loaded for this metric.
+        parallel    -- bool : if True, calculate the flagging views of the
+                       spws concurrently.
 
         Returns:
         TsysflagspectraResults object containing the flagging views and flagging
-        results for the requested metric.
+        results for the requested metric, and the time spent on the metric
+        and on the views of each spw.
         """
 
         LOG.info('flag '+metric)
         inputs = self.inputs
+        t0 = time.perf_counter()
 
         # Initialize results object
         result = TsysflagspectraResults()
         result.view_by_field = False
 
-        # Load the tsys caltable to assess.
-        tsystable = caltableaccess.CalibrationTableDataFiller.getcal(caltable_to_assess)
+        # Load the tsys caltable to assess, if not loaded yet.
+        if tsystable is None:
+            tsystable = caltableaccess.CalibrationTableDataFiller.getcal(caltable_to_assess)
 
         # Store the vis from the tsystable in the result
         result.vis = tsystable.vis
@@ -508,15 +553,18 @@ class Tsysflag(basetask.StandardTaskTemplate):
         if metric == 'fieldshape':
             viewtask = TsysflagView(context=inputs.context, vis=inputs.vis,
                                     metric=metric,
-                                    refintent=inputs.ff_refintent)
+                                    refintent=inputs.ff_refintent,
+                                    tsystable=tsystable, parallel=parallel)
         elif metric == 'nmedian':
             viewtask = TsysflagView(context=inputs.context, vis=inputs.vis,
                                     metric=metric,
-                                    split_by_field=inputs.fnm_byfield)
+                                    split_by_field=inputs.fnm_byfield,
+                                    tsystable=tsystable, parallel=parallel)
             result.view_by_field = inputs.fnm_byfield
         else:
             viewtask = TsysflagView(context=inputs.context, vis=inputs.vis,
-                                    metric=metric)
+                                    metric=metric,
+                                    tsystable=tsystable, parallel=parallel)
 
         # Construct the task that will set any flags raised in the
         # underlying data.
@@ -585,6 +633,11 @@ class Tsysflag(basetask.StandardTaskTemplate):
         # Copy flagging summaries to final result.
         result.summaries = flaggerresult.summaries
 
+        # Store the time spent on this metric, and on the flagging views of
+        # each spw, summed over the views before and after flagging.
+        result.metric_time = time.perf_counter() - t0
+        result.spw_times = dict(viewtask.spw_times)
+
         return result
 
     @staticmethod
@@ -597,11 +650,11 @@ class Tsysflag(basetask.StandardTaskTemplate):
         """
         allflags = []
 
-        # Open table, step through each row, store whether the spectrum for
-        # any polarisation (axis=1) was fully flagged.
+        # Open table, step through the flags of each row, store whether the
+        # spectrum for any polarisation (axis=1) was fully flagged.
         table = caltableaccess.CalibrationTableDataFiller.getcal(caltable)
-        for row in table.rows:
-            allflags.append(np.any(np.all(row.get('FLAG'), axis=1)))
+        for flag in table.get_row_values('FLAG'):
+            allflags.append(np.any(np.all(flag, axis=1)))
 
         # Count fully flagged spectra, raise warning if there were any.
         nflagged = allflags.count(True)
@@ -645,7 +698,7 @@ class TsysflagData(basetask.StandardTaskTemplate):
 class TsysflagView:
 
     def __init__(self, context, vis=None, metric=None, refintent=None,
-                 split_by_field=False):
+                 split_by_field=False, tsystable=None, parallel=False):
         """
         Creates an TsysflagView instance for specified metric.
 
@@ -670,12 +723,22 @@ class TsysflagView:
                           other data will be compared, in some views.
         split_by_field -- if True and if the 'metric' supports it, then create
                           separate flagging views for each field.
+        tsystable      -- ColumnarCalibrationTableData of the tsys caltable,
+                          if already loaded. Its flags are re-read for each
+                          calculation of the views.
+        parallel       -- if True, calculate the views of the spws
+                          concurrently on the TaskQueue workers.
         """
         self.context = context
         self.vis = vis
         self.metric = metric
         self.refintent = refintent
         self.split_by_field = split_by_field
+        self.tsystable = tsystable
+        self.parallel = parallel
+
+        # time spent on the views of each spw, in seconds
+        self.spw_times = collections.defaultdict(float)
 
         # Set intents-of-interest based on flagging metric:
         #  - for all metrics, always include ATMOSPHERE
@@ -706,6 +769,15 @@ class TsysflagView:
 
         return self.result
 
+    def __getstate__(self):
+        # The views of a spw are calculated from the MS and the caltable rows
+        # of that spw, so neither the context nor the full caltable are
+        # shipped to TaskQueue workers.
+        state = self.__dict__.copy()
+        state['context'] = None
+        state['tsystable'] = None
+        return state
+
     @staticmethod
     def intent_ids(intent, ms):
         """
@@ -756,8 +828,14 @@ class TsysflagView:
                      caltable.
         """
 
-        # Load the tsystable from file into memory, store vis in result
-        tsystable = caltableaccess.CalibrationTableDataFiller.getcal(table)
+        # Load the tsystable from file into memory, or re-read the flags of
+        # the loaded tsystable as these may have been updated since the last
+        # calculation. Store vis in result.
+        if self.tsystable is None:
+            tsystable = caltableaccess.CalibrationTableDataFiller.getcal(table)
+        else:
+            tsystable = self.tsystable
+            tsystable.reload('FLAG')
         self.result.vis = tsystable.vis
 
         # Get the MS object from the context
@@ -765,7 +843,7 @@ class TsysflagView:
         self.ms = ms
 
         # Get the spws from the tsystable.
-        tsysspws = {row.get('SPECTRAL_WINDOW_ID') for row in tsystable.rows}
+        tsysspws = set(tsystable.get_column('SPECTRAL_WINDOW_ID'))
 
         # Get the Tsys spw map by retrieving it from the first tsys CalFrom
         # that is present in the callibrary. We need to know the Tsys mapping
@@ -805,29 +883,62 @@ class TsysflagView:
 
         # Compute the flagging view for every spw and every intent
         LOG.info('Computing flagging metrics for caltable {}'.format(table))
-        for tsys_spw_id, intent_to_field_ids in tsys_spw_to_intent_to_field_ids.items():
-            for intent, field_ids in intent_to_field_ids.items():
-                # Warn if no fields were found for this Tsys spw and intent.
-                if not field_ids:
-                    LOG.warning("{} - no valid fields found for Tsys spw {} and intent {}, unable to create"
-                                " corresponding flagging views.".format(ms.basename, tsys_spw_id, intent))
+        parallel = self.parallel and len(tsys_spw_to_intent_to_field_ids) > 1
+        if parallel:
+            # The views of each spw are independent: calculate these on the
+            # TaskQueue workers, each from the caltable rows of its spw, and
+            # merge the views in spw order.
+            with mpihelpers.TaskQueue(parallel=parallel) as tq:
+                for tsys_spw_id, intent_to_field_ids in tsys_spw_to_intent_to_field_ids.items():
+                    spw_table = tsystable.subset(tsystable.select(spw=tsys_spw_id))
+                    tq.add_functioncall(_calculate_spw_views_task, self, spw_table, tsys_spw_id,
+                                        intent_to_field_ids, use_pickle=True)
+            for tsys_spw_id, (spw_result, elapsed) in zip(tsys_spw_to_intent_to_field_ids, tq.get_results()):
+                self.result.importfrom(spw_result)
+                self.spw_times[int(tsys_spw_id)] += elapsed
+        else:
+            for tsys_spw_id, intent_to_field_ids in tsys_spw_to_intent_to_field_ids.items():
+                t0 = time.perf_counter()
+                self.calculate_spw_views(tsystable, tsys_spw_id, intent_to_field_ids)
+                self.spw_times[int(tsys_spw_id)] += time.perf_counter() - t0
 
-                # Otherwise, continue with calculating the flagging view.
-                elif self.metric in ['nmedian', 'toomany']:
-                    self.calculate_median_spectra_view(tsystable, tsys_spw_id, intent, field_ids,
-                                                       split_by_field=self.split_by_field)
+    def calculate_spw_views(self, tsystable, tsys_spw_id, intent_to_field_ids):
+        """
+        Calculates the flagging views of a single Tsys spw for each intent,
+        based on metric that TsysflagView was initialized with.
 
-                elif self.metric == 'derivative':
-                    self.calculate_derivative_view(tsystable, tsys_spw_id, intent, field_ids)
+        Results are added to self.result.
 
-                elif self.metric == 'fieldshape':
-                    self.calculate_fieldshape_view(tsystable, tsys_spw_id, intent, field_ids, self.refintent)
+        Keyword arguments:
+        tsystable           -- CalibrationTableData object giving access to
+                               the tsys caltable.
+        tsys_spw_id         -- views will be calculated using data for this
+                               Tsys spw id.
+        intent_to_field_ids -- dictionary of intent to the field ids to use
+                               for the view of that intent.
+        """
+        for intent, field_ids in intent_to_field_ids.items():
+            # Warn if no fields were found for this Tsys spw and intent.
+            if not field_ids:
+                LOG.warning("{} - no valid fields found for Tsys spw {} and intent {}, unable to create"
+                            " corresponding flagging views.".format(self.ms.basename, tsys_spw_id, intent))
+
+            # Otherwise, continue with calculating the flagging view.
+            elif self.metric in ['nmedian', 'toomany']:
+                self.calculate_median_spectra_view(tsystable, tsys_spw_id, intent, field_ids,
+                                                   split_by_field=self.split_by_field)
+
+            elif self.metric == 'derivative':
+                self.calculate_derivative_view(tsystable, tsys_spw_id, intent, field_ids)
 
-                elif self.metric == 'birdies':
-                    self.calculate_antenna_diff_channel_view(tsystable, tsys_spw_id, intent, field_ids)
+            elif self.metric == 'fieldshape':
+                self.calculate_fieldshape_view(tsystable, tsys_spw_id, intent, field_ids, self.refintent)
 
-                elif self.metric == 'edgechans':
-                    self.calculate_median_channel_view(tsystable, tsys_spw_id, intent, field_ids)
+            elif self.metric == 'birdies':
+                self.calculate_antenna_diff_channel_view(tsystable, tsys_spw_id, intent, field_ids)
+
+            elif self.metric == 'edgechans':
+                self.calculate_median_channel_view(tsystable, tsys_spw_id, intent, field_ids)
 
     @staticmethod
     def get_tsystable_data(tsystable, spwid, fieldids, antenna_names,
@@ -865,24 +976,21 @@ class TsysflagView:
         # Select rows from tsystable that match the specified spw and fields,
         # store a Tsys spectrum for each polarisation in the tsysspectra results
         # and store the corresponding time.
-        for row in tsystable.rows:
-            if row.get('SPECTRAL_WINDOW_ID') == spwid and \
-              row.get('FIELD_ID') in fieldids:
-
-                for pol in range(len(corr_type)):
-                    tsysspectrum = commonresultobjects.SpectrumResult(
-                        data=row.get('FPARAM')[pol, :, 0],
-                        flag=row.get('FLAG')[pol, :, 0],
-                        datatype=datatype, filename=tsystable.name,
-                        field_id=row.get('FIELD_ID'),
-                        spw=row.get('SPECTRAL_WINDOW_ID'),
-                        ant=(row.get('ANTENNA1'), antenna_names[row.get('ANTENNA1')]),
-                        units='K',
-                        pol=corr_type[pol][0],
-                        time=row.get('TIME'), normalise=normalise)
-
-                    tsysspectra[pol].addview(tsysspectrum.description, tsysspectrum)
-                    times.update([row.get('TIME')])
+        for row in tsystable.get_rows(tsystable.select(spw=spwid, field=fieldids)):
+            for pol in range(len(corr_type)):
+                tsysspectrum = commonresultobjects.SpectrumResult(
+                    data=row.get('FPARAM')[pol, :, 0],
+                    flag=row.get('FLAG')[pol, :, 0],
+                    datatype=datatype, filename=tsystable.name,
+                    field_id=row.get('FIELD_ID'),
+                    spw=row.get('SPECTRAL_WINDOW_ID'),
+                    ant=(row.get('ANTENNA1'), antenna_names[row.get('ANTENNA1')]),
+                    units='K',
+                    pol=corr_type[pol][0],
+                    time=row.get('TIME'), normalise=normalise)
+
+                tsysspectra[pol].addview(tsysspectrum.description, tsysspectrum)
+                times.update([row.get('TIME')])
 
         return tsysspectra, times
 
@@ -0,0 +1,45 @@
+"""Tests for the parallel_spws input of the Tsys flagging tasks."""
+import inspect
+from unittest.mock import Mock
+
+import pytest
+
+from pipeline.hifa.cli.hifa_tsysflag import hifa_tsysflag
+from pipeline.hifa.tasks.tsysflag import tsysflag as hifa_tsysflag_task
+from pipeline.hsd.cli.hsd_tsysflag import hsd_tsysflag
+from pipeline.hsd.tasks.tsysflag import tsysflag as hsd_tsysflag_task
+from pipeline.infrastructure import argmapper
+from pipeline.infrastructure.launcher import Context
+
+TASKS = [hifa_tsysflag_task, hsd_tsysflag_task]
+
+
+@pytest.mark.parametrize('task_module', TASKS)
+def test_parallel_spws_default_resolves_to_false(task_module):
+    """Test that the per-spw flagging views are off by default."""
+    inputs = task_module.TsysflagInputs(context=Mock(spec=Context), vis=None)
+    assert inputs.parallel_spws is False
+
+
+@pytest.mark.parametrize('task_module', TASKS)
+@pytest.mark.parametrize('value', [True, False])
+def test_parallel_spws_set_through_inputs(task_module, value):
+    """Test that the derived Inputs pass parallel_spws on to the h-level Inputs, separate from parallel."""
+    inputs = task_module.TsysflagInputs(context=Mock(spec=Context), vis=None, parallel_spws=value, parallel=False)
+    assert inputs.parallel_spws is value
+    assert inputs.parallel is False
+
+
+@pytest.mark.parametrize('cli_task', [hifa_tsysflag, hsd_tsysflag])
+def test_cli_signature_includes_parallel_spws(cli_task):
+    """Test whether parallel_spws is included in the CLI function signature."""
+    params = inspect.signature(cli_task).parameters
+    assert 'parallel_spws' in params
+    assert params['parallel_spws'].default is None
+
+
+@pytest.mark.parametrize('task_cls', [hifa_tsysflag_task.Tsysflag, hsd_tsysflag_task.SerialTsysflag])
+def test_argmapper_preserves_parallel_spws(task_cls):
+    """Test whether the CLI-to-inputs mapper accepts and preserves parallel_spws."""
+    converted = argmapper.convert_args(task_cls, {'parallel_spws': True})
+    assert converted['parallel_spws'] is True
@@ -12,6 +12,7 @@ import time
 from typing import Any
 
 import numpy as np
+import scipy.sparse
 
 import pipeline.infrastructure as infrastructure
 import pipeline.infrastructure.mpihelpers as mpihelpers
@@ -143,6 +144,8 @@ GridPrecompute = tuple
 _PB_IMAGE_CACHE: dict[tuple[int, int, float, float, float], tuple[np.ndarray, np.ndarray]] = {}
 _EPHEM_RADVEL_CACHE: dict[tuple[str, int], tuple[str, np.ndarray, np.ndarray]] = {}
 _PROFILE_DEFAULT_DIR: str | None = None
+# Peak memory budget for gridding and transforming one block of cube channels.
+_CUBE_BLOCK_MAX_BYTES = 32 * 1024 * 1024
 
 
 def _get_tb() -> Any:
@@ -1256,6 +1259,64 @@ def _image_from_vis_precomputed(
     return np.real(img)
 
 
+def _image_cube_from_vis_precomputed(
+    vis: np.ndarray,
+    npix: int,
+    idx: np.ndarray,
+    w: np.ndarray,
+    inb: np.ndarray,
+    idx2: np.ndarray,
+    w2: np.ndarray,
+    inb2: np.ndarray,
+    max_block_bytes: int = _CUBE_BLOCK_MAX_BYTES,
+) -> tuple[np.ndarray, float, float]:
+    '''Grid and image all channels of (row, chan) visibilities in channel blocks, returning the cube and timings.
+
+    The gridding is one precomputed sparse (cell, visibility) weight matrix,
+    with the input ifftshift folded into its cell indices, applied to a
+    whole block of channels at once. Each block is transformed with one
+    multi-axis FFT. Points accumulate in the same order as in
+    _image_from_vis_precomputed, so the cube matches the per-channel images
+    exactly. The block size keeps the gridding inputs and the FFT work
+    arrays of a block within max_block_bytes.
+    '''
+    nchan = int(vis.shape[1])
+    npix = int(npix)
+    npix2 = npix * npix
+    half = npix // 2
+    cube = np.zeros((nchan, npix, npix), dtype=np.float32)
+    # conjugate points follow the direct points, as in the per-channel path
+    cell_y, cell_x = np.divmod(np.concatenate((idx, idx2)), npix)
+    shifted_cell = ((cell_y + half) % npix) * npix + (cell_x + half) % npix
+    rows = np.concatenate((np.flatnonzero(inb), np.flatnonzero(inb2)))
+    ndirect = int(np.count_nonzero(inb))
+    nvis = int(rows.size)
+    gridder = scipy.sparse.csr_matrix(
+        (np.concatenate((w, w2)).astype(np.complex128), (shifted_cell, np.arange(nvis))), shape=(npix2, nvis)
+    )
+    # gridding inputs and their temporaries per visibility, and FFT work planes per pixel
+    bytes_per_chan = 48 * nvis + 80 * npix2
+    nblock = int(max(1, min(nchan, max_block_bytes // max(bytes_per_chan, 1))))
+    t_grid = 0.0
+    t_fft = 0.0
+    for c0 in range(0, nchan, nblock):
+        c1 = min(nchan, c0 + nblock)
+        t0 = time.perf_counter()
+        block = vis[rows, c0:c1].astype(np.complex128)
+        np.conjugate(block[ndirect:], out=block[ndirect:])
+        # (y, x, chan) planes: the FFT runs over the leading axes
+        grid = (gridder @ block).reshape((npix, npix, c1 - c0))
+        del block
+        t_grid += time.perf_counter() - t0
+        t1 = time.perf_counter()
+        img = np.fft.ifft2(grid, axes=(0, 1))
+        del grid
+        # output fftshift, then the astro display convention: RA increases to the left, Dec increases upward
+        cube[c0:c1] = np.roll(np.moveaxis(img.real, 2, 0)[:, ::-1, ::-1], (-half, -half), axis=(1, 2))
+        t_fft += time.perf_counter() - t1
+    return cube, t_grid, t_fft
+
+
 def _compute_cube_products(
     cube: np.ndarray,
     ref_sigma: float = 3.0,
@@ -1280,9 +1341,8 @@ def _compute_cube_products(
         mask2d = None
     cube_use = cube.reshape(nchan, -1) if mask2d is None else cube[:, mask2d]
     t_sigma = time.perf_counter()
-    for ch in range(nchan):
-        sig = _robust_sigma(cube_use[ch])
-        sigmas[ch] = sig if np.isfinite(sig) and sig > 0 else 0.0
+    sigmas = _robust_sigmas(cube_use)
+    sigmas[~(np.isfinite(sigmas) & (sigmas > 0))] = 0.0
     dt_sigma = time.perf_counter() - t_sigma
 
     t_ref = time.perf_counter()
@@ -1697,6 +1757,117 @@ def _robust_sigma(img: np.ndarray) -> float:
     return float(sig)
 
 
+def _sorted_quantiles(sorted_rows: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    '''Return the quantile q of the first counts[i] values of each ascending row, as np.quantile computes it.'''
+    virtual = (counts - 1) * q
+    prev = np.floor(virtual).astype(np.int64)
+    nxt = np.minimum(prev + 1, counts - 1)
+    rows = np.arange(sorted_rows.shape[0])
+    a = sorted_rows[rows, prev]
+    b = sorted_rows[rows, nxt]
+    gamma = virtual - prev
+    diff = b - a
+    return np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+
+
+def _sorted_medians(sorted_rows: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    '''Return the median of the first counts[i] values of each ascending row, as np.median computes it.'''
+    rows = np.arange(sorted_rows.shape[0])
+    upper = sorted_rows[rows, counts // 2]
+    lower = sorted_rows[rows, np.maximum(counts - 1, 0) // 2]
+    return np.where(counts % 2 == 1, upper, (lower + upper) / 2)
+
+
+def _adaptive_noise_sigmas(
+    x: np.ndarray,
+    clip_sigma: float = 5.0,
+    n_iter: int = 4,
+    dilate_width: int = 5,
+    k_exceed: float = 4.0,
+) -> np.ndarray:
+    '''Return the adaptive robust sigma of _adaptive_noise_stats for each row of a finite 2D array at once.'''
+    x = np.asarray(x, dtype=np.float64)
+    nrow, ncol = x.shape
+    if ncol == 0:
+        return np.full(nrow, np.nan)
+
+    def _masked_sorted(vals: np.ndarray, mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return np.sort(np.where(mask, vals, np.inf), axis=1), np.maximum(np.count_nonzero(mask, axis=1), 1)
+
+    def _sigmas(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        srt, counts = _masked_sorted(x, mask)
+        c = _sorted_medians(srt, counts)
+        r = srt - c[:, None]
+        neg_tail = -_sorted_quantiles(r, counts, 16.0 / 100)
+        pos_tail = _sorted_quantiles(r, counts, 84.0 / 100)
+        mad = _sorted_medians(*_masked_sorted(np.abs(x - c[:, None]), mask))
+        sig = np.where(emission, neg_tail, np.where(absorption, pos_tail, 1.4826 * mad))
+        return c, sig
+
+    # tail metrics of the unclipped rows determine the clipping regime
+    srt = np.sort(x, axis=1)
+    counts = np.full(nrow, ncol)
+    c0 = _sorted_medians(srt, counts)
+    r0 = srt - c0[:, None]
+    q01, q25, q50, q75, q99 = (_sorted_quantiles(r0, counts, q / 100) for q in (1.0, 25.0, 50.0, 75.0, 99.0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iqr = q75 - q25
+        asym = np.where(q99 - q01 != 0, (q99 + q01) / (q99 - q01), np.nan)
+        hpos = np.where(iqr > 0, q99 / iqr, np.nan)
+        hneg = np.where(iqr > 0, -q01 / iqr, np.nan)
+        sig_mad0 = 1.4826 * _sorted_medians(np.sort(np.abs(x - c0[:, None]), axis=1), counts)
+        valid0 = np.isfinite(sig_mad0) & (sig_mad0 > 0)
+        p_pos = np.where(valid0, np.mean((x - c0[:, None]) > float(k_exceed) * sig_mad0[:, None], axis=1), np.nan)
+        p_neg = np.where(valid0, np.mean((x - c0[:, None]) < -float(k_exceed) * sig_mad0[:, None], axis=1), np.nan)
+    metrics_ok = np.isfinite(hpos) & np.isfinite(hneg) & np.isfinite(asym) & np.isfinite(p_pos) & np.isfinite(p_neg)
+    noise = metrics_ok & (hpos < 2.2) & (hneg < 2.2) & (np.abs(asym) < 0.2) & (p_pos < 0.01) & (p_neg < 0.01)
+    emission = metrics_ok & ~noise & ((hpos > 3.0) | (p_pos > 0.02) | (asym > 0.3)) & (hneg < 2.5)
+    absorption = metrics_ok & ~noise & ~emission & ((hneg > 3.0) | (p_neg > 0.02) | (asym < -0.3)) & (hpos < 2.5)
+
+    width = int(max(dilate_width, 1))
+    offset = (width - 1) // 2
+    mask = np.ones(x.shape, dtype=bool)
+    active = np.ones(nrow, dtype=bool)
+    for _ in range(int(max(n_iter, 1))):
+        active &= np.any(mask, axis=1)
+        if not np.any(active):
+            break
+        c, sig = _sigmas(mask)
+        active &= np.isfinite(sig) & (sig > 0)
+        d = x - c[:, None]
+        limit = clip_sigma * sig[:, None]
+        excl = np.where(emission[:, None], d > limit, np.where(absorption[:, None], d < -limit, np.abs(d) > limit))
+        # dilate the exclusions as np.convolve(excl, ones(width), mode='same') > 0 does
+        dilated = np.zeros_like(excl)
+        for k in range(width):
+            shift = offset - k
+            if shift >= 0:
+                dilated[:, :ncol - shift] |= excl[:, shift:]
+            else:
+                dilated[:, -shift:] |= excl[:, :ncol + shift]
+        mask[active] &= ~dilated[active]
+
+    _, sig = _sigmas(mask)
+    return np.where(np.any(mask, axis=1) & np.isfinite(sig) & (sig > 0), sig, np.nan)
+
+
+def _robust_sigmas(rows: np.ndarray) -> np.ndarray:
+    '''Return _robust_sigma for each row of a 2D array, evaluating rows without non-finite pixels as one batch.'''
+    rows = np.asarray(rows)
+    sigmas = np.zeros((rows.shape[0],), dtype=np.float64)
+    if rows.shape[1] == 0:
+        return sigmas
+    finite_rows = np.all(np.isfinite(rows), axis=1)
+    max_sample = 4096
+    step = int(np.ceil(rows.shape[1] / float(max_sample))) if rows.shape[1] > max_sample else 1
+    if np.any(finite_rows):
+        batch = _adaptive_noise_sigmas(rows[finite_rows][:, ::step], dilate_width=2)
+        sigmas[finite_rows] = np.where(np.isfinite(batch) & (batch > 0), batch, 0.0)
+    for row in np.flatnonzero(~finite_rows):
+        sigmas[row] = _robust_sigma(rows[row])
+    return sigmas
+
+
 def _compute_reference_spectrum(
     cube: np.ndarray,
     sig_k: np.ndarray,
@@ -1883,6 +2054,7 @@ def cube_threshold_spectrum(
     cell_arcsec_override: float | None = None,
     return_cube: bool = False,
     log_dir: str | None = None,
+    max_block_bytes: int = _CUBE_BLOCK_MAX_BYTES,
 ) -> dict[str, Any]:
     '''Generate a cube and spectra using preloaded visibilities.'''
     if preloaded is None:
@@ -1938,14 +2110,11 @@ def cube_threshold_spectrum(
             )
 
     t_makecube = time.perf_counter()
-    cube = np.zeros((nchan, npix, npix), dtype=np.float32)
-    for ch in range(nchan):
-        img, _, _ = _image_from_vis_precomputed(
-            v[:, ch], npix, idx, w, inb, idx2, w2, inb2, return_timing=True
-        )
-        cube[ch] = img.astype(np.float32, copy=False)
+    cube, dt_grid, dt_fft = _image_cube_from_vis_precomputed(
+        v, npix, idx, w, inb, idx2, w2, inb2, max_block_bytes=max_block_bytes
+    )
     dt_makecube = time.perf_counter() - t_makecube
-    _profile_logf(log_dir, 'cube_threshold_spectrum makecube spw=%s field=%s nchan=%s dt=%.3f', str(spw_name), str(field), nchan, dt_makecube)
+    _profile_logf(log_dir, 'cube_threshold_spectrum makecube spw=%s field=%s nchan=%s grid=%.3f fft=%.3f dt=%.3f', str(spw_name), str(field), nchan, dt_grid, dt_fft, dt_makecube)
 
     if save_cube_path is not None:
         np.save(save_cube_path, cube)
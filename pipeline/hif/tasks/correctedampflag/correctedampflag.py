@@ -3,6 +3,7 @@ from __future__ import annotations
 import collections
 import copy
 import os
+import time
 from statistics import mode
 from typing import TYPE_CHECKING
 
@@ -10,6 +11,7 @@ import numpy as np
 
 import pipeline.infrastructure as infrastructure
 import pipeline.infrastructure.basetask as basetask
+import pipeline.infrastructure.mpihelpers as mpihelpers
 import pipeline.infrastructure.utils as utils
 import pipeline.infrastructure.vdp as vdp
 from pipeline.domain import DataType
@@ -412,6 +414,72 @@ def _propagate_phase_flags(flags: list[FlagCmd], ms: MeasurementSet, antenna_id_
     return flags
 
 
+# Snapshot of the task inputs used by the flagging heuristics, which unlike
+# the inputs themselves can be shipped to TaskQueue workers.
+HeuristicParameters = collections.namedtuple(
+    'HeuristicParameters',
+    'antnegsig antpossig tmantint tmint tmbl antblnegsig antblpossig relaxed_factor examineCrossPolSum'
+)
+
+
+def _evaluate_heuristic_for_baseline_set_task(params: HeuristicParameters, ms: MeasurementSet, intent: str, field: str,
+                                              spwid: int, antenna_id_to_name: dict,
+                                              baseline_set: tuple[str, str] | None = None) -> list[FlagCmd]:
+    """
+    Evaluate the flagging heuristics for one intent, field, spw and baseline
+    set, reading the data through its own MS tool. This is the function
+    distributed to the TaskQueue workers in parallel mode.
+    """
+    return Correctedampflag._evaluate_baseline_set(params, ms, intent, field, spwid, antenna_id_to_name, baseline_set)
+
+
+def _count_outliers_per_timestamp(ant1: NDArray, ant2: NDArray, time: NDArray, timestamps: NDArray,
+                                  nants: int) -> tuple[NDArray, NDArray]:
+    """
+    Count in one pass how many outlier baselines each antenna is part of in
+    each timestamp.
+
+    :param ant1: first antenna of each outlier
+    :param ant2: second antenna of each outlier
+    :param time: timestamp of each outlier
+    :param timestamps: sorted unique timestamps of the outliers
+    :param nants: number of antennas
+    :return: (timestamp, antenna) outlier counts, and number of outliers per
+        timestamp
+    """
+    ntime = len(timestamps)
+    nbins = max(nants, int(max(np.max(ant1), np.max(ant2))) + 1) if len(ant1) else nants
+    time_idx = np.searchsorted(timestamps, time)
+    ant_counts = np.bincount(np.concatenate([time_idx * nbins + ant1, time_idx * nbins + ant2]),
+                             minlength=ntime * nbins).reshape(ntime, nbins)
+    return ant_counts, np.bincount(time_idx, minlength=ntime)
+
+
+def _count_outlier_baselines(ant1: NDArray, ant2: NDArray, id_outliers: NDArray,
+                             nants: int) -> tuple[list[tuple], NDArray, NDArray]:
+    """
+    Count for each baseline with outliers its number of outlier timestamps and
+    its total number of timestamps.
+
+    :param ant1: first antenna of each row
+    :param ant2: second antenna of each row
+    :param id_outliers: indices of the outlier rows
+    :param nants: number of antennas
+    :return: baselines with outliers, in order of their first outlier; number
+        of outlier timestamps and number of timestamps of each baseline
+    """
+    nbins = max(nants, int(max(np.max(ant1), np.max(ant2))) + 1)
+    bl_key = ant1.astype(np.int64) * nbins + ant2
+    outlier_keys, first_idx, outlier_counts = np.unique(bl_key[id_outliers], return_index=True, return_counts=True)
+    all_keys, all_counts = np.unique(bl_key, return_counts=True)
+    bl_counts = all_counts[np.searchsorted(all_keys, outlier_keys)]
+
+    order = np.argsort(first_idx, kind='stable')
+    first_outliers = id_outliers[first_idx[order]]
+    baselines = list(zip(ant1[first_outliers], ant2[first_outliers]))
+    return baselines, outlier_counts[order], bl_counts[order]
+
+
 class CorrectedampflagInputs(vdp.StandardInputs):
     """
     CorrectedampflagInputs defines the inputs for the Correctedampflag pipeline task.
@@ -481,10 +549,14 @@ class CorrectedampflagInputs(vdp.StandardInputs):
     # Whether to examine the XY+YX sum for multi-scan full-polarization data.
     examineCrossPolSum = vdp.VisDependentProperty(default=False)
 
+    # Whether to evaluate the heuristics for the fields, spws and baseline
+    # sets on the TaskQueue workers.
+    parallel = vdp.VisDependentProperty(default=False)
+
     # docstring and type hints: supplements hif_correctedampflag
     def __init__(self, context, output_dir=None, vis=None, intent=None, field=None, spw=None, antnegsig=None,
                  antpossig=None, tmantint=None, tmint=None, tmbl=None, antblnegsig=None, antblpossig=None,
-                 relaxed_factor=None, niter=None, examineCrossPolSum=None):
+                 relaxed_factor=None, niter=None, examineCrossPolSum=None, parallel=None):
         """Initialize Inputs.
 
         Args:
@@ -533,6 +605,11 @@ class CorrectedampflagInputs(vdp.StandardInputs):
             examineCrossPolSum: Whether to examine the XY+YX sum for multi-scan full-polarization data. Defaults to
                 False, so only XX+YY is evaluated because the cross-pol sum can be non-flat when Stokes I is stable.
 
+            parallel: Evaluate the flagging heuristics for the individual fields, spws and baseline sets in parallel
+                using the casampi parallelization framework. Options: ``'true'``, ``'false'``, ``'automatic'``.
+
+                Default: ``False``
+
         """
         super().__init__()
 
@@ -558,6 +635,7 @@ class CorrectedampflagInputs(vdp.StandardInputs):
         self.relaxed_factor = relaxed_factor
         self.niter = niter
         self.examineCrossPolSum = examineCrossPolSum
+        self.parallel = parallel
 
 
 @task_registry.set_equivalent_casa_task('hif_correctedampflag')
@@ -687,52 +765,78 @@ class Correctedampflag(basetask.StandardTaskTemplate):
         # Get the spws to use.
         spwids = list(map(int, inputs.spw.split(',')))
 
+        # Determine which baseline sets to evaluate separately; if none were
+        # received, then evaluate heuristics for all baselines at once.
+        baseline_sets = self._identify_baseline_sets(ms) or [None]
+
+        # Collect the independent (intent, field, spw, baseline set)
+        # evaluations.
+        evaluations = []
+
+        # Evaluate flagging heuristics separately for each intent.
+        for intent in inputs.intent.split(','):
+            # For current intent, identify which fields from inputs are valid.
+            if intent == 'TARGET':
+                # Use field IDs to loop over individual mosaic pointings for
+                # science targets (PIPE-337).
+                valid_fields = [
+                    str(field.id)
+                    for field in ms.get_fields(intent=intent)
+                    if field.name in list(utils.safe_split(inputs.field))
+                ]
+            else:
+                # Use field names for calibrators.
+                valid_fields = [
+                    field.name
+                    for field in ms.get_fields(intent=intent)
+                    if field.name in list(utils.safe_split(inputs.field))
+                ]
+
+            # If no valid fields were found, raise warning, and continue to
+            # next intent. The following intents are optional and do not require
+            # a warning: CHECK (PIPE-281), POLANGLE, POLLEAKAGE (PIPE-607),
+            # DIFFGAINREF, DIFFGAINSRC (PIPE-2082, PIPE-2145).
+            if not valid_fields:
+                if intent not in ['CHECK', 'DIFFGAINREF', 'DIFFGAINSRC', 'POLANGLE', 'POLLEAKAGE']:
+                    LOG.warning(
+                        'Invalid data selection for given intent(s) and field(s): fields %s do not include '
+                        "intent '%s'.",
+                        utils.commafy(utils.safe_split(inputs.field)),
+                        intent,
+                    )
+                continue
+
+            # Evaluate heuristic for each valid field, separately for each spw
+            # and each set of baselines.
+            for field in valid_fields:
+                for spwid in spwids:
+                    for baseline_set in baseline_sets:
+                        evaluations.append((intent, field, spwid, baseline_set))
+
         # Initialize list of newly found flags.
         newflags = []
 
-        # Open the MS once for all (intent, field, spw) reads (PIPE-3089).
-        with casa_tools.MSReader(ms.name) as openms:
-            # Evaluate flagging heuristics separately for each intent.
-            for intent in inputs.intent.split(','):
-                # For current intent, identify which fields from inputs are valid.
-                if intent == 'TARGET':
-                    # Use field IDs to loop over individual mosaic pointings for
-                    # science targets (PIPE-337).
-                    valid_fields = [
-                        str(field.id)
-                        for field in ms.get_fields(intent=intent)
-                        if field.name in list(utils.safe_split(inputs.field))
-                    ]
-                else:
-                    # Use field names for calibrators.
-                    valid_fields = [
-                        field.name
-                        for field in ms.get_fields(intent=intent)
-                        if field.name in list(utils.safe_split(inputs.field))
-                    ]
-
-                # If no valid fields were found, raise warning, and continue to
-                # next intent. The following intents are optional and do not require
-                # a warning: CHECK (PIPE-281), POLANGLE, POLLEAKAGE (PIPE-607),
-                # DIFFGAINREF, DIFFGAINSRC (PIPE-2082, PIPE-2145).
-                if not valid_fields:
-                    if intent not in ['CHECK', 'DIFFGAINREF', 'DIFFGAINSRC', 'POLANGLE', 'POLLEAKAGE']:
-                        LOG.warning(
-                            'Invalid data selection for given intent(s) and field(s): fields %s do not include '
-                            "intent '%s'.",
-                            utils.commafy(utils.safe_split(inputs.field)),
-                            intent,
-                        )
-                    continue
-
-                # Evaluate heuristic for each valid field.
-                for field in valid_fields:
-                    # Evaluate flagging heuristics separately for each spw.
-                    for spwid in spwids:
-                        flags_for_intent_field_spw = self._evaluate_heuristic(
-                            ms, intent, field, spwid, antenna_id_to_name, ms_handle=openms
+        parallel = mpihelpers.parse_parallel_input_parameter(inputs.parallel) and len(evaluations) > 1
+        if parallel:
+            # Distribute the evaluations over the TaskQueue workers, each
+            # reading its data through its own MS tool; the flags are collected
+            # in the same order as in the sequential evaluation.
+            params = self._get_heuristic_parameters()
+            with mpihelpers.TaskQueue(parallel=parallel) as tq:
+                for intent, field, spwid, baseline_set in evaluations:
+                    tq.add_functioncall(_evaluate_heuristic_for_baseline_set_task, params, ms, intent, field, spwid,
+                                        antenna_id_to_name, baseline_set, use_pickle=True)
+            for flags_for_evaluation in tq.get_results():
+                newflags.extend(flags_for_evaluation)
+        else:
+            # Open the MS once for all (intent, field, spw) reads (PIPE-3089).
+            with casa_tools.MSReader(ms.name) as openms:
+                for intent, field, spwid, baseline_set in evaluations:
+                    newflags.extend(
+                        self._evaluate_heuristic_for_baseline_set(
+                            ms, intent, field, spwid, antenna_id_to_name, baseline_set, ms_handle=openms
                         )
-                        newflags.extend(flags_for_intent_field_spw)
+                    )
 
         LOG.debug(
             'Flagging commands from current iteration, before consolidation:\n%s',
@@ -745,32 +849,9 @@ class Correctedampflag(basetask.StandardTaskTemplate):
 
         return newflags
 
-    def _evaluate_heuristic(
-        self, ms: MeasurementSet, intent: str, field: str, spwid: int, antenna_id_to_name: dict, *, ms_handle=None
-    ) -> list[FlagCmd]:
-        # Initialize flags.
-        allflags = []
-
-        # Determine which baseline sets to evaluate separately.
-        baseline_sets = self._identify_baseline_sets(ms)
-
-        # If no baseline sets were received, then evaluate heuristics for
-        # all baselines at once.
-        if not baseline_sets:
-            allflags.extend(
-                self._evaluate_heuristic_for_baseline_set(
-                    ms, intent, field, spwid, antenna_id_to_name, ms_handle=ms_handle
-                )
-            )
-        else:
-            # Evaluate heuristic for each set of baselines.
-            for baseline_set in baseline_sets:
-                newflags = self._evaluate_heuristic_for_baseline_set(
-                    ms, intent, field, spwid, antenna_id_to_name, baseline_set, ms_handle=ms_handle
-                )
-                allflags.extend(newflags)
-
-        return allflags
+    def _get_heuristic_parameters(self) -> HeuristicParameters:
+        inputs = self.inputs
+        return HeuristicParameters(**{name: getattr(inputs, name) for name in HeuristicParameters._fields})
 
     @staticmethod
     def _identify_baseline_sets(ms: MeasurementSet) -> list[tuple[str, str]]:
@@ -825,7 +906,8 @@ class Correctedampflag(basetask.StandardTaskTemplate):
 
         return baseline_sets
 
-    def _uvbinFactor(self, uvmin: float, totalpts: int) -> float:
+    @staticmethod
+    def _uvbinFactor(uvmin: float, totalpts: int) -> float:
         # Determine the uvrange bin width for searching for outliers in TARGET data.
         # ACA snapshot mosaics can have small number of visibility points per field that would
         # not support the option with finer bins at short baselines (18 bins from 7m-36m).
@@ -866,8 +948,22 @@ class Correctedampflag(basetask.StandardTaskTemplate):
         *,
         ms_handle=None,
     ) -> list[FlagCmd]:
+        return self._evaluate_baseline_set(self._get_heuristic_parameters(), ms, intent, field, spwid,
+                                           antenna_id_to_name, baseline_set, ms_handle=ms_handle)
 
-        inputs = self.inputs
+    @staticmethod
+    def _evaluate_baseline_set(
+        inputs: HeuristicParameters,
+        ms: MeasurementSet,
+        intent: str,
+        field: str,
+        spwid: int,
+        antenna_id_to_name: dict,
+        baseline_set: list | None = None,
+        *,
+        ms_handle=None,
+    ) -> list[FlagCmd]:
+        t_start = time.perf_counter()
 
         # Set "default" scale factor by which the thresholds
         # tmint and tmbl should be scaled.
@@ -944,7 +1040,7 @@ class Correctedampflag(basetask.StandardTaskTemplate):
 
         # Select non-autocorrelations.
         id_nonac = np.where(data['antenna1'] != data['antenna2'])
-        time = data['time'][id_nonac]
+        times = data['time'][id_nonac]
         ant1 = data['antenna1'][id_nonac]
         ant2 = data['antenna2'][id_nonac]
 
@@ -1001,7 +1097,7 @@ class Correctedampflag(basetask.StandardTaskTemplate):
             # to contain outliers, based on maximum fractional threshold and
             # number of unique timestamps, while setting to a minimum of 1.
             n_time_with_highsig_thresh_min = 1
-            n_time_with_highsig_thresh_frac = tmantint * len(np.unique(time))
+            n_time_with_highsig_thresh_frac = tmantint * len(np.unique(times))
             n_time_with_highsig_max = np.max([n_time_with_highsig_thresh_min, n_time_with_highsig_thresh_frac])
 
             # Select for non-flagged data and non-NaN data.
@@ -1015,7 +1111,7 @@ class Correctedampflag(basetask.StandardTaskTemplate):
                 continue
 
             cmetric_sel = cmetric[id_nonbad]
-            time_sel = time[id_nonbad]
+            time_sel = times[id_nonbad]
             ant1_sel = ant1[id_nonbad]
             ant2_sel = ant2[id_nonbad]
 
@@ -1165,7 +1261,7 @@ class Correctedampflag(basetask.StandardTaskTemplate):
                 uv1 = uvmin
                 while uv1 < uvmax:
                     uv0 = uv1
-                    uv1 *= self._uvbinFactor(uv0, len(uvdist_sel))
+                    uv1 *= Correctedampflag._uvbinFactor(uv0, len(uvdist_sel))
                     uvbins.append([uv0, uv1])
                 LOG.info('%s: Defined %d uvbins for field %s spw %d: %s'
                          '' % (ms, len(uvbins), str(field), spwid, str(uvbins)))
@@ -1315,7 +1411,7 @@ class Correctedampflag(basetask.StandardTaskTemplate):
                     # timestamps set by a threshold, then evaluate the antenna
                     # based heuristics for those timestamps.
                     if 0 < len(time_sel_highsig_uniq) <= n_time_with_highsig_max:
-                        new_antbased_flags = self._evaluate_antbased_heuristics(
+                        new_antbased_flags = Correctedampflag._evaluate_antbased_heuristics(
                             ms, spwid, intent, icorr, field,
                             ants_in_outlier_baseline_scans_thresh,
                             ants_in_outlier_baseline_scans_partial_thresh,
@@ -1327,7 +1423,7 @@ class Correctedampflag(basetask.StandardTaskTemplate):
                     # number of timestamps set by a threshold, then evaluate the
                     # antenna based heuristics for those timestamps.
                     elif 0 < len(time_sel_veryhighsig_uniq) <= n_time_with_veryhighsig_max:
-                        new_antbased_flags = self._evaluate_antbased_heuristics(
+                        new_antbased_flags = Correctedampflag._evaluate_antbased_heuristics(
                             ms, spwid, intent, icorr, field,
                             ants_in_outlier_baseline_scans_thresh,
                             ants_in_outlier_baseline_scans_partial_thresh,
@@ -1341,7 +1437,7 @@ class Correctedampflag(basetask.StandardTaskTemplate):
                 bad_timestamps = time_sel[id_ultrahighsig]
                 bad_bls = list(zip(ant1_sel[id_ultrahighsig], ant2_sel[id_ultrahighsig]))
                 newflags.extend(
-                    self._create_flags_for_ultrahigh_baselines_timestamps(
+                    Correctedampflag._create_flags_for_ultrahigh_baselines_timestamps(
                         ms, spwid, intent, icorr, field, bad_timestamps, bad_bls, antenna_id_to_name))
 
             #
@@ -1381,26 +1477,11 @@ class Correctedampflag(basetask.StandardTaskTemplate):
 
                 # Proceed if outliers were found...
                 if len(id_flagsig) > 0:
-                    # Identify baselines involved in each baseline/timestamp
-                    # outlier; this list may contain multiples of the same
-                    # baseline when it was an outlier in more than one
-                    # timestamp.
-                    outlier_ant1 = ant1[id_flagsig]
-                    outlier_ant2 = ant2[id_flagsig]
-                    outlier_bl = list(zip(outlier_ant1, outlier_ant2))
-
-                    # Compute for each baseline how many outlier timestamps
-                    # it is a part of. This creates a dictionary with
-                    # baselines as keys, and number of outlier timestamps
-                    # as values.
-                    outlier_bl_counts = collections.Counter(outlier_bl)
-
-                    # Compute for each baseline how many timestamps
-                    # it is a part of. This creates a dictionary with
-                    # baselines as keys, and number of timestamps
-                    # as values.
-                    baselines = list(zip(ant1, ant2))
-                    bl_counts = collections.Counter(baselines)
+                    # Compute for each baseline involved in baseline/timestamp
+                    # outliers how many outlier timestamps it is a part of,
+                    # and how many timestamps it is a part of in total.
+                    outlier_bls, outlier_bl_counts, bl_counts = _count_outlier_baselines(
+                        ant1, ant2, id_flagsig, nants)
 
                     # Compute final threshold for maximum fraction of "outlier
                     # timestamps" over "total timestamps" that a baseline can
@@ -1415,8 +1496,8 @@ class Correctedampflag(basetask.StandardTaskTemplate):
 
                     # Identify "bad baselines" as those baselines whose number
                     # of timestamps with outliers exceeds the threshold.
-                    bad_bls = [bl for bl, count in outlier_bl_counts.items()
-                               if count > np.max([1, bl_counts[bl] * tmint_scaled])]
+                    id_bad_bls = np.where(outlier_bl_counts > np.maximum(1, bl_counts * tmint_scaled))[0]
+                    bad_bls = [outlier_bls[i] for i in id_bad_bls]
 
                     # Compute for each antenna how many "bad baselines" it is
                     # a part of.
@@ -1462,8 +1543,8 @@ class Correctedampflag(basetask.StandardTaskTemplate):
 
                     # Compute fraction of outlier timestamps for each bad baseline.
                     bad_bls_timestamp_fraction = {
-                        bl: float(outlier_bl_counts[bl]) / bl_counts[bl]
-                        for bl in bad_bls}
+                        outlier_bls[i]: float(outlier_bl_counts[i]) / bl_counts[i]
+                        for i in id_bad_bls}
 
                     # For each bad baseline, check if it was already covered by
                     # one of the bad antennas, and otherwise flag it explicitly
@@ -1484,6 +1565,10 @@ class Correctedampflag(basetask.StandardTaskTemplate):
                                     reason='bad baseline',
                                     antenna_id_to_name=antenna_id_to_name))
 
+        LOG.debug('Evaluated flagging heuristics for %s intent %s field %s spw %s baseline set %s in %.3f s',
+                  ms.basename, intent, field, spwid, baseline_set[0] if baseline_set else 'all',
+                  time.perf_counter() - t_start)
+
         return newflags
 
     @staticmethod
@@ -1517,57 +1602,58 @@ class Correctedampflag(basetask.StandardTaskTemplate):
         # Initialize flags.
         newflags = []
 
-        # For each of the few bad timestamps...
-        for timestamp in time_sel_highsig_uniq:
-
-            # Identify baseline scans within this timestamp.
-            id_outlier_scans_in_timestamp = np.where(
-                time_sel_highsig == timestamp)[0]
-            n_outlier_scans_in_timestamp = len(id_outlier_scans_in_timestamp)
-
-            # Get a list of antennas involved in outlier scans
-            # matching the timestamp.
-            ants_in_olscans_in_tstamp = list(np.concatenate(
-                [ant1_sel[id_highsig][id_outlier_scans_in_timestamp],
-                 ant2_sel[id_highsig][id_outlier_scans_in_timestamp]]))
-
-            # Identify number of outlier scans within current
-            # timestamp that each antenna is involved in.
-            antcnts = np.bincount(ants_in_olscans_in_tstamp, minlength=nants)
-
-            # Identify the ants involved in the largest number
-            # of outliers as well as 1 count less (while ignoring
-            # ants involved in 0 outliers).
-            id_affected_ants = np.where(antcnts >= max([1, antcnts.max() - 1]))[0]
-
-            # Identify the ants that are at least partially affected,
-            # by being involved in at least one outlier, but excluding
-            # antennas already identified as "affected".
-            id_partly_affected_ants = np.setdiff1d(
-                np.where(antcnts >= 1)[0],
-                id_affected_ants)
-
-            # If the number of affected antennas is a significant fraction of
-            # all antennas, then flag the entire timestamp.
-            if len(id_affected_ants) > ants_in_outlier_baseline_scans_thresh * nants:
-                # Create a flagging command for all antennas
-                # in this timestamp (for given spw, intent, pol).
-                newflags.append(
-                    FlagCmd(
-                        filename=ms.name,
-                        spw=spwid,
-                        intent=utils.to_CASA_intent(ms, intent),
-                        pol=icorr,
-                        time=timestamp,
-                        field=field,
-                        reason='bad timestamp'))
-            # Evaluate a slightly more restrictive threshold, this time
-            # on the total number of affected and partly affected antennas,
-            # while still requiring half the original threshold.
-            elif (len(id_affected_ants) > 0.5 * ants_in_outlier_baseline_scans_thresh * nants
-                    and len(id_affected_ants) + len(id_partly_affected_ants) >
-                    ants_in_outlier_baseline_scans_partial_thresh * nants):
+        # Identify in one pass the number of outlier scans within each of the
+        # few bad timestamps, and the number of these outlier scans that each
+        # antenna is involved in.
+        antcnts, n_outlier_scans_in_timestamp = _count_outliers_per_timestamp(
+            ant1_sel[id_highsig], ant2_sel[id_highsig], time_sel_highsig, time_sel_highsig_uniq, nants)
+        antcnts_max = antcnts.max(axis=1)
+
+        # Identify for each timestamp the ants involved in the largest number
+        # of outliers as well as 1 count less (while ignoring ants involved
+        # in 0 outliers).
+        affected_ants = antcnts >= np.maximum(1, antcnts_max - 1)[:, np.newaxis]
+        n_affected_ants = np.count_nonzero(affected_ants, axis=1)
+
+        # Identify the ants that are at least partially affected, by being
+        # involved in at least one outlier, but excluding antennas already
+        # identified as "affected".
+        n_partly_affected_ants = np.count_nonzero((antcnts >= 1) & ~affected_ants, axis=1)
+
+        # If the number of affected antennas is a significant fraction of all
+        # antennas, then flag the entire timestamp. Otherwise, evaluate a
+        # slightly more restrictive threshold, this time on the total number of
+        # affected and partly affected antennas, while still requiring half the
+        # original threshold.
+        bad_timestamp = (
+            (n_affected_ants > ants_in_outlier_baseline_scans_thresh * nants)
+            | ((n_affected_ants > 0.5 * ants_in_outlier_baseline_scans_thresh * nants)
+               & (n_affected_ants + n_partly_affected_ants > ants_in_outlier_baseline_scans_partial_thresh * nants))
+        )
+
+        # If there was no significant fraction of affected antennas, then
+        # check if the antenna(s) with the highest number of outlier scans
+        # (within this timestamp) equals-or-exceeds the threshold.
+        bad_antenna_timestamp = (
+            (antcnts_max >= max_frac_outlier_scans * n_outlier_scans_in_timestamp)
+            & (n_outlier_scans_in_timestamp > 5)
+        )
+
+        # Heuristic for catching cross-CAI-dependent issues: if there are
+        # affected antennas, and total number of affected and partially
+        # affected antennas exceeds the larger of 6 or 20% of the antennas,
+        # then flag the timestamp. The minimum threshold of 6 is there to
+        # prevent over-application on ACA 7m datasets.
+        bad_cai_timestamp = (
+            (n_affected_ants + n_partly_affected_ants > np.max([6, 0.2 * nants]))
+            & (n_affected_ants > 0)
+        )
 
+        # For each of the few bad timestamps, create the flagging commands of
+        # the first heuristic that applies.
+        for itime in np.where(bad_timestamp | bad_antenna_timestamp | bad_cai_timestamp)[0]:
+            timestamp = time_sel_highsig_uniq[itime]
+            if bad_timestamp[itime]:
                 # Create a flagging command for all antennas
                 # in this timestamp (for given spw, intent, pol).
                 newflags.append(
@@ -1579,16 +1665,10 @@ class Correctedampflag(basetask.StandardTaskTemplate):
                         time=timestamp,
                         field=field,
                         reason='bad timestamp'))
-            # If there was no significant fraction of affected antennas,
-            # then proceed to check if the antenna(s) with the highest number
-            # of outlier scans (within this timestamp) equals-or-exceeds the
-            # threshold and flag the corresponding antenna(s).
-            elif (antcnts.max() >= max_frac_outlier_scans * n_outlier_scans_in_timestamp
-                    and n_outlier_scans_in_timestamp > 5):
-
+            elif bad_antenna_timestamp[itime]:
                 # Identify which antennas matched the highest counts,
                 # and create a flagging command for each.
-                id_ants_highest_cnts = np.where(antcnts == antcnts.max())[0]
+                id_ants_highest_cnts = np.where(antcnts[itime] == antcnts_max[itime])[0]
                 for ant in id_ants_highest_cnts:
                     # Create a flagging command for this antenna
                     newflags.append(
@@ -1602,18 +1682,10 @@ class Correctedampflag(basetask.StandardTaskTemplate):
                             field=field,
                             reason='bad antenna timestamp',
                             antenna_id_to_name=antenna_id_to_name))
-            # Heuristic for catching cross-CAI-dependent issues:
-            # If there are affected antennas, and total number of affected
-            # and partially affected antennas exceeds the larger of 6 or
-            # 20% of the antennas, then flag the timestamp. The minimum
-            # threshold of 6 is there to prevent over-application on ACA 7m
-            # datasets.
-            elif (len(id_affected_ants) + len(id_partly_affected_ants) > np.max([6, 0.2 * nants])
-                    and len(id_affected_ants) > 0):
-
+            else:
                 # Create flags only for the "affected" antennas for this timestamp
                 # because CAI-dependent issues do not affect all antennas.
-                for ant in id_affected_ants:
+                for ant in np.where(affected_ants[itime])[0]:
                     # Create a flagging command for this antenna.
                     newflags.append(
                         FlagCmd(
@@ -2,10 +2,15 @@
 
 These tests pin down the parameter-plumbing contract for ``examineCrossPolSum``
 and the multi-scan correlation averaging behavior. They use synthetic reader
-output rather than full CASA/MS machinery.
+output rather than full CASA/MS machinery. Further tests compare the parallel
+evaluation mode and the vectorised outlier counting with their sequential and
+per-timestamp counterparts.
 """
 
+import collections
+import contextlib
 import inspect
+import time
 from types import SimpleNamespace
 from unittest.mock import Mock
 
@@ -17,9 +22,11 @@ from pipeline.extern import XmlObjectifier
 from pipeline.hif.cli.hif_correctedampflag import hif_correctedampflag
 from pipeline.hif.tasks.correctedampflag import correctedampflag
 from pipeline.hif.tasks.correctedampflag.correctedampflag import Correctedampflag, CorrectedampflagInputs
-from pipeline.infrastructure import argmapper
+from pipeline.infrastructure import argmapper, logging
 from pipeline.infrastructure.launcher import Context
 
+LOG = logging.get_logger(__name__)
+
 PARAM = 'examineCrossPolSum'
 
 
@@ -252,3 +259,171 @@ def test_single_scan_evaluates_all_correlations_independently(monkeypatch):
     )
 
     assert evaluated == [0, 1, 2, 3]
+
+
+class _SyntheticMS:
+    """Minimal hashable MS for evaluating all heuristics on synthetic reader output."""
+
+    def __init__(self, nants, nscans=1):
+        self.basename = 'synthetic.ms'
+        self.name = 'synthetic.ms'
+        self.antennas = [SimpleNamespace(id=i, name=f'DA{i:02d}', diameter=12.0) for i in range(nants)]
+        self.nscans = nscans
+
+    def get_scans(self, **kwargs):
+        return [SimpleNamespace(id=i) for i in range(self.nscans)]
+
+    def get_fields(self, intent=None):
+        return [SimpleNamespace(id=i, name=f'cal{i}') for i in range(2)]
+
+    @staticmethod
+    def get_original_intent(intent):
+        return [f'CALIBRATE_{intent}#ON_SOURCE']
+
+
+def _synthetic_outlier_data(nants, ntimes, seed):
+    """Channel-averaged reader payload with bad antennas, timestamps and baselines."""
+    rng = np.random.default_rng(seed)
+    ant1, ant2 = np.triu_indices(nants, k=1)
+    nbl = len(ant1)
+    ant1 = np.tile(ant1, ntimes)
+    ant2 = np.tile(ant2, ntimes)
+    times = np.repeat(np.arange(ntimes, dtype=float), nbl)
+    cmetric = rng.normal(1.0, 0.01, (2, len(ant1)))
+    # a bad antenna in two timestamps, a bad timestamp, and a bad baseline
+    cmetric[:, ((ant1 == 3) | (ant2 == 3)) & np.isin(times, [2, 5])] += 0.2
+    cmetric[:, times == 7] -= 0.3
+    cmetric[:, (ant1 == 1) & (ant2 == 4)] += 0.05 * rng.uniform(0.0, 2.0, ntimes)
+    return {
+        'corrected_data': cmetric[:, np.newaxis, :],
+        'model_data': np.zeros_like(cmetric[:, np.newaxis, :]),
+        'antenna1': ant1,
+        'antenna2': ant2,
+        'flag': np.zeros_like(cmetric[:, np.newaxis, :], dtype=bool),
+        'time': times,
+        'uvdist': rng.uniform(10.0, 500.0, len(ant1)),
+    }
+
+
+def test_parallel_evaluation_matches_sequential(monkeypatch):
+    """Test that the parallel mode evaluates each field and spw separately into the same flags."""
+    nants = 12
+    reads = []
+
+    def read_data(ms, field, spwid, intent, items, baseline_set=None, *, ms_handle=None):
+        reads.append((field, spwid, ms_handle))
+        return _synthetic_outlier_data(nants, 30, seed=10 * int(field[-1]) + spwid)
+
+    monkeypatch.setattr(correctedampflag.mstools, 'read_channel_averaged_data_from_ms', read_data)
+    monkeypatch.setattr(correctedampflag.commonhelpermethods, 'get_corr_products', Mock(return_value=['XX', 'YY']))
+    monkeypatch.setattr(correctedampflag.casa_tools, 'MSReader', lambda name: contextlib.nullcontext('openms'))
+
+    ms = _SyntheticMS(nants)
+    antenna_id_to_name = {ant.id: ant.name for ant in ms.antennas}
+    flags = {}
+    for parallel in (False, True):
+        inputs = CorrectedampflagInputs(context=Mock(spec=Context), vis='synthetic.ms', intent='BANDPASS',
+                                        field='cal0,cal1', spw='0,1', parallel=parallel)
+        flags[parallel] = [flag.flagcmd for flag in
+                           Correctedampflag(inputs)._run_flagging_iteration(ms, antenna_id_to_name)]
+
+    assert flags[True] == flags[False]
+    assert any('DA03' in flag for flag in flags[True])
+    # the sequential evaluations share one MS tool, the parallel ones open their own
+    assert reads == [(field, spw, handle) for handle in ('openms', None)
+                     for field in ('cal0', 'cal1') for spw in (0, 1)]
+
+
+def _per_timestamp_antbased_flags(nants, ant1_sel, ant2_sel, id_highsig, time_sel_highsig, time_sel_highsig_uniq):
+    """Reference antenna based heuristics evaluated one timestamp at a time, as (reason, time, antenna)."""
+    flags = []
+    for timestamp in time_sel_highsig_uniq:
+        id_in_timestamp = np.where(time_sel_highsig == timestamp)[0]
+        n_in_timestamp = len(id_in_timestamp)
+        antcnts = np.bincount(np.concatenate([ant1_sel[id_highsig][id_in_timestamp],
+                                              ant2_sel[id_highsig][id_in_timestamp]]), minlength=nants)
+        id_affected = np.where(antcnts >= max([1, antcnts.max() - 1]))[0]
+        id_partly = np.setdiff1d(np.where(antcnts >= 1)[0], id_affected)
+        if len(id_affected) > nants / 3.0:
+            flags.append(('bad timestamp', timestamp, None))
+        elif len(id_affected) > 0.5 * nants / 3.0 and len(id_affected) + len(id_partly) > 0.5 * nants:
+            flags.append(('bad timestamp', timestamp, None))
+        elif antcnts.max() >= 0.5 * n_in_timestamp and n_in_timestamp > 5:
+            flags.extend(('bad antenna timestamp', timestamp, ant) for ant in np.where(antcnts == antcnts.max())[0])
+        elif len(id_affected) + len(id_partly) > np.max([6, 0.2 * nants]) and len(id_affected) > 0:
+            flags.extend(('bad CAI-dependent data', timestamp, ant) for ant in id_affected)
+    return flags
+
+
+def _synthetic_outliers(nants, ntimes):
+    """Outlier selection of all baselines over regular timestamps, as passed to the antenna based heuristics."""
+    rng = np.random.default_rng(nants)
+    ant1, ant2 = np.triu_indices(nants, k=1)
+    ant1_sel = np.tile(ant1, ntimes)
+    ant2_sel = np.tile(ant2, ntimes)
+    time_sel = np.repeat(np.arange(ntimes, dtype=float), len(ant1))
+    # outliers on a few antennas, on many antennas, and scattered over timestamps
+    outlier = rng.uniform(size=len(time_sel)) < 0.02
+    outlier |= ((ant1_sel == 2) | (ant2_sel == 5)) & (time_sel % 3 == 0)
+    outlier |= (time_sel % 7 == 0) & (rng.uniform(size=len(time_sel)) < 0.4)
+    id_highsig = np.where(outlier)[0]
+    time_sel_highsig = time_sel[id_highsig]
+    time_sel_highsig_uniq = np.unique(time_sel_highsig)
+    return ant1_sel, ant2_sel, id_highsig, time_sel_highsig, time_sel_highsig_uniq
+
+
+def _onepass_antbased_flags(nants, ant1_sel, ant2_sel, id_highsig, time_sel_highsig, time_sel_highsig_uniq):
+    """Flags of the one-pass antenna based heuristics on a synthetic MS."""
+    ms = _SyntheticMS(nants)
+    flags = Correctedampflag._evaluate_antbased_heuristics(
+        ms, 0, 'BANDPASS', 0, 'cal0', 1.0 / 3.0, 0.5, 0.5, {}, ant1_sel, ant2_sel, nants, id_highsig,
+        time_sel_highsig, time_sel_highsig_uniq)
+    return [(flag.reason, flag.time, flag.antenna) for flag in flags]
+
+
+def test_antbased_heuristics_match_per_timestamp():
+    """Test that the one-pass antenna based heuristics match the per-timestamp evaluation."""
+    nants = 12
+    outliers = _synthetic_outliers(nants, 20)
+
+    expected = _per_timestamp_antbased_flags(nants, *outliers)
+    flags = _onepass_antbased_flags(nants, *outliers)
+
+    assert {reason for reason, _, _ in expected} == {'bad timestamp', 'bad antenna timestamp',
+                                                     'bad CAI-dependent data'}
+    assert flags == expected
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('nants, ntimes', [(12, 20), (43, 200)])
+def test_antbased_heuristics_benchmark(nants, ntimes):
+    """Benchmark the one-pass antenna based heuristics against the per-timestamp evaluation."""
+    outliers = _synthetic_outliers(nants, ntimes)
+
+    t0 = time.perf_counter()
+    expected = _per_timestamp_antbased_flags(nants, *outliers)
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    flags = _onepass_antbased_flags(nants, *outliers)
+    t_onepass = time.perf_counter() - t0
+    LOG.info('Antenna based heuristics of %d antennas, %d timestamps: per timestamp %.3f s, one pass %.3f s',
+             nants, len(outliers[-1]), t_loop, t_onepass)
+
+    assert flags == expected
+
+
+def test_count_outlier_baselines():
+    """Test the outlier baseline counts against counting baseline tuples."""
+    rng = np.random.default_rng(7)
+    ant1 = rng.integers(0, 10, 5000)
+    ant2 = ant1 + rng.integers(1, 5, 5000)
+    id_outliers = np.sort(rng.choice(5000, 400, replace=False))
+
+    baselines, outlier_counts, bl_counts = correctedampflag._count_outlier_baselines(ant1, ant2, id_outliers, 10)
+
+    expected_outlier_counts = collections.Counter(zip(ant1[id_outliers], ant2[id_outliers]))
+    expected_bl_counts = collections.Counter(zip(ant1, ant2))
+    assert baselines == list(expected_outlier_counts)
+    assert list(outlier_counts) == list(expected_outlier_counts.values())
+    assert list(bl_counts) == [expected_bl_counts[bl] for bl in baselines]
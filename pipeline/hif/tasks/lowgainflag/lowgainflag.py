@@ -586,15 +586,14 @@ class LowgainflagView:
         # Open gains caltable.
         gtable = caltableaccess.CalibrationTableDataFiller.getcal(table)
 
-        # Get range of scans covered.
-        scans = set()
-        for row in gtable.rows:
-            # The gain table is T, should be no pol dimension
-            npols = np.shape(row.get('CPARAM'))[0]
+        # The gain table is T, should be no pol dimension
+        for cparam in gtable.get_row_values('CPARAM'):
+            npols = np.shape(cparam)[0]
             if npols != 1:
                 raise Exception('table has polarization results')
-            scans.update([row.get('SCAN_NUMBER')])
-        scans = np.sort(list(scans))
+
+        # Get range of scans covered.
+        scans = np.unique(gtable.get_column('SCAN_NUMBER'))
 
         # Create translation of scan ID to flagging view axis ID.
         scanid_to_axisid = {scan_id: axis_id for axis_id, scan_id in enumerate(scans)}
@@ -636,15 +635,14 @@ class LowgainflagView:
                     data = np.zeros([nants, len(scans)])
                     flag = np.ones([nants, len(scans)], bool)
 
-                    for row in gtable.rows:
+                    for row in gtable.get_rows(gtable.select(spw=spwid, antenna=antenna_ids)):
                         ant = row.get('ANTENNA1')
-                        if row.get('SPECTRAL_WINDOW_ID') == spwid and ant in antenna_ids:
-                            gain = row.get('CPARAM')[0][0]
-                            gainflag = row.get('FLAG')[0][0]
-                            scan = row.get('SCAN_NUMBER')
-                            if not gainflag:
-                                data[antid_to_axisid[ant], scanid_to_axisid[scan]] = np.asarray(np.abs(gain)).item()
-                                flag[antid_to_axisid[ant], scanid_to_axisid[scan]] = 0
+                        gain = row.get('CPARAM')[0][0]
+                        gainflag = row.get('FLAG')[0][0]
+                        scan = row.get('SCAN_NUMBER')
+                        if not gainflag:
+                            data[antid_to_axisid[ant], scanid_to_axisid[scan]] = np.asarray(np.abs(gain)).item()
+                            flag[antid_to_axisid[ant], scanid_to_axisid[scan]] = 0
 
                     axes = [
                         commonresultobjects.ResultAxis(name='Antenna1', units='id', data=np.asarray(antenna_ids)),
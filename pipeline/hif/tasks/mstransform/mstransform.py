@@ -330,7 +330,8 @@ class SerialMstransform(basetask.StandardTaskTemplate):
 
         # Import the new measurement set.
         to_import = os.path.relpath(result.outputvis)
-        observing_run = tablereader.ObservingRunReader.get_observing_run(to_import)
+        observing_run = tablereader.ObservingRunReader.get_observing_run(
+            to_import, cache_dir=self.inputs.context.metadata_cache_dir)
 
         # Adopt same session as source measurement set
         for ms in observing_run.measurement_sets:
@@ -14,6 +14,7 @@ from casatasks import imhead
 
 import pipeline.infrastructure as infrastructure
 from pipeline.extern.findContinuum import convertColonDelimitersToHMSDMS
+from pipeline.h.tasks.common import atmutil
 from pipeline.infrastructure import casa_tools
 
 LOG = infrastructure.get_logger(__name__)
@@ -667,43 +668,19 @@ def CalcAtmTransmissionForImage(img, chanInfo='', airmass=1.5, pwv=-1,
 #    reffreq = np.mean(topofreqs)
     numchanModel = numchan*1
     chansepModel = (topofreqs[-1]-topofreqs[0])/(numchanModel-1)
-    nbands = 1
-    lqa = casa_tools.quanta
-    fCenter = lqa.quantity(reffreq, 'GHz')
-    fResolution = lqa.quantity(chansepModel, 'GHz')
-    fWidth = lqa.quantity(numchanModel*chansepModel, 'GHz')
-    myat = casa_tools.atmosphere
-    myat.initAtmProfile(humidity=H, temperature=lqa.quantity(T, "K"),
-                        altitude=lqa.quantity(altitude, "m"),
-                        pressure=lqa.quantity(P, 'mbar'), atmType=midLatitudeWinter)
-    myat.initSpectralWindow(nbands, fCenter, fWidth, fResolution)
-    myat.setUserWH2O(lqa.quantity(pwv, 'mm'))
-#    myat.setAirMass()  # This does not affect the opacity, but it does effect TebbSky, so do it manually.
-    lqa.done()
-
-    dry = np.array(myat.getDryOpacitySpec(0)[1])
-    wet = np.array(myat.getWetOpacitySpec(0)[1]['value'])
-    TebbSky = myat.getTebbSkySpec(spwid=0)[1]['value']
-    # readback the values to be sure they got set
-
-    if (myat.getRefFreq()['unit'] != 'GHz'):
-        LOG.warning("There is a unit mismatch for refFreq in the atm code.")
-    if (myat.getChanSep()['unit'] != 'MHz'):
-        LOG.warning("There is a unit mismatch for chanSep in the atm code.")
-    numchanModel = myat.getNumChan()
-    freq0 = myat.getChanFreq(0)['value']
-    freq1 = myat.getChanFreq(numchanModel-1)['value']
+    spectrum = atmutil.get_opacity_spectrum(humidity=H, temperature=T, altitude=altitude, pressure=P,
+                                            atmtype=midLatitudeWinter, pwv=pwv, fcenter=reffreq,
+                                            nchan=numchanModel, resolution=chansepModel,
+                                            with_tebbsky=(value != 'transmission'))
+    numchanModel = len(spectrum.frequency)
     # We keep the original LSRK freqs for overlay on the LSRK spectrum, but associate
     # the transmission values from the equivalent TOPO freqs
     newfreqs = np.linspace(freqs[0], freqs[-1], numchanModel)  # fix for SCOPS-4815
-    transmission = np.exp(-airmass*(wet+dry))
-    TebbSky *= (1-np.exp(-airmass*(wet+dry)))/(1-np.exp(-wet-dry))
     if value=='transmission':
-        values = transmission
+        values = spectrum.transmission(airmass)
     else:
-        values = TebbSky
-    myat.done()
-    del myat
+        # setAirMass does not affect the opacity, but it does affect TebbSky, so scale it manually.
+        values = spectrum.sky_temperature(airmass)
     return(newfreqs, values)
 
 
@@ -16,6 +16,7 @@ import pipeline.infrastructure.pipelineqa as pipelineqa
 import pipeline.infrastructure.utils as utils
 import pipeline.infrastructure.vdp as vdp
 from pipeline.domain import DataType
+from pipeline.h.tasks.common import cubereducer
 from pipeline.hif.heuristics import imageparams_factory
 from pipeline.infrastructure import casa_tasks, casa_tools, task_registry
 
@@ -1623,8 +1624,49 @@ class Tclean(cleanbase.CleanBase):
     def _calc_moment_image(self, imagename=None, moments=None, outfile=None, chans=None, iter=None):
         """Computes moment image, writes it to disk and updates moment image metadata.
 
-        This method is used in _calc_mom0_8() and _calc_mom0_8_10_fc().
+        This method is the fallback of _calc_moment_images().
         """
+        # Execute job to create the MOM0/8/10_FC image.
+        job = casa_tasks.immoments(imagename=imagename, moments=moments, outfile=outfile, chans=chans, stokes='I')
+        self._executor.execute(job)
+        assert os.path.exists(outfile)
+
+        self._set_moment_image_miscinfo(outfile, iter=iter)
+
+    def _calc_moment_images(self, imagename=None, outfiles=None, chan_ranges=None, iter=None):
+        """Computes several moment images in one pass over the cube and writes them to disk.
+
+        All requested moments are accumulated in a single read of the Stokes I
+        cube instead of one immoments call (and full cube read) per moment. If
+        the single-pass reduction fails, the images are made with immoments.
+
+        Args:
+            imagename: Name of the input cube.
+            outfiles: Dictionary mapping the moment number (0, 8 or 10) to the output image name.
+            chan_ranges: Inclusive (start, stop) channel ranges to use, or None for all channels.
+            iter: Clean iteration recorded in the image metadata.
+        """
+        try:
+            reduction = cubereducer.reduce_cube(imagename, stokes='I', chans=chan_ranges, use_cache=False)
+            for moment, outfile in outfiles.items():
+                cubereducer.write_moment_image(imagename, outfile, reduction, 'mom%d' % moment, stokes='I')
+                assert os.path.exists(outfile)
+                self._set_moment_image_miscinfo(outfile, iter=iter)
+            LOG.info('Computed moments %s of %s in a single pass (%.1f s)', ', '.join(map(str, outfiles)),
+                     os.path.basename(imagename), reduction.timing['total'])
+        except Exception as ex:
+            LOG.warning('Single-pass moment computation for %s failed (%s), falling back to immoments.',
+                        os.path.basename(imagename), ex)
+            if chan_ranges is None:
+                chans = ''
+            else:
+                chans = ";".join(["%s~%s" % (ch0, ch1) for ch0, ch1 in chan_ranges])
+            for moment, outfile in outfiles.items():
+                self._calc_moment_image(imagename=imagename, moments=[moment], outfile=outfile, chans=chans,
+                                        iter=iter)
+
+    def _set_moment_image_miscinfo(self, outfile, iter=None):
+        """Updates the metadata of a moment image."""
         context = self.inputs.context
 
         # Determine moment image type.
@@ -1638,15 +1680,10 @@ class Tclean(cleanbase.CleanBase):
         if "_fc" in outfile:
             mom_type += "_fc"
 
-        # Execute job to create the MOM0/8/10_FC image.
-        job = casa_tasks.immoments(imagename=imagename, moments=moments, outfile=outfile, chans=chans, stokes='I')
-        self._executor.execute(job)
-        assert os.path.exists(outfile)
-
         # Using virtual spw setups for all interferometry pipelines
         virtspw = True
 
-        # Update the metadata in the MOM8_FC image.
+        # Update the metadata in the moment image.
         imageheader.set_miscinfo(name=outfile, spw=self.inputs.spw, virtspw=virtspw,
                                  field=self.inputs.field, iter=iter,
                                  datatype=self.inputs.datatype, type=mom_type,
@@ -1690,24 +1727,18 @@ class Tclean(cleanbase.CleanBase):
             if cont_chan_ranges[0] in ('ALL', 'ALLCONT'):
                 cont_chan_ranges_str = ''
                 cont_chan_indices = slice(None)
+                cont_chan_ranges_sel = None
             else:
                 cont_chan_ranges_str = ";".join(["%s~%s" % (ch0, ch1) for ch0, ch1 in cont_chan_ranges])
                 cont_chan_indices = np.hstack([np.arange(start, stop + 1) for start, stop in cont_chan_ranges])
+                cont_chan_ranges_sel = cont_chan_ranges
 
-            # Calculate MOM0_FC image
-            self._calc_moment_image(imagename=imagename, moments=[0], outfile=mom0fc_name, chans=cont_chan_ranges_str,
-                                    iter=maxiter)
+            # Calculate MOM0_FC, MOM8_FC and MOM10_FC images in one pass over the cube
+            self._calc_moment_images(imagename=imagename, outfiles={0: mom0fc_name, 8: mom8fc_name, 10: mom10fc_name},
+                                     chan_ranges=cont_chan_ranges_sel, iter=maxiter)
             # Update the result.
             result.set_mom0_fc(maxiter, mom0fc_name)
 
-            # Calculate MOM8_FC image
-            self._calc_moment_image(imagename=imagename, moments=[8], outfile=mom8fc_name, chans=cont_chan_ranges_str,
-                                    iter=maxiter)
-
-            # Calculate MOM10_FC image
-            self._calc_moment_image(imagename=imagename, moments=[10], outfile=mom10fc_name, chans=cont_chan_ranges_str,
-                                    iter=maxiter)
-
             # Calculate the MOM8_FC peak SNR for the QA
 
             # Create flattened PB over continuum channels
@@ -1918,18 +1949,14 @@ class Tclean(cleanbase.CleanBase):
         # non-PB-corrected image.
         imagename = result.iterations[maxiter]['image'].replace('.pbcor', '')
 
-        # Set output filename for MOM0 all channel image.
+        # Set output filenames for MOM0 and MOM8 all channel images.
         mom0_name = '%s.mom0' % imagename
-        # Calculate moment image
-        self._calc_moment_image(imagename=imagename, moments=[0], outfile=mom0_name, chans='', iter=maxiter)
-        # Update the result.
-        result.set_mom0(maxiter, mom0_name)
-
-        # Set output filename for MOM8 all channel image.
         mom8_name = '%s.mom8' % imagename
-        # Calculate moment image
-        self._calc_moment_image(imagename=imagename, moments=[8], outfile=mom8_name, chans='', iter=maxiter)
+        # Calculate both moment images in one pass over the cube
+        self._calc_moment_images(imagename=imagename, outfiles={0: mom0_name, 8: mom8_name}, chan_ranges=None,
+                                 iter=maxiter)
         # Update the result.
+        result.set_mom0(maxiter, mom0_name)
         result.set_mom8(maxiter, mom8_name)
 
     def _update_miscinfo(self, imagename: str, nfield: int | None = None, datamin: float | None = None,
@@ -223,7 +223,8 @@ class Transformimagedata(mssplit.MsSplit):
 
         # Import the new MS
         rel_to_import = result.outputvis
-        observing_run = tablereader.ObservingRunReader.get_observing_run(rel_to_import)
+        observing_run = tablereader.ObservingRunReader.get_observing_run(
+            rel_to_import, cache_dir=self.inputs.context.metadata_cache_dir)
 
         # Adopt same session as source measurement set
         for ms in observing_run.measurement_sets:
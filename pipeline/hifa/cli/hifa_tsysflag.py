@@ -11,7 +11,7 @@ def hifa_tsysflag(vis=None, caltable=None,
                   flag_birdies=None, fb_sharps_limit=None,
                   flag_toomany=None, tmf1_limit=None, tmef1_limit=None,
                   metric_order=None, normalize_tsys=None, filetemplate=None,
-                  parallel=None):
+                  parallel_spws=None, parallel=None):
     """Flag deviant system temperatures for ALMA interferometry measurements.
 
     This task flags all deviant system temperature measurements in the system
@@ -8,9 +8,9 @@ import numpy as np
 import pipeline.infrastructure as infrastructure
 from pipeline.domain import measures
 from pipeline.h.heuristics import tsysspwmap
+from pipeline.h.tasks.common import atmutil
 from pipeline.h.tasks.common import calibrationtableaccess as caltableaccess
 from pipeline.h.tasks.common import commonresultobjects
-from pipeline.infrastructure import casa_tools
 
 if TYPE_CHECKING:
     from pipeline.domain import SpectralWindow
@@ -30,90 +30,34 @@ class AtmHeuristics:
     def _calculate(self):
         LOG.info("Calculating opacities for {}...".format(os.path.basename(self.vis)))
 
-        # get channel information for each spw
-        centre_freq = []
-        width = []
-        resolution = []
-        spw_to_band = {}
-
-        for ispw, spw in enumerate(self.science_spws):
-            spw_to_band[spw.id] = ispw
-
-            channels = spw.channels
-
-            # translate from Stewart's domain measures to CASA quantities
-            freqs = np.zeros([len(channels)], np.double)
-            channel_unit = channels[0].low.units['symbol']
-            freq = np.zeros([len(channels)], np.double)
-            channel_width = np.zeros([len(channels)], np.double)
-            res = np.zeros([len(channels)], np.double)
-
-            for i in np.arange(len(freqs)):
-                freq[i] = float(channels[i].low.value +
-                                channels[i].high.value) / 2.0
-                channel_width[i] = float(channels[i].low.value -
-                                         channels[i].high.value)
-                res[i] = float(channels[i].low.value - channels[i].high.value)
-
-            centre_frequency = spw.centre_frequency
-            centre_freq.append(float(centre_frequency.value))
-            centre_freq_unit = centre_frequency.units['symbol']
-            resolution.append(abs(channel_width[0]))
-            resolution_unit = channel_unit
-            bandwidth = spw.bandwidth
-            width.append(float(bandwidth.value))
-            width_unit = bandwidth.units['symbol']
-
         # canonical atmospheric params
         pressure = 563.0
         humidity = 20.0
         temperature = 273.0
         pwv = 1.0
 
-        # tropical = 1
-        # mid_latitude_summer = 2
-        mid_latitude_winter = 3
-
-        fcentre = casa_tools.quanta.quantity(centre_freq, centre_freq_unit)
-        fresolution = casa_tools.quanta.quantity(resolution, resolution_unit)
-        fwidth = casa_tools.quanta.quantity(width, width_unit)
-
-        # setup atm
-        casa_tools.atmosphere.initAtmProfile(
-            humidity=humidity,
-            temperature=casa_tools.quanta.quantity(temperature, "K"),
-            altitude=casa_tools.quanta.quantity(5059, "m"),
-            pressure=casa_tools.quanta.quantity(pressure, 'mbar'),
-            atmType=mid_latitude_winter)
-        casa_tools.atmosphere.initSpectralWindow(len(centre_freq), fcentre, fwidth, fresolution)
-        casa_tools.atmosphere.setUserWH2O(casa_tools.quanta.quantity(pwv, 'mm'))
-
         for spw in self.science_spws:
-            band = spw_to_band[spw.id]
+            # get channel information of the spw
+            channels = spw.channels
+            resolution = abs(float(channels[0].low.to_units(measures.FrequencyUnits.GIGAHERTZ) -
+                                   channels[0].high.to_units(measures.FrequencyUnits.GIGAHERTZ)))
+            centre_freq = float(spw.centre_frequency.to_units(measures.FrequencyUnits.GIGAHERTZ))
+            width = float(spw.bandwidth.to_units(measures.FrequencyUnits.GIGAHERTZ))
 
-            numchan = casa_tools.atmosphere.getNumChan(band)
-            refchan = casa_tools.atmosphere.getRefChan(band)
-            reffreq = casa_tools.atmosphere.getRefFreq(band)
-            reffreq = casa_tools.quanta.convert(reffreq, 'GHz')
-            chansep = casa_tools.atmosphere.getChanSep(band)
-            chansep = casa_tools.quanta.convert(chansep, 'GHz')
+            # calculate opacities, or take them from the opacity cache
+            spectrum = atmutil.get_opacity_spectrum(
+                humidity=humidity, temperature=temperature, altitude=5059.0, pressure=pressure,
+                atmtype=atmutil.AtmType.midLatitudeWinter, pwv=pwv, fcenter=centre_freq,
+                nchan=int(round(width / resolution)), resolution=resolution)
 
             # axis object describing channel/freq axis
-            freqs = np.zeros([numchan], np.double)
-            for i in np.arange(numchan):
-                freqs[i] = reffreq['value'][0] + float(i - refchan) * \
-                  chansep['value'][0] 
             axis = commonresultobjects.ResultAxis(name='Frequency',
-                                                  units='GHz', data=freqs)
-
-            # calculate opacities
-            dry = np.array(casa_tools.atmosphere.getDryOpacitySpec(band)[1])
-            wet = np.array(casa_tools.atmosphere.getWetOpacitySpec(band)[1]['value'])
+                                                  units='GHz', data=np.array(spectrum.frequency))
 
             # object containing result
             opacity = commonresultobjects.SpectrumResult(
                 axis=axis,
-                data=wet+dry,
+                data=spectrum.wet_opacity + spectrum.dry_opacity,
                 datatype='opacity',
                 spw=spw.id)
 
@@ -149,21 +93,19 @@ class AtmHeuristics:
             # Load the tsys caltable to assess.
             tsystable = caltableaccess.CalibrationTableDataFiller.getcal(table)
 
-            # Go through each row of Tsys caltable:
-            for row in tsystable.rows:
+            # Go through the rows of Tsys caltable matching the spws and
+            # fields (intents) to consider:
+            for row in tsystable.get_rows(tsystable.select(spw=list(tsys_to_sci_spwmap), field=fieldids)):
                 # Get spw for current row.
                 row_spwid = row.get('SPECTRAL_WINDOW_ID')
 
-                # Extract info from rows matching the spws and fields
-                # (intents) to consider.
-                if row_spwid in tsys_to_sci_spwmap and row.get('FIELD_ID') in fieldids:
-                    # Get tsys spectrum and corresponding flags.
-                    spec = row.get('FPARAM')
-                    flag = row.get('FLAG')
+                # Get tsys spectrum and corresponding flags.
+                spec = row.get('FPARAM')
+                flag = row.get('FLAG')
 
-                    # Add unflagged tsys measurements to overall list for this
-                    # spw.
-                    tsys[tsys_to_sci_spwmap[row_spwid]].extend(list(spec[np.logical_not(flag)]))
+                # Add unflagged tsys measurements to overall list for this
+                # spw.
+                tsys[tsys_to_sci_spwmap[row_spwid]].extend(list(spec[np.logical_not(flag)]))
 
         # Calculate median for each spw; for each spwid where no Tsys was
         # available, this will be NaN.
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import copy
+import os
 from typing import TYPE_CHECKING
 
 import numpy as np
@@ -35,6 +36,64 @@ LOG = infrastructure.logging.get_logger(__name__)
 #          - Dec 2024 check caltable spw and match with spw_candidates
 ##################
 
+# Upper limit on the size of the FLAG data read in one chunk
+MAX_FLAG_CHUNK_BYTES = 128 * 1024 ** 2
+
+
+class BaselineFlagFractions:
+    """
+    Flagged fraction of each baseline of an MS, per spw and field.
+
+    The ANTENNA1, ANTENNA2, FIELD_ID and DATA_DESC_ID columns are read once
+    for all spws. The FLAG column of a spw is read, in chunks of rows, on the
+    first request for that spw and reduced to the flagged fraction of each
+    (field, antenna1, antenna2) group.
+    """
+    def __init__(self, vis: str):
+        self.vis = vis
+        with casa_tools.TableReader(os.path.join(vis, 'DATA_DESCRIPTION')) as tb:
+            self.dd_spw = tb.getcol('SPECTRAL_WINDOW_ID')
+        with casa_tools.TableReader(vis) as tb:
+            self.ddid = tb.getcol('DATA_DESC_ID')
+            self.keys = np.column_stack([tb.getcol('FIELD_ID'), tb.getcol('ANTENNA1'), tb.getcol('ANTENNA2')])
+        self._fractions = {}
+
+    def get(self, spw: int) -> dict[tuple[int, int, int], float]:
+        """
+        Return the flagged fraction of each baseline of a spw.
+
+        Args:
+            spw: spectral window to retrieve flagging info for
+
+        Returns:
+            Flagged fraction of the data in all polarisations, channels and
+            integrations, keyed by (field id, antenna1 id, antenna2 id).
+        """
+        if spw not in self._fractions:
+            # MS reads datadescid not spw id
+            datadescid = np.flatnonzero(self.dd_spw == spw)[0]
+            rows = np.flatnonzero(self.ddid == datadescid)
+            keys, inverse = np.unique(self.keys[rows], axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+
+            nflagged = np.empty(len(rows), dtype=np.int64)
+            with casa_tools.TableReader(self.vis) as tb:
+                tb1 = tb.selectrows(rows.tolist())
+                try:
+                    npol, nchan = tb1.getcell('FLAG', 0).shape if len(rows) > 0 else (1, 1)
+                    chunk_rows = max(1, MAX_FLAG_CHUNK_BYTES // (npol * nchan))
+                    for startrow in range(0, len(rows), chunk_rows):
+                        nrow = min(chunk_rows, len(rows) - startrow)
+                        flags = tb1.getcol('FLAG', startrow, nrow)  # index is [pol][chan][integration]
+                        nflagged[startrow:startrow + nrow] = flags.sum(axis=(0, 1))
+                finally:
+                    tb1.close()
+
+            fraction = (np.bincount(inverse, nflagged, len(keys)) /
+                        (np.bincount(inverse, minlength=len(keys)) * npol * nchan))
+            self._fractions[spw] = {tuple(int(k) for k in key): f for key, f in zip(keys, fraction)}
+        return self._fractions[spw]
+
 
 class PhaseStabilityHeuristics:
     def __init__(self, inputsin, outlier_limit, flag_tolerance, max_poor_ant):
@@ -105,6 +164,7 @@ class PhaseStabilityHeuristics:
 
         # Select which SpW to use for phase stability analysis, and retrieve
         # corresponding baseline flagging information.
+        self.blflagfractions = BaselineFlagFractions(self.vis)
         self.spw, self.blflags = self._get_final_spw_and_blflags(inputsin, spw_candidates)
 
         # Check to see if data are ACA or not
@@ -560,11 +620,9 @@ class PhaseStabilityHeuristics:
 
         return config
 
-    def _getblflags(self, spw: int, ant1: str | None = None, ant2: str | None = None) \
-            -> tuple[NDArray, NDArray, NDArray, NDArray]:
+    def _getblflags(self, spw: int) -> dict[tuple[int, int, int], float]:
         """
-        Code to open and close the table for the MS
-        and get the baseline based flags in one lump
+        Get the baseline based flags of the MS in one lump
 
         we only pass the spw as previously established
         here the assumption is that any phase RMS issue with
@@ -576,34 +634,12 @@ class PhaseStabilityHeuristics:
 
         Args:
             spw: spectral window to retrieve flagging info for
-            ant1: if provided (together with ant2), then retrieve flagging info
-                only for baseline defined by ant1, ant2
-            ant2: if provided (together with ant1), then retrieve flagging info
-                only for baseline defined by ant1, ant2
 
         Returns:
-             4-tuple containing Numpy arrays for flags, antenna1, antenna2, and field.
+             Flagged fraction of each baseline, keyed by (field id, antenna1
+             id, antenna2 id).
         """
-        # MS reads datadescid not spw id
-        # need to do the conversion to make sure we use
-        # the correct value
-        with casa_tools.MSMDReader(self.vis) as msmd:
-            datadescid = msmd.datadescids(spw=spw)[0]
-
-        with casa_tools.TableReader(self.vis) as tb:
-            if (ant1 is not None) and (ant2 is not None):
-                tb1 = tb.query("ANTENNA1 == %s && ANTENNA2 == %s && DATA_DESC_ID == %s " % (ant1, ant2, datadescid))
-            else:
-                # Speed up - pull everything in one go not per antena, divide out later in main function
-                tb1 = tb.query("DATA_DESC_ID == %s " % (datadescid))
-
-            flags = tb1.getcol('FLAG')  # index is [pol][chan][integration]
-            a1s = tb1.getcol('ANTENNA1')
-            a2s = tb1.getcol('ANTENNA2')
-            field = tb1.getcol('FIELD_ID')
-            tb1.close()
-
-        return flags, a1s, a2s, field
+        return self.blflagfractions.get(spw)
 
     def _log_setup_info(self):
         """
@@ -622,26 +658,25 @@ class PhaseStabilityHeuristics:
         LOG.info(' The median integration time {}'.format(self.difftime))
 
     # Methods used by _do_analysis()
-    def _get_cal_phase(self, ant: int) -> NDArray:
+    def _get_cal_phases(self) -> NDArray:
         """
         Read a caltable file and select the
-        phases from one pol (tested in PIPE692 as sufficient).
+        phases from one pol (tested in PIPE692 as sufficient)
+        of all antennas in one go.
         If those phase data have a flag, the phase
         value is set to nan, which is dealt with in the correct
         way during the rest of the calulation. The phases
         are unwrapped, i.e. solved for the 2PI ambiguitiy
 
-        input required:
-                 ant - the antenna to get the phases for
-
         uses inputs:
-                 self.caltable, self.refantid, self.spw, self.scan
+                 self.caltable, self.refantid, self.spw, self.scan, self.antlist
 
 
-        returns: float array of the phases of an antenna
+        returns: float array of the phases with shape (nant, ntime)
         """
         with casa_tools.TableReader(self.caltable) as tb:
-            tb1 = tb.query("ANTENNA1 == %s && ANTENNA2 == %s && SPECTRAL_WINDOW_ID == %s && SCAN_NUMBER == %s "%(ant, self.refantid, self.spw, self.scan))
+            tb1 = tb.query("ANTENNA2 == %s && SPECTRAL_WINDOW_ID == %s && SCAN_NUMBER == %s "%(self.refantid, self.spw, self.scan))
+            ant1 = tb1.getcol('ANTENNA1')
             cal_phases = tb1.getcol('CPARAM')
             cal_phases = np.angle(cal_phases[0][0])  ## in radians one pol only
 
@@ -654,25 +689,24 @@ class PhaseStabilityHeuristics:
             flags = tb1.getcol('FLAG')  # [0][0]
             tb1.close()
 
-        cal_phases = [val if not flags[0][0][id_u] else np.nan for id_u, val in enumerate(cal_phases)]  # so only one pol used 'X'
-        cal_phases = np.array(cal_phases)
+        cal_phases[flags[0][0]] = np.nan  # so only one pol used 'X'
 
         # Correct wraps in phase stream
         # Note: everything is in radians
-        cal_phases = self.phase_unwrap(cal_phases)
-        return cal_phases
+        return np.array([self.phase_unwrap(cal_phases[ant1 == ant]) for ant in range(len(self.antlist))])
 
     def _phase_rms_caltab(self, antout: list=[], timeScale: float=None) -> dict[str, str]:
         """
-        Run the loop over the caltable, work out the baseline based phases,
-        and calculate the phase RMS. Also get the Phase RMS per antenna (with
-        respect to the refant - i.e. ant based phase RMS).
+        Read the caltable, work out the baseline based phases,
+        and calculate the phase RMS of all baselines at once. Also get the
+        Phase RMS per antenna (with respect to the refant - i.e. ant based
+        phase RMS).
 
         inputs used:
               self.antlist, self.flag_tolerance, self.difftime, self.baselines
 
         calls functions:
-              self._get_cal_phase, self.ave_phase, self.std_overlapping_avg
+              self._get_cal_phases, self.phase_rms
 
         returns:  rms_results{}
         dict keys: blphaserms, bphasermscycle, bllen, blname,
@@ -681,109 +715,56 @@ class PhaseStabilityHeuristics:
 
         # setup the result list
         rms_results = {}
-        rms_results['blphaserms'] = []
-        rms_results['blphasermscycle'] = []
-        rms_results['bllen'] = []
-        rms_results['blname'] = []
-        rms_results['antphaserms'] = []
-        rms_results['antphasermscycle'] = []
-        rms_results['antname'] = []
-
-        # PIPE-1661 baseline based flag awareness - these store flags
-        # that we read in - just in case we 'need' this information
-        rms_results['blflags'] = []
 
-        # Get phase for the reference antenna.
-        pHrefant = self._get_cal_phase(self.refantid)
+        # Get phases for all antennas, i.e. (nant, ntime)
+        phases = self._get_cal_phases()
 
         # Number of antennas.
         nant = len(self.antlist)
 
-        # Loop over every antenna ID.
-        iloop = np.arange(nant-1)
-        for i in iloop:
-            # Ant based parameters
-            pHant1 = self._get_cal_phase(i)
-            rms_results['antname'].append(self.antlist[i])
-
-            # Subtract the phase for reference antenna from the phase for the
-            # current antenna. Because phases can be non-zero, use
-            # pHant1- pHrefant (or) pHrefant - pHant1, depending on which is
-            # smaller antenna index.
-            if self.refantid <= i:
-                pHantalone = pHrefant - pHant1
-            else:
-                pHantalone = pHant1 - pHrefant
-
-            # Make an assessment of flagged data for that antenna
-            if len(pHantalone[np.isnan(pHantalone)]) > self.flag_tolerance*len(pHantalone):
-                rms_results['antphaserms'].append(np.nan)
-                rms_results['antphasermscycle'].append(np.nan)
-
-            else:
-                # Perform averaging over 10s, but work on the corrected w.r.t.
-                # refant. This should be zero but in case there is a jump
-                # (i.e. refant change), then this should now correctly have
-                # taken this out.
-                pHant_ave = self.ave_phase(pHantalone, self.difftime, over=10.0)
-                rmspHant_ave = np.std(np.array(pHant_ave)[np.isfinite(pHant_ave)])
-                rms_results['antphaserms'].append(rmspHant_ave)
-                if timeScale:
-                    rmspHant_ave_cycle = self.std_overlapping_avg(pHant_ave, self.difftime, over=timeScale)
-                    rms_results['antphasermscycle'].append(rmspHant_ave_cycle)
-                else:
-                    rms_results['antphasermscycle'].append(rmspHant_ave)
-
-            jloop = np.arange(i+1, nant)  # baseline loop
-            for j in jloop:
-                # Get the phases - needs to be the single read in table
-
-                # pHant1 is read in above already
-                pHant2 = self._get_cal_phase(j)
-                # phases from cal table come in an order, baseline then is simply the subtraction
-                pH = pHant1 - pHant2
-
-                # fill baseline information now
-                rms_results['blname'].append(self.antlist[i]+'-'+self.antlist[j])
-                # OLD (new) WAY from context - average all as overview
-                # not direcrtly the BP only
-                # rms_results['bllen'].append(float(self.baselines.get_baseline(i,j).length.value)) # from context input
-
-                rms_results['bllen'].append(float(self.baselines[self.antlist[i]+'-'+self.antlist[j]])) # from function
-
-                # PIPE-1661 - get baseline based flags
-                blisflagged = self._isblflagged(i, j)
-
-                rms_results['blflags'].append(blisflagged)
-                ######
-
-                # make assessment if this is a bad antenna
-                if self.antlist[i] in antout or self.antlist[j] in antout:
-                    rms_results['blphaserms'].append(np.nan)
-                    rms_results['blphasermscycle'].append(np.nan)
-
-                # PIPE-1661 assessment (could tie with if above but separated for clarity
-                elif blisflagged:  # can only be T/F bool
-                    rms_results['blphaserms'].append(np.nan)
-                    rms_results['blphasermscycle'].append(np.nan)
-                ###############
-
-                # make an assessment of flagged data
-                elif len(pH[np.isnan(pH)]) > self.flag_tolerance*len(pH):
-                    rms_results['blphaserms'].append(np.nan)
-                    rms_results['blphasermscycle'].append(np.nan)
-
-                else:
-                    # do averaing -> 10s
-                    # need to get time and then rebin
-                    pH_ave = self.ave_phase(pH, self.difftime, over=10.0)  # for thermal/short term noise
-                    rmspH_ave = np.std(np.array(pH_ave)[np.isfinite(pH_ave)])
-                    rms_results['blphaserms'].append(rmspH_ave)
-                    if timeScale:
-                        rmspH_ave_cycle = self.std_overlapping_avg(pH_ave, self.difftime, over=timeScale)
-                        rms_results['blphasermscycle'].append(rmspH_ave_cycle)
-                    else:
-                        rms_results['blphasermscycle'].append(rmspH_ave)
+        # Ant based parameters, for every antenna ID but the last
+        ant_ids = np.arange(nant-1)
+        rms_results['antname'] = [self.antlist[i] for i in ant_ids]
+
+        # Subtract the phase for reference antenna from the phase for the
+        # current antenna. Because phases can be non-zero, use
+        # pHant1- pHrefant (or) pHrefant - pHant1, depending on which is
+        # smaller antenna index.
+        pHrefant = phases[self.refantid]
+        pHantalone = np.where((self.refantid <= ant_ids)[:, np.newaxis],
+                              pHrefant - phases[ant_ids], phases[ant_ids] - pHrefant)
+
+        # Perform averaging over 10s, but work on the corrected w.r.t.
+        # refant. This should be zero but in case there is a jump
+        # (i.e. refant change), then this should now correctly have
+        # taken this out. Antennas with too much flagged data are nan.
+        antphaserms, antphasermscycle = self.phase_rms(pHantalone, self.difftime, self.flag_tolerance, timeScale)
+        rms_results['antphaserms'] = list(antphaserms)
+        rms_results['antphasermscycle'] = list(antphasermscycle)
+
+        # Baselines in the order of the antenna loops (i, j > i)
+        ant1, ant2 = np.triu_indices(nant, k=1)
+        # phases from cal table come in an order, baseline then is simply the subtraction
+        pH = phases[ant1] - phases[ant2]
+
+        # fill baseline information now
+        rms_results['blname'] = [self.antlist[i]+'-'+self.antlist[j] for i, j in zip(ant1, ant2)]
+        rms_results['bllen'] = [float(self.baselines[blname]) for blname in rms_results['blname']]  # from function
+
+        # PIPE-1661 - get baseline based flags
+        rms_results['blflags'] = [self._isblflagged(i, j) for i, j in zip(ant1, ant2)]
+
+        # do averaing -> 10s for thermal/short term noise, and make an
+        # assessment of flagged data
+        blphaserms, blphasermscycle = self.phase_rms(pH, self.difftime, self.flag_tolerance, timeScale)
+
+        # make assessment if this is a bad antenna, or (PIPE-1661) a flagged baseline
+        blbad = np.array([self.antlist[i] in antout or self.antlist[j] in antout for i, j in zip(ant1, ant2)],
+                         dtype=bool) | np.array(rms_results['blflags'], dtype=bool)
+        blphaserms[blbad] = np.nan
+        blphasermscycle[blbad] = np.nan
+        rms_results['blphaserms'] = list(blphaserms)
+        rms_results['blphasermscycle'] = list(blphasermscycle)
 
         # set RMS output in degrees as we want
         for key_res in ['blphaserms', 'blphasermscycle', 'antphaserms', 'antphasermscycle']:
@@ -791,7 +772,7 @@ class PhaseStabilityHeuristics:
 
         return rms_results
 
-    def _isblflagged(self, ant1: int, ant2: int):
+    def _isblflagged(self, ant1: int, ant2: int) -> bool:
         """
         function to make the assessment of
         the flags that are saved and return if the
@@ -799,44 +780,19 @@ class PhaseStabilityHeuristics:
 
         requires the self.blflags
         """
-
-        # in checking the order of data read associated with each antenna
-        # the ordering system is not 100% preordained it seems,
-        # i.e. we have to select each time the index of bls in agreement with
-        # the antenna pair and antenna list - then check the flags
-
-        # simply need to select the correct cut for the baseline in question
-        # start with the bandpass, if totally flagged assume all data flagged
-        # for that baseline
-
-        # speed assumption is we will hit a false before a true
-        # flag for good data, so assume bad, set to good
-        flaggedbl = True
-
-        idbl = np.where((self.blflags[1]==ant1) & (self.blflags[2]==ant2) & (self.blflags[3]==self.fieldId))[0]
-        # loop over correct ant, integration time index
-        for iduse in idbl:
-
-            if self.blflags[0].shape[0]*self.blflags[0].shape[1]!= np.sum(self.blflags[0][:,:,iduse]):
-                flaggedbl = False
-                break
+        # start with the bandpass, if totally flagged (or absent) assume all
+        # data flagged for that baseline
+        if self.blflags.get((self.fieldId, ant1, ant2), 1.0) >= 1.0:
+            return True
 
         # else here for Phase cal check if not flagged in BP
-        if not flaggedbl:
-            flaggedbl = True
-            for phid in self.ph_ids:  # usually one phase cal anyway but loop incase multiple
-                idbl = np.where((self.blflagsref[1] == ant1) & (self.blflagsref[2] == ant2) & (self.blflagsref[3] == phid))[0]
-                for iduse in idbl:
-                    if self.blflagsref[0].shape[0] * self.blflagsref[0].shape[1] != np.sum(self.blflagsref[0][:, :, iduse]):
-                        # if there is unflagged data in this antenna pair and time then
-                        # that baseline is, in fact, not fully flagged
-                        flaggedbl = False
-                        break
-
-        return flaggedbl
+        # usually one phase cal anyway but loop incase multiple; if there is
+        # unflagged data in this antenna pair then that baseline is, in fact,
+        # not fully flagged
+        return all(self.blflagsref.get((phid, ant1, ant2), 1.0) >= 1.0 for phid in self.ph_ids)
 
     def _get_final_spw_and_blflags(self, inputsin, qa_spw_candidates) \
-            -> tuple[int, tuple[NDArray, NDArray, NDArray, NDArray]]:
+            -> tuple[int, dict[tuple[int, int, int], float]]:
         """
         Select the best candidate SpW for the phase decoherence analysis based
         on ranked list and baseline flagging information.
@@ -847,7 +803,7 @@ class PhaseStabilityHeuristics:
         Returns:
             2-Tuple containing:
                 - selected SpW ID (integer)
-                - 4-tuple representing baseline flagging info for selected SpW
+                - flagged fraction of each baseline for selected SpW
         """
         # PIPE-1871: from the ranked list of SpWs, pick the first SpW for which
         # the baselines are not fully flagged.
@@ -860,16 +816,11 @@ class PhaseStabilityHeuristics:
             blflags = self._getblflags(spw=candidate_spwid)
 
             # Check whether for current spw (and bandpass field), all
-            # corresponding baselines rows are entirely flagged in all pol and
-            # all channels:
-            # - blflags[3] represents the field, with shape (nrow).
-            # - blflags[0] represents the flag, with shape (npol, nchan, nrow).
-            # - np.all(blflags[0], (0, 1)) performs an AND on flags in each
-            #   (npol, nchan) plane, i.e. checking for each row if all pol, chan
-            #   are flagged.
+            # corresponding baselines are entirely flagged in all pol, all
+            # channels and all integrations, i.e. have a flagged fraction of 1.
             # If the baselines are not entirely flagged, then keep this Spw as
             # the one to analyse, and stop looking.
-            if not np.all(np.all(blflags[0], (0, 1))[blflags[3] == self.fieldId]):
+            if not all(fraction >= 1.0 for (field, _, _), fraction in blflags.items() if field == self.fieldId):
                 spwid = candidate_spwid
                 break
             else:
@@ -959,7 +910,79 @@ class PhaseStabilityHeuristics:
         return np.median(np.abs(data - np.median(data, axis)), axis)
 
     @staticmethod
-    def std_overlapping_avg(phase: NDArray, diffTime: float, over: float=120.0) -> float:
+    def phase_rms(phase: NDArray, diffTime: float, flag_tolerance: float,
+                  timeScale: float | None = None) -> tuple[NDArray, NDArray]:
+        """
+        Calculate the phase RMS of phase-time streams, after averaging over
+        10s, over the full stream and (if timeScale is given) as the average
+        standard deviation over overlapping windows of timeScale seconds.
+        Streams with more than a fraction flag_tolerance of flagged (nan)
+        values get a nan phase RMS.
+
+        :param phase: unwrapped phases, with shape (nstream, ntime)
+        :param diffTime: the time between each data integration
+        :param flag_tolerance: maximum allowed fraction of flagged values
+        :param timeScale: time in seconds to calculate the overlapping SD over
+        :returns: phase RMS and phase RMS over the time scale of each stream
+        """
+        phase = np.atleast_2d(phase)
+        flagged = np.count_nonzero(np.isnan(phase), axis=-1) > flag_tolerance * phase.shape[-1]
+
+        phase_ave = np.atleast_2d(PhaseStabilityHeuristics.ave_phase(phase, diffTime, over=10.0))
+        _, _, rms = PhaseStabilityHeuristics._window_stats(phase_ave, phase_ave.shape[-1], nwin=1)
+        rms = rms[..., 0]
+        if timeScale:
+            rms_cycle = np.atleast_1d(PhaseStabilityHeuristics.std_overlapping_avg(phase_ave, diffTime, over=timeScale))
+        else:
+            rms_cycle = rms.copy()
+
+        rms[flagged] = np.nan
+        rms_cycle[flagged] = np.nan
+        return rms, rms_cycle
+
+    @staticmethod
+    def _window_stats(phase: NDArray, over: int, nwin: int | None = None) -> tuple[NDArray, NDArray, NDArray]:
+        """
+        Count, mean and standard deviation of the finite values in the
+        overlapping windows phase[..., i:i+over] for i in range(nwin), computed
+        for all windows at once from cumulative sums. The default number of
+        windows is len(phase) - over, as in the overlapping estimators below.
+
+        :param phase: input phases, the windows run along the last axis
+        :param over: window length in elements
+        :param nwin: number of windows
+        :returns: count, mean and standard deviation per window; windows
+            without finite values have nan mean and standard deviation
+        """
+        phase = np.asarray(phase, dtype=np.float64)
+        if nwin is None:
+            nwin = phase.shape[-1] - over
+        nwin = max(nwin, 0)
+
+        finite = np.isfinite(phase)
+        # Remove the mean of each stream to limit the loss of precision in the cumulative sums
+        nfinite = np.count_nonzero(finite, axis=-1)
+        offset = np.where(finite, phase, 0.0).sum(axis=-1) / np.maximum(nfinite, 1)
+        values = np.where(finite, phase - offset[..., np.newaxis], 0.0)
+
+        def window_sum(data):
+            csum = np.cumsum(data, axis=-1)
+            csum = np.concatenate([np.zeros(csum.shape[:-1] + (1,)), csum], axis=-1)
+            return csum[..., over:over + nwin] - csum[..., :nwin]
+
+        count = window_sum(finite.astype(np.float64))
+        sums = window_sum(values)
+        sums2 = window_sum(values**2)
+
+        valid = count > 0
+        safe_count = np.where(valid, count, 1.0)
+        mean = np.where(valid, sums / safe_count, np.nan)
+        var = np.maximum(sums2 / safe_count - (sums / safe_count)**2, 0.0)
+        std = np.where(valid, np.sqrt(var), np.nan)
+        return count, mean + offset[..., np.newaxis], std
+
+    @staticmethod
+    def std_overlapping_avg(phase: NDArray, diffTime: float, over: float=120.0) -> float | NDArray:
         """
         Calculate STD over a set time and return the average of all overlapping
         values of the standard deviation - overlapping estimator. This acts
@@ -971,6 +994,10 @@ class PhaseStabilityHeuristics:
         mean value. RMS with mean or fit removed provides
         the same value for zero-centered phases.
 
+        The standard deviations of all windows (and of all streams, if phase
+        is 2D with time along the last axis) are computed at once from
+        cumulative sums.
+
         :param phase: any unwrapped input phase
         :param diffTime: the time between each data integration
         :param over: time in seconds to calculate the SD over
@@ -980,18 +1007,13 @@ class PhaseStabilityHeuristics:
         # Overlap in elements
         over = int(np.round(over / diffTime))
 
-        # Use nan versions of numpy functions as some elements of 'phase' might be np.nan to indicate that it was flagged
-        std_hold = []
-
-        # Loop over the data in range rounded to size of time step
-        for i in range(len(phase) - over):
-            std_hold.append(
-                np.nanstd(np.array(phase[i:i+over]))
-            )
-
-        std_mean = np.nanmean(std_hold)
+        # Windows with only flagged (nan) elements have a nan standard deviation, and are ignored in the average
+        _, _, std_hold = PhaseStabilityHeuristics._window_stats(phase, over)
+        nvalid = np.count_nonzero(np.isfinite(std_hold), axis=-1)
+        std_mean = np.where(nvalid > 0, np.where(np.isfinite(std_hold), std_hold, 0.0).sum(axis=-1) /
+                            np.maximum(nvalid, 1), np.nan)
 
-        return std_mean
+        return std_mean if std_mean.ndim > 0 else float(std_mean)
 
     @staticmethod
     def ave_phase(phase: NDArray, diffTime: NDArray, over: float=1.0) -> NDArray:
@@ -1002,7 +1024,8 @@ class PhaseStabilityHeuristics:
         If input phases from the gain table have integration(diffTime) > 10s
         then no averaging is made.
 
-        :param phase: phase series of the data to average
+        :param phase: phase series of the data to average, or 2D array of
+            phase series with time along the last axis
         :param diffTime: the average difference in time between each data value, i.e. each phase
         :param over: the time to average over - default is 1s
         :returns: array of averaged phases
@@ -1011,12 +1034,8 @@ class PhaseStabilityHeuristics:
         # Make an int for using elements
         # There will be slight but minimal inaccuracies due to long timegaps in the data
         if over > 1.0:
-            mean_hold = []
-            for i in range(len(phase) - over):
-                # Average/smooth the data and ignore the nan values
-                mean_hold.append(
-                    np.mean(np.array(phase[i:i+over])[~np.isnan(phase[i:i+over])])
-                    )
+            # Average/smooth the data and ignore the nan values
+            _, mean_hold, _ = PhaseStabilityHeuristics._window_stats(phase, over)
         else:
             mean_hold = phase
 
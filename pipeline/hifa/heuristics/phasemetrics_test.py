@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+import pytest
+
+from pipeline.infrastructure import logging
+
+from .phasemetrics import PhaseStabilityHeuristics
+
+LOG = logging.get_logger(__name__)
+
+
+def _loop_ave_phase(phase, diffTime, over):
+    """Reference moving average, one window at a time."""
+    over = int(np.round(over / diffTime))
+    if over <= 1:
+        return phase
+    return np.array([np.mean(phase[i:i+over][~np.isnan(phase[i:i+over])]) for i in range(len(phase) - over)])
+
+
+def _loop_std_overlapping_avg(phase, diffTime, over):
+    """Reference overlapping standard deviation estimator, one window at a time."""
+    over = int(np.round(over / diffTime))
+    return np.nanmean([np.nanstd(phase[i:i+over]) for i in range(len(phase) - over)])
+
+
+def _synthetic_phases(nstream, ntime, flag_fraction, seed=2):
+    """Unwrapped random-walk phases of long baselines with randomly flagged integrations."""
+    rng = np.random.default_rng(seed)
+    phases = np.cumsum(rng.normal(0.0, 0.2, (nstream, ntime)), axis=1) + rng.uniform(-50, 50, (nstream, 1))
+    phases[rng.random(phases.shape) < flag_fraction] = np.nan
+    return phases
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+@pytest.mark.parametrize('diff_time, time_scale', [(6.0, 120.0), (2.0, 300.0), (12.0, 60.0)])
+def test_overlapping_estimators_match_loops(diff_time, time_scale):
+    """Test that the cumulative-sum estimators match the window-by-window calculation."""
+    phases = _synthetic_phases(20, 200, flag_fraction=0.1)
+    # one fully flagged stream, and one with a fully flagged window
+    phases[3] = np.nan
+    phases[4, 10:60] = np.nan
+
+    averaged = PhaseStabilityHeuristics.ave_phase(phases, diff_time, over=10.0)
+    std_mean = PhaseStabilityHeuristics.std_overlapping_avg(averaged, diff_time, over=time_scale)
+
+    for stream, stream_averaged, stream_std in zip(phases, averaged, std_mean):
+        expected = _loop_ave_phase(stream, diff_time, 10.0)
+        assert np.allclose(stream_averaged, expected, rtol=1e-7, atol=1e-10, equal_nan=True)
+        assert np.allclose(stream_std, _loop_std_overlapping_avg(expected, diff_time, time_scale),
+                           rtol=1e-7, atol=1e-10, equal_nan=True)
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_phase_rms_flag_tolerance():
+    """Test that streams with too many flagged integrations get a nan phase RMS."""
+    phases = _synthetic_phases(3, 100, flag_fraction=0.0)
+    phases[1, :40] = np.nan
+
+    rms, rms_cycle = PhaseStabilityHeuristics.phase_rms(phases, 6.0, flag_tolerance=0.3, timeScale=120.0)
+
+    assert np.isfinite(rms[[0, 2]]).all() and np.isfinite(rms_cycle[[0, 2]]).all()
+    assert np.isnan(rms[1]) and np.isnan(rms_cycle[1])
+    expected = np.std(_loop_ave_phase(phases[0], 6.0, 10.0))
+    assert np.isclose(rms[0], expected, rtol=1e-10)
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_phase_rms_matches_loops():
+    """Test that the batched phase RMS matches per-baseline loops on a 20 minute scan of 2 s integrations."""
+    phases = _synthetic_phases(10, 600, flag_fraction=0.02)
+
+    expected = [_loop_std_overlapping_avg(_loop_ave_phase(stream, 2.0, 10.0), 2.0, 600.0) for stream in phases]
+    _, rms_cycle = PhaseStabilityHeuristics.phase_rms(phases, 2.0, flag_tolerance=0.3, timeScale=600.0)
+
+    assert np.allclose(rms_cycle, expected, rtol=1e-7)
+
+
+@pytest.mark.benchmark
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_phase_rms_benchmark():
+    """Benchmark the batched phase RMS against per-baseline loops on a long-baseline configuration."""
+    # 25 antennas, i.e. 300 baselines, and a 20 minute bandpass scan of 2 s integrations
+    phases = _synthetic_phases(25 * 24 // 2, 600, flag_fraction=0.02)
+
+    t0 = time.perf_counter()
+    expected = [_loop_std_overlapping_avg(_loop_ave_phase(stream, 2.0, 10.0), 2.0, 600.0) for stream in phases]
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _, rms_cycle = PhaseStabilityHeuristics.phase_rms(phases, 2.0, flag_tolerance=0.3, timeScale=600.0)
+    t_batched = time.perf_counter() - t0
+    LOG.info('Phase RMS of %d baselines: loop %.3f s, batched %.3f s', len(phases), t_loop, t_batched)
+
+    assert np.allclose(rms_cycle, expected, rtol=1e-7)
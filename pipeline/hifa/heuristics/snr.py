@@ -7,14 +7,15 @@ import sys
 from copy import deepcopy
 from typing import TYPE_CHECKING
 
+import cachetools
 import numpy as np
 
 import pipeline.infrastructure as infrastructure
 from pipeline.h.heuristics.tsysfieldmap import get_intent_to_tsysfield_map
 from pipeline.h.tasks.importdata.fluxes import ORIGIN_XML, ORIGIN_ANALYSIS_UTILS
 from pipeline.hifa.tasks.importdata.dbfluxes import ORIGIN_DB
-from pipeline.infrastructure import casa_tasks
 from pipeline.infrastructure import casa_tools
+from pipeline.infrastructure.utils.flagsummary import get_flag_summary
 from pipeline.infrastructure.utils.math import round_up
 
 if TYPE_CHECKING:
@@ -48,6 +49,16 @@ PREFERRED_ORIGIN_ORDER = {
     str(ORIGIN_XML): 3
 }
 
+# Column of the SYSCAL table holding the spectra of each temperature type
+SYSCAL_TEMPERATURE_COLUMNS = {
+    'tsys': 'TSYS_SPECTRUM',
+    'trx': 'TRX_SPECTRUM',
+    'tsky': 'TSKY_SPECTRUM',
+}
+
+# SYSCAL table caches, keyed by MS name
+_SYSCAL_CACHE = cachetools.LRUCache(maxsize=8)
+
 
 def estimate_gaincalsnr(ms, fieldlist, intent, spwidlist, compute_nantennas,
                         max_fracflagged, edge_fraction):
@@ -480,6 +491,100 @@ def make_tsyslists(spwlist, tsysdict):
     return tsys_spwlist, scan_list
 
 
+class _SyscalCache:
+    """In-memory copy of the SYSCAL table of an MS for median temperature queries.
+
+    The TIME, INTERVAL, ANTENNA_ID and SPECTRAL_WINDOW_ID columns are read when
+    the cache is created. The median of each row of the temperature spectra is
+    computed, one spw at a time, on the first query of a temperature type.
+    """
+
+    def __init__(self, vis: str):
+        self.vis = vis
+        self.fingerprint = _syscal_fingerprint(vis)
+        self._row_medians = {}
+
+        with casa_tools.TableReader(os.path.join(vis, 'SYSCAL')) as table:
+            self.antennas = table.getcol('ANTENNA_ID')
+            if len(self.antennas) < 1:
+                return
+
+            time_colkeywords = table.getcolkeywords('TIME')
+            self.time_unit = time_colkeywords['QuantumUnits'][0]
+
+            # Compute the time range of validity for each tsys measurement
+            # PIPE-775: This considers the time to be the central time
+            tsys_times = table.getcol('TIME')
+            tsys_intervals = table.getcol('INTERVAL')
+            self.start_times = tsys_times - 0.5 * tsys_intervals
+            self.end_times = self.start_times + tsys_intervals
+
+            self.spws = table.getcol('SPECTRAL_WINDOW_ID')
+            self.unique_spws = np.unique(self.spws)
+
+    def __len__(self) -> int:
+        return len(self.antennas)
+
+    def match_scans(self, unique_scans: list[int], begin_scan_times: list[dict],
+                    end_scan_times: list[dict]) -> np.ndarray:
+        """Return the first scan whose time range overlaps the validity interval of each row.
+
+        Args:
+            unique_scans: Sorted list of scan ids.
+            begin_scan_times: Start epoch of each scan.
+            end_scan_times: End epoch of each scan.
+
+        Returns:
+            Scan id per SYSCAL row, 0 for rows that do not match any scan.
+        """
+        qt = casa_tools.quanta
+        begin = np.array([qt.convert(epoch['m0'], self.time_unit)['value'] for epoch in begin_scan_times])
+        end = np.array([qt.convert(epoch['m0'], self.time_unit)['value'] for epoch in end_scan_times])
+
+        # Scan starts after end of validity interval or ends before the
+        # beginning of the validity interval.
+        overlaps = ~((begin[np.newaxis, :] > self.end_times[:, np.newaxis]) |
+                     (end[np.newaxis, :] < self.start_times[:, np.newaxis]))
+        scanids = np.zeros(len(self), dtype=np.int32)
+        matched = overlaps.any(axis=1)
+        scanids[matched] = np.asarray(unique_scans)[overlaps[matched].argmax(axis=1)]
+        return scanids
+
+    def row_medians(self, temptype: str) -> np.ndarray:
+        """Return the median of the temperature spectrum of each SYSCAL row."""
+        if temptype not in self._row_medians:
+            column = SYSCAL_TEMPERATURE_COLUMNS[temptype]
+            medians = np.empty(len(self), dtype=np.float64)
+            with casa_tools.TableReader(os.path.join(self.vis, 'SYSCAL')) as table:
+                for spw in self.unique_spws:
+                    rows = np.flatnonzero(self.spws == spw)
+                    subtable = table.selectrows(rows.tolist())
+                    try:
+                        spectra = subtable.getcol(column)
+                    finally:
+                        subtable.close()
+                    medians[rows] = np.median(spectra.reshape(-1, len(rows)), axis=0)
+            self._row_medians[temptype] = medians
+        return self._row_medians[temptype]
+
+
+def _syscal_fingerprint(vis: str) -> tuple:
+    """Return the latest modification time of the SYSCAL table of an MS and its files."""
+    syscal = os.path.join(vis, 'SYSCAL')
+    with os.scandir(syscal) as entries:
+        mtimes = [entry.stat().st_mtime_ns for entry in entries]
+    return max(mtimes + [os.stat(syscal).st_mtime_ns]), len(mtimes)
+
+
+def _get_syscal_cache(vis: str) -> _SyscalCache:
+    """Return the SYSCAL table cache of an MS, rereading it if the table was modified."""
+    cache = _SYSCAL_CACHE.get(vis)
+    if cache is None or cache.fingerprint != _syscal_fingerprint(vis):
+        cache = _SyscalCache(vis)
+        _SYSCAL_CACHE[vis] = cache
+    return cache
+
+
 def get_mediantemp(ms, tsys_spwlist, scan_list, antenna='', temptype='tsys'):
     """Get median Tsys, Trx, or Tsky temperatures as a function of spw and return
     a dictionary
@@ -506,7 +611,7 @@ def get_mediantemp(ms, tsys_spwlist, scan_list, antenna='', temptype='tsys'):
     LOG.info('Estimating Tsys temperatures')
 
     # Temperature type must be one of 'tsys' or 'trx' or 'tsky'
-    if temptype not in ['tsys', 'trx', 'tsky']:
+    if temptype not in SYSCAL_TEMPERATURE_COLUMNS:
         return medtempsdict
 
     # Get list of unique scan ids.
@@ -531,100 +636,43 @@ def get_mediantemp(ms, tsys_spwlist, scan_list, antenna='', temptype='tsys'):
         LOG.debug('scan %d start %s end %s' % (scan, start_time, end_time))
 
     # Get the syscal table meta data.
-    with casa_tools.TableReader(os.path.join(ms.name, 'SYSCAL')) as table:
-
-        # Get the antenna ids
-        tsys_antennas = table.getcol('ANTENNA_ID')
-        if len(tsys_antennas) < 1:
-            LOG.warning('The SYSCAL table is blank in MS %s' % ms.basename)
-            return medtempsdict
-
-        # Get columns and tools needed to understand the tsys times
-        time_colkeywords = table.getcolkeywords('TIME')
-        time_unit = time_colkeywords['QuantumUnits'][0]
-        time_ref = time_colkeywords['MEASINFO']['Ref']
-        mt = casa_tools.measures
-        qt = casa_tools.quanta
+    syscal = _get_syscal_cache(ms.name)
+    if len(syscal) < 1:
+        LOG.warning('The SYSCAL table is blank in MS %s' % ms.basename)
+        return medtempsdict
 
-        # Get time and intervals
-        tsys_times = table.getcol('TIME')
-        tsys_intervals = table.getcol('INTERVAL')
-
-        # Compute the time range of validity for each tsys measurement
-        #    Worry about memory efficiency later
-        # PIPE-775: This considers the time to be the central time
-        tsys_start_times = tsys_times - 0.5 * tsys_intervals
-        tsys_end_times = tsys_start_times + tsys_intervals
-
-        # Get the spw ids
-        tsys_spws = table.getcol('SPECTRAL_WINDOW_ID')
-        tsys_uniqueSpws = np.unique(tsys_spws)
-
-        # Create a scan id array and populate it with zeros
-        scanids = np.zeros(len(tsys_start_times), dtype=np.int32)
-
-        # Determine if a tsys measurement matches the scan interval
-        #    If it does  set the scan to the scan id
-        nmatch = 0
-        for i in range(len(tsys_start_times)):
-
-            # Time conversions
-            #    Not necessary if scan begin and end times are not converted
-            tstart = mt.epoch(time_ref, qt.quantity(tsys_start_times[i], time_unit))
-            tend = mt.epoch(time_ref, qt.quantity(tsys_end_times[i], time_unit))
-            LOG.debug('row %d start %s end %s' % (i, tstart, tend))
-
-            # Scan starts after end of validity interval or ends before
-            # the beginning of the validity interval.
-            for j, scan in enumerate(unique_scans):
-                if (begin_scan_times[j]['m0']['value'] > tend['m0']['value'] or
-                    end_scan_times[j]['m0']['value'] < tstart['m0']['value']):
-                    continue
-                if scanids[i] <= 0:
-                    scanids[i] = unique_scans[j]
-                    nmatch = nmatch + 1
-
-        if nmatch <= 0:
-            LOG.warning('No SYSCAL table row matches for scans %s tsys spws %s in MS %s' %
-                        (unique_scans, tsys_spwlist, ms.basename))
-            return medtempsdict
-        else:
-            LOG.info('    SYSCAL table row matches for scans %s Tsys spws %s %d / %d' %
-                     (unique_scans, tsys_spwlist, nmatch, len(tsys_start_times)))
+    # Determine if a tsys measurement matches the scan interval
+    #    If it does  set the scan to the scan id
+    scanids = syscal.match_scans(unique_scans, begin_scan_times, end_scan_times)
+    nmatch = np.count_nonzero(scanids)
+    if nmatch <= 0:
+        LOG.warning('No SYSCAL table row matches for scans %s tsys spws %s in MS %s' %
+                    (unique_scans, tsys_spwlist, ms.basename))
+        return medtempsdict
+    else:
+        LOG.info('    SYSCAL table row matches for scans %s Tsys spws %s %d / %d' %
+                 (unique_scans, tsys_spwlist, nmatch, len(syscal)))
 
     # Get a list of unique antenna ids.
     if antenna == '':
         unique_antenna_ids = [a.id for a in ms.get_antenna()]
     else:
         unique_antenna_ids = [ms.get_antenna(search_term=antenna)[0].id]
+    antenna_rows = np.isin(syscal.antennas, unique_antenna_ids)
 
     # Loop over the spw and scan list which have the same length
     for spw, scan in zip(tsys_spwlist, scan_list):
 
         # If no Tsys data skip to the next window
-        if spw not in tsys_uniqueSpws:
+        if spw not in syscal.unique_spws:
             LOG.warning('Tsys spw %d is not in the SYSCAL table for MS %s' %
                         (spw, ms.basename))
             continue
             # return medtempsdict
 
-        # Loop over the rows
-        medians = []
-        with casa_tools.TableReader(os.path.join(ms.name, 'SYSCAL')) as table:
-            for i in range(len(tsys_antennas)):
-                if tsys_spws[i] != spw:
-                    continue
-                if tsys_antennas[i] not in unique_antenna_ids:
-                    continue
-                if scan != scanids[i]:
-                    continue
-                if temptype == 'tsys':
-                    tsys = table.getcell('TSYS_SPECTRUM', i)
-                elif temptype == 'trx':
-                    tsys = table.getcell('TRX_SPECTRUM', i)
-                elif temptype == 'tsky':
-                    tsys = table.getcell('TSKY_SPECTRUM', i)
-                medians.append(np.median(tsys))
+        # Select the rows of the spw, antennas and scan
+        rows = (syscal.spws == spw) & antenna_rows & (scanids == scan)
+        medians = syscal.row_medians(temptype)[rows]
 
         if len(medians) > 0:
             medtempsdict[spw] = np.median(medians)
@@ -657,12 +705,8 @@ def _get_unflagged_antennas(vis, scanidlist, ants12m, ants7m, max_fracflagged=0.
         nunflagged_7mantennas: number of unflagged 7m antennas
     """
 
-    # Execute the CASA flagdata task for the specified bandpass scans
-    #     Format the id list for CASA
-    #     Execute task
-    scanidstr = ','.join([str(scanid) for scanid in scanidlist])
-    flagdata_task = casa_tasks.flagdata(vis=vis, scan=scanidstr, mode='summary')
-    flagdata_result = flagdata_task.execute()
+    # Retrieve the flag summary for the specified bandpass scans
+    flagdata_result = get_flag_summary(vis, scan=scanidlist)
 
     # Initialize the statistics per scan
     unflagged_12mantennas = []
@@ -999,8 +1043,7 @@ def compute_gaincalsnr(ms, spwlist, spw_dict, intent, edge_fraction):
 
     # PIPE-788: retrieve the fraction of flagged data
     scans = set(np.hstack([spw_dict[spwid]['snr_scans'] for spwid in spwlist]))
-    flag_task = casa_tasks.flagdata(vis=ms.name, scan=','.join(map(str, list(scans))), mode='summary')
-    flag_result = flag_task.execute()
+    flag_result = get_flag_summary(ms.name, scan=sorted(int(scan) for scan in scans))
 
     # PIPE-2499: log whether combine and solint will be set based on integration
     # time or scan time.
@@ -0,0 +1,113 @@
+import os
+import types
+
+import numpy as np
+import pytest
+
+from . import snr
+from .snr import _get_syscal_cache
+
+
+class _FakeTableReader:
+    """Table reader of the SYSCAL tables of the class attribute tables, keyed by path, counting the opens."""
+    tables = {}
+    nopen = 0
+
+    def __init__(self, name, columns=None):
+        self.columns = self.tables[name] if columns is None else columns
+        if columns is None:
+            _FakeTableReader.nopen += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def getcol(self, name):
+        return self.columns[name]
+
+    def getcolkeywords(self, name):
+        return {'QuantumUnits': ['s']}
+
+    def selectrows(self, rows):
+        return _FakeTableReader(None, {name: col[..., rows] for name, col in self.columns.items()})
+
+    def close(self):
+        pass
+
+
+def _make_ms(path, nant=3, nspw=2, seed=4):
+    """MS directory with an (empty) SYSCAL table, and the columns of its fake table."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(path, 'SYSCAL'))
+    with open(os.path.join(path, 'SYSCAL', 'table.f0'), 'w') as f:
+        f.write('syscal')
+    nrow = nant * nspw * 2
+    columns = {
+        'ANTENNA_ID': np.tile(np.arange(nant), nspw * 2),
+        'SPECTRAL_WINDOW_ID': np.repeat(np.tile(np.arange(nspw), 2), nant),
+        'TIME': np.repeat([100.0, 200.0], nant * nspw),
+        'INTERVAL': np.full(nrow, 10.0),
+        'TSYS_SPECTRUM': rng.uniform(50.0, 150.0, (2, 8, nrow)),
+    }
+    return str(path), columns
+
+
+@pytest.fixture
+def syscal_tables(monkeypatch, tmp_path):
+    tables = {}
+    for name in ('a.ms', 'b.ms'):
+        vis, columns = _make_ms(tmp_path / name)
+        tables[os.path.join(vis, 'SYSCAL')] = columns
+    monkeypatch.setattr(_FakeTableReader, 'tables', tables)
+    monkeypatch.setattr(_FakeTableReader, 'nopen', 0)
+    monkeypatch.setattr(snr, 'casa_tools', types.SimpleNamespace(TableReader=_FakeTableReader))
+    monkeypatch.setattr(snr, '_SYSCAL_CACHE', {})
+    return str(tmp_path / 'a.ms'), str(tmp_path / 'b.ms'), tables
+
+
+def test_syscal_cache_row_medians(syscal_tables):
+    """Test that the row medians of the temperature spectra are computed once per temperature type."""
+    vis, _, tables = syscal_tables
+    spectra = tables[os.path.join(vis, 'SYSCAL')]['TSYS_SPECTRUM']
+
+    cache = _get_syscal_cache(vis)
+    medians = cache.row_medians('tsys')
+
+    np.testing.assert_allclose(medians, np.median(spectra.reshape(-1, spectra.shape[-1]), axis=0))
+    assert cache.row_medians('tsys') is medians
+    assert _FakeTableReader.nopen == 2
+
+
+def test_syscal_cache_reused(syscal_tables):
+    """Test that repeated lookups of an unchanged MS reuse the cache, and that each MS has its own cache."""
+    vis_a, vis_b, _ = syscal_tables
+
+    cache = _get_syscal_cache(vis_a)
+
+    assert _get_syscal_cache(vis_a) is cache
+    assert _get_syscal_cache(vis_b) is not cache
+    assert _get_syscal_cache(vis_a) is cache
+    assert _FakeTableReader.nopen == 2
+
+
+def test_syscal_cache_invalidated(syscal_tables):
+    """Test that the cache is reread after the SYSCAL table is modified."""
+    vis, _, _ = syscal_tables
+    cache = _get_syscal_cache(vis)
+
+    # a later modification time of a table file
+    filename = os.path.join(vis, 'SYSCAL', 'table.f0')
+    mtime = os.stat(filename).st_mtime_ns + 10 ** 9
+    os.utime(filename, ns=(mtime, mtime))
+    modified = _get_syscal_cache(vis)
+    assert modified is not cache
+
+    # a new table file, with an unchanged modification time of the table
+    with open(os.path.join(vis, 'SYSCAL', 'table.f1'), 'w') as f:
+        f.write('syscal')
+    os.utime(os.path.join(vis, 'SYSCAL', 'table.f1'), ns=(mtime, mtime))
+    os.utime(os.path.join(vis, 'SYSCAL'), ns=(mtime, mtime))
+    assert _get_syscal_cache(vis) is not modified
+    assert _FakeTableReader.nopen == 3
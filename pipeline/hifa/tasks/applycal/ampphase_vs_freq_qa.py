@@ -4,6 +4,7 @@ import collections
 import functools
 import operator
 import os
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import TYPE_CHECKING
@@ -12,6 +13,7 @@ import numpy as np
 import scipy.optimize
 
 import pipeline.infrastructure as infrastructure
+import pipeline.infrastructure.mpihelpers as mpihelpers
 from pipeline.domain.measures import FrequencyUnits
 
 from . import mswrapper, qa_utils
@@ -102,17 +104,20 @@ def score_all_scans(
         flag_all: bool,
         memory_gb: float,
         buffer_path: Path,
-        export_mswrappers: bool
+        export_mswrappers: bool,
+        parallel: bool = True
 ) -> list[Outlier]:
     """
     Calculate amp/phase vs freq and time outliers for an EB and filter out outliers.
     :param ms: The measurement set.
     :param intent: scan intent.
     :param flag_all: True if all data should be flagged as a QA fail.
-    :param memory_gb: Max memory allowed in gb.
+    :param memory_gb: Max memory allowed in gb (per spw averaging job).
     :param buffer_path: Folder where saved average visibilities are, if any.
     :param export_mswrappers: True if snapshots (pickles) of the computed state
         should be saved to accelerate subsequent runs during development and debugging.
+    :param parallel: True if the visibility averages of different spws may be
+        computed in parallel by the TaskQueue workers, if available.
     :return: list of Outlier objects
     """
     outliers = []
@@ -125,9 +130,31 @@ def score_all_scans(
     unit_factor = qa_utils.get_unit_factor(ms)
     antenna_ids = [antenna.id for antenna in scans[0].antennas]
 
-    for scan in scans:
-        spws = sorted([spw for spw in scan.spws if spw.type in ('FDM', 'TDM')],
-                      key=operator.attrgetter('id'))
+    scan_spws = [
+        (scan, sorted([spw for spw in scan.spws if spw.type in ('FDM', 'TDM')], key=operator.attrgetter('id')))
+        for scan in scans
+    ]
+
+    # Compute the averaged visibilities of all scans that have no saved
+    # averages, reading the MS once per spw, with the spws in parallel
+    scans_to_average = collections.defaultdict(list)
+    for scan, spws in scan_spws:
+        for spw in spws:
+            if not os.path.exists(buffer_path / f'buf.{ms.basename}.{int(scan.id)}.{spw.id}.pkl'):
+                scans_to_average[spw.id].append(int(scan.id))
+
+    averaged = {}
+    if scans_to_average:
+        with mpihelpers.TaskQueue(parallel=parallel and len(scans_to_average) > 1) as tq:
+            for spw_id, scan_ids in scans_to_average.items():
+                LOG.info('Applycal QA analysis: averaging {} scans {} spw {}'.format(ms.basename, scan_ids, spw_id))
+                tq.add_functioncall(mswrapper.MSWrapper.create_averages_for_scans, ms.name, scan_ids, spw_id,
+                                    memory_gb)
+            for spw_id, spw_wrappers in zip(scans_to_average, tq.get_results()):
+                for scan_id, wrapper in spw_wrappers.items():
+                    averaged[(scan_id, spw_id)] = wrapper
+
+    for scan, spws in scan_spws:
         for spw in spws:
             LOG.info('Applycal QA analysis: processing {} scan {} spw {}'.format(ms.basename, scan.id, spw.id))
 
@@ -135,13 +162,13 @@ def score_all_scans(
 
             # are there saved averaged visbilities?
             saved_visibility = buffer_path / f'buf.{ms.basename}.{int(scan.id)}.{spw.id}.pkl'
-            if os.path.exists(saved_visibility):
-                wrapper = mswrapper.MSWrapper(ms, scan.id, spw.id)
-                wrapper.load(saved_visibility)
-            else:
-                wrapper = mswrapper.MSWrapper.create_averages_from_ms(ms.name, int(scan.id), spw.id, memory_gb)
+            if (int(scan.id), spw.id) in averaged:
+                wrapper = averaged[(int(scan.id), spw.id)]
                 if export_mswrappers:
                     wrapper.save(saved_visibility)
+            else:
+                wrapper = mswrapper.MSWrapper(ms, scan.id, spw.id)
+                wrapper.load(saved_visibility)
 
             wrappers.setdefault(spw.id, []).append(wrapper)
 
@@ -206,6 +233,10 @@ def get_best_fits_per_ant(wrapper: mswrapper.MSWrapper, frequencies: NDArray) ->
     antenna, returning a list of AntennaFit objects that characterise the fit
     parameters and fit uncertainties per fit.
 
+    The high S/N fits of all antennas and polarisations are solved together
+    by get_batched_fits; the iterative per-antenna fits are only used for the
+    fits that the batched solver could not converge.
+
     :param wrapper: MSWrapper to process.
     :param frequencies: The frequencies.
     :return: list of AntennaFit objects
@@ -220,16 +251,24 @@ def get_best_fits_per_ant(wrapper: mswrapper.MSWrapper, frequencies: NDArray) ->
     pol_indices = tuple(np.where((wrapper.corr_axis=='XX') | (wrapper.corr_axis=='YY'))[0])
 
     all_fits = []
+    if not pol_indices:
+        return all_fits
 
-    for ant in range(num_antennas):
-        bandwidth = np.ma.max(frequencies) - np.ma.min(frequencies)
-        band_midpoint = (np.ma.max(frequencies) + np.ma.min(frequencies)) / 2.0
-        frequency_scale = 1.0 / bandwidth
+    bandwidth = np.ma.max(frequencies) - np.ma.min(frequencies)
+    band_midpoint = (np.ma.max(frequencies) + np.ma.min(frequencies)) / 2.0
+    frequency_scale = 1.0 / bandwidth
 
-        amp_model_fn = get_linear_function(band_midpoint, frequency_scale)
-        ang_model_fn = get_angular_linear_function(band_midpoint, frequency_scale)
+    amp_model_fn = get_linear_function(band_midpoint, frequency_scale)
+    ang_model_fn = get_angular_linear_function(band_midpoint, frequency_scale)
 
-        for pol in pol_indices:
+    t_start = time.perf_counter()
+    batch = get_batched_fits(frequencies, t_avg[:, list(pol_indices), :], t_sigma[:, list(pol_indices), :],
+                             band_midpoint, frequency_scale)
+    t_batch = time.perf_counter() - t_start
+    num_fallback = 0
+
+    for ant in range(num_antennas):
+        for ipol, pol in enumerate(pol_indices):
             visibilities = t_avg[ant, pol, :]
             ta_sigma = t_sigma[ant, pol, :]
 
@@ -237,29 +276,30 @@ def get_best_fits_per_ant(wrapper: mswrapper.MSWrapper, frequencies: NDArray) ->
                 LOG.info('Could not fit ant {} pol {}: data is completely flagged'.format(ant, pol))
                 continue
 
-            # PIPE-884: as of NumPy ver1.20, ma.abs() doesn't convert MaskedArray fill_value to float automatically. This
-            # introduces a casting-related ComplexWarning when the result is passed to ma.median(). We mitigate the warning
-            # by using the real part of filled value explicitly. See also below.
-            median_sn = np.ma.median(np.ma.abs(visibilities).real / np.ma.abs(ta_sigma).real)
-            if median_sn > 3:  # PIPE-401: Check S/N and either fit or use average
-                # Fit the amplitude
-                try:
-                    amp_fit, amp_err = get_amp_fit(amp_model_fn, frequencies, visibilities, ta_sigma)
-                    amplitude_fit = to_linear_fit_parameters(amp_fit, amp_err)
-                except TypeError:
-                    # Antenna probably flagged..
-                    LOG.info('Could not fit phase vs frequency for ant {} pol {} (high S/N; amp. vs frequency)'.format(
-                        ant, pol))
-                    continue
-                # Fit the phase
-                try:
-                    phase_fit, phase_err = get_phase_fit(amp_model_fn, ang_model_fn, frequencies, visibilities, ta_sigma)
-                    phase_fit = to_linear_fit_parameters(phase_fit, phase_err)
-                except TypeError:
-                    # Antenna probably flagged..
-                    LOG.info('Could not fit phase vs frequency for ant {} pol {} (high S/N; phase vs frequency)'.format(
-                        ant, pol))
-                    continue
+            if batch.high_sn[ant, ipol]:  # PIPE-401: Check S/N and either fit or use average
+                if batch.converged[ant, ipol]:
+                    amplitude_fit = to_linear_fit_parameters(batch.amp_fit[ant, ipol], batch.amp_err[ant, ipol])
+                    phase_fit = to_linear_fit_parameters(batch.phase_fit[ant, ipol], batch.phase_err[ant, ipol])
+                else:
+                    num_fallback += 1
+                    # Fit the amplitude
+                    try:
+                        amp_fit, amp_err = get_amp_fit(amp_model_fn, frequencies, visibilities, ta_sigma)
+                        amplitude_fit = to_linear_fit_parameters(amp_fit, amp_err)
+                    except TypeError:
+                        # Antenna probably flagged..
+                        LOG.info('Could not fit phase vs frequency for ant {} pol {} (high S/N; amp. vs frequency)'.format(
+                            ant, pol))
+                        continue
+                    # Fit the phase
+                    try:
+                        phase_fit, phase_err = get_phase_fit(amp_model_fn, ang_model_fn, frequencies, visibilities, ta_sigma)
+                        phase_fit = to_linear_fit_parameters(phase_fit, phase_err)
+                    except TypeError:
+                        # Antenna probably flagged..
+                        LOG.info('Could not fit phase vs frequency for ant {} pol {} (high S/N; phase vs frequency)'.format(
+                            ant, pol))
+                        continue
             else:
                 LOG.debug('Low S/N for ant {} pol {}'.format(ant, pol))
                 # 'Fit' the amplitude
@@ -310,6 +350,11 @@ def get_best_fits_per_ant(wrapper: mswrapper.MSWrapper, frequencies: NDArray) ->
             fit_obj = AntennaFit(spw=wrapper.spw, scan=stdListStr(wrapper.scan), ant=ant, pol=pol, amp=amplitude_fit, phase=phase_fit)
             all_fits.append(fit_obj)
 
+    LOG.debug('Amp/phase vs frequency fits for spw {} scan {}: {} batched fits in {:.3f} s, {} per-antenna '
+              'fallback fits, {:.3f} s in total'.format(wrapper.spw, stdListStr(wrapper.scan),
+                                                         int(np.sum(batch.converged)), t_batch, num_fallback,
+                                                         time.perf_counter() - t_start))
+
     return all_fits
 
 
@@ -930,6 +975,216 @@ def fit_angular_model(angular_model: Callable, nu: NDArray, angdata: NDArray, an
     return fitres
 
 
+@dataclass
+class BatchedFits:
+    """
+    BatchedFits holds the amp/phase vs frequency best fits of a set of spectra
+
+    All arrays have the leading shape of the input spectra, e.g. (ant, pol),
+    with the last axis of the fit arrays holding (slope, intercept).
+    """
+    high_sn: NDArray
+    converged: NDArray
+    amp_fit: NDArray
+    amp_err: NDArray
+    phase_fit: NDArray
+    phase_err: NDArray
+
+
+def get_batched_fits(
+        frequencies: NDArray,
+        visibilities: NDArray,
+        sigma: NDArray,
+        midpoint: float,
+        x_scale: float,
+        max_iter: int = 100,
+        tolerance: float = 1e-10
+) -> BatchedFits:
+    """
+    Fit the linear amp and phase vs frequency models to many spectra at once.
+
+    This is the vectorised equivalent of get_amp_fit and get_phase_fit. The
+    weighted linear amplitude fits, and the linear refit of the detrended
+    phases, are solved in closed form. The angular phase model is fitted with
+    a Levenberg-Marquardt damped Gauss-Newton solver that iterates on all
+    spectra simultaneously, starting from the same initial guess as
+    fit_angular_model.
+
+    Spectra that have less than 2 valid channels, non-positive or non-finite
+    uncertainties, or for which the angular fit does not converge within
+    max_iter iterations are marked as not converged; these should be fitted
+    with the per-spectrum functions instead.
+
+    :param frequencies: numpy array of channel frequencies
+    :param visibilities: masked array of time-averaged visibilities, with the channel axis last
+    :param sigma: masked array of uncertainties in the time-averaged visibilities
+    :param midpoint: the midpoint of the linear models
+    :param x_scale: the x scale of the linear models
+    :param max_iter: maximum number of Gauss-Newton iterations
+    :param tolerance: convergence tolerance on the parameter updates
+    :return: BatchedFits with the fit parameters and uncertainties
+    """
+    batch_shape = visibilities.shape[:-1]
+    x = (np.asarray(frequencies, dtype=np.float64) - midpoint) * x_scale
+
+    # PIPE-401: S/N check, as in get_best_fits_per_ant
+    median_sn = np.ma.median(np.ma.abs(visibilities).real / np.ma.abs(sigma).real, axis=-1)
+    high_sn = np.ma.filled(median_sn > 3, False)
+
+    # Data selection as in get_amp_fit and get_phase_fit
+    amp = np.ma.abs(visibilities)
+    zeroamp = np.ma.getdata(amp) <= 0.0
+    amp = np.ma.array(amp, mask=np.ma.getmaskarray(amp) | zeroamp)
+    sigma_amp = np.ma.sqrt((visibilities.real * sigma.real) ** 2 + (visibilities.imag * sigma.imag) ** 2) / amp
+    sigma_phase = np.ma.sqrt((visibilities.imag * sigma.real) ** 2 + (visibilities.real * sigma.imag) ** 2) / (
+            amp ** 2)
+    valid = ~np.ma.getdata(np.ma.all([amp.mask, sigma_amp <= 0, sigma_phase <= 0], axis=0))
+
+    norm_vis = np.ma.divide(visibilities, amp)
+    norm_sigma = np.ma.divide(sigma, amp)
+    ang_valid = ~np.ma.getmaskarray(norm_vis)
+
+    y_amp = np.ma.getdata(amp)
+    s_amp = np.ma.getdata(sigma_amp)
+    s_phase = np.ma.getdata(sigma_phase)
+    d = np.ma.getdata(norm_vis)
+    s_re = np.ma.getdata(norm_sigma).real
+    s_im = np.ma.getdata(norm_sigma).imag
+
+    # Spectra that the batched solver can handle exactly like the per-spectrum fits
+    with np.errstate(invalid='ignore', divide='ignore'):
+        usable = (
+            high_sn
+            & (np.sum(valid, axis=-1) >= 2)
+            & np.all(~valid | (np.isfinite(y_amp) & np.isfinite(s_amp) & (s_amp > 0)
+                               & np.isfinite(s_phase) & (s_phase > 0)), axis=-1)
+            & np.all(~ang_valid | (np.isfinite(d) & (s_re > 0) & (s_im > 0)
+                                   & np.isfinite(s_re) & np.isfinite(s_im)), axis=-1)
+        )
+    usable &= np.all(~valid | ang_valid, axis=-1)
+    valid = valid & usable[..., np.newaxis]
+    ang_valid = ang_valid & usable[..., np.newaxis]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Weighted linear amplitude fit, as get_amp_fit
+        amp_fit, amp_err = _weighted_linear_fit(x, y_amp, s_amp, valid)
+
+        # Angular model fit, as fit_angular_model
+        w_re = np.where(ang_valid, 1.0 / s_re ** 2, 0.0)
+        w_im = np.where(ang_valid, 1.0 / s_im ** 2, 0.0)
+        d = np.where(ang_valid, d, 0.0)
+        angle = np.ma.array(np.angle(d), mask=~ang_valid)
+        theta = np.stack([np.zeros(batch_shape), np.ma.filled(np.ma.median(angle, axis=-1), 0.0)], axis=-1)
+        theta, ang_converged = _fit_angular_model_batched(x, d, w_re, w_im, theta, max_iter, tolerance)
+
+        # Detrend phases using fit and refit to obtain errors, as get_phase_fit
+        detrend_phase = np.angle(d * np.exp(-1j * (theta[..., 0:1] * x + theta[..., 1:2])))
+        zerophasefit, phase_err = _weighted_linear_fit(x, detrend_phase, s_phase, valid)
+        phase_fit = theta + zerophasefit
+
+    converged = (usable & ang_converged & np.all(np.isfinite(amp_fit), axis=-1) & np.all(np.isfinite(amp_err), axis=-1)
+                 & np.all(np.isfinite(phase_fit), axis=-1) & np.all(np.isfinite(phase_err), axis=-1))
+
+    return BatchedFits(high_sn=high_sn, converged=converged, amp_fit=amp_fit, amp_err=amp_err,
+                       phase_fit=phase_fit, phase_err=phase_err)
+
+
+def _weighted_linear_fit(x: NDArray, y: NDArray, sigma: NDArray, valid: NDArray) -> tuple[NDArray, NDArray]:
+    """
+    Solve weighted linear least squares fits y = slope * x + intercept in closed form.
+
+    The uncertainties are those of scipy.optimize.curve_fit with absolute_sigma=True.
+
+    :param x: the scaled abscissa, shared by all fits
+    :param y: the ordinates, with the fit axis last
+    :param sigma: the uncertainties of y
+    :param valid: True for the data points to include in the fits
+    :return: tuple of best fit (slope, intercept) and their uncertainties
+    """
+    w = np.where(valid, 1.0 / np.where(valid, sigma, 1.0) ** 2, 0.0)
+    y = np.where(valid, y, 0.0)
+    s = np.sum(w, axis=-1)
+    sx = np.sum(w * x, axis=-1)
+    sxx = np.sum(w * x * x, axis=-1)
+    sy = np.sum(w * y, axis=-1)
+    sxy = np.sum(w * x * y, axis=-1)
+    det = s * sxx - sx ** 2
+
+    fit = np.stack([(s * sxy - sx * sy) / det, (sxx * sy - sx * sxy) / det], axis=-1)
+    err = np.sqrt(np.stack([s / det, sxx / det], axis=-1))
+    return fit, err
+
+
+def _fit_angular_model_batched(
+        x: NDArray,
+        d: NDArray,
+        w_re: NDArray,
+        w_im: NDArray,
+        theta: NDArray,
+        max_iter: int,
+        tolerance: float
+) -> tuple[NDArray, NDArray]:
+    """
+    Minimise the chi-squared of the angular linear model for many spectra at once.
+
+    The model and chi-squared are those of get_angular_linear_function and
+    get_chi2_ang_model. Each spectrum has its own Levenberg-Marquardt damping
+    factor; a step is only accepted if it lowers the chi-squared.
+
+    :param x: the scaled frequencies
+    :param d: normalised visibilities, zero where invalid
+    :param w_re: weights of the real parts, zero where invalid
+    :param w_im: weights of the imaginary parts, zero where invalid
+    :param theta: initial (slope, intercept) per spectrum
+    :param max_iter: maximum number of iterations
+    :param tolerance: convergence tolerance on the parameter updates
+    :return: tuple of best fit (slope, intercept) and convergence flags
+    """
+    def chi2(params):
+        m = np.exp(1j * (params[..., 0:1] * x + params[..., 1:2]))
+        diff = d - m
+        return np.sum(w_re * diff.real ** 2 + w_im * diff.imag ** 2, axis=-1), m
+
+    lam = np.full(theta.shape[:-1], 1e-3)
+    current, m = chi2(theta)
+    converged = np.zeros(theta.shape[:-1], dtype=bool)
+
+    for _ in range(max_iter):
+        diff = d - m
+        # derivatives of the model real and imaginary parts w.r.t. (slope, intercept)
+        dre = -m.imag
+        dim = m.real
+        a = w_re * dre ** 2 + w_im * dim ** 2
+        h00 = np.sum(a * x * x, axis=-1)
+        h01 = np.sum(a * x, axis=-1)
+        h11 = np.sum(a, axis=-1)
+        b = w_re * diff.real * dre + w_im * diff.imag * dim
+        g0 = np.sum(b * x, axis=-1)
+        g1 = np.sum(b, axis=-1)
+
+        d00 = h00 * (1.0 + lam)
+        d11 = h11 * (1.0 + lam)
+        det = d00 * d11 - h01 ** 2
+        step = np.stack([(d11 * g0 - h01 * g1) / det, (d00 * g1 - h01 * g0) / det], axis=-1)
+        step[converged] = 0.0
+
+        trial = theta + step
+        trial_chi2, trial_m = chi2(trial)
+        better = np.isfinite(trial_chi2) & (trial_chi2 <= current)
+
+        theta = np.where(better[..., np.newaxis], trial, theta)
+        m = np.where(better[..., np.newaxis], trial_m, m)
+        small_step = np.all(np.abs(step) <= tolerance * (1.0 + np.abs(theta)), axis=-1)
+        converged |= better & small_step
+        current = np.where(better, trial_chi2, current)
+        lam = np.where(better, lam / 10.0, lam * 10.0)
+
+        if np.all(converged):
+            break
+
+    return theta, converged
+
+
 def robust_stats(a: NDArray) -> tuple[float, float]:
     """
     Return median and estimate standard deviation of numpy array A using median statistics
@@ -1,10 +1,15 @@
+import time
 from pathlib import Path
 
+import numpy as np
 import pytest
 
-from pipeline.infrastructure import casa_tools
+from pipeline.infrastructure import casa_tools, logging
 from pipeline.infrastructure.tablereader import MeasurementSetReader
-from .ampphase_vs_freq_qa import score_all_scans
+from .ampphase_vs_freq_qa import (get_amp_fit, get_angular_linear_function, get_batched_fits, get_linear_function,
+                                  get_phase_fit, score_all_scans)
+
+LOG = logging.get_logger(__name__)
 
 # # Tests that depend on the pipeline-testdata repository
 TEST_DATA_PATH = casa_tools.utils.resolve('pl-unittest/casa_data')
@@ -27,3 +32,75 @@ def test_score_all_scans():
     ms = MeasurementSetReader.get_measurement_set(MS_NAME_DC)
     score = score_all_scans(ms, 'TARGET', flag_all=False, memory_gb=2.0, buffer_path=Path('.'), export_mswrappers=False)
     assert score == []
+
+
+def _synthetic_spectra(num_ants, num_pols, num_chans):
+    """Noisy visibility spectra with a linear amplitude and phase slope, and their fit scaling."""
+    rng = np.random.default_rng(1)
+    frequencies = np.linspace(100e9, 102e9, num_chans)
+    midpoint = (frequencies.max() + frequencies.min()) / 2.0
+    scale = 1.0 / (frequencies.max() - frequencies.min())
+    x = (frequencies - midpoint) * scale
+
+    slope = rng.normal(0, 0.3, (num_ants, num_pols, 1))
+    intercept = rng.normal(0, 1.0, (num_ants, num_pols, 1))
+    vis = (1.0 + 0.05 * x) * np.exp(1j * (slope * x + intercept))
+    vis += 0.05 * (rng.normal(size=vis.shape) + 1j * rng.normal(size=vis.shape))
+    mask = rng.random(vis.shape) < 0.05
+    visibilities = np.ma.array(vis, mask=mask)
+    sigma = np.ma.array(np.full(vis.shape, 0.05 + 0.05j), mask=mask)
+    return frequencies, visibilities, sigma, midpoint, scale
+
+
+def _per_antenna_fits(frequencies, visibilities, sigma, midpoint, scale):
+    """Amplitude and phase fits and their errors, fitted per antenna and polarisation."""
+    amp_model_fn = get_linear_function(midpoint, scale)
+    ang_model_fn = get_angular_linear_function(midpoint, scale)
+    fits = {}
+    for ant in range(visibilities.shape[0]):
+        for pol in range(visibilities.shape[1]):
+            amp_fit, amp_err = get_amp_fit(amp_model_fn, frequencies, visibilities[ant, pol], sigma[ant, pol])
+            phase_fit, phase_err = get_phase_fit(amp_model_fn, ang_model_fn, frequencies, visibilities[ant, pol],
+                                                 sigma[ant, pol])
+            fits[ant, pol] = amp_fit, amp_err, phase_fit, phase_err
+    return fits
+
+
+def _assert_fits_match(batch, fits):
+    assert np.all(batch.high_sn)
+    assert np.all(batch.converged)
+    for (ant, pol), (amp_fit, amp_err, phase_fit, phase_err) in fits.items():
+        assert np.allclose(batch.amp_fit[ant, pol], amp_fit, rtol=1e-6, atol=1e-8)
+        assert np.allclose(batch.phase_fit[ant, pol], phase_fit, rtol=1e-5, atol=1e-7)
+        # curve_fit estimates the covariance from a finite-difference Jacobian,
+        # whereas the batched fits use the exact linear least squares covariance
+        assert np.allclose(batch.amp_err[ant, pol], amp_err, rtol=0.1)
+        assert np.allclose(batch.phase_err[ant, pol], phase_err, rtol=0.1)
+
+
+def test_get_batched_fits_matches_per_antenna_fits():
+    """Test that the batched amp/phase vs frequency fits agree with the per-antenna fits."""
+    spectra = _synthetic_spectra(num_ants=6, num_pols=2, num_chans=64)
+
+    batch = get_batched_fits(*spectra)
+
+    _assert_fits_match(batch, _per_antenna_fits(*spectra))
+
+
+@pytest.mark.benchmark
+def test_get_batched_fits_benchmark():
+    """Benchmark the batched amp/phase vs frequency fits against the per-antenna fits."""
+    num_ants, num_pols, num_chans = 50, 2, 480
+    spectra = _synthetic_spectra(num_ants, num_pols, num_chans)
+
+    t0 = time.perf_counter()
+    batch = get_batched_fits(*spectra)
+    t_batch = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fits = _per_antenna_fits(*spectra)
+    t_per_ant = time.perf_counter() - t0
+    LOG.info('Amp/phase vs frequency fits of %d spectra of %d channels: batched %.3f s, per-antenna %.3f s',
+             num_ants * num_pols, num_chans, t_batch, t_per_ant)
+
+    _assert_fits_match(batch, fits)
@@ -1,5 +1,7 @@
-import numpy as np
 import pickle
+import time
+
+import numpy as np
 
 import pipeline.infrastructure.logging as logging
 from pipeline.infrastructure import casa_tools
@@ -52,9 +54,6 @@ class MSWrapper:
         LOG.trace('MSWrapper.create_averages_from_ms(%r, %r, %r, %r, %r)',
                   filename, scan, spw, memlim, perantave)
 
-        # Epsilon used to avoid division by zero in sigma calculations
-        epsilon = 1.e-6
-
         # put memory limit in bytes
         memlim = int(memlim * (1024.0 ** 3))
 
@@ -187,40 +186,9 @@ class MSWrapper:
                 # Jump to next chunk of data
                 do_next = openms.iternext()
 
-            # For pixels with no unmasked data accumulated, make sure those
-            # pixels are filled with some epsilon dummy value
-            #On the same iteration, get the maximum length of freq averages and use that length as masked array size
-            f_avg_max_length = 0
-
-            for antenna in antennaids:
-                zeroselt = n_t_points[antenna].data < 1.0 #if no t_points were counted, antenna should be flagged.should it not be masked already?
-                n_t_points[antenna].data[zeroselt] = epsilon
-                n_t_points[antenna].mask += zeroselt
-
-                f_avg_l = f_avg[antenna].shape[1]
-                if f_avg_l>f_avg_max_length:
-                    f_avg_max_length = f_avg_l
-
-            # Iterate over antennas, now calculating the mean and sigma of the data
-            # creating the variable V to be returned as output
-            dtype = average_visibility_dtype(npol,nchan,f_avg_max_length)
-            visibilities=np.ma.empty((0,), dtype=dtype)
-            for antenna in antennaids:
-                #compute avgs
-                t_avg = (t_real_sum[antenna] + 1j*t_imag_sum[antenna]) / n_t_points[antenna]
-                t_sigma_real = np.ma.sqrt((t_real_sq_sum[antenna] - np.square(t_real_sum[antenna]) / n_t_points[antenna]) / (n_t_points[antenna] - 1.0))
-                t_sigma_imag = np.ma.sqrt((t_imag_sq_sum[antenna] - np.square(t_imag_sum[antenna]) / n_t_points[antenna]) / (n_t_points[antenna] - 1.0))
-                # apply final formula from sigma values
-                t_sigma = (t_sigma_real + 1j * t_sigma_imag) / norm_sigma_tavg
-
-                v=np.ma.empty((1,), dtype=dtype)
-                v['antenna'] = antenna
-                v['t_avg'] = t_avg
-                v['t_sigma'] = t_sigma
-                v['f_avg'] = f_avg[antenna]
-                v['f_sigma'] = f_sigma[antenna]
-                v['flagged'] = n_t_points[antenna].mask.all() #flagg antenna if all points were flagged.
-                visibilities = np.ma.concatenate((visibilities,v),axis=0)
+            visibilities = MSWrapper._averages_to_visibilities(
+                antennaids, npol, nchan, t_real_sum, t_imag_sum, t_real_sq_sum, t_imag_sq_sum, n_t_points,
+                f_avg, f_sigma, norm_sigma_tavg)
 
         #Set up time axis
         int_axis = np.array([i for i in range(int(ntstamps)) for ant in range(nant-1)])
@@ -228,6 +196,275 @@ class MSWrapper:
 
         return MSWrapper(filename, scan, spw, None, corr_axis, freq_axis, int_axis, time_axis, V=visibilities)
 
+    @staticmethod
+    def create_averages_for_scans(filename, scans, spw, memlim, perantave=True):
+        """
+        Create new MSWrappers for several scans of one spw in a single pass over the MS.
+
+        This is equivalent to calling create_averages_from_ms once per scan,
+        but the MS is opened and selected once per group of scans and every
+        chunk of rows is read once. The time averages of all scans and
+        antennas in a group are accumulated into preallocated (scan, antenna,
+        pol, chan) arrays with numpy.add.at on the scan and antenna indices of
+        each row, and the per-row frequency averages are computed for all rows
+        of a chunk at once.
+
+        The scans are split into groups whose accumulators and per-row
+        frequency averages take at most half of the memory limit; the rest is
+        used for the data buffer.
+
+        :param filename: measurement set filename
+        :param scans: list of integer scan IDs
+        :param spw: integer spw ID
+        :param memlim: Limit for memory for data buffer use, given in Gigabytes
+        :param perantave: Compute per antenna average (default True)
+        :type perantave: bool
+        :return: dictionary mapping scan ID to MSWrapper instance
+        """
+        LOG.trace('MSWrapper.create_averages_for_scans(%r, %r, %r, %r, %r)',
+                  filename, scans, spw, memlim, perantave)
+
+        scans = [int(scan) for scan in scans]
+
+        # put memory limit in bytes
+        memlim = int(memlim * (1024.0 ** 3))
+
+        with casa_tools.MSMDReader(filename) as msmd:
+            nant = msmd.nantennas()
+            nbl = nant * (nant - 1) / 2 + nant
+            ddid = msmd.datadescids(spw=spw)[0]
+            npol = msmd.ncorrforpol(msmd.polidfordatadesc(ddid))
+            nchan = msmd.nchan(spw)
+            # five float64 (antenna, pol, chan) accumulators per scan, plus the
+            # scan, antenna and row indices, the real and imaginary frequency
+            # averages, their complex sigma and mask for every row of the scan
+            scan_sizes = [5 * 8 * nant * npol * nchan + len(msmd.timesforscan(scan)) * nbl * (4 * 8 + 33 * npol)
+                          for scan in scans]
+
+        groups = []
+        group_size = 0
+        for scan, scan_size in zip(scans, scan_sizes):
+            if not groups or group_size + scan_size > memlim // 2:
+                groups.append([])
+                group_size = 0
+            groups[-1].append(scan)
+            group_size += scan_size
+
+        wrappers = {}
+        for group in groups:
+            wrappers.update(MSWrapper._create_averages_for_scan_group(filename, group, spw, memlim // 2, perantave))
+
+        return wrappers
+
+    @staticmethod
+    def _create_averages_for_scan_group(filename, scans, spw, memlim, perantave):
+        """
+        Create new MSWrappers for a group of scans of one spw in a single pass over the MS.
+
+        :param filename: measurement set filename
+        :param scans: list of integer scan IDs
+        :param spw: integer spw ID
+        :param memlim: Limit for memory for the data buffer, given in bytes
+        :param perantave: Compute per antenna average
+        :return: dictionary mapping scan ID to MSWrapper instance
+        """
+        t_start = time.perf_counter()
+        nscan = len(scans)
+
+        col_names = ['antenna1', 'antenna2', 'flag', 'time', 'scan_number', 'corrected_data']
+
+        with casa_tools.MSReader(filename) as openms:
+            data_selection = {"scan": ','.join(str(scan) for scan in scans), "spw": str(spw)}
+            openms.msselect(data_selection)
+            md = openms.metadata()
+            antennaids = md.antennaids()
+            nant = len(antennaids)
+            nbl = nant * (nant - 1) / 2 + nant
+            nrows = openms.nrow(selected=True)
+
+            axis_info = openms.getdata(['axis_info'])
+            corr_axis = axis_info['axis_info']['corr_axis']
+            freq_axis = axis_info['axis_info']['freq_axis']
+
+            npol = len(corr_axis)
+            nchan = len(freq_axis['chan_freq'])
+
+            # antenna1, antenna2, flag, time, scan_number, corrected_data, plus the
+            # float64 working copies of the real and imaginary parts
+            rowdatasize = 4 + 4 + 8 + 4 + npol * nchan * (1 + 16 + 2 * 8)
+            nrowsbuffer = max(1, int(np.floor(1.0 * memlim / rowdatasize)))
+            LOG.debug('Scans {0} of spw {1} have {2:d} rows, reading data in chunks of {3:d} rows'.format(
+                scans, spw, nrows, nrowsbuffer))
+
+            # lookup tables from scan number and antenna ID to array index
+            scan_index = np.full(max(scans) + 1, -1, dtype=int)
+            scan_index[scans] = np.arange(nscan)
+            ant_index = np.full(max(antennaids) + 1, -1, dtype=int)
+            ant_index[antennaids] = np.arange(nant)
+
+            shape = (nscan, nant, npol, nchan)
+            t_real_sum = np.zeros(shape, dtype=np.float64)
+            t_imag_sum = np.zeros(shape, dtype=np.float64)
+            t_real_sq_sum = np.zeros(shape, dtype=np.float64)
+            t_imag_sq_sum = np.zeros(shape, dtype=np.float64)
+            n_t_points = np.zeros(shape, dtype=np.float64)
+            nrows_per_scan = np.zeros(nscan, dtype=int)
+            tstart = np.full(nscan, 1.e12)
+
+            # per-row frequency averages, kept with their scan and antenna indices
+            f_chunks = []
+
+            openms.iterinit(maxrows=nrowsbuffer)
+            do_next = openms.iterorigin()
+            row_offset = 0
+
+            while do_next:
+                raw_data = openms.getdata(col_names)
+                # data has axis order pol->channel->time. Swap order to a more natural time->pol->channel
+                data = raw_data['corrected_data'].transpose(2, 0, 1)
+                valid = np.logical_not(raw_data['flag'].transpose(2, 0, 1))
+                scan_idx = scan_index[raw_data['scan_number']]
+                nrows_per_scan += np.bincount(scan_idx, minlength=nscan)
+                np.minimum.at(tstart, scan_idx, raw_data['time'])
+
+                # only cross-correlations contribute to the per-antenna averages
+                cross = raw_data['antenna1'] != raw_data['antenna2']
+                scan_idx = scan_idx[cross]
+                ant1_idx = ant_index[raw_data['antenna1'][cross]]
+                ant2_idx = ant_index[raw_data['antenna2'][cross]]
+                valid = valid[cross]
+                data_real = np.where(valid, data[cross].real, 0.0)
+                data_imag = np.where(valid, data[cross].imag, 0.0)
+                data_real_sq = np.square(data_real)
+                data_imag_sq = np.square(data_imag)
+                # If the per antenna adjustment is selected, invert the sign of the imaginary part when the
+                # antenna is in position 2
+                sign2 = -1.0 if perantave else 1.0
+
+                for ant_idx, sign in ((ant1_idx, 1.0), (ant2_idx, sign2)):
+                    np.add.at(t_real_sum, (scan_idx, ant_idx), data_real)
+                    np.add.at(t_imag_sum, (scan_idx, ant_idx), sign * data_imag)
+                    np.add.at(t_real_sq_sum, (scan_idx, ant_idx), data_real_sq)
+                    np.add.at(t_imag_sq_sum, (scan_idx, ant_idx), data_imag_sq)
+                    np.add.at(n_t_points, (scan_idx, ant_idx), valid)
+
+                # frequency averages and their uncertainties for every row
+                nvalid = valid.sum(axis=2)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    f_r_avg = data_real.sum(axis=2) / nvalid
+                    f_i_avg = data_imag.sum(axis=2) / nvalid
+                    f_r_sigma = np.sqrt(np.sum(np.where(valid, np.square(data_real - f_r_avg[..., np.newaxis]), 0.0),
+                                               axis=2) / nchan)
+                    f_i_sigma = np.sqrt(np.sum(np.where(valid, np.square(data_imag - f_i_avg[..., np.newaxis]), 0.0),
+                                               axis=2) / nchan)
+                f_mask = nvalid == 0
+                f_sigma_row = (f_r_sigma + 1j * f_i_sigma) / np.sqrt(nchan)
+                rows = row_offset + np.arange(len(scan_idx))
+                f_chunks.append((scan_idx, ant1_idx, ant2_idx, rows, f_r_avg, f_i_avg, f_sigma_row, f_mask))
+                row_offset += len(cross)
+
+                # Jump to next chunk of data
+                do_next = openms.iternext()
+
+        t_read = time.perf_counter() - t_start
+
+        # Group the per-row frequency averages by scan and antenna, keeping the row order
+        scan_idx, ant1_idx, ant2_idx, rows, f_r_avg, f_i_avg, f_sigma_row, f_mask = (
+            np.concatenate(column) for column in zip(*f_chunks))
+        keys = np.concatenate([scan_idx * nant + ant1_idx, scan_idx * nant + ant2_idx])
+        entry_rows = np.concatenate([rows, rows])
+        f_values = np.concatenate([f_r_avg + 1j * f_i_avg, f_r_avg + 1j * sign2 * f_i_avg])
+        f_sigmas = np.concatenate([f_sigma_row, f_sigma_row])
+        f_masks = np.concatenate([f_mask, f_mask])
+        order = np.lexsort((entry_rows, keys))
+        keys = keys[order]
+        boundaries = np.searchsorted(keys, np.arange(nscan * nant + 1))
+
+        wrappers = {}
+        for i, scan in enumerate(scans):
+            ntstamps = nrows_per_scan[i] / nbl
+            norm_sigma_tavg = np.sqrt(ntstamps * (nant - 1.0))
+
+            f_avg = {}
+            f_sigma = {}
+            for j, antenna in enumerate(antennaids):
+                sel = order[boundaries[i * nant + j]:boundaries[i * nant + j + 1]]
+                f_avg[antenna] = np.ma.array(f_values[sel], mask=f_masks[sel]).T
+                f_sigma[antenna] = np.ma.array(f_sigmas[sel], mask=f_masks[sel]).T
+
+            def per_antenna(values):
+                return {antenna: np.ma.array(values[i, j]) for j, antenna in enumerate(antennaids)}
+
+            visibilities = MSWrapper._averages_to_visibilities(
+                antennaids, npol, nchan, per_antenna(t_real_sum), per_antenna(t_imag_sum),
+                per_antenna(t_real_sq_sum), per_antenna(t_imag_sq_sum),
+                {antenna: np.ma.array(n_t_points[i, j], mask=np.zeros((npol, nchan), dtype=bool))
+                 for j, antenna in enumerate(antennaids)},
+                f_avg, f_sigma, norm_sigma_tavg)
+
+            #Set up time axis
+            int_axis = np.array([k for k in range(int(ntstamps)) for ant in range(nant-1)])
+            time_axis = tstart[i] + 1.0*int_axis
+
+            wrappers[scan] = MSWrapper(filename, scan, spw, None, corr_axis, freq_axis, int_axis, time_axis,
+                                       V=visibilities)
+
+        LOG.debug('Averaged {0:d} scans of spw {1} in {2:.3f} s ({3:.3f} s reading and accumulating)'.format(
+            nscan, spw, time.perf_counter() - t_start, t_read))
+
+        return wrappers
+
+    @staticmethod
+    def _averages_to_visibilities(antennaids, npol, nchan, t_real_sum, t_imag_sum, t_real_sq_sum, t_imag_sq_sum,
+                                  n_t_points, f_avg, f_sigma, norm_sigma_tavg):
+        """
+        Convert accumulated per-antenna sums into the averaged visibility array.
+
+        All arguments except the dimensions and the normalisation are
+        dictionaries keyed by antenna ID.
+
+        :return: masked array of average_visibility_dtype, one element per antenna
+        """
+        # Epsilon used to avoid division by zero in sigma calculations
+        epsilon = 1.e-6
+
+        # For pixels with no unmasked data accumulated, make sure those
+        # pixels are filled with some epsilon dummy value
+        #On the same iteration, get the maximum length of freq averages and use that length as masked array size
+        f_avg_max_length = 0
+
+        for antenna in antennaids:
+            zeroselt = n_t_points[antenna].data < 1.0 #if no t_points were counted, antenna should be flagged.should it not be masked already?
+            n_t_points[antenna].data[zeroselt] = epsilon
+            n_t_points[antenna].mask += zeroselt
+
+            f_avg_l = f_avg[antenna].shape[1]
+            if f_avg_l>f_avg_max_length:
+                f_avg_max_length = f_avg_l
+
+        # Iterate over antennas, now calculating the mean and sigma of the data
+        # creating the variable V to be returned as output
+        dtype = average_visibility_dtype(npol,nchan,f_avg_max_length)
+        visibilities=np.ma.empty((0,), dtype=dtype)
+        for antenna in antennaids:
+            #compute avgs
+            t_avg = (t_real_sum[antenna] + 1j*t_imag_sum[antenna]) / n_t_points[antenna]
+            t_sigma_real = np.ma.sqrt((t_real_sq_sum[antenna] - np.square(t_real_sum[antenna]) / n_t_points[antenna]) / (n_t_points[antenna] - 1.0))
+            t_sigma_imag = np.ma.sqrt((t_imag_sq_sum[antenna] - np.square(t_imag_sum[antenna]) / n_t_points[antenna]) / (n_t_points[antenna] - 1.0))
+            # apply final formula from sigma values
+            t_sigma = (t_sigma_real + 1j * t_sigma_imag) / norm_sigma_tavg
+
+            v=np.ma.empty((1,), dtype=dtype)
+            v['antenna'] = antenna
+            v['t_avg'] = t_avg
+            v['t_sigma'] = t_sigma
+            v['f_avg'] = f_avg[antenna]
+            v['f_sigma'] = f_sigma[antenna]
+            v['flagged'] = n_t_points[antenna].mask.all() #flagg antenna if all points were flagged.
+            visibilities = np.ma.concatenate((visibilities,v),axis=0)
+
+        return visibilities
+
     @staticmethod
     def create_averages_from_combination(mswlist,antennaids):
         """
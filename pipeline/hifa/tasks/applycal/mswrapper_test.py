@@ -52,3 +52,26 @@ def test_create_averages_from_ms_works():
         ('f_sigma', '<c16', (2, 40)),
         ('flagged', '?'),
     ]
+
+
+@skip_if_no_data_repo
+@pytest.mark.parametrize('memlim', [1, 1e-6])
+def test_create_averages_for_scans_matches_per_scan_averages(memlim):
+    """Test that the single-pass multi-scan reader gives the per-scan averages, also when the scans are split
+    into several groups to stay within the memory limit.
+    """
+    ms = MeasurementSetReader.get_measurement_set(MS_NAME_DC)
+    scan_ids = sorted(int(scan.id) for scan in ms.get_scans(spw=SPW_ID))
+
+    expected = {scan_id: MSWrapper.create_averages_from_ms(ms.name, scan_id, SPW_ID, 1) for scan_id in scan_ids}
+    wrappers = MSWrapper.create_averages_for_scans(ms.name, scan_ids, SPW_ID, memlim)
+
+    assert sorted(wrappers) == scan_ids
+    for scan_id, wrapper in wrappers.items():
+        assert wrapper.V.dtype == expected[scan_id].V.dtype
+        np.testing.assert_array_equal(wrapper.time_axis, expected[scan_id].time_axis)
+        for field in ('t_avg', 't_sigma', 'f_avg', 'f_sigma', 'flagged'):
+            np.testing.assert_array_equal(np.ma.getmaskarray(wrapper.V[field]),
+                                          np.ma.getmaskarray(expected[scan_id].V[field]))
+            np.testing.assert_allclose(np.ma.filled(wrapper.V[field], 0), np.ma.filled(expected[scan_id].V[field], 0),
+                                       rtol=1e-10, atol=1e-12)
@@ -724,36 +724,24 @@ def lowtrans_alma(ms: MeasurementSet, mintransrepspw: float, mintransnonrepspws:
     # Compute the mean airmass for each science scan.
     airmass_for_scan = {scan.id: get_airmass_for_alma_scan(scan) for scan in scans}
 
-    # Initializes atmospheric profile for a defined set of atmospheric
-    # parameters from PIPE-624, that are common for all scans and SpWs.
-    myat = casa_tools.atmosphere
-    atmutil.init_atm(myat, altitude=5059.0, humidity=20.0, temperature=273.0, pressure=563.0, max_altitude=48.0,
-                     delta_p=5.0, delta_pm=1.1, h0=1.0, atmtype=atmutil.AtmType.tropical)
-
     # Evaluate low transmission for each SpW:
     for spw in scispws:
         # Set transmission threshold based on whether current SpW is the
         # representative SpW.
         thresh_transm = mintransrepspw if spw.id == repr_spwid else mintransnonrepspws
 
-        # Initialize spectral window setting in atmosphere tool for current SpW,
-        # and update atmospheric profile to set PWV (needs to happen after SpW is
-        # initialized).
-        atmutil.init_spw(myat, fcenter=float(spw.mean_frequency.to_units(measures.FrequencyUnits.GIGAHERTZ)),
-                         nchan=spw.num_channels,
-                         resolution=float(spw.bandwidth.to_units(measures.FrequencyUnits.GIGAHERTZ) / spw.num_channels))
-        myqa = casa_tools.quanta
-        myat.setUserWH2O(myqa.quantity(pwv, 'mm'))
-
-        # Get wet and dry opacity from atmospheric profile, for channels of
-        # current SpW.
-        dry_opacity = atmutil.get_dry_opacity(myat)
-        wet_opacity = atmutil.get_wet_opacity(myat)
+        # Get wet and dry opacity for channels of current SpW, for a defined
+        # set of atmospheric parameters from PIPE-624 that are common for all
+        # scans and SpWs, and for the PWV of the MS.
+        spectrum = atmutil.get_opacity_spectrum(
+            altitude=5059.0, humidity=20.0, temperature=273.0, pressure=563.0, max_altitude=48.0, delta_p=5.0,
+            delta_pm=1.1, h0=1.0, atmtype=atmutil.AtmType.tropical, pwv=pwv,
+            fcenter=float(spw.mean_frequency.to_units(measures.FrequencyUnits.GIGAHERTZ)), nchan=spw.num_channels,
+            resolution=float(spw.bandwidth.to_units(measures.FrequencyUnits.GIGAHERTZ) / spw.num_channels))
 
         # Get transmission spectrum for opacity profiles for current SpW and
         # airmass of each scan.
-        transm = np.asarray([atmutil.calc_transmission(airmass_for_scan[scan.id], dry_opacity, wet_opacity)
-                             for scan in scans])
+        transm = np.asarray([spectrum.transmission(airmass_for_scan[scan.id]) for scan in scans])
 
         # For collection of transmission spectra for current SpW, assess the
         # fraction of data points (channels, scans) that fall below the
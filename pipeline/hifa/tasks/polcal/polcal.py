@@ -486,7 +486,8 @@ class Polcal(basetask.StandardTaskTemplate):
 
         # Initialize MS object and set its reference antenna to locked, to
         # enforce strict refantmode.
-        session_ms = tablereader.MeasurementSetReader.get_measurement_set(session_msname)
+        session_ms = tablereader.MeasurementSetReader.get_measurement_set(
+            session_msname, cache_dir=self.inputs.context.metadata_cache_dir)
         session_ms.reference_antenna_locked = True
 
         # Add session MS to local context.
@@ -137,7 +137,8 @@ class T2_4MDetailsPolcalRenderer(basetemplates.T2_4MDetailsDefaultRenderer):
             if session_results.vis:
                 LOG.debug(f"Registering session MS {session_results.vis} to local copy of pipeline context for"
                           f" weblog rendering.")
-                session_ms = tablereader.MeasurementSetReader.get_measurement_set(session_results.vis)
+                session_ms = tablereader.MeasurementSetReader.get_measurement_set(
+                    session_results.vis, cache_dir=context.metadata_cache_dir)
                 context.observing_run.add_measurement_set(session_ms)
             else:
                 LOG.debug(f"No session MS found for session {session_results.session}, unable to render.")
@@ -29,7 +29,7 @@ class TsysflagInputs(tsysflag.TsysflagInputs):
                  flag_birdies=None, fb_sharps_limit=None,
                  flag_toomany=None, tmf1_limit=None, tmef1_limit=None,
                  metric_order=None, normalize_tsys=None, filetemplate=None,
-                 parallel=None):
+                 parallel_spws=None, parallel=None):
         """Initialize Inputs.
 
         Args:
@@ -100,6 +100,10 @@ class TsysflagInputs(tsysflag.TsysflagInputs):
                 template. If the template flags file is undefined, a name of the form
                 'msname.flagtsystemplate.txt' is assumed.
 
+            parallel_spws: Calculate the flagging views of the spws of a MS
+                concurrently, if CASA HPC functionality is available.
+                Default: None (equivalent to False)
+
         """
         super().__init__(
             context=context, output_dir=output_dir, vis=vis, caltable=caltable,
@@ -109,7 +113,8 @@ class TsysflagInputs(tsysflag.TsysflagInputs):
             flag_fieldshape=flag_fieldshape, ff_refintent=ff_refintent, ff_max_limit=ff_max_limit,
             flag_birdies=flag_birdies, fb_sharps_limit=fb_sharps_limit,
             flag_toomany=flag_toomany, tmf1_limit=tmf1_limit, tmef1_limit=tmef1_limit,
-            metric_order=metric_order, normalize_tsys=normalize_tsys, filetemplate=filetemplate)
+            metric_order=metric_order, normalize_tsys=normalize_tsys, filetemplate=filetemplate,
+            parallel_spws=parallel_spws)
 
         self.parallel = parallel
 
@@ -17,6 +17,16 @@ from .vlascanheuristics import VLAScanHeuristics
 
 LOG = infrastructure.get_logger(__name__)
 
+# number of MS rows read at a time by get_amp_stats
+AMP_STATS_MAXROWS = 10000
+# logarithmic amplitude histogram used by get_amp_stats to estimate percentiles
+AMP_STATS_HIST_RANGE = (1e-8, 1e8)
+AMP_STATS_HIST_BINS_PER_DECADE = 1000
+# shortest time bin (in seconds) that get_amp_range treats as an average over whole scans
+AMP_STATS_WHOLE_SCAN_TIMEBIN = 1e8
+# time spans supported by the time averages of get_amp_stats
+AMP_STATS_TIMESPANS = ('', 'scan')
+
 
 class RflagDevHeuristic(api.Heuristic):
     """Heuristics for Rflag thresholds.
@@ -259,12 +269,22 @@ def get_amp_range(vis, field='', spw='', scan='', intent='', datacolumn='correct
                   timeaverage=True, timebin='1e8s', timespan='', vis_averaged=None):
     """Get amplitude min/max from a MS after applying data selection and time-averging.
 
+    The time averages over whole scans (timebin of at least AMP_STATS_WHOLE_SCAN_TIMEBIN, timespan of
+    '' or 'scan') of the unflagged data (useflags=True) are streamed through get_amp_stats without any
+    intermediate MS. Other time averages are made with mstransform(keepflags=False) into vis_averaged, or
+    into a temporary MS that is removed afterwards. With vis_averaged given, the averaged MS is always written.
     note: currently not used.
     """
     amp_range = [0., 0.]
 
     try:
-        if timeaverage:
+        if timeaverage and vis_averaged is None and useflags and timespan in AMP_STATS_TIMESPANS \
+                and _timebin_seconds(timebin) >= AMP_STATS_WHOLE_SCAN_TIMEBIN:
+            stats = get_amp_stats(vis, field=field, spw=spw, scan=scan, intent=intent, datacolumn=datacolumn,
+                                  correlation=correlation, uvrange=uvrange, useflags=useflags,
+                                  timeaverage=True, timespan=timespan)
+            amp_range = [stats['min'], stats['max']]
+        elif timeaverage:
             if vis_averaged is None:
                 vis_tmp = '{}.ms'.format(uuid.uuid4())
             else:
@@ -287,6 +307,157 @@ def get_amp_range(vis, field='', spw='', scan='', intent='', datacolumn='correct
     return amp_range
 
 
+def _timebin_seconds(timebin):
+    """Return a time bin given as a quantity string (e.g. '1e8s', '10min') in seconds."""
+    qa = casa_tools.quanta
+    return qa.convert(qa.quantity(timebin), 's')['value']
+
+
+def get_amp_stats(vis, field='', spw='', scan='', intent='', datacolumn='corrected',
+                  correlation='', uvrange='', useflags=True,
+                  timeaverage=False, timespan='', percentiles=(5., 50., 95.),
+                  maxrows=AMP_STATS_MAXROWS):
+    """Get amplitude statistics of a data selection by streaming through the MS.
+
+    The selected data and flag columns are read in chunks of maxrows rows for each data description,
+    so no intermediate MS is created and only a single pass over the data is needed. With
+    timeaverage=True, the unflagged visibilities are vector-averaged over time (weighted by the WEIGHT
+    column) per field, scan and baseline, like mstransform(timeaverage=True, timebin='1e8s',
+    keepflags=False); timespan='scan' averages across scans as well, and other timespan values raise
+    ValueError. Percentiles are estimated from a logarithmic histogram with a relative resolution of ~0.2%,
+    while min/max are exact.
+
+    Returns a dictionary with the keys:
+        'min', 'max': amplitude range of the unflagged (averaged) data
+        'percentiles': {percentile: amplitude}
+        'unflagged_fraction': fraction of the selected visibilities that are not flagged
+        'npts': number of unflagged (averaged) data points
+    """
+    if timeaverage and timespan not in AMP_STATS_TIMESPANS:
+        raise ValueError('Unsupported timespan {!r} of the time averages; use one of {!r}.'.format(
+            timespan, AMP_STATS_TIMESPANS))
+    amp_stats = {'min': 0., 'max': 0., 'percentiles': {q: 0. for q in percentiles},
+                 'unflagged_fraction': 0., 'npts': 0}
+    colname = {'data': 'data', 'corrected': 'corrected_data', 'model': 'model_data'}[datacolumn.lower()]
+    staql = {'field': field, 'spw': spw, 'scan': scan,
+             'scanintent': intent, 'polarization': correlation, 'uvdist': uvrange}
+    histogram = _AmpHistogram()
+    nvis = 0
+    nvis_unflagged = 0
+
+    try:
+        with casa_tools.MSReader(vis) as msfile:
+            if not msfile.msselect(staql, onlyparse=False):
+                LOG.warning("Null selection from the data selection {!r}.".format(staql))
+                return amp_stats
+            ddids = msfile.msselectedindices()['dd']
+            if len(ddids) == 0:
+                # no spw in the selection: visit every data description and
+                # skip those without rows matching the remaining selection
+                with casa_tools.MSMDReader(vis) as msmd:
+                    ddids = msmd.datadescids()
+            for ddid in ddids:
+                # data shape is constant within a data description
+                msfile.reset()
+                msfile.selectinit(datadescid=int(ddid))
+                if not msfile.msselect(staql, onlyparse=False):
+                    continue
+                columns = [colname, 'flag']
+                if timeaverage:
+                    columns += ['weight', 'field_id', 'scan_number', 'antenna1', 'antenna2']
+                averages = {}
+                msfile.iterinit(maxrows=maxrows)
+                msfile.iterorigin()
+                iterating = True
+                while iterating:
+                    rec = msfile.getdata(columns)
+                    if colname not in rec:
+                        break
+                    data = rec[colname]
+                    unflagged = ~rec['flag'] if useflags else np.ones(data.shape, dtype=bool)
+                    nvis += unflagged.size
+                    nvis_unflagged += np.count_nonzero(unflagged)
+                    if timeaverage:
+                        _accumulate_time_average(averages, rec, data, unflagged, avg_scans='scan' in timespan)
+                    else:
+                        histogram.add(np.abs(data[unflagged]))
+                    iterating = msfile.iternext()
+                for vis_sum, weight_sum in averages.values():
+                    valid = weight_sum > 0
+                    histogram.add(np.abs(vis_sum[valid] / weight_sum[valid]))
+    except Exception as ex:
+        LOG.warning("Exception: Unable to obtain the statistics of data amps. {!s}".format(str(ex)))
+        return amp_stats
+
+    if histogram.npts > 0:
+        amp_stats.update(min=histogram.min, max=histogram.max,
+                         percentiles={q: histogram.percentile(q) for q in percentiles},
+                         unflagged_fraction=nvis_unflagged / nvis, npts=histogram.npts)
+
+    return amp_stats
+
+
+def _accumulate_time_average(averages, rec, data, unflagged, avg_scans=False):
+    """Accumulate weighted visibility sums of a chunk of MS rows per field, scan and baseline.
+
+    averages is a dictionary of {(field, scan, ant1, ant2): [weighted sum, sum of weights]} updated in place.
+    """
+    weight = rec['weight'][:, np.newaxis, :] * unflagged
+    scans = np.zeros_like(rec['scan_number']) if avg_scans else rec['scan_number']
+    keys = np.stack([rec['field_id'], scans, rec['antenna1'], rec['antenna2']], axis=1)
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    # rows first to sum up rows of the same key
+    vis_sum = np.zeros((len(unique_keys),) + data.shape[:2], dtype=np.complex128)
+    weight_sum = np.zeros((len(unique_keys),) + data.shape[:2], dtype=np.float64)
+    np.add.at(vis_sum, inverse, np.moveaxis(np.where(unflagged, data * weight, 0), -1, 0))
+    np.add.at(weight_sum, inverse, np.moveaxis(weight, -1, 0))
+    for key, chunk_vis_sum, chunk_weight_sum in zip(map(tuple, unique_keys), vis_sum, weight_sum):
+        if key in averages:
+            averages[key][0] += chunk_vis_sum
+            averages[key][1] += chunk_weight_sum
+        else:
+            averages[key] = [chunk_vis_sum, chunk_weight_sum]
+
+
+class _AmpHistogram:
+    """Streaming amplitude range and logarithmic histogram for percentile estimates."""
+
+    def __init__(self):
+        self.log_min = np.log10(AMP_STATS_HIST_RANGE[0])
+        self.nbins = int(round((np.log10(AMP_STATS_HIST_RANGE[1]) - self.log_min) * AMP_STATS_HIST_BINS_PER_DECADE))
+        # the first and last bins collect the amplitudes below and above the histogram range
+        self.counts = np.zeros(self.nbins + 2, dtype=np.int64)
+        self.min = np.inf
+        self.max = -np.inf
+        self.npts = 0
+
+    def add(self, amp):
+        if amp.size == 0:
+            return
+        self.min = min(self.min, float(amp.min()))
+        self.max = max(self.max, float(amp.max()))
+        self.npts += amp.size
+        with np.errstate(divide='ignore'):
+            index = np.floor((np.log10(amp) - self.log_min) * AMP_STATS_HIST_BINS_PER_DECADE)
+        index = np.clip(index, -1, self.nbins).astype(np.int64) + 1
+        self.counts += np.bincount(index.ravel(), minlength=self.nbins + 2)
+
+    def percentile(self, q):
+        """Return the q-th percentile interpolated linearly in log(amplitude) within a histogram bin."""
+        target = q / 100. * self.npts
+        cumsum = np.cumsum(self.counts)
+        ibin = min(int(np.searchsorted(cumsum, target)), self.nbins + 1)
+        if ibin == 0:
+            return self.min
+        if ibin == self.nbins + 1:
+            return self.max
+        below = cumsum[ibin - 1]
+        fraction = (target - below) / self.counts[ibin] if self.counts[ibin] > 0 else 0.
+        value = 10. ** (self.log_min + (ibin - 1 + fraction) / AMP_STATS_HIST_BINS_PER_DECADE)
+        return float(min(max(value, self.min), self.max))
+
+
 def _get_amp_range2(vis, field='', spw='', scan='', intent='', datacolumn='corrected',
                     correlation='', uvrange='',
                     useflags=True):
@@ -0,0 +1,119 @@
+"""
+Tests for the hifv/heuristics/rfi.py module.
+"""
+import shutil
+import time
+import types
+
+import numpy as np
+import pytest
+
+from pipeline.infrastructure import casa_tools, logging
+
+from . import rfi
+from .rfi import _get_amp_range2, get_amp_range, get_amp_stats
+
+LOG = logging.get_logger(__name__)
+
+# Tests that depend on the pipeline-testdata repository
+TEST_DATA_PATH = casa_tools.utils.resolve('pl-unittest/casa_data')
+# Skip tests if CASA cannot resolve to an absolute path
+skip_data_tests = not TEST_DATA_PATH.startswith('/')
+# Create decorator with reason to skip tests
+skip_if_no_data_repo = pytest.mark.skipif(
+    skip_data_tests,
+    reason="The repo pipeline-testdata is not set up for the tests"
+)
+
+MS_NAME = casa_tools.utils.resolve("pl-unittest/uid___A002_Xc46ab2_X15ae_repSPW_spw16_17_small.ms")
+
+
+@skip_if_no_data_repo
+def test_get_amp_stats_matches_ms_statistics():
+    """Test that the streaming amplitude statistics match ms.statistics()."""
+    expected = _get_amp_range2(MS_NAME, datacolumn='data')
+    stats = get_amp_stats(MS_NAME, datacolumn='data', maxrows=500)
+
+    assert np.allclose([stats['min'], stats['max']], expected, rtol=1e-6)
+    assert stats['min'] <= stats['percentiles'][5.] <= stats['percentiles'][50.] <= stats['percentiles'][95.] \
+        <= stats['max']
+    assert 0. < stats['unflagged_fraction'] <= 1.
+
+
+@skip_if_no_data_repo
+def test_get_amp_stats_matches_time_averaged_ms(tmp_path):
+    """Test that the streaming time-averaged amplitude range matches mstransform + ms.statistics()."""
+    vis_averaged = str(tmp_path / 'averaged.ms')
+    expected = get_amp_range(MS_NAME, datacolumn='data', vis_averaged=vis_averaged)
+    shutil.rmtree(vis_averaged, ignore_errors=True)
+    amp_range = get_amp_range(MS_NAME, datacolumn='data')
+
+    assert np.allclose(amp_range, expected, rtol=1e-3)
+
+
+@skip_if_no_data_repo
+@pytest.mark.benchmark
+def test_get_amp_stats_benchmark(tmp_path):
+    """Benchmark the streaming amplitude statistics against ms.statistics(), and the streaming time-averaged
+    amplitude range against mstransform + ms.statistics()."""
+    t0 = time.perf_counter()
+    expected = _get_amp_range2(MS_NAME, datacolumn='data')
+    t_statistics = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    stats = get_amp_stats(MS_NAME, datacolumn='data')
+    t_streaming = time.perf_counter() - t0
+    LOG.info('Amplitude range of %s: ms.statistics %.3f s, streaming %.3f s', MS_NAME, t_statistics, t_streaming)
+    assert np.allclose([stats['min'], stats['max']], expected, rtol=1e-6)
+
+    vis_averaged = str(tmp_path / 'averaged.ms')
+    t0 = time.perf_counter()
+    expected = get_amp_range(MS_NAME, datacolumn='data', vis_averaged=vis_averaged)
+    t_mstransform = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    amp_range = get_amp_range(MS_NAME, datacolumn='data')
+    t_streaming = time.perf_counter() - t0
+    LOG.info('Time-averaged amplitude range of %s: mstransform %.3f s, streaming %.3f s',
+             MS_NAME, t_mstransform, t_streaming)
+    assert np.allclose(amp_range, expected, rtol=1e-3)
+
+
+@pytest.fixture
+def mstransform_calls(monkeypatch):
+    """mstransform jobs run by get_amp_range, with the amplitude range of any MS being [1, 2]."""
+    calls = []
+
+    def mstransform(**kwargs):
+        return types.SimpleNamespace(execute=lambda: calls.append(kwargs))
+    monkeypatch.setattr(rfi, 'casa_tasks', types.SimpleNamespace(mstransform=mstransform))
+    monkeypatch.setattr(rfi, '_get_amp_range2', lambda vis, **kwargs: [1., 2.])
+    monkeypatch.setattr(rfi, 'get_amp_stats', lambda vis, **kwargs: {'min': 3., 'max': 4.})
+    return calls
+
+
+def test_get_amp_range_streams_whole_scan_averages(mstransform_calls):
+    """Test that time averages over whole scans of the unflagged data are streamed without mstransform."""
+    assert get_amp_range('synthetic.ms') == [3., 4.]
+    assert get_amp_range('synthetic.ms', timebin='1e9s', timespan='scan') == [3., 4.]
+    assert mstransform_calls == []
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'timebin': '10s'},
+    {'timespan': 'state'},
+    {'useflags': False},
+    {'vis_averaged': 'averaged.ms'},
+])
+def test_get_amp_range_falls_back_to_mstransform(mstransform_calls, kwargs):
+    """Test that other time averages, and those of all data, are made by mstransform."""
+    assert get_amp_range('synthetic.ms', **kwargs) == [1., 2.]
+    assert len(mstransform_calls) == 1
+    assert mstransform_calls[0]['keepflags'] is False
+    for name in ('timebin', 'timespan'):
+        if name in kwargs:
+            assert mstransform_calls[0][name] == kwargs[name]
+    assert mstransform_calls[0]['outputvis'] == kwargs.get('vis_averaged', mstransform_calls[0]['outputvis'])
+
+
+def test_get_amp_stats_rejects_unsupported_timespan():
+    with pytest.raises(ValueError):
+        get_amp_stats('synthetic.ms', timeaverage=True, timespan='state')
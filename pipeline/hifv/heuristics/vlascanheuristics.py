@@ -1,4 +1,5 @@
 import datetime
+import fnmatch
 import math
 
 import numpy
@@ -202,23 +203,16 @@ def buildscans(msfile, scd):
 
     with casa_tools.TableReader(msfile + '/POLARIZATION') as table:
         ncorarr=table.getcol("NUM_CORR")
-        # corr_type is in general variable shape, have to read row-by-row
-        # or use getvarcol to return into dictionary, we will iterate manually
+        # corr_type is in general variable shape, use getvarcol to read all
+        # rows into a dictionary keyed by 'r<row+1>'
         npols = len(ncorarr)
+        cortarr = table.getvarcol("CORR_TYPE") if npols > 0 else {}
         polindex = {}
         poldescr = {}
         for ip in range(npols):
-            cort = table.getcol("CORR_TYPE", startrow=ip, nrow=1)
-            (nct, nr) = cort.shape
-            cortypes = []
-            cordescs = []
-            for ict in range(nct):
-                cct = cort[ict][0]
-                cde = cordesclist[cct]
-                cortypes.append(cct)
-                cordescs.append(cde)
+            cortypes = cortarr['r%d' % (ip + 1)][:, 0].tolist()
             polindex[ip] = cortypes
-            poldescr[ip] = cordescs
+            poldescr[ip] = [cordesclist[cct] for cct in cortypes]
         # cortype is an array of npol, e.g. 5,6,7,8 is for RR,RL,LR,LL respectively
         # for alma this would be 9,10,11,12 for XX,XY,YX,YY respectively
         # cordesc are the strings associated with the types (enum for casa)
@@ -269,46 +263,11 @@ def buildscans(msfile, scd):
     #
     # Now compile list of visibility times and info
     #
-    # Extract times from the Main Table
-    # Build lookup for DDs by scan_number
-    timdict = {}
-    ddlookup = {}
-    ddscantimes = {}
-    ntottimes = 0
-
-    with casa_tools.MSReader(msfile) as ms:
-        for idd in range(ndd):
-            # Select this DD (after reset if needed)
-            if idd > 0:
-                ms.selectinit(reset=True)
-            ms.selectinit(idd)
-            # recf = ms.getdata(["flag"])
-            # (nx,nc,ni) = recf['flag'].shape
-            # get the times
-            rect = ms.getdata(["time", "field_id", "scan_number"], ifraxis=True)
-            nt = rect['time'].shape[0]
-            ntottimes += nt
-            print('Found {} times in DD={}'.format(nt, idd))
-
-            timdict[idd] = {}
-            timdict[idd]['time'] = rect['time']
-            timdict[idd]['field_id'] = rect['field_id']
-            timdict[idd]['scan_number'] = rect['scan_number']
-
-            for it in range(nt):
-                isc = rect['scan_number'][it]
-                tim = rect['time'][it]
-                if isc in ddlookup:
-                    if ddlookup[isc].count(idd)<1:
-                        ddlookup[isc].append(idd)
-                    if idd in ddscantimes[isc]:
-                        ddscantimes[isc][idd].append(tim)
-                    else:
-                        ddscantimes[isc][idd] = [tim]
-                else:
-                    ddlookup[isc] = [idd]
-                    ddscantimes[isc] = {}
-                    ddscantimes[isc][idd] = [tim]
+    # Build lookup for DDs by scan_number, and the visibility times per scan
+    # and DD, from a single read of the Main Table columns
+    scan_index = ScanIndex(msfile, with_times=True)
+    ddlookup = {int(isc): scan_index.ddsforscan(isc) for isc in scan_index.scans}
+    ddscantimes = scan_index.times
 
     # print 'Found total '+str(ntottimes)+' times'
 
@@ -410,16 +369,115 @@ def buildscans(msfile, scd):
     return scandict
 
 
+class ScanIndex:
+    """
+    Columnar index of the scans of an MS.
+
+    The SCAN_NUMBER, DATA_DESC_ID, STATE_ID, FIELD_ID and TIME columns of the
+    main table are read once, and reduced to the unique (scan, field, state,
+    data description) combinations and the time range of each scan. The
+    per-scan and per-intent lists are derived from these combinations with
+    grouped numpy operations, without further queries of the main table.
+
+    The intent lookups mirror those of the msmetadata tool: an intent pattern
+    matches a scan if it matches any of the comma-separated intents of the
+    OBS_MODE of one of the states of the scan.
+    """
+    def __init__(self, vis, with_times=False):
+        self.vis = vis
+
+        with casa_tools.TableReader(vis + '/DATA_DESCRIPTION') as table:
+            self.dd_spw = table.getcol('SPECTRAL_WINDOW_ID')
+        with casa_tools.TableReader(vis + '/SPECTRAL_WINDOW') as table:
+            self.num_spws = table.nrows()
+        with casa_tools.TableReader(vis + '/STATE') as table:
+            self.state_intents = [obs_mode.split(',') for obs_mode in table.getcol('OBS_MODE')] \
+                if table.nrows() > 0 else []
+
+        with casa_tools.TableReader(vis) as table:
+            scan = table.getcol('SCAN_NUMBER')
+            ddid = table.getcol('DATA_DESC_ID')
+            state = table.getcol('STATE_ID')
+            field = table.getcol('FIELD_ID')
+            time = table.getcol('TIME')
+
+        # Unique (scan, field, state, ddid) combinations; state ids are
+        # shifted by one to accommodate rows without state (-1)
+        dims = tuple(int(c.max()) + 2 if len(c) > 0 else 1 for c in (scan, field, state, ddid))
+        keys = numpy.unique(numpy.ravel_multi_index((scan, field, state + 1, ddid), dims))
+        self.combo_scan, self.combo_field, combo_state, self.combo_dd = numpy.unravel_index(keys, dims)
+        self.combo_state = combo_state - 1
+
+        # Time range of each scan
+        order = numpy.argsort(scan, kind='stable')
+        self.scans, starts = numpy.unique(scan[order], return_index=True)
+        if len(order) > 0:
+            self.scan_begin = numpy.minimum.reduceat(time[order], starts)
+            self.scan_end = numpy.maximum.reduceat(time[order], starts)
+        else:
+            self.scan_begin = self.scan_end = numpy.zeros(0)
+
+        # Unique integration times per scan and data description, in time order
+        self.times = None
+        if with_times:
+            self.times = {}
+            scan_dd_time = numpy.unique(numpy.rec.fromarrays([scan, ddid, time], names='scan,dd,time'))
+            boundaries = numpy.flatnonzero((numpy.diff(scan_dd_time['scan']) != 0) |
+                                           (numpy.diff(scan_dd_time['dd']) != 0)) + 1
+            for group in numpy.split(scan_dd_time, boundaries):
+                if len(group) > 0:
+                    self.times.setdefault(int(group['scan'][0]), {})[int(group['dd'][0])] = group['time'].tolist()
+
+    def nspw(self):
+        """Return the number of spectral windows of the MS."""
+        return self.num_spws
+
+    def states_for_intent(self, intent):
+        """Return the ids of the states with an intent matching the pattern."""
+        return [state_id for state_id, intents in enumerate(self.state_intents)
+                if any(fnmatch.fnmatchcase(i, intent) for i in intents)]
+
+    def _combos_for_states(self, state_ids):
+        return numpy.isin(self.combo_state, state_ids)
+
+    def scans_and_fields_for_states(self, state_ids):
+        """Return the sorted lists of unique scans and fields of the rows with the given states."""
+        select = self._combos_for_states(state_ids)
+        return list(numpy.unique(self.combo_scan[select])), list(numpy.unique(self.combo_field[select]))
+
+    def scansforintent(self, intent):
+        """Return the sorted array of scans with an intent matching the pattern."""
+        return numpy.unique(self.combo_scan[self._combos_for_states(self.states_for_intent(intent))])
+
+    def fieldsforintent(self, intent):
+        """Return the sorted array of fields with an intent matching the pattern."""
+        return numpy.unique(self.combo_field[self._combos_for_states(self.states_for_intent(intent))])
+
+    def spwsforintent(self, intent):
+        """Return the sorted array of spws with an intent matching the pattern."""
+        select = self._combos_for_states(self.states_for_intent(intent))
+        return numpy.unique(self.dd_spw[self.combo_dd[select]])
+
+    def ddsforscan(self, scan):
+        """Return the sorted list of data descriptions of a scan."""
+        return numpy.unique(self.combo_dd[self.combo_scan == scan]).tolist()
+
+
 class VLAScanHeuristics:
     def __init__(self, vis):
         self.vis = vis
 
+    def get_scan_index(self):
+        """Return the scan index of the MS, building it if makescandict was not run."""
+        if getattr(self, 'scan_index', None) is None:
+            self.scan_index = ScanIndex(self.vis)
+        return self.scan_index
+
     def makescandict(self):
         """Run Steve's buildscans"""
 
-        with casa_tools.MSReader(self.vis) as ms:
-            self.scan_summary = ms.getscansummary()
-            self.ms_summary = ms.summary()
+        # Columnar index of the scans, states, fields and data descriptions of the MS
+        self.scan_index = ScanIndex(self.vis)
 
         # self.scandict = buildscans(self.vis, self.scan_summary)
         # self.startdate=float(self.ms_summary['BeginTime'])
@@ -489,6 +547,8 @@ class VLAScanHeuristics:
         with casa_tools.TableReader(self.vis + '/STATE') as table:
             intents = table.getcol('OBS_MODE')
 
+        scan_index = self.get_scan_index()
+
         self.bandpass_state_IDs = []
         self.delay_state_IDs = []
         self.flux_state_IDs = []
@@ -541,17 +601,15 @@ class VLAScanHeuristics:
                 # print 'CAL INTENT CACHE 3:'
                 # print tb.showcache()
 
-                with casa_tools.TableReader(self.vis) as table:
-                    subtable = table.query(self.flux_state_select_string)
-                    self.flux_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                    self.flux_scan_select_string = ','.join(["%s" % ii for ii in self.flux_scan_list])
-                    # logprint ("Flux density calibrator(s) scans are "
-                    # +flux_scan_select_string, logfileout='logs/msinfo.log')
-                    self.flux_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                    self.flux_field_select_string = ','.join(["%s" % ii for ii in self.flux_field_list])
-                    # logprint ("Flux density calibrator(s) are fields "
-                    # +flux_field_select_string, logfileout='logs/msinfo.log')
-                    subtable.close()
+                scan_list, field_list = scan_index.scans_and_fields_for_states(self.flux_state_IDs)
+                self.flux_scan_list = scan_list
+                self.flux_scan_select_string = ','.join(["%s" % ii for ii in self.flux_scan_list])
+                # logprint ("Flux density calibrator(s) scans are "
+                # +flux_scan_select_string, logfileout='logs/msinfo.log')
+                self.flux_field_list = field_list
+                self.flux_field_select_string = ','.join(["%s" % ii for ii in self.flux_field_list])
+                # logprint ("Flux density calibrator(s) are fields "
+                # +flux_field_select_string, logfileout='logs/msinfo.log')
 
                 # print 'CAL INTENT CACHE 4:'
                 # print tb.showcache()
@@ -573,26 +631,24 @@ class VLAScanHeuristics:
                 # print 'CAL INTENT CACHE 5:'
                 # print tb.showcache()
 
-                with casa_tools.TableReader(self.vis) as table:
-                    subtable = table.query(self.bandpass_state_select_string)
-                    self.bandpass_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                    self.bandpass_scan_select_string = ','.join(["%s" % ii for ii in self.bandpass_scan_list])
-                    # logprint ("Bandpass calibrator(s) scans are "
-                    # +bandpass_scan_select_string, logfileout='logs/msinfo.log')
-                    self.bandpass_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                    self.bandpass_field_select_string = ','.join(["%s" % ii for ii in self.bandpass_field_list])
-                    # logprint ("Bandpass calibrator(s) are fields "
-                    # +bandpass_field_select_string, logfileout='logs/msinfo.log')
-                    if len(self.bandpass_field_list) > 1:
-                        # logprint ("WARNING: More than one field is defined as the bandpass calibrator.",
-                        # logfileout='logs/msinfo.log')
-                        # logprint ("WARNING: Models are required for all BP calibrators if multiple fields",
-                        # logfileout='logs/msinfo.log')
-                        # logprint ("WARNING: are to be used, not yet implemented; the pipeline will use",
-                        # logfileout='logs/msinfo.log')
-                        # logprint ("WARNING: only the first field.", logfileout='logs/msinfo.log')
-                        self.bandpass_field_select_string = str(self.bandpass_field_list[0])
-                    subtable.close()
+                scan_list, field_list = scan_index.scans_and_fields_for_states(self.bandpass_state_IDs)
+                self.bandpass_scan_list = scan_list
+                self.bandpass_scan_select_string = ','.join(["%s" % ii for ii in self.bandpass_scan_list])
+                # logprint ("Bandpass calibrator(s) scans are "
+                # +bandpass_scan_select_string, logfileout='logs/msinfo.log')
+                self.bandpass_field_list = field_list
+                self.bandpass_field_select_string = ','.join(["%s" % ii for ii in self.bandpass_field_list])
+                # logprint ("Bandpass calibrator(s) are fields "
+                # +bandpass_field_select_string, logfileout='logs/msinfo.log')
+                if len(self.bandpass_field_list) > 1:
+                    # logprint ("WARNING: More than one field is defined as the bandpass calibrator.",
+                    # logfileout='logs/msinfo.log')
+                    # logprint ("WARNING: Models are required for all BP calibrators if multiple fields",
+                    # logfileout='logs/msinfo.log')
+                    # logprint ("WARNING: are to be used, not yet implemented; the pipeline will use",
+                    # logfileout='logs/msinfo.log')
+                    # logprint ("WARNING: only the first field.", logfileout='logs/msinfo.log')
+                    self.bandpass_field_select_string = str(self.bandpass_field_list[0])
 
                 # print 'CAL INTENT CACHE 6:'
                 # print tb.showcache()
@@ -609,25 +665,23 @@ class VLAScanHeuristics:
                     self.delay_state_select_string += (',%s') % self.delay_state_IDs[state_ID]
                 self.delay_state_select_string += ']'
 
-                with casa_tools.TableReader(self.vis) as table:
-                    subtable = table.query(self.delay_state_select_string)
-                    self.delay_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                    self.delay_scan_select_string = ','.join(["%s" % ii for ii in self.delay_scan_list])
-                    # logprint ("Delay calibrator(s) scans are "+delay_scan_select_string, logfileout='logs/msinfo.log')
-                    self.delay_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                    self.delay_field_select_string = ','.join(["%s" % ii for ii in self.delay_field_list])
-                    # logprint ("Delay calibrator(s) are fields "+delay_field_select_string,
+                scan_list, field_list = scan_index.scans_and_fields_for_states(self.delay_state_IDs)
+                self.delay_scan_list = scan_list
+                self.delay_scan_select_string = ','.join(["%s" % ii for ii in self.delay_scan_list])
+                # logprint ("Delay calibrator(s) scans are "+delay_scan_select_string, logfileout='logs/msinfo.log')
+                self.delay_field_list = field_list
+                self.delay_field_select_string = ','.join(["%s" % ii for ii in self.delay_field_list])
+                # logprint ("Delay calibrator(s) are fields "+delay_field_select_string,
+                # logfileout='logs/msinfo.log')
+                if (len(self.delay_field_list) > 1):
+                    # logprint ("WARNING: More than one field is defined as the delay calibrator.",
+                    # logfileout='logs/msinfo.log')
+                    # logprint ("WARNING: Models are required for all delay calibrators if multiple fields",
                     # logfileout='logs/msinfo.log')
-                    if (len(self.delay_field_list) > 1):
-                        # logprint ("WARNING: More than one field is defined as the delay calibrator.",
-                        # logfileout='logs/msinfo.log')
-                        # logprint ("WARNING: Models are required for all delay calibrators if multiple fields",
-                        # logfileout='logs/msinfo.log')
-                        # logprint ("WARNING: are to be used, not yet implemented; the pipeline will use",
-                        # logfileout='logs/msinfo.log')
-                        # logprint ("WARNING: only the first field.", logfileout='logs/msinfo.log')
-                        self.delay_field_select_string = str(self.delay_field_list[0])
-                    subtable.close()
+                    # logprint ("WARNING: are to be used, not yet implemented; the pipeline will use",
+                    # logfileout='logs/msinfo.log')
+                    # logprint ("WARNING: only the first field.", logfileout='logs/msinfo.log')
+                    self.delay_field_select_string = str(self.delay_field_list[0])
 
                 # print 'CAL INTENT CACHE 7:'
                 # print tb.showcache()
@@ -645,17 +699,15 @@ class VLAScanHeuristics:
                     self.polarization_state_select_string += (',%s')%self.polarization_state_IDs[state_ID]
                 self.polarization_state_select_string += ']'
 
-                with casa_tools.TableReader(self.vis) as table:
-                    subtable = table.query(self.polarization_state_select_string)
-                    self.polarization_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                    self.polarization_scan_select_string = ','.join(["%s" % ii for ii in self.polarization_scan_list])
-                    # logprint ("Polarization calibrator(s) scans are "+polarization_scan_select_string,
-                    # logfileout='logs/msinfo.log')
-                    self.polarization_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                    self.polarization_field_select_string = ','.join(["%s" % ii for ii in self.polarization_field_list])
-                    # logprint ("Polarization calibrator(s) are fields "+polarization_field_select_string,
-                    # logfileout='logs/msinfo.log'
-                    subtable.close()
+                scan_list, field_list = scan_index.scans_and_fields_for_states(self.polarization_state_IDs)
+                self.polarization_scan_list = scan_list
+                self.polarization_scan_select_string = ','.join(["%s" % ii for ii in self.polarization_scan_list])
+                # logprint ("Polarization calibrator(s) scans are "+polarization_scan_select_string,
+                # logfileout='logs/msinfo.log')
+                self.polarization_field_list = field_list
+                self.polarization_field_select_string = ','.join(["%s" % ii for ii in self.polarization_field_list])
+                # logprint ("Polarization calibrator(s) are fields "+polarization_field_select_string,
+                # logfileout='logs/msinfo.log'
 
                 # print 'CAL INTENT CACHE 8:'
                 # print tb.showcache()
@@ -670,17 +722,15 @@ class VLAScanHeuristics:
                     self.phase_state_select_string += (',%s')%self.phase_state_IDs[state_ID]
                 self.phase_state_select_string += ']'
 
-                with casa_tools.TableReader(self.vis) as table:
-                    subtable = table.query(self.phase_state_select_string)
-                    self.phase_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                    self.phase_scan_select_string = ','.join(["%s" % ii for ii in self.phase_scan_list])
-                    # logprint ("Phase calibrator(s) scans are "+phase_scan_select_string,
-                    # logfileout='logs/msinfo.log')
-                    self.phase_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                    self.phase_field_select_string = ','.join(["%s" % ii for ii in self.phase_field_list])
-                    # logprint ("Phase calibrator(s) are fields "+phase_field_select_string,
-                    # logfileout='logs/msinfo.log')
-                    subtable.close()
+                scan_list, field_list = scan_index.scans_and_fields_for_states(self.phase_state_IDs)
+                self.phase_scan_list = scan_list
+                self.phase_scan_select_string = ','.join(["%s" % ii for ii in self.phase_scan_list])
+                # logprint ("Phase calibrator(s) scans are "+phase_scan_select_string,
+                # logfileout='logs/msinfo.log')
+                self.phase_field_list = field_list
+                self.phase_field_select_string = ','.join(["%s" % ii for ii in self.phase_field_list])
+                # logprint ("Phase calibrator(s) are fields "+phase_field_select_string,
+                # logfileout='logs/msinfo.log')
 
                 # print 'CAL INTENT CACHE 9:'
                 # print tb.showcache()
@@ -693,13 +743,11 @@ class VLAScanHeuristics:
 
             self.calibrator_state_select_string += ']'
 
-            with casa_tools.TableReader(self.vis) as table:
-                subtable = table.query(self.calibrator_state_select_string)
-                self.calibrator_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                self.calibrator_scan_select_string = ','.join(["%s" % ii for ii in self.calibrator_scan_list])
-                self.calibrator_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                self.calibrator_field_select_string = ','.join(["%s" % ii for ii in self.calibrator_field_list])
-                subtable.close()
+            scan_list, field_list = scan_index.scans_and_fields_for_states(self.calibrator_state_IDs)
+            self.calibrator_scan_list = scan_list
+            self.calibrator_scan_select_string = ','.join(["%s" % ii for ii in self.calibrator_scan_list])
+            self.calibrator_field_list = field_list
+            self.calibrator_field_select_string = ','.join(["%s" % ii for ii in self.calibrator_field_list])
 
             # print 'CAL INTENT CACHE 10:'
             # print tb.showcache()
@@ -746,17 +794,15 @@ class VLAScanHeuristics:
                     self.flux_state_select_string += (',%s')%self.flux_state_IDs[state_ID]
                 self.flux_state_select_string += ']'
 
-                with casa_tools.TableReader(self.vis) as table:
-                    subtable = table.query(self.flux_state_select_string)
-                    self.flux_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                    self.flux_scan_select_string = ','.join(["%s" % ii for ii in self.flux_scan_list])
-                    # logprint ("Flux density calibrator(s) scans are "+flux_scan_select_string,
-                    # logfileout='logs/msinfo.log')
-                    self.flux_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                    self.flux_field_select_string = ','.join(["%s" % ii for ii in self.flux_field_list])
-                    # logprint ("Flux density calibrator(s) are fields "+flux_field_select_string,
-                    # logfileout='logs/msinfo.log')
-                    subtable.close()
+                scan_list, field_list = scan_index.scans_and_fields_for_states(self.flux_state_IDs)
+                self.flux_scan_list = scan_list
+                self.flux_scan_select_string = ','.join(["%s" % ii for ii in self.flux_scan_list])
+                # logprint ("Flux density calibrator(s) scans are "+flux_scan_select_string,
+                # logfileout='logs/msinfo.log')
+                self.flux_field_list = field_list
+                self.flux_field_select_string = ','.join(["%s" % ii for ii in self.flux_field_list])
+                # logprint ("Flux density calibrator(s) are fields "+flux_field_select_string,
+                # logfileout='logs/msinfo.log')
 
                 # print 'CAL INTENT CACHE 11:'
                 # print tb.showcache()
@@ -776,26 +822,24 @@ class VLAScanHeuristics:
                     self.bandpass_state_select_string += (',%s')%self.bandpass_state_IDs[state_ID]
                 self.bandpass_state_select_string += ']'
 
-                with casa_tools.TableReader(self.vis) as table:
-                    subtable = table.query(self.bandpass_state_select_string)
-                    self.bandpass_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                    self.bandpass_scan_select_string = ','.join(["%s" % ii for ii in self.bandpass_scan_list])
-                    # logprint ("Bandpass calibrator(s) scans are "+bandpass_scan_select_string,
+                scan_list, field_list = scan_index.scans_and_fields_for_states(self.bandpass_state_IDs)
+                self.bandpass_scan_list = scan_list
+                self.bandpass_scan_select_string = ','.join(["%s" % ii for ii in self.bandpass_scan_list])
+                # logprint ("Bandpass calibrator(s) scans are "+bandpass_scan_select_string,
+                # logfileout='logs/msinfo.log')
+                self.bandpass_field_list = field_list
+                self.bandpass_field_select_string = ','.join(["%s" % ii for ii in self.bandpass_field_list])
+                # logprint ("Bandpass calibrator(s) are fields "+bandpass_field_select_string,
+                # logfileout='logs/msinfo.log')
+                if len(self.bandpass_field_list) > 1:
+                    # logprint ("WARNING: More than one field is defined as the bandpass calibrator.",
+                    # logfileout='logs/msinfo.log')
+                    # logprint ("WARNING: Models are required for all BP calibrators if multiple fields",
                     # logfileout='logs/msinfo.log')
-                    self.bandpass_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                    self.bandpass_field_select_string = ','.join(["%s" % ii for ii in self.bandpass_field_list])
-                    # logprint ("Bandpass calibrator(s) are fields "+bandpass_field_select_string,
+                    # logprint ("WARNING: are to be used, not yet implemented; the pipeline will use",
                     # logfileout='logs/msinfo.log')
-                    if len(self.bandpass_field_list) > 1:
-                        # logprint ("WARNING: More than one field is defined as the bandpass calibrator.",
-                        # logfileout='logs/msinfo.log')
-                        # logprint ("WARNING: Models are required for all BP calibrators if multiple fields",
-                        # logfileout='logs/msinfo.log')
-                        # logprint ("WARNING: are to be used, not yet implemented; the pipeline will use",
-                        # logfileout='logs/msinfo.log')
-                        # logprint ("WARNING: only the first field.", logfileout='logs/msinfo.log')
-                        self.bandpass_field_select_string = str(self.bandpass_field_list[0])
-                    subtable.close()
+                    # logprint ("WARNING: only the first field.", logfileout='logs/msinfo.log')
+                    self.bandpass_field_select_string = str(self.bandpass_field_list[0])
 
                 # print 'CAL INTENT CACHE 12:'
                 # print tb.showcache()
@@ -813,16 +857,14 @@ class VLAScanHeuristics:
                     self.delay_state_select_string += (',%s') % self.delay_state_IDs[state_ID]
                 self.delay_state_select_string += ']'
 
-                with casa_tools.TableReader(self.vis) as table:
-                    subtable = table.query(self.delay_state_select_string)
-                    self.delay_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                    self.delay_scan_select_string = ','.join(["%s" % ii for ii in self.delay_scan_list])
-                    # logprint ("Delay calibrator(s) scans are "+delay_scan_select_string, logfileout='logs/msinfo.log')
-                    self.delay_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                    self.delay_field_select_string = ','.join(["%s" % ii for ii in self.delay_field_list])
-                    # logprint ("Delay calibrator(s) are fields "+delay_field_select_string,
-                    # logfileout='logs/msinfo.log')
-                    subtable.close()
+                scan_list, field_list = scan_index.scans_and_fields_for_states(self.delay_state_IDs)
+                self.delay_scan_list = scan_list
+                self.delay_scan_select_string = ','.join(["%s" % ii for ii in self.delay_scan_list])
+                # logprint ("Delay calibrator(s) scans are "+delay_scan_select_string, logfileout='logs/msinfo.log')
+                self.delay_field_list = field_list
+                self.delay_field_select_string = ','.join(["%s" % ii for ii in self.delay_field_list])
+                # logprint ("Delay calibrator(s) are fields "+delay_field_select_string,
+                # logfileout='logs/msinfo.log')
 
                 # print 'CAL INTENT CACHE 13:'
                 # print tb.showcache()
@@ -840,17 +882,15 @@ class VLAScanHeuristics:
                     self.polarization_state_select_string += (',%s') % self.polarization_state_IDs[state_ID]
                 self.polarization_state_select_string += ']'
 
-                with casa_tools.TableReader(self.vis) as table:
-                    subtable = table.query(self.polarization_state_select_string)
-                    self.polarization_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                    self.polarization_scan_select_string = ','.join(["%s" % ii for ii in self.polarization_scan_list])
-                    # logprint ("Polarization calibrator(s) scans are "+polarization_scan_select_string,
-                    # logfileout='logs/msinfo.log')
-                    self.polarization_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                    self.polarization_field_select_string = ','.join(["%s" % ii for ii in self.polarization_field_list])
-                    # logprint ("Polarization calibrator(s) are fields "+polarization_field_select_string,
-                    # logfileout='logs/msinfo.log')
-                    subtable.close()
+                scan_list, field_list = scan_index.scans_and_fields_for_states(self.polarization_state_IDs)
+                self.polarization_scan_list = scan_list
+                self.polarization_scan_select_string = ','.join(["%s" % ii for ii in self.polarization_scan_list])
+                # logprint ("Polarization calibrator(s) scans are "+polarization_scan_select_string,
+                # logfileout='logs/msinfo.log')
+                self.polarization_field_list = field_list
+                self.polarization_field_select_string = ','.join(["%s" % ii for ii in self.polarization_field_list])
+                # logprint ("Polarization calibrator(s) are fields "+polarization_field_select_string,
+                # logfileout='logs/msinfo.log')
 
                 # print 'CAL INTENT CACHE 14:'
                 # print tb.showcache()
@@ -865,16 +905,14 @@ class VLAScanHeuristics:
                     self.phase_state_select_string += (',%s')%self.phase_state_IDs[state_ID]
                 self.phase_state_select_string += ']'
 
-                with casa_tools.TableReader(self.vis) as table:
-                    subtable = table.query(self.phase_state_select_string)
-                    self.phase_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                    self.phase_scan_select_string = ','.join(["%s" % ii for ii in self.phase_scan_list])
-                    # logprint ("Phase calibrator(s) scans are "+phase_scan_select_string, logfileout='logs/msinfo.log')
-                    self.phase_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                    self.phase_field_select_string = ','.join(["%s" % ii for ii in self.phase_field_list])
-                    # logprint ("Phase calibrator(s) are fields "+phase_field_select_string,
-                    # logfileout='logs/msinfo.log')
-                    subtable.close()
+                scan_list, field_list = scan_index.scans_and_fields_for_states(self.phase_state_IDs)
+                self.phase_scan_list = scan_list
+                self.phase_scan_select_string = ','.join(["%s" % ii for ii in self.phase_scan_list])
+                # logprint ("Phase calibrator(s) scans are "+phase_scan_select_string, logfileout='logs/msinfo.log')
+                self.phase_field_list = field_list
+                self.phase_field_select_string = ','.join(["%s" % ii for ii in self.phase_field_list])
+                # logprint ("Phase calibrator(s) are fields "+phase_field_select_string,
+                # logfileout='logs/msinfo.log')
 
                 # print 'CAL INTENT CACHE 15:'
                 # print tb.showcache()
@@ -892,17 +930,15 @@ class VLAScanHeuristics:
                     self.amp_state_select_string += (',%s') % self.amp_state_IDs[state_ID]
                 self.amp_state_select_string += ']'
 
-                with casa_tools.TableReader(self.vis) as table:
-                    subtable = table.query(self.amp_state_select_string)
-                    self.amp_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                    self.amp_scan_select_string = ','.join(["%s" % ii for ii in self.amp_scan_list])
-                    # logprint ("Amplitude calibrator(s) scans are "+amp_scan_select_string,
-                    # logfileout='logs/msinfo.log')
-                    self.amp_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                    self.amp_field_select_string = ','.join(["%s" % ii for ii in self.amp_field_list])
-                    # logprint ("Amplitude calibrator(s) are fields "+amp_field_select_string,
-                    # logfileout='logs/msinfo.log')
-                    subtable.close()
+                scan_list, field_list = scan_index.scans_and_fields_for_states(self.amp_state_IDs)
+                self.amp_scan_list = scan_list
+                self.amp_scan_select_string = ','.join(["%s" % ii for ii in self.amp_scan_list])
+                # logprint ("Amplitude calibrator(s) scans are "+amp_scan_select_string,
+                # logfileout='logs/msinfo.log')
+                self.amp_field_list = field_list
+                self.amp_field_select_string = ','.join(["%s" % ii for ii in self.amp_field_list])
+                # logprint ("Amplitude calibrator(s) are fields "+amp_field_select_string,
+                # logfileout='logs/msinfo.log')
 
                 # print 'CAL INTENT CACHE 16:'
                 # print tb.showcache()
@@ -915,13 +951,11 @@ class VLAScanHeuristics:
 
             self.calibrator_state_select_string += ']'
 
-            with casa_tools.TableReader(self.vis) as table:
-                subtable = table.query(self.calibrator_state_select_string)
-                self.calibrator_scan_list = list(numpy.unique(subtable.getcol('SCAN_NUMBER')))
-                self.calibrator_scan_select_string = ','.join(["%s" % ii for ii in self.calibrator_scan_list])
-                self.calibrator_field_list = list(numpy.unique(subtable.getcol('FIELD_ID')))
-                self.calibrator_field_select_string = ','.join(["%s" % ii for ii in self.calibrator_field_list])
-                subtable.close()
+            scan_list, field_list = scan_index.scans_and_fields_for_states(self.calibrator_state_IDs)
+            self.calibrator_scan_list = scan_list
+            self.calibrator_scan_select_string = ','.join(["%s" % ii for ii in self.calibrator_scan_list])
+            self.calibrator_field_list = field_list
+            self.calibrator_field_select_string = ','.join(["%s" % ii for ii in self.calibrator_field_list])
 
             # print 'CAL INTENT CACHE 17:'
             # print tb.showcache()
@@ -959,114 +993,109 @@ class VLAScanHeuristics:
         def buildSelectionString(selectionList):
             return ','.join(["%s" % item for item in selectionList])
 
-        with casa_tools.MSMDReader(self.vis) as msmd:
-            # We used to use CALIBRATE_AMPLI rather than FLUX
-            # Note that in the current epoch we do not use the
-            # CALIBRATE_AMPLI intent for anything.
-            # There is an implicit assumption here that we only have one
-            # observation in the MS
-            # Changed April 2018 so that all flux scans and fields require FLUX,
-            #   even prior to 2013.
-            if casa_tools.quanta.le(msmd.timerangeforobs(0)['begin']['m0'],
-                                    casa_tools.quanta.quantity("2012/02/21 12:00:00")):
-                self.flux_scan_select_string = \
-                    buildSelectionString(msmd.scansforintent("CALIBRATE_FLUX*"))
-                self.flux_field_select_string = \
-                    buildSelectionString(msmd.fieldsforintent("CALIBRATE_FLUX*"))
-            else:
-                self.flux_scan_select_string = \
-                    buildSelectionString(msmd.scansforintent("CALIBRATE_FLUX*"))
-                self.flux_field_select_string = \
-                    buildSelectionString(msmd.fieldsforintent("CALIBRATE_FLUX*"))
-
-            if (self.flux_field_select_string == ''):
-                LOG.warning("No flux density calibration fields found")
-
-            # Bandpass Cal Intent
-            self.bandpass_scan_select_string = \
-                buildSelectionString(msmd.scansforintent("CALIBRATE_BANDPASS*"))
-            bpfieldlist = msmd.fieldsforintent("CALIBRATE_BANDPASS*")
-            if len(bpfieldlist) > 1:
-                self.bandpass_field_select_string = \
-                    buildSelectionString([bpfieldlist[0]])
-                LOG.warning("More than one field is defined as the bandpass calibrator.")
-                LOG.warning("  Models are required for all BP calibrators if multiple fields ")
-                LOG.warning("  are to be used, not yet implemented; the pipeline will use ")
-                LOG.warning("  only the first field.")
-            else:
-                self.bandpass_field_select_string = \
-                    buildSelectionString(bpfieldlist)
-
-            if (self.bandpass_scan_select_string == '' or
-                self.bandpass_field_select_string == ''):
-                # Default to using the flux scan for bandpass
-                self.bandpass_scan_select_string  = self.flux_scan_select_string
-                self.bandpass_field_select_string = self.flux_field_select_string
-
-            # Delay Cal Intent
-            self.delay_scan_select_string = \
-                buildSelectionString(msmd.scansforintent("CALIBRATE_DELAY*"))
-            delayfieldlist = msmd.fieldsforintent("CALIBRATE_DELAY*")
-            if len(delayfieldlist) > 1:
-                self.delay_field_select_string = \
-                    buildSelectionString([delayfieldlist[0]])
-                LOG.warning("More than one field is defined as the delay calibrator.")
-                LOG.warning("  The pipeline will use only the first field.")
-            else:
-                self.delay_field_select_string = \
-                    buildSelectionString(delayfieldlist)
-
-            if (self.delay_scan_select_string == '' or
-                self.delay_field_select_string == ''):
-                # Default to using the bandpass for the delay
-                self.delay_scan_select_string  = self.bandpass_scan_select_string
-                self.delay_field_select_string = self.bandpass_field_select_string
-
-            # Polarization Cal Intent
-            self.polarization_scan_select_string = \
-                buildSelectionString(msmd.scansforintent("CALIBRATE_POLARIZATION*"))
-            self.polarization_field_select_string =\
-                buildSelectionString(msmd.fieldsforintent("CALIBRATE_POLARIZATION*"))
-
-            # Phase Cal Intent
-            self.phase_scan_select_string = \
-                buildSelectionString(msmd.scansforintent("CALIBRATE_PHASE*"))
-            self.phase_field_select_string = \
-                buildSelectionString(msmd.fieldsforintent("CALIBRATE_PHASE*"))
-            if (self.phase_scan_select_string == '' or
-                self.phase_field_select_string == ''):
-                LOG.warning("No gain calibration scans found")
-
-            # Find all calibrator scans and fields
-            self.calibrator_scan_select_string = \
-                buildSelectionString(msmd.scansforintent("CALIBRATE*"))
-            self.calibrator_field_select_string = \
-                buildSelectionString(msmd.fieldsforintent("CALIBRATE*"))
-
-            # JSK: Modifying the heuristic for dealing with the number of
-            #      science SPWs after discussion with Claire 4/12/2016.
-            # New Heuristic is: from numSpws2 subtract the number of spws that
-            #     only appear in pointing scans.
-            #
-            # Here is the Old hueristic
-            # If there are any pointing state IDs, subtract 2 from the number of
-            # science spws -- needed for QA scores
-            # if (len(self.pointing_state_IDs)>0):
-            #     self.numSpws2 = numSpws - 2
-            # else:
-            #     self.numSpws2 = numSpws
-            self.numSpws2 = msmd.nspw()
-            obsTargetSpws = msmd.spwsforintent("OBSERVE_TARGET*").tolist()
-            pointingSpws = msmd.spwsforintent("CALIBRATE_POINTING*").tolist()
-            for spw in pointingSpws:
-                if not obsTargetSpws.count(spw):
-                    self.numSpws2 -= 1
-
-            # Here we pass through a set construct to get the unique union.
-            self.testgainscans = buildSelectionString(
-                sorted(filter(None, set(self.bandpass_scan_select_string.split(',')+self.delay_scan_select_string.split(','))), key=int))
-            self.checkflagfields = buildSelectionString(
-                sorted(filter(None, set(self.bandpass_field_select_string.split(',')+self.delay_field_select_string.split(','))), key=int))
+        # The scans, fields and spws per intent are looked up in the columnar
+        # scan index of the MS rather than by metadata queries per intent.
+        scan_index = self.get_scan_index()
+        # We used to use CALIBRATE_AMPLI rather than FLUX
+        # Note that in the current epoch we do not use the
+        # CALIBRATE_AMPLI intent for anything.
+        # There is an implicit assumption here that we only have one
+        # observation in the MS
+        # Changed April 2018 so that all flux scans and fields require FLUX,
+        #   even prior to 2013.
+        self.flux_scan_select_string = \
+            buildSelectionString(scan_index.scansforintent("CALIBRATE_FLUX*"))
+        self.flux_field_select_string = \
+            buildSelectionString(scan_index.fieldsforintent("CALIBRATE_FLUX*"))
+
+        if (self.flux_field_select_string == ''):
+            LOG.warning("No flux density calibration fields found")
+
+        # Bandpass Cal Intent
+        self.bandpass_scan_select_string = \
+            buildSelectionString(scan_index.scansforintent("CALIBRATE_BANDPASS*"))
+        bpfieldlist = scan_index.fieldsforintent("CALIBRATE_BANDPASS*")
+        if len(bpfieldlist) > 1:
+            self.bandpass_field_select_string = \
+                buildSelectionString([bpfieldlist[0]])
+            LOG.warning("More than one field is defined as the bandpass calibrator.")
+            LOG.warning("  Models are required for all BP calibrators if multiple fields ")
+            LOG.warning("  are to be used, not yet implemented; the pipeline will use ")
+            LOG.warning("  only the first field.")
+        else:
+            self.bandpass_field_select_string = \
+                buildSelectionString(bpfieldlist)
+
+        if (self.bandpass_scan_select_string == '' or
+            self.bandpass_field_select_string == ''):
+            # Default to using the flux scan for bandpass
+            self.bandpass_scan_select_string  = self.flux_scan_select_string
+            self.bandpass_field_select_string = self.flux_field_select_string
+
+        # Delay Cal Intent
+        self.delay_scan_select_string = \
+            buildSelectionString(scan_index.scansforintent("CALIBRATE_DELAY*"))
+        delayfieldlist = scan_index.fieldsforintent("CALIBRATE_DELAY*")
+        if len(delayfieldlist) > 1:
+            self.delay_field_select_string = \
+                buildSelectionString([delayfieldlist[0]])
+            LOG.warning("More than one field is defined as the delay calibrator.")
+            LOG.warning("  The pipeline will use only the first field.")
+        else:
+            self.delay_field_select_string = \
+                buildSelectionString(delayfieldlist)
+
+        if (self.delay_scan_select_string == '' or
+            self.delay_field_select_string == ''):
+            # Default to using the bandpass for the delay
+            self.delay_scan_select_string  = self.bandpass_scan_select_string
+            self.delay_field_select_string = self.bandpass_field_select_string
+
+        # Polarization Cal Intent
+        self.polarization_scan_select_string = \
+            buildSelectionString(scan_index.scansforintent("CALIBRATE_POLARIZATION*"))
+        self.polarization_field_select_string =\
+            buildSelectionString(scan_index.fieldsforintent("CALIBRATE_POLARIZATION*"))
+
+        # Phase Cal Intent
+        self.phase_scan_select_string = \
+            buildSelectionString(scan_index.scansforintent("CALIBRATE_PHASE*"))
+        self.phase_field_select_string = \
+            buildSelectionString(scan_index.fieldsforintent("CALIBRATE_PHASE*"))
+        if (self.phase_scan_select_string == '' or
+            self.phase_field_select_string == ''):
+            LOG.warning("No gain calibration scans found")
+
+        # Find all calibrator scans and fields
+        self.calibrator_scan_select_string = \
+            buildSelectionString(scan_index.scansforintent("CALIBRATE*"))
+        self.calibrator_field_select_string = \
+            buildSelectionString(scan_index.fieldsforintent("CALIBRATE*"))
+
+        # JSK: Modifying the heuristic for dealing with the number of
+        #      science SPWs after discussion with Claire 4/12/2016.
+        # New Heuristic is: from numSpws2 subtract the number of spws that
+        #     only appear in pointing scans.
+        #
+        # Here is the Old hueristic
+        # If there are any pointing state IDs, subtract 2 from the number of
+        # science spws -- needed for QA scores
+        # if (len(self.pointing_state_IDs)>0):
+        #     self.numSpws2 = numSpws - 2
+        # else:
+        #     self.numSpws2 = numSpws
+        self.numSpws2 = scan_index.nspw()
+        obsTargetSpws = scan_index.spwsforintent("OBSERVE_TARGET*").tolist()
+        pointingSpws = scan_index.spwsforintent("CALIBRATE_POINTING*").tolist()
+        for spw in pointingSpws:
+            if not obsTargetSpws.count(spw):
+                self.numSpws2 -= 1
+
+        # Here we pass through a set construct to get the unique union.
+        self.testgainscans = buildSelectionString(
+            sorted(filter(None, set(self.bandpass_scan_select_string.split(',')+self.delay_scan_select_string.split(','))), key=int))
+        self.checkflagfields = buildSelectionString(
+            sorted(filter(None, set(self.bandpass_field_select_string.split(',')+self.delay_field_select_string.split(','))), key=int))
 
         return True
 
@@ -0,0 +1,122 @@
+"""
+Tests for the hifv/heuristics/vlascanheuristics.py module.
+"""
+import os
+import shutil
+import time
+
+import numpy as np
+import pytest
+
+from pipeline.infrastructure import casa_tools, logging
+
+from .vlascanheuristics import ScanIndex, VLAScanHeuristics
+
+LOG = logging.get_logger(__name__)
+
+# Tests that depend on the pipeline-testdata repository
+TEST_DATA_PATH = casa_tools.utils.resolve('pl-unittest/casa_data')
+# Skip tests if CASA cannot resolve to an absolute path
+skip_data_tests = not TEST_DATA_PATH.startswith('/')
+# Create decorator with reason to skip tests
+skip_if_no_data_repo = pytest.mark.skipif(
+    skip_data_tests,
+    reason="The repo pipeline-testdata is not set up for the tests"
+)
+
+MS_NAME = casa_tools.utils.resolve("pl-unittest/uid___A002_Xc46ab2_X15ae_repSPW_spw16_17_small.ms")
+
+VLA_OBS_MODES = ['CALIBRATE_FLUX#UNSPECIFIED,CALIBRATE_BANDPASS#UNSPECIFIED',
+                 'CALIBRATE_DELAY#UNSPECIFIED',
+                 'CALIBRATE_PHASE#UNSPECIFIED,CALIBRATE_AMPLI#UNSPECIFIED',
+                 'OBSERVE_TARGET#UNSPECIFIED',
+                 'CALIBRATE_POINTING#UNSPECIFIED',
+                 'CALIBRATE_POLARIZATION#UNSPECIFIED']
+
+INTENTS = ['CALIBRATE_FLUX*', 'CALIBRATE_BANDPASS*', 'CALIBRATE_DELAY*', 'CALIBRATE_POLARIZATION*',
+           'CALIBRATE_PHASE*', 'CALIBRATE*', 'OBSERVE_TARGET*', 'CALIBRATE_POINTING*']
+
+
+@pytest.fixture
+def many_scan_ms(tmp_path):
+    """Copy of the small test MS with every integration relabelled as a scan with a VLA intent."""
+    vis = str(tmp_path / os.path.basename(MS_NAME))
+    shutil.copytree(MS_NAME, vis)
+
+    with casa_tools.TableReader(vis + '/STATE', nomodify=False) as table:
+        table.removerows(list(range(table.nrows())))
+        table.addrows(len(VLA_OBS_MODES))
+        table.putcol('OBS_MODE', np.array(VLA_OBS_MODES))
+
+    with casa_tools.TableReader(vis, nomodify=False) as table:
+        _, scan = np.unique(table.getcol('TIME'), return_inverse=True)
+        table.putcol('SCAN_NUMBER', scan.ravel() + 1)
+        table.putcol('STATE_ID', scan.ravel() % len(VLA_OBS_MODES))
+
+    return vis
+
+
+def _msmd_lookups(vis):
+    """Per-intent scan, field and spw lookups of the msmetadata tool, and the number of spws."""
+    with casa_tools.MSMDReader(vis) as msmd:
+        return ({intent: (msmd.scansforintent(intent), msmd.fieldsforintent(intent), msmd.spwsforintent(intent))
+                 for intent in INTENTS}, msmd.nspw())
+
+
+def _scan_index_lookups(vis):
+    """Scan index of an MS, and its per-intent scan, field and spw lookups."""
+    scan_index = ScanIndex(vis)
+    return scan_index, {intent: (scan_index.scansforintent(intent), scan_index.fieldsforintent(intent),
+                                 scan_index.spwsforintent(intent))
+                        for intent in INTENTS}
+
+
+def _assert_lookups_equal(scan_index, result, expected, nspw):
+    assert len(scan_index.scans) > 10
+    assert scan_index.nspw() == nspw
+    for intent in INTENTS:
+        for values, expected_values in zip(result[intent], expected[intent]):
+            assert np.array_equal(values, expected_values), intent
+
+
+@skip_if_no_data_repo
+def test_scan_index_matches_msmd(many_scan_ms):
+    """Test the per-intent lookups of the scan index against the msmetadata tool."""
+    expected, nspw = _msmd_lookups(many_scan_ms)
+    scan_index, result = _scan_index_lookups(many_scan_ms)
+
+    _assert_lookups_equal(scan_index, result, expected, nspw)
+
+
+@skip_if_no_data_repo
+@pytest.mark.benchmark
+def test_scan_index_benchmark(many_scan_ms):
+    """Benchmark the per-intent lookups of the scan index against the msmetadata tool and the scan summary,
+    which VLAScanHeuristics used before the scan index."""
+    t0 = time.perf_counter()
+    expected, nspw = _msmd_lookups(many_scan_ms)
+    with casa_tools.MSReader(many_scan_ms) as ms:
+        ms.getscansummary()
+    t_msmd = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    scan_index, result = _scan_index_lookups(many_scan_ms)
+    t_index = time.perf_counter() - t0
+    LOG.info('Scan/intent lookup of %d scans: msmd + scan summary %.3f s, scan index %.3f s',
+             len(scan_index.scans), t_msmd, t_index)
+
+    _assert_lookups_equal(scan_index, result, expected, nspw)
+
+
+@skip_if_no_data_repo
+def test_calibrator_intents(many_scan_ms):
+    """Test the calibrator scan and field selections derived from the scan index."""
+    msinfo = VLAScanHeuristics(many_scan_ms)
+    msinfo.makescandict()
+    msinfo.calibratorIntents()
+
+    scans = msinfo.scan_index.scans
+    assert msinfo.flux_scan_select_string == ','.join(str(s) for s in scans[scans % 6 == 1])
+    assert msinfo.delay_scan_select_string == ','.join(str(s) for s in scans[scans % 6 == 2])
+    assert msinfo.testgainscans == ','.join(str(s) for s in scans[(scans % 6 == 1) | (scans % 6 == 2)])
+    assert msinfo.calibrator_scan_select_string == ','.join(str(s) for s in scans[~np.isin(scans % 6, [4])])
@@ -2,8 +2,6 @@ import collections
 import os
 import shutil
 
-import numpy
-
 import pipeline.h.tasks.importdata.importdata as importdata
 import pipeline.infrastructure as infrastructure
 import pipeline.infrastructure.basetask as basetask
@@ -12,7 +10,7 @@ import pipeline.infrastructure.sessionutils as sessionutils
 import pipeline.infrastructure.vdp as vdp
 from pipeline.hifv.heuristics.vlascanheuristics import VLAScanHeuristics
 from pipeline.hifv.heuristics.specline_detect import detect_spectral_lines
-from pipeline.infrastructure import casa_tasks, casa_tools, task_registry
+from pipeline.infrastructure import casa_tasks, task_registry
 
 LOG = infrastructure.get_logger(__name__)
 
@@ -203,8 +201,7 @@ class VLAImportDataResults(basetask.Results):
         msinfo.calibratorIntents()
         msinfo.determine3C84()
 
-        with casa_tools.TableReader(ms) as table:
-            scanNums = sorted(numpy.unique(table.getcol('SCAN_NUMBER')))
+        scanNums = sorted(msinfo.scan_index.scans)
 
         # Check for missing scans
         missingScans = 0
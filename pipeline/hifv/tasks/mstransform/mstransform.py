@@ -228,7 +228,8 @@ class VlaMstransform(mst.SerialMstransform):
         return produce_lines_ms
 
     def _import_new_ms(self, result, to_import, datatype):
-        observing_run = tablereader.ObservingRunReader.get_observing_run(to_import)
+        observing_run = tablereader.ObservingRunReader.get_observing_run(
+            to_import, cache_dir=self.inputs.context.metadata_cache_dir)
 
         # Adopt same session as source measurement set
         for ms in observing_run.measurement_sets:
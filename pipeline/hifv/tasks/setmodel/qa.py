@@ -4,7 +4,6 @@ import pipeline.infrastructure.pipelineqa as pqa
 import pipeline.infrastructure.utils as utils
 from pipeline import infrastructure
 from pipeline.h.tasks.common import commonfluxresults
-from pipeline.infrastructure import casa_tasks
 from . import vlasetjy
 
 LOG = infrastructure.logging.get_logger(__name__)
@@ -25,8 +24,7 @@ class VLASetjyQAHandler(pqa.QAPlugin):
             msg = ''
             field_ids = [str(fieldid) for sublist in standard_source_fields for fieldid in sublist]
             calfields = ",".join(field_ids)
-            flagdata_task = casa_tasks.flagdata(vis=vis, mode="summary", field=calfields, intent='*CALIBRATE*')
-            flagdata_result = flagdata_task.execute()
+            flagdata_result = utils.get_flag_summary(vis, field=calfields, intent='*CALIBRATE*')
             for fields in standard_source_fields:
                 field_intents = set()
                 for myfield in fields:
@@ -10,7 +10,8 @@ def hsd_tsysflag(vis=None, caltable=None,
                  flag_fieldshape=None, ff_refintent=None, ff_max_limit=None,
                  flag_birdies=None, fb_sharps_limit=None,
                  flag_toomany=None, tmf1_limit=None, tmef1_limit=None,
-                 metric_order=None, normalize_tsys=None, filetemplate=None):
+                 metric_order=None, normalize_tsys=None, filetemplate=None,
+                 parallel_spws=None):
     """Flag deviant system temperature measurements.
 
     Flag deviant system temperature measurements for single dish measurements. This is done by running a
@@ -19,6 +19,7 @@ if TYPE_CHECKING:
     from collections.abc import Sequence
 
     from pipeline.domain import DataTable, MeasurementSet
+    from pipeline.hsd.tasks.common.utils import EchoDictionary, RowMap
 
 LOG = infrastructure.logging.get_logger(__name__)
 
@@ -140,7 +141,7 @@ class BaselineFitParamConfig(api.Heuristic, abc.ABC):
 
     def calculate(self, datatable: DataTable,
                   ms: MeasurementSet,
-                  rowmap: dict,
+                  rowmap: RowMap | EchoDictionary,
                   antenna_id: int,
                   field_id: int,
                   spw_id: int,
@@ -157,7 +158,7 @@ class BaselineFitParamConfig(api.Heuristic, abc.ABC):
         Args:
             datatable: DataTable instance
             ms: MS domain object to calculate fitting parameters
-            rowmap: Row map dictionary between origin_ms and ms
+            rowmap: Row map between origin_ms and ms
             antenna_id: Antenna ID to process
             field_id: Field ID to process
             spw_id: Spw ID to process
@@ -279,7 +280,7 @@ class BaselineFitParamConfig(api.Heuristic, abc.ABC):
                 for y, member in enumerate( member_list ):
                     origin_rows = member[0] # origin_ms row ID
                     idxs = member[1] # datatable row ID
-                    rows = [rowmap[i] for i in origin_rows] # vis row ID
+                    rows = rowmap.lookup(origin_rows) # vis row ID
 
                     spectra = numpy.zeros((len(rows), npol, nchan,), dtype=numpy.float32)
                     for (i, row) in enumerate(rows):
@@ -264,36 +264,42 @@ class DetectLine(basetask.StandardTaskTemplate):
             BinningRange.append([i, 0])
             if i > 1:
                 BinningRange.append([i, i//2])
+        MaxLineWidth = MaxFWHM
+        MinLineWidth = rules.LineFinderRule['MinFWHM']
+
+        # detect lines in all spectra at once for each binning
+        ProcStartTime = time.time()
+        rows_with_spectrum = [row for row in range(nrow) if len(grid_table[row][6]) > 0]
+        protected_per_binning = []
+        for [BINN, offset] in BinningRange:
+            if len(rows_with_spectrum) == 0:
+                break
+            SP = self.SpBinning(spectra[rows_with_spectrum], BINN, offset)
+            MSK = self.MaskBinning(masks[rows_with_spectrum], BINN, offset)
+            protected = self._detect_batch(spectra=SP,
+                                           masks=MSK,
+                                           threshold=Thre+math.sqrt(BINN)-1.0,
+                                           tweak=True,
+                                           edge=(EdgeL, EdgeR))
+            # 2019/8/16 Threshold gets too high when Binning gets large
+            # (previously threshold=Thre+math.log(BINN)/math.log(4))
+            protected_per_binning.append(dict(zip(rows_with_spectrum, protected)))
+        ProcEndTime = time.time()
+        LOG.debug('Line detection of %s spectra with %s binnings: Elapsed Time=%.1f sec',
+                  len(rows_with_spectrum), len(BinningRange), (ProcEndTime - ProcStartTime))
+
         for row in range(nrow):
             # Countup progress timer
             Timer.count()
 
-            ProcStartTime = time.time()
             Protected = []
             if len(grid_table[row][6]) == 0:
                 LOG.debug('Row %s: No spectrum', row)
                 # No spectrum
                 Protected = [[-1, -1, 1]]
             else:
-                LOG.debug('Start Row %s', row)
-                for [BINN, offset] in BinningRange:
-                    SP = self.SpBinning(spectra[row], BINN, offset)
-                    MSK = self.MaskBinning(masks[row], BINN, offset)
-
-                    protected = self._detect(spectrum=SP,
-                                             mask=MSK,
-                                             threshold=Thre+math.sqrt(BINN)-1.0,
-                                             tweak=True,
-                                             edge=(EdgeL, EdgeR))
-                    # 2019/8/16 Threshold gets too high when Binning gets large
-                    #protected = self._detect(spectrum=SP,
-                    #                         mask=MSK,
-                    #                         threshold=Thre+math.log(BINN)/math.log(4),
-                    #                         tweak=True,
-                    #                         edge=(EdgeL, EdgeR))
-
-                    MaxLineWidth = MaxFWHM
-                    MinLineWidth = rules.LineFinderRule['MinFWHM']
+                for [BINN, offset], protected_per_row in zip(BinningRange, protected_per_binning):
+                    protected = protected_per_row[row]
                     for i in range(len(protected)):
                         if protected[i][0] != -1:
                             Chan0 = protected[i][0]*BINN+offset
@@ -310,10 +316,7 @@ class DetectLine(basetask.StandardTaskTemplate):
             detect_signal[row] = [grid_table[row][4],  # RA
                                   grid_table[row][5],  # DEC
                                   Protected]           # Protected Region
-            ProcEndTime = time.time()
             LOG.info('Channel ranges of detected lines for Row %s: %s', row, detect_signal[row][2])
-
-            LOG.debug('End Row %s: Elapsed Time=%.1f sec', row, (ProcEndTime - ProcStartTime))
         del Timer
 
         # analyse mask (True: valid)
@@ -374,6 +377,9 @@ class DetectLine(basetask.StandardTaskTemplate):
                     offset: int = 0) -> np.ndarray:
         """Perform Binning for mask array.
 
+        Binning is applied along the last axis so that a two-dimensional
+        array of masks is binned at once.
+
         Args:
             data: boolean mask array
             Bin: Binning width
@@ -385,7 +391,7 @@ class DetectLine(basetask.StandardTaskTemplate):
         if Bin == 1:
             return data
         else:
-            return np.array([data[i:i+Bin].min() for i in range(offset, len(data)-Bin+1, Bin)], dtype=bool)
+            return self._bin_view(data, Bin, offset).min(axis=-1).astype(bool)
 
     def SpBinning(self,
                   data: np.ndarray,
@@ -393,6 +399,9 @@ class DetectLine(basetask.StandardTaskTemplate):
                   offset: int = 0) -> np.ndarray:
         """Perform Binning for spectral data array.
 
+        Binning is applied along the last axis so that a two-dimensional
+        array of spectra is binned at once.
+
         Args:
             data: float mask array
             Bin: Binning width
@@ -404,7 +413,26 @@ class DetectLine(basetask.StandardTaskTemplate):
         if Bin == 1:
             return data
         else:
-            return np.array([data[i:i+Bin].mean() for i in range(offset, len(data)-Bin+1, Bin)], dtype=float)
+            return self._bin_view(data, Bin, offset).mean(axis=-1).astype(float)
+
+    @staticmethod
+    def _bin_view(data: np.ndarray, Bin: int, offset: int) -> np.ndarray:
+        """Reshape the last axis of data into bins of Bin channels.
+
+        Trailing channels that do not fill a complete bin are dropped.
+
+        Args:
+            data: Data array
+            Bin: Binning width
+            offset: Offset channel to start binning.
+
+        Returns:
+            Array with the last axis split into (number of bins, Bin)
+        """
+        data = np.asarray(data)
+        nbin = max((data.shape[-1] - offset) // Bin, 0)
+        binned = data[..., offset:offset+nbin*Bin]
+        return binned.reshape(data.shape[:-1] + (nbin, Bin))
 
     def analyse(self, result: DetectLineResults) -> DetectLineResults:
         """Analyse result.
@@ -437,13 +465,6 @@ class DetectLine(basetask.StandardTaskTemplate):
         """
         nchan = len(spectrum)
         (EdgeL, EdgeR) = edge
-        Nedge = EdgeR + EdgeL
-        #2015/04/23 0.5 -> 1/3.0
-        #MaxFWHM = int(min(rules.LineFinderRule['MaxFWHM'], (nchan - Nedge)/3.0))
-        #2019/08/16 MaxFWHM < nchan/2.0 Need wider line detection (NGC1097)
-        MaxFWHM = int((nchan - Nedge)/2.0)
-        MinFWHM = int(rules.LineFinderRule['MinFWHM'])
-
         LOG.trace('line detection parameters: ')
         LOG.trace('threshold (S/N per channel)=%s, channels, edges to be dropped=[%s, %s]',
                   threshold, EdgeL, EdgeR)
@@ -452,9 +473,67 @@ class DetectLine(basetask.StandardTaskTemplate):
                                        tweak=True,
                                        mask=mask,
                                        edge=(int(EdgeL), int(EdgeR)))
+        return self._select_line_ranges(line_ranges, nchan, edge)
+
+    def _detect_batch(self,
+                      spectra: np.ndarray,
+                      masks: np.ndarray,
+                      threshold: float,
+                      tweak: bool,
+                      edge: list[int]) -> list[list[list[int]]]:
+        """Perform spectral line detection on all given spectra at once.
+
+        This is equivalent to calling _detect on every row of spectra.
+
+        Args:
+            spectra: Two-dimensional spectral data, one spectrum per row
+            masks: Channel masks, one mask per row
+            threshold: Threshold for linedetection
+            tweak: if True, spectral line ranges are extended to cover line edges.
+            edge: Edge channels to exclude
+
+        Returns:
+            A list with, for each spectrum, a list of [start, end] index lists of
+            spectral lines as returned by _detect.
+        """
+        nchan = spectra.shape[1]
+        (EdgeL, EdgeR) = edge
+        LOG.trace('line detection parameters: ')
+        LOG.trace('threshold (S/N per channel)=%s, channels, edges to be dropped=[%s, %s]',
+                  threshold, EdgeL, EdgeR)
+        line_ranges_per_row = self.line_finder.calculate_batch(spectra=spectra,
+                                                               threshold=threshold,
+                                                               tweak=True,
+                                                               masks=masks,
+                                                               edge=(int(EdgeL), int(EdgeR)))
+        return [self._select_line_ranges(line_ranges, nchan, edge) for line_ranges in line_ranges_per_row]
+
+    def _select_line_ranges(self,
+                            line_ranges: list[int],
+                            nchan: int,
+                            edge: list[int]) -> list[list[int]]:
+        """Select and merge line ranges returned by line finder.
+
+        Args:
+            line_ranges: Start and end indices of spectral lines in the order of
+                         [start0, end0, start1, end1, ...]
+            nchan: Number of channels of the spectrum
+            edge: Edge channels to exclude
+
+        Returns:
+            A list of [start, end] index lists of spectral lines, more explicitly,
+            [[start0, end0], [start1, end1]..., [startN, endN]].
+        """
+        (EdgeL, EdgeR) = edge
+        Nedge = EdgeR + EdgeL
+        #2015/04/23 0.5 -> 1/3.0
+        #MaxFWHM = int(min(rules.LineFinderRule['MaxFWHM'], (nchan - Nedge)/3.0))
+        #2019/08/16 MaxFWHM < nchan/2.0 Need wider line detection (NGC1097)
+        MaxFWHM = int((nchan - Nedge)/2.0)
+        MinFWHM = int(rules.LineFinderRule['MinFWHM'])
+
         # line_ranges = [line0L, line0R, line1L, line1R, ...]
         nlines = len(line_ranges) // 2
-
         ### Debug TT
         #LOG.info('NLINES=%s, EdgeL=%s, EdgeR=%s' % (nlines, EdgeL, EdgeR))
         #LOG.debug('ranges=%s'%(line_ranges))
@@ -12,6 +12,7 @@ import numpy as np
 import numpy.linalg as LA
 import scipy.cluster.hierarchy as HIERARCHY
 import scipy.cluster.vq as VQ
+from scipy.ndimage import label
 
 import pipeline.infrastructure as infrastructure
 import pipeline.infrastructure.basetask as basetask
@@ -1073,8 +1074,11 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
         ListBestScore = []
         converged = False
         #
-        elapsed = 0.0
+        elapsed_kmeans = 0.0
+        elapsed_score = 0.0
         self.DebugOutVer[1] += 1
+        # flag of each line, which is set to Region[i][5] after the analysis
+        flag = np.ones(len(Region), dtype=int)
         for Ncluster in range(1, MaxCluster + 1):
             # We cannot perform clustering analysis with the number of clusters
             # exceeding number of data
@@ -1086,7 +1090,10 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
             np.random.seed((1234, 567))
             # Try multiple times to supress random selection effect 2007/09/04
             for Multi in range(min(Ncluster+1, 10)):
+                start_time = time.time()
                 codebook, diff = VQ.kmeans(Region2, Ncluster, iter=50)
+                elapsed_kmeans += time.time() - start_time
+                start_time = time.time()
                 # codebook = [[clstCentX, clstCentY],[clstCentX,clstCentY],,[]] len=Ncluster
                 # diff <= distortion
                 NclusterNew = 0
@@ -1100,29 +1107,28 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
                     LOG.trace('Cluster Category&Distance %s, distance = %s', category, distance)
 
                     # remove empty line in codebook
-                    codebook = codebook.take([x for x in range(0, len(codebook)) if any(category==x)], axis=0)
+                    codebook = codebook.take(np.unique(category), axis=0)
                     NclusterNew = len(codebook)
 
                     # Clear Flag
-                    for i in range(len(Region)):
-                        Region[i][5] = 1
+                    flag[:] = 1
 
                     Outlier = 0.0
                     lines = []
                     for Nc in range(NclusterNew):
+                        is_member = category == Nc
                         ### 2011/05/17 Strict the threshold, clean-up each cluster by nsigma clipping/flagging
-                        ValueList = distance[(category == Nc).nonzero()[0]]
+                        ValueList = distance[is_member]
                         Stddev = ValueList.std()
                         Threshold = ValueList.mean() + Stddev * self.nsigma
                         del ValueList
                         LOG.trace('Cluster Clipping Threshold = %s, Stddev = %s', Threshold, Stddev)
-                        for i in ((distance * (category == Nc)) > Threshold).nonzero()[0]:
-                            Region[i][5] = 0 # set flag to 0
-                            Outlier += 1.0
+                        is_outlier = (distance * is_member) > Threshold
+                        flag[is_outlier] = 0 # set flag to 0
+                        Outlier += float(np.count_nonzero(is_outlier))
                         # Calculate Cluster Characteristics
-                        MaxDistance = max(distance * ((distance < Threshold) * (category == Nc)))
-                        indices = [x for x in range(len(category)) if category[x] == Nc and Region[x][5] != 0]
-                        properties = Region2.take(indices, axis=0)
+                        MaxDistance = (distance * ((distance < Threshold) * is_member)).max()
+                        properties = Region2[is_member & (flag != 0)]
                         rep_width = np.percentile(properties[:, 0], 75)
                         median_prop = np.median(properties[:, :2], axis=0)
                         LOG.info(
@@ -1132,7 +1138,7 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
                         )
                         lines.append([median_prop[1], rep_width, True, MaxDistance, median_prop[0]])
                     MemberRate = (len(Region) - Outlier)/float(len(Region))
-                    MeanDistance = (distance * np.transpose(np.array(Region))[5]).mean()
+                    MeanDistance = (distance * flag).mean()
                     LOG.trace('lines = %s, MemberRate = %s', lines, MemberRate)
 
                     # 2010/6/15 Plot the score along the number of the clusters
@@ -1155,6 +1161,7 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
                         BestCodebook = codebook.copy()
                         BestRegion = Region[:]
                         Bestlines = lines[:]
+                elapsed_score += time.time() - start_time
 
             ListBestScore.append(min(ListScore[index0:]))
             LOG.debug('Ncluster = %s, BestScore = %s', NclusterNew, ListBestScore[-1])
@@ -1168,6 +1175,12 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
                 converged = True
                 break
 
+        # Region shares its elements with BestRegion so that flags of the
+        # last clustering trial are propagated to both
+        for i in range(len(Region)):
+            Region[i][5] = int(flag[i])
+        LOG.debug('K-mean clustering: kmeans %.3f sec, scoring %.3f sec', elapsed_kmeans, elapsed_score)
+
         if converged is False:
             LOG.warning('Clustering analysis not converged. Number of clusters may be greater than upper limit'
                         ' (MaxCluster=%s)', MaxCluster)
@@ -1292,7 +1305,7 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
         print('Init Threshold: {}'.format(Threshold), end=' ')
         print('\tInit Ncluster: {}'.format(Ncluster))
 
-        IDX = np.array([x for x in range(len(Data))])
+        IDX = np.arange(len(Data))
         for k in range(Ncluster):
             C = Category.max()
             NewData = Data[Category==(k+1)] # Category starts with 1 (not 0)
@@ -1319,9 +1332,8 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
                 print(((NewCategory == kk+1)*1).sum(), end=' ')
             print('')
             if NewNcluster > 1:
-                for i in range(len(NewData)):
-                    if NewCategory[i] > 1:
-                        Category[NewIDX[i]] = C + NewCategory[i] - 1
+                is_new = NewCategory > 1
+                Category[NewIDX[is_new]] = C + NewCategory[is_new] - 1
         Ncluster = Category.max() # update Ncluster
 
         (Region, Range, Percentile75, Stdev, Category) = self.clean_cluster(Data, Category, Region, nThreshold2, 2) # nThreshold, NumParam
@@ -1524,22 +1536,28 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
         GridMember = np.zeros((nra, ndec))
 
         # Set the number of spectra belong to each gridding positions
-        for row in range(len(detect_signal)):
-            GridMember[int((detect_signal[row][0] - ra0)/grid_ra)][int((detect_signal[row][1] - dec0)/grid_dec)] += 1
-
-        for i in range(len(category)):
-            if Region[i][5] == 1: # valid spectrum
-                # binning = 4**n
-                n = int(math.log(Region[i][6])/math.log(4.) + 0.1)
-                # if binning larger than 1, detection is done twice: m=>0.5
-                if n == 0: m = 1.0 # case binning=1
-                else: m = 0.5
-                try:
-                    #2014/11/28 Counting is done for each binning separately
-                    GridClusterWithBinning[category[i]][n][int((Region[i][3] - ra0)/grid_ra)][int((Region[i][4] - dec0)/grid_dec)] += m
-                    #GridCluster[category[i]][int((Region[i][3] - ra0)/grid_ra)][int((Region[i][4] - dec0)/grid_dec)] += 1.0
-                except IndexError:
-                    pass
+        signal_pos = np.array([detect_signal[row][:2] for row in range(len(detect_signal))], dtype=float).reshape(-1, 2)
+        signal_x = ((signal_pos[:, 0] - ra0) / grid_ra).astype(int)
+        signal_y = ((signal_pos[:, 1] - dec0) / grid_dec).astype(int)
+        np.add.at(GridMember, (signal_x, signal_y), 1)
+
+        is_valid = np.array([Region[i][5] == 1 for i in range(len(category))], dtype=bool) # valid spectrum
+        if np.any(is_valid):
+            valid_region = np.array([Region[i][3:7] for i in np.nonzero(is_valid)[0]], dtype=float)
+            cat = np.asarray(category)[is_valid]
+            # binning = 4**n
+            n = (np.log(valid_region[:, 3]) / math.log(4.) + 0.1).astype(int)
+            # if binning larger than 1, detection is done twice: m=>0.5
+            m = np.where(n == 0, 1.0, 0.5)
+            x = ((valid_region[:, 0] - ra0) / grid_ra).astype(int)
+            y = ((valid_region[:, 1] - dec0) / grid_dec).astype(int)
+            #2014/11/28 Counting is done for each binning separately
+            # indices out of the grid are ignored while negative ones count from the end
+            index = (cat, n, x, y)
+            in_range = np.ones(len(cat), dtype=bool)
+            for idx, size in zip(index, GridClusterWithBinning.shape):
+                in_range &= (-size <= idx) & (idx < size)
+            np.add.at(GridClusterWithBinning, tuple(idx[in_range] for idx in index), m[in_range])
         GridCluster = GridClusterWithBinning.max(axis=1)
         LOG.trace('GridClusterWithBinning = %s', GridClusterWithBinning)
         LOG.trace('GridCluster = %s', GridCluster)
@@ -1628,20 +1646,20 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
         MinChanBinSp = 50.0
         BinningVariation = 1 + int(math.ceil(math.log(self.nchan/MinChanBinSp)/math.log(4)))
 
-        for Nc in range(Ncluster):
-            LOG.trace('GridCluster[Nc]: %s', GridCluster[Nc])
-            LOG.trace('Gridmember: %s', GridMember)
-            for x in range(nra):
-                for y in range(ndec):
-                    if GridMember[x][y] == 0: GridCluster[Nc][x][y] = 0.0
-                    elif GridMember[x][y] == 1 and GridCluster[Nc][x][y] > 0.9:
-                        GridCluster[Nc][x][y] = 1.0
-                    ### 2014/11/28 Binning valiation is taken into account in the previous stage
-                    # normarize validity
-                    #else: GridCluster[Nc][x][y] /= float(GridMember[x][y])
-                    else: GridCluster[Nc][x][y] = min(GridCluster[Nc][x][y] / float(GridMember[x][y]), 1.0)
-
-            if ((GridCluster[Nc] > self.Questionable)*1).sum() == 0: lines[Nc][2] = False
+        no_member = GridMember == 0
+        single_member = GridMember == 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for Nc in range(Ncluster):
+                LOG.trace('GridCluster[Nc]: %s', GridCluster[Nc])
+                LOG.trace('Gridmember: %s', GridMember)
+                ### 2014/11/28 Binning valiation is taken into account in the previous stage
+                # normarize validity
+                normalized = np.minimum(GridCluster[Nc] / GridMember, 1.0)
+                normalized[single_member & (GridCluster[Nc] > 0.9)] = 1.0
+                normalized[no_member] = 0.0
+                GridCluster[Nc] = normalized
+
+                if ((GridCluster[Nc] > self.Questionable)*1).sum() == 0: lines[Nc][2] = False
 
         threshold = [self.Valid, self.Marginal, self.Questionable]
         flag_digit = self.flag_digits['validation']
@@ -1710,41 +1728,18 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
         GridScore = np.zeros((2, nra, ndec), dtype=np.float32)
         LOG.trace('GridCluster = %s', GridCluster)
         LOG.trace('lines = %s', lines)
+        # Rating = 1.0 / (dx*dx + dy*dy) for abs(dx) + abs(dy) <= 3 within 2 pixels
+        d = np.arange(-2, 3)
+        d2 = np.add.outer(d * d, d * d)
+        kernel = np.zeros(d2.shape, dtype=np.float64)
+        in_kernel = (np.add.outer(abs(d), abs(d)) <= 3) & (d2 > 0)
+        kernel[in_kernel] = 1.0 / d2[in_kernel]
+        kernel[2][2] = 6.0
+        # sum of Rating of the pixels within the grid
+        GridScore[1] = convolve2d(np.ones((nra, ndec)), kernel, mode='constant')
         for Nc in range(Ncluster):
             if lines[Nc][2] != False:
-                GridScore[:] = 0.0
-                for x in range(nra):
-                    range_x = list(range(-min(2, x), 0)) + list(range(1, min(3, nra-x)))
-                    for y in range(ndec):
-                        range_y = list(range(-min(2, y), 0)) + list(range(1, min(3, ndec-y)))
-                        # TN refactoring
-                        # split smoothing loop
-                        # dx = 0 and dy = 0
-                        GridScore[0][x][y] += 6.0 * GridCluster[Nc][x][y]
-                        GridScore[1][x][y] += 6.0
-                        # dx = 0
-                        for dy in range_y:
-                            ny = y + dy
-                            #Rating = 1.0 / abs(dy)
-                            Rating = 1.0 / abs(dy*dy)
-                            GridScore[0][x][y] += Rating * GridCluster[Nc][x][ny]
-                            GridScore[1][x][y] += Rating
-                        # dy = 0
-                        for dx in range_x:
-                            nx = x + dx
-                            #Rating = 1.0 / abs(dx)
-                            Rating = 1.0 / abs(dx*dx)
-                            GridScore[0][x][y] += Rating * GridCluster[Nc][nx][y]
-                            GridScore[1][x][y] += Rating
-                        # dx != 0 and dy != 0
-                        for dx in range_x:
-                            for dy in range_y:
-                                if (abs(dx) + abs(dy)) <= 3:
-                                    (nx, ny) = (x + dx, y + dy)
-                                    #Rating = 1.0 / sqrt(dx*dx + dy*dy)
-                                    Rating = 1.0 / (dx*dx + dy*dy)
-                                    GridScore[0][x][y] += Rating * GridCluster[Nc][nx][ny]
-                                    GridScore[1][x][y] += Rating
+                GridScore[0] = convolve2d(GridCluster[Nc], kernel, mode='constant')
                 LOG.trace('Score :  GridScore[%s][0] = %s', Nc, GridScore[0])
                 LOG.trace('Rating:  GridScore[%s][1] = %s', Nc, GridScore[1])
                 #GridCluster[Nc] = GridScore[0] / GridScore[1]
@@ -1844,6 +1839,15 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
         MinFWHM = self.MinFWHM
         MaxFWHM = self.MaxFWHM
 
+        # elapsed time of each phase for debugging
+        elapsed_isolation = 0.0
+        elapsed_blur = 0.0
+        elapsed_distribution = 0.0
+
+        # grid position of the detected lines
+        region_x = np.array([int((Region[i][3] - x0)/grid_ra) for i in range(len(category))], dtype=int)
+        region_y = np.array([int((Region[i][4] - y0)/grid_dec) for i in range(len(category))], dtype=int)
+
         # for Channel Map velocity range determination 2014/1/12
         channelmap_range = []
         for i in range(len(lines)):
@@ -1863,7 +1867,9 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
             GridCluster[Nc] *= 0.0
 
             # Clean isolated grids
+            start_time = time.time()
             MemberList, Realmember = self.CleanIsolation(nra, ndec, Original, Plane, GridMember)
+            elapsed_isolation += time.time() - start_time
             if len(MemberList) == 0: continue
 
             # Blur each SubCluster with the radius of sqrt(Nmember/Pi) * ratio
@@ -1871,9 +1877,15 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
             # Set-up SubCluster
             for Ns in range(len(MemberList)):  # Ns: SubCluster number
                 LOG.trace('------01------ Ns=%s', Ns)
+                start_time = time.time()
                 SubPlane = np.zeros((nra, ndec), dtype=np.float32)
-                for (x, y) in MemberList[Ns]: SubPlane[x][y] = Original[x][y]
+                member_x, member_y = np.array(MemberList[Ns]).T
+                SubPlane[member_x, member_y] = Original[member_x, member_y]
                 ValidPlane, BlurPlane = self.DoBlur(Realmember[Ns], nra, ndec, SubPlane, ratio)
+                elapsed_blur += time.time() - start_time
+                # spatial grid position of each line
+                is_subcluster_member = (np.asarray(category) == Nc) & \
+                    (SubPlane[region_x, region_y] > self.Valid)
 
                 LOG.debug('GridCluster.shape = %s', list(GridCluster.shape))
                 LOG.trace('Original %s', Original)
@@ -1903,9 +1915,8 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
                 FitData = []
                 LOG.trace('------02-1---- category=%s, len(category)=%s, ClusterNumber(Nc)=%s, SubClusterNumber(Ns)=%s', category, len(category), Nc, Ns)
                 #Region format:([row, line[0], line[1], RA, DEC, flag])
-                dummy = [tuple(Region[i][:5]) for i in range(len(category))
-                         if category[i] == Nc and Region[i][5] == 1 and
-                         SubPlane[int((Region[i][3] - x0)/grid_ra)][int((Region[i][4] - y0)/grid_dec)] > self.Valid]
+                # all flags are cleared above so that flag check is not necessary
+                dummy = [tuple(Region[i][:5]) for i in np.nonzero(is_subcluster_member)[0]]
                 LOG.trace('------02-2----- len(dummy)=%s, dummy=%s', len(dummy), dummy)
                 if len(dummy) == 0: continue
 
@@ -2074,15 +2085,17 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
                 LOG.trace('------07------ SingularMatrix=False')
                 # Clear FitData and restore all relevant data
                 # FitData: [(Chan0, Chan1, RA, DEC, Flag)]
-                FitData = []
-                for i in range(len(category)):
-                    if category[i] == Nc and Region[i][5] == 1 and SubPlane[int((Region[i][3] - x0)/grid_ra)][int((Region[i][4] - y0)/grid_dec)] > self.Valid:
-                        FitData.append(tuple(Region2[i][:5]))
+                FitData = [tuple(Region2[i][:5]) for i in np.nonzero(is_subcluster_member)[0]]
                 if len(FitData) == 0: continue
 
                 # for Channel Map velocity range determination 2014/1/12
                 (MaskMin, MaskMax) = (10000.0, 0.0)
+                # Valid grids to search the nearest one for grids in Blur Plane
+                (valid_x, valid_y) = np.nonzero(ValidPlane == 1)
+                square_aspect = grid_ra / grid_dec
+                square_aspect *= square_aspect
                 # Calculate Fit for each position
+                start_time = time.time()
                 LOG.trace('------08------ Calc Fit for each pos')
                 for x in range(nra):
                     for y in range(ndec):
@@ -2116,17 +2129,10 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
                             # in Blur Plane, Fit is not extrapolated,
                             # but use the nearest value in Valid Plane
                             # Search the nearest Valid Grid
-                            Nearest = []
-                            square_aspect = grid_ra / grid_dec
-                            square_aspect *= square_aspect
-                            Dist2 = np.inf
-                            for xx in range(nra):
-                                for yy in range(ndec):
-                                    if ValidPlane[xx][yy] == 1:
-                                        Dist3 = (xx-x)*(xx-x)*square_aspect + (yy-y)*(yy-y)
-                                        if Dist2 > Dist3:
-                                            Nearest = [xx, yy]
-                                            Dist2 = Dist3
+                            Dist3 = (valid_x-x)*(valid_x-x)*square_aspect + (valid_y-y)*(valid_y-y)
+                            nearest_index = np.argmin(Dist3)
+                            Nearest = [valid_x[nearest_index], valid_y[nearest_index]]
+                            Dist2 = Dist3[nearest_index]
                             (RA0, DEC0) = (x0 + grid_ra * (x + 0.5), y0 + grid_dec * (y + 0.5))
                             (RA1, DEC1) = (x0 + grid_ra * (Nearest[0] + 0.5), y0 + grid_dec * (Nearest[1] + 0.5))
 
@@ -2159,6 +2165,8 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
                                 LOG.trace('------12------ out of range Fit0=%s Fit1=%s', Fit0, Fit1)
                                 continue
 
+                elapsed_distribution += time.time() - start_time
+
                 # Add every SubClusters to GridCluster just for Plot
                 GridCluster[Nc] += BlurPlane
                 #if not SingularMatrix: GridCluster[Nc] += BlurPlane
@@ -2176,10 +2184,11 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
                 LOG.info('channelmap_range[Nc]: %s', channelmap_range[Nc])
                 LOG.info('lines[Nc]: %s', lines[Nc])
 
-            for x in range(nra):
-                for y in range(ndec):
-                    if Original[x][y] > self.Valid: GridCluster[Nc][x][y] = 2.0
-                    elif GridCluster[Nc][x][y] > 0.5: GridCluster[Nc][x][y] = 1.0
+            GridCluster[Nc] = np.where(Original > self.Valid, 2.0,
+                                       np.where(GridCluster[Nc] > 0.5, 1.0, GridCluster[Nc]))
+
+        LOG.debug('Final Stage: isolation %.3f sec, blur %.3f sec, distribution %.3f sec',
+                  elapsed_isolation, elapsed_blur, elapsed_distribution)
 
         threshold = [1.5, 0.5, 0.5, 0.5]
         flag_digit = self.flag_digits['final']
@@ -2215,41 +2224,17 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
             Realmember contains number of cluster members with only Valid detection
             RealMember: [Nvalid_00, Nvalid_01, ..., Nvalid_n-1i-1]
         """
-        Nmember = []  # number of positions where value > self.Marginal in each SubCluster
-        Realmember = []  # number of positions where value > self.Valid in each SubCluster
-        MemberList = []
-        NsubCluster = 0
         # Separate cluster members into several SubClusters by spacial connection
-        for x in range(nra):
-            for y in range(ndec):
-                if Plane[x][y] == 1:
-                    Plane[x][y] = 2
-                    SearchList = [(x, y)]
-                    M = 1
-                    if Original[x][y] > self.Valid:
-                        MM = 1
-                    else:
-                        MM = 0
-                    MemberList.append([(x, y)])
-                    while(len(SearchList) != 0):
-                        cx, cy = SearchList[0]
-                        #for dx in [-1, 0, 1]:
-                        for dx in range(-min(1, cx), min(2, nra-cx)):
-                            #for dy in [-1, 0, 1]:
-                            for dy in range(-min(1, cy), min(2, ndec-cy)):
-                                (nx, ny) = (cx + dx, cy + dy)
-                                #if 0 <= nx < nra and 0 <= ny < ndec and Plane[nx][ny] == 1:
-                                if Plane[nx][ny] == 1:
-                                    Plane[nx][ny] = 2
-                                    SearchList.append((nx, ny))
-                                    M += 1
-                                    if Original[nx][ny] > self.Valid:
-                                        MM += 1
-                                    MemberList[NsubCluster].append((nx, ny))
-                        del SearchList[0]
-                    Nmember.append(M)
-                    Realmember.append(MM)
-                    NsubCluster += 1
+        # SubClusters are numbered in the order of raster scan of the grids
+        labels, NsubCluster = label(Plane == 1, structure=np.ones((3, 3), dtype=int))
+        Plane[labels > 0] = 2
+        # number of positions where value > self.Marginal in each SubCluster
+        Nmember = np.bincount(labels.ravel(), minlength=NsubCluster + 1)[1:].tolist()
+        # number of positions where value > self.Valid in each SubCluster
+        Realmember = np.bincount(labels[Original > self.Valid], minlength=NsubCluster + 1)[1:].tolist()
+        MemberList = [[] for _ in range(NsubCluster)]
+        for x, y in zip(*np.nonzero(labels)):
+            MemberList[labels[x, y] - 1].append((int(x), int(y)))
 
         if len(Nmember) > 0:
             Threshold = min(0.5 * max(Realmember), 3)
@@ -2300,13 +2285,8 @@ class ValidateLineRaster(basetask.StandardTaskTemplate):
         # caution: if nra < (Blur*2+1) and ndec < (Blur*2+1)
         #  => dimension of SPC.convolve2d(Sub,kernel) gets not (nra,ndec) but (Blur*2+1,Blur*2+1)
         if nra < (Blur * 2 + 1) and ndec < (Blur * 2 + 1): Blur = int((max(nra, ndec) - 1) // 2)
-        kernel = np.zeros((Blur * 2 + 1, Blur * 2 + 1), dtype=int)
-        for x in range(Blur * 2 + 1):
-            dx = Blur - x
-            for y in range(Blur * 2 + 1):
-                dy = Blur - y
-                if sqrt(dx*dx + dy*dy) <= BlurF:
-                    kernel[x][y] = 1
+        d = Blur - np.arange(Blur * 2 + 1)
+        kernel = (np.sqrt(np.add.outer(d * d, d * d)) <= BlurF).astype(int)
         # ValidPlane is used for fitting parameters
         # BlurPlane is not used for fitting but just extend the parameter determined in ValidPlane
         return (SubPlane > self.Valid) * 1, (convolve2d(SubPlane, kernel) > self.Marginal) * 1
@@ -2467,21 +2447,15 @@ def convolve2d(data: np.ndarray, kernel: np.ndarray, mode: str = 'nearest', cval
         dummy[0:edgex, edgey+ndy:] = data[0][ndy-1]
         dummy[edgex+ndx:, 0:edgey] = data[ndx-1][0]
         dummy[edgex+ndx:, edgey+ndy:] = data[ndx-1][ndy-1]
-        for i in range(ndx):
-            dummy[i+edgex, 0:edgey] = data[i][0]
-            dummy[i+edgex, edgey+ndy:] = data[i][ndy-1]
-        for i in range(ndy):
-            dummy[0:edgex, i+edgey] = data[0][i]
-            dummy[edgex+ndx:, i+edgey] = data[ndx-1][i]
+        dummy[edgex:edgex+ndx, 0:edgey] = np.asarray(data)[:, :1]
+        dummy[edgex:edgex+ndx, edgey+ndy:] = np.asarray(data)[:, ndy-1:]
+        dummy[0:edgex, edgey:edgey+ndy] = np.asarray(data)[:1, :]
+        dummy[edgex+ndx:, edgey:edgey+ndy] = np.asarray(data)[ndx-1:, :]
+    # accumulate shifted planes in the order of kernel elements
     cdata = np.zeros((ndx, ndy), dtype=np.float64)
-    for ix in range(ndx):
-        for iy in range(ndy):
-            for jx in range(nkx):
-                for jy in range(nky):
-                    idx = ix + jx
-                    idy = iy + jy
-                    val = dummy[idx][idy]
-                    cdata[ix][iy] += kernel[jx][jy] * val
+    for jx in range(nkx):
+        for jy in range(nky):
+            cdata += kernel[jx][jy] * dummy[jx:jx+ndx, jy:jy+ndy]
     return cdata
 
 
@@ -0,0 +1,61 @@
+"""Unit test for hsd/tasks/baseline/validation.py module."""
+import numpy as np
+import pytest
+
+from pipeline.hsd.tasks.baseline.validation import ValidateLineRaster, convolve2d
+
+
+def _direct_convolve2d(data, kernel, mode, cval):
+    """Reference implementation of convolve2d by explicit loop over pixels."""
+    (ndx, ndy) = data.shape
+    (nkx, nky) = kernel.shape
+    edgex = (nkx - 1) // 2
+    edgey = (nky - 1) // 2
+    cdata = np.zeros((ndx, ndy), dtype=np.float64)
+    for ix in range(ndx):
+        for iy in range(ndy):
+            for jx in range(nkx):
+                for jy in range(nky):
+                    x = ix + jx - edgex
+                    y = iy + jy - edgey
+                    if mode == 'nearest':
+                        val = data[min(max(x, 0), ndx - 1)][min(max(y, 0), ndy - 1)]
+                    elif 0 <= x < ndx and 0 <= y < ndy:
+                        val = data[x][y]
+                    else:
+                        val = cval
+                    cdata[ix][iy] += kernel[jx][jy] * val
+    return cdata
+
+
+@pytest.mark.parametrize('mode', ['nearest', 'constant'])
+@pytest.mark.parametrize('shape, kernel_size', [((7, 9), 3), ((12, 5), 5), ((3, 3), 1)])
+def test_convolve2d(mode, shape, kernel_size):
+    """Test that convolve2d matches direct convolution including edges."""
+    rng = np.random.default_rng(30)
+    data = rng.random(shape)
+    kernel = rng.integers(0, 3, (kernel_size, kernel_size))
+    expected = _direct_convolve2d(data, kernel, mode, 0.3)
+    assert np.allclose(convolve2d(data, kernel, mode=mode, cval=0.3), expected)
+
+
+def test_clean_isolation():
+    """Test that CleanIsolation separates spatially connected sub-clusters."""
+    task = object.__new__(ValidateLineRaster)
+    Original = np.zeros((6, 7))
+    # diagonally connected sub-cluster of three Valid grids
+    Original[0][0] = Original[1][1] = Original[2][2] = 0.8
+    # sub-cluster of four grids including one Marginal grid
+    Original[0][5] = Original[0][6] = Original[1][6] = 0.9
+    Original[1][5] = 0.4
+    # isolated grid made from single spectrum
+    Original[5][0] = 0.9
+    Plane = (Original > task.Marginal) * 1
+    GridMember = np.full(Original.shape, 3)
+    GridMember[5][0] = 1
+
+    MemberList, Realmember = task.CleanIsolation(6, 7, Original, Plane, GridMember)
+
+    assert [sorted(m) for m in MemberList] == [[(0, 0), (1, 1), (2, 2)],
+                                               [(0, 5), (0, 6), (1, 5), (1, 6)]]
+    assert Realmember == [3, 3]
@@ -482,8 +482,8 @@ class SerialBaselineSubtractionWorker(basetask.StandardTaskTemplate):
         accum = self.inputs.plan
         deviationmask_list = self.inputs.deviationmask
         formatted_edge = list(common.parseEdge(self.inputs.edge))
-        out_rowmap = utils.make_row_map(origin_ms, outfile)
-        in_rowmap = None if ms.name == ms.origin_ms else utils.make_row_map(origin_ms, ms.name)
+        out_rowmap = utils.make_row_map_between_ms(origin_ms, outfile)
+        in_rowmap = None if ms.name == ms.origin_ms else utils.make_row_map_between_ms(origin_ms, ms.name)
         plot_list = []
         stats = []
 
@@ -21,10 +21,14 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
+import numpy as np
+
 import pipeline.infrastructure as infrastructure
 from pipeline.infrastructure import casa_tools
 
 if TYPE_CHECKING:
+    from numpy.typing import ArrayLike, NDArray
+
     from pipeline.infrastructure.utils.casa_types import (
         DirectionDict,
         EpochDict,
@@ -34,7 +38,8 @@ if TYPE_CHECKING:
 
 LOG = infrastructure.logging.get_logger(__name__)
 
-__all__ = { 'direction_shift', 'direction_offset', 'direction_recover', 'direction_convert' }
+__all__ = { 'direction_shift', 'direction_offset', 'direction_recover', 'direction_recover_many',
+            'direction_convert' }
 
 
 def direction_shift(direction: DirectionDict, reference: DirectionDict, origin: DirectionDict) -> DirectionDict:
@@ -135,6 +140,45 @@ def direction_recover(ra: float, dec: float, org_direction: DirectionDict) -> tu
     return new_ra, new_dec
 
 
+def direction_recover_many(ra: ArrayLike, dec: ArrayLike,
+                           org_direction: DirectionDict) -> tuple[NDArray, NDArray]:
+    """
+    Recovers the 'Shifted-coordinate' from 'Offset-coordinate' for arrays of directions.
+
+    Array counterpart of direction_recover(): the offset of each direction
+    from the coordinate-origin (0, 0), i.e. its separation and position
+    angle, is applied to org_direction with spherical trigonometry on the
+    whole arrays at once, instead of with the measures tool per direction.
+
+    Args:
+        ra:  ra of 'Offset-coordinate' in degrees
+        dec: dec of 'Offset-coordinate' in degrees
+        org_direction: direction of the origin
+    Returns:
+        return value: arrays of ra, dec in 'Shift-coordinate' in degrees,
+                      with ra in the range (-180, 180] as returned by
+                      the measures tool
+    """
+    qa = casa_tools.quanta
+    ra0 = qa.convert(org_direction['m0'], 'rad')['value']
+    dec0 = qa.convert(org_direction['m1'], 'rad')['value']
+    ra = np.radians(np.asarray(ra, dtype=float))
+    dec = np.radians(np.asarray(dec, dtype=float))
+
+    # separation and position angle of the directions from (0, 0)
+    sin_dec, cos_dec = np.sin(dec), np.cos(dec)
+    offset = np.arctan2(np.hypot(cos_dec * np.sin(ra), sin_dec), cos_dec * np.cos(ra))
+    posang = np.arctan2(cos_dec * np.sin(ra), sin_dec)
+
+    # shift the origin by the offset along the position angle
+    new_dec = np.arcsin(np.sin(dec0) * np.cos(offset) + np.cos(dec0) * np.sin(offset) * np.cos(posang))
+    new_ra = ra0 + np.arctan2(np.sin(posang) * np.sin(offset) * np.cos(dec0),
+                              np.cos(offset) - np.sin(dec0) * np.sin(new_dec))
+    new_ra = np.arctan2(np.sin(new_ra), np.cos(new_ra))
+
+    return np.degrees(new_ra), np.degrees(new_dec)
+
+
 def direction_convert(
         direction: DirectionDict,
         mepoch: EpochDict,
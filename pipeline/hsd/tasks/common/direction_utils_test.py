@@ -4,11 +4,13 @@ direction_utils_test.py : Unit tests for "hsd/tasks/common/direction_utils.py".
 Unit tests for "hsd/tasks/common/direction_utils.py"
 """
 
+import numpy as np
 import pytest
 
 import pipeline.infrastructure as infrastructure
 from pipeline.infrastructure import casa_tools
-from pipeline.hsd.tasks.common.direction_utils import direction_shift, direction_offset, direction_recover, direction_convert
+from pipeline.hsd.tasks.common.direction_utils import direction_shift, direction_offset, direction_recover, \
+    direction_recover_many, direction_convert
 
 LOG = infrastructure.get_logger(__name__)
 
@@ -177,6 +179,35 @@ def test_direction_recover( ra, dec, org_direction, expected_ra, expected_dec ):
     result_ra, result_dec = direction_recover( ra, dec, org_direction )
     assert abs(result_ra-expected_ra)<eps and abs(result_dec-expected_dec)<eps
 
+@pytest.mark.parametrize("ra, dec, org_direction, expected_ra, expected_dec", test_params_recover)
+def test_direction_recover_many( ra, dec, org_direction, expected_ra, expected_dec ):
+    """
+    Unit test for direction_recover_many(): quantitave test of calculations.
+
+    Unit test for direction_recover_many(): quantitave test of calculations,
+    for a single direction and for arrays of raster offsets around it
+    compared with direction_recover().
+    Args:
+      ra, dec : (as noted for direction_recover() )
+      org_directiopn : (as noted for direction_recover() )
+      expected_ra, expected_dec : expected results
+    Returns:
+      (none)
+    Raises:
+      AssertationError for tests failing
+    """
+    eps = 1.0E-8 # in deg
+    result_ra, result_dec = direction_recover_many( [ra], [dec], org_direction )
+    assert abs(result_ra[0]-expected_ra)<eps and abs(result_dec[0]-expected_dec)<eps
+
+    rng = np.random.default_rng( 1 )
+    offsets_ra = ra + rng.uniform( -0.05, 0.05, 20 )
+    offsets_dec = dec + rng.uniform( -0.05, 0.05, 20 )
+    result_ra, result_dec = direction_recover_many( offsets_ra, offsets_dec, org_direction )
+    for rr, dd, result_rr, result_dd in zip( offsets_ra, offsets_dec, result_ra, result_dec ):
+        expected_rr, expected_dd = direction_recover( rr, dd, org_direction )
+        assert abs(result_rr-expected_rr)<eps and abs(result_dd-expected_dd)<eps
+
 # ----------------------------------------------------------------------------
 
 test_params_convert = [
@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import collections
+import collections.abc
 import contextlib
 import datetime
 import functools
@@ -25,6 +26,7 @@ if TYPE_CHECKING:
     from typing import Any, TypeAlias
 
     from casatools import table as casa_table
+    from numpy.typing import ArrayLike, NDArray
     TableLike: TypeAlias = casa_tools._logging_table_cls | casa_table
 
     from pipeline.domain import DataTable, Field, MeasurementSet, ObservingRun
@@ -699,11 +701,156 @@ class EchoDictionary(dict):
         """Destructor of EchoDictionary class."""
         return x
 
+    def lookup(self, rows: ArrayLike) -> NDArray:
+        """Return the given rows as an array, as RowMap.lookup does for mapped rows."""
+        return numpy.asarray(rows)
+
+
+class RowMap(collections.abc.Mapping):
+    """
+    Row mapping between a source and a derived MeasurementSet (MS).
+
+    The mapping is stored as two integer arrays: the row IDs of the source
+    MS in ascending order, and the corresponding row IDs of the derived MS.
+    Arrays of row IDs are mapped at once with lookup(). RowMap is also a
+    read-only mapping of source MS row ID to derived MS row ID, such that
+    it can be used in place of a row mapping dictionary.
+
+    Attributes:
+        src_rows: Row IDs of the source MS in ascending order.
+        derived_rows: Corresponding row IDs of the derived MS.
+    """
+
+    def __init__(self, src_rows: ArrayLike, derived_rows: ArrayLike):
+        """
+        Initialize RowMap class.
+
+        Args:
+            src_rows: Row IDs of the source MS.
+            derived_rows: Corresponding row IDs of the derived MS. If a
+                source row ID is given more than once, the last mapping is
+                kept, as when assigning to a dictionary.
+        """
+        src_rows = numpy.asarray(src_rows, dtype=numpy.int64)
+        derived_rows = numpy.asarray(derived_rows, dtype=numpy.int64)
+        self.src_rows, last = numpy.unique(src_rows[::-1], return_index=True)
+        self.derived_rows = derived_rows[::-1][last]
+
+    def lookup(self, rows: ArrayLike) -> NDArray:
+        """
+        Return the row IDs of the derived MS for an array of row IDs of the source MS.
+
+        Args:
+            rows: Row IDs of the source MS.
+
+        Raises:
+            KeyError: If any of the rows is not mapped.
+
+        Returns:
+            Row IDs of the derived MS, with the shape of rows.
+        """
+        rows = numpy.asarray(rows)
+        index = numpy.searchsorted(self.src_rows, rows)
+        found = index < len(self.src_rows)
+        found[found] = self.src_rows[index[found]] == rows[found]
+        if not numpy.all(found):
+            raise KeyError(rows[~found].ravel()[0])
+        return self.derived_rows[index]
+
+    @property
+    def nbytes(self) -> int:
+        """Return the number of bytes used by the row ID arrays."""
+        return self.src_rows.nbytes + self.derived_rows.nbytes
+
+    def save(self, path: str, key: tuple[int, ...]):
+        """
+        Save the row mapping to a file, replacing any existing file at once.
+
+        Args:
+            path: A path to the file.
+            key: Integers identifying the tables the mapping was made from,
+                e.g. their modification times, to check on load.
+        """
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            numpy.savez(f, src_rows=self.src_rows, derived_rows=self.derived_rows, key=numpy.asarray(key))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, key: tuple[int, ...]) -> RowMap | None:
+        """
+        Load a row mapping from a file.
+
+        Args:
+            path: A path to the file.
+            key: Integers identifying the tables the mapping should have been
+                made from.
+
+        Returns:
+            RowMap instance, or None if the file does not exist, or if it
+            holds a mapping made from other tables.
+        """
+        if not os.path.exists(path):
+            return None
+        with numpy.load(path) as data:
+            if not numpy.array_equal(data['key'], key):
+                return None
+            rowmap = cls.__new__(cls)
+            rowmap.src_rows = data['src_rows']
+            rowmap.derived_rows = data['derived_rows']
+        return rowmap
+
+    def __getitem__(self, row: int) -> int:
+        """Return the row ID of the derived MS for a row ID of the source MS."""
+        index = numpy.searchsorted(self.src_rows, row)
+        if index < len(self.src_rows) and self.src_rows[index] == row:
+            return self.derived_rows[index]
+        raise KeyError(row)
+
+    def __iter__(self):
+        return iter(self.src_rows)
+
+    def __len__(self) -> int:
+        return len(self.src_rows)
+
+
+# Row mappings used recently in this process: (source MS, derived MS) -> (key, RowMap)
+_ROW_MAP_CACHE: collections.OrderedDict = collections.OrderedDict()
+_ROW_MAP_CACHE_SIZE = 8
+
+
+def row_map_path(src_vis: str, derived_vis: str) -> str:
+    """
+    Return the path of the file storing the row mapping between source and derived MSes.
+
+    The file is stored next to the derived MS.
+
+    Args:
+        src_vis: A name of source MS.
+        derived_vis: A name of derived MS.
+
+    Returns:
+        A path to the row mapping file.
+    """
+    derived_vis = derived_vis.rstrip(os.sep)
+    return '{}.{}.rowmap.npz'.format(derived_vis, os.path.basename(src_vis.rstrip(os.sep)))
+
+
+def _table_mtime(vis: str) -> int:
+    """Return the modification time of a table in nanoseconds."""
+    return os.stat(os.path.join(vis, 'table.dat')).st_mtime_ns
+
+
 def make_row_map_between_ms(src_ms: MeasurementSet, derived_vis: str,
-                            table_container=None) -> dict:
+                            table_container=None) -> RowMap | EchoDictionary:
     """
     Make row mapping between source and derived MSes.
 
+    The row mapping is made once per pair of MSes, and shared between
+    stages: it is stored in a file next to the derived MS, and reused as
+    long as neither MS was modified since. The row mappings used recently
+    are also kept in memory.
+
     Args:
         src_ms: An MS domain object of source MS.
         derived_vis: A name of derived MS
@@ -711,24 +858,53 @@ def make_row_map_between_ms(src_ms: MeasurementSet, derived_vis: str,
             of calibrated and associating MS.
 
     Returns:
-        A row mapping dictionary. A key is row ID of source MS and
+        A row mapping. A key is row ID of source MS and
         a corresponding value is that of derived MS.
     """
+    if src_ms.name == derived_vis:
+        return EchoDictionary()
+
     src_tb = None
     derived_tb = None
     if table_container is not None:
         src_tb = table_container.tb1
         derived_tb = table_container.tb2
 
-    return make_row_map(src_ms, derived_vis, src_tb, derived_tb)
+    cache_key = (absolute_path(src_ms.name), absolute_path(derived_vis))
+    key = (_table_mtime(src_ms.name), _table_mtime(derived_vis))
+    if cache_key in _ROW_MAP_CACHE and _ROW_MAP_CACHE[cache_key][0] == key:
+        _ROW_MAP_CACHE.move_to_end(cache_key)
+        return _ROW_MAP_CACHE[cache_key][1]
+
+    path = row_map_path(src_ms.name, derived_vis)
+    start_time = time.time()
+    rowmap = RowMap.load(path, key)
+    if rowmap is not None:
+        LOG.debug('Loaded row map between {} and {} from {} in {:.3f} sec'.format(
+            src_ms.basename, os.path.basename(derived_vis), path, time.time() - start_time))
+    else:
+        rowmap = make_row_map(src_ms, derived_vis, src_tb, derived_tb)
+        LOG.debug('Made row map between {} and {} in {:.3f} sec'.format(
+            src_ms.basename, os.path.basename(derived_vis), time.time() - start_time))
+        try:
+            rowmap.save(path, key)
+        except OSError as e:
+            LOG.warning('Failed to save row map to {}: {}'.format(path, e))
+
+    _ROW_MAP_CACHE[cache_key] = (key, rowmap)
+    while len(_ROW_MAP_CACHE) > _ROW_MAP_CACHE_SIZE:
+        _ROW_MAP_CACHE.popitem(last=False)
+    return rowmap
 
 #@profiler
 def make_row_map(src_ms: MeasurementSet, derived_vis: str,
                  src_tb: TableLike | None=None,
-                 derived_tb: TableLike | None=None) -> dict:
+                 derived_tb: TableLike | None=None) -> RowMap | EchoDictionary:
     """
     Make row mapping between a source and a derived MeasurementSet (MS).
 
+    Use make_row_map_between_ms to reuse the row mapping made before.
+
     Args:
         src_ms: An MS domain object of source MS.
         derived_vis: A name of the MS that derives from the source MS.
@@ -738,13 +914,14 @@ def make_row_map(src_ms: MeasurementSet, derived_vis: str,
             The derived_vis is used if not specified.
 
     Returns:
-        A row mapping dictionary. A key is row ID of calibrated MS and
+        A row mapping. A key is row ID of calibrated MS and
         a corresponding value is that of baselined MS.
     """
     vis0 = src_ms.name
     vis1 = derived_vis
 
-    rowmap = {}
+    src_rows = []
+    derived_rows = []
 
     if vis0 == vis1:
         return EchoDictionary()
@@ -967,15 +1144,15 @@ def make_row_map(src_ms: MeasurementSet, derived_vis: str,
                             # assert set(tstate0) == set(states[scan_number])
                             assert set(tstate0).issubset(set(states[scan_number]))
 
-                            for (i0, i1) in zip(sort_index0, sort_index1):
-                                r0 = trow0[i0]
-                                r1 = trow1[i1]
-                                rowmap[r0] = r1
+                            src_rows.append(trow0[sort_index0])
+                            derived_rows.append(trow1[sort_index1])
 
                             LOG.trace('END PROCESSOR %s SCAN %s DATA_DESC_ID %s ANTENNA %s FIELD %s' %
                                       (processor_id, scan_number, data_desc_id, antenna_id, field_id))
 
-    return rowmap
+    if not src_rows:
+        return RowMap([], [])
+    return RowMap(numpy.concatenate(src_rows), numpy.concatenate(derived_rows))
 
 
 class SpwSimpleView:
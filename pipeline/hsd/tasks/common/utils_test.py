@@ -22,12 +22,26 @@ Test Cases:
         interpreted the values in tests #4 and #5 as 2024/4/15, which
         is obviously wrong. These tests intend to make sure the
         functions are not suffered from the bug.
+
+Row mapping between source and derived MSes is tested on synthetic
+row IDs, compared with a row mapping dictionary, and benchmarked against
+it.
 """
 import datetime
+import os
+import time
+import tracemalloc
+import types
 
+import numpy
 import pytest
 
-from .utils import mjd_to_datetime, mjd_to_datestring
+from pipeline.infrastructure import logging
+
+from . import utils
+from .utils import RowMap, mjd_to_datetime, mjd_to_datestring
+
+LOG = logging.get_logger(__name__)
 
 test_cases = [
     (56839.91646527777, datetime.datetime(2014, 7, 1, 21, 59, 42, 599999, tzinfo=datetime.timezone.utc)),
@@ -71,3 +85,147 @@ def test_mjd_to_datestring(mjd: float, expected: str):
     # default unit is 's'
     result = mjd_to_datestring(mjd_sec)
     assert result == expected
+
+
+def _synthetic_row_ids(nrow, seed=11):
+    """Row IDs of a synthetic source MS and of a derived MS with the rows in another order."""
+    rng = numpy.random.default_rng(seed)
+    src_rows = numpy.arange(nrow)
+    derived_rows = rng.permutation(nrow)
+    return src_rows, derived_rows
+
+
+def _row_map_dict(src_rows, derived_rows):
+    """Reference row mapping dictionary, filled one row at a time."""
+    rowmap_dict = {}
+    for r0, r1 in zip(src_rows, derived_rows):
+        rowmap_dict[r0] = r1
+    return rowmap_dict
+
+
+def test_row_map():
+    """Test that RowMap maps row IDs as a row mapping dictionary does."""
+    src_rows, derived_rows = _synthetic_row_ids(1000)
+    # a source row mapped twice keeps the last mapping, as in a dictionary
+    src_rows = numpy.append(src_rows, 7)
+    derived_rows = numpy.append(derived_rows, 2000)
+    expected = dict(zip(src_rows.tolist(), derived_rows.tolist()))
+    rowmap = RowMap(src_rows, derived_rows)
+
+    assert len(rowmap) == len(expected)
+    assert dict(rowmap) == expected
+    assert rowmap[7] == 2000
+    assert 1000 not in rowmap
+    with pytest.raises(KeyError):
+        rowmap[1000]
+
+    rows = numpy.array([[3, 7], [999, 0]])
+    assert numpy.array_equal(rowmap.lookup(rows), [[expected[r] for r in row] for row in rows.tolist()])
+    with pytest.raises(KeyError):
+        rowmap.lookup([3, 1000])
+    assert numpy.array_equal(utils.EchoDictionary().lookup(rows), rows)
+
+
+def test_row_map_memory():
+    """Test that RowMap maps row IDs as a row mapping dictionary does, in less memory."""
+    nrow = 20_000
+    src_rows, derived_rows = _synthetic_row_ids(nrow)
+    lookup_rows = src_rows[::7]
+
+    tracemalloc.start()
+    rowmap_dict = _row_map_dict(src_rows, derived_rows)
+    mem_dict = tracemalloc.get_traced_memory()[0]
+    expected = [rowmap_dict[r] for r in lookup_rows]
+    del rowmap_dict
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    rowmap = RowMap(src_rows, derived_rows)
+    mem_array = tracemalloc.get_traced_memory()[0]
+    mapped = rowmap.lookup(lookup_rows)
+    tracemalloc.stop()
+
+    assert numpy.array_equal(mapped, expected)
+    assert rowmap.nbytes == 2 * 8 * nrow
+    assert mem_array < mem_dict
+
+
+@pytest.mark.benchmark
+def test_row_map_benchmark():
+    """Benchmark build and lookup time of RowMap against a row mapping dictionary."""
+    nrow = 200_000
+    src_rows, derived_rows = _synthetic_row_ids(nrow)
+    lookup_rows = src_rows[::7]
+
+    t0 = time.perf_counter()
+    rowmap_dict = _row_map_dict(src_rows, derived_rows)
+    t_dict = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    expected = [rowmap_dict[r] for r in lookup_rows]
+    t_dict_lookup = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    rowmap = RowMap(src_rows, derived_rows)
+    t_array = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    mapped = rowmap.lookup(lookup_rows)
+    t_array_lookup = time.perf_counter() - t0
+
+    LOG.info('Row map of %d rows: dict build %.3f s, lookup %.3f s; RowMap build %.3f s, lookup %.3f s',
+             nrow, t_dict, t_dict_lookup, t_array, t_array_lookup)
+
+    assert numpy.array_equal(mapped, expected)
+
+
+@pytest.fixture
+def synthetic_ms_pair(tmp_path, monkeypatch):
+    """Source and derived MSes, of which make_row_map counts the calls."""
+    src_vis = tmp_path / 'uid___A002_X1.ms'
+    derived_vis = tmp_path / 'uid___A002_X1.ms_bl'
+    for vis in (src_vis, derived_vis):
+        vis.mkdir()
+        (vis / 'table.dat').write_bytes(b'')
+    src_rows, derived_rows = _synthetic_row_ids(100)
+    calls = []
+
+    def make_row_map(src_ms, derived_vis, src_tb=None, derived_tb=None):
+        calls.append((src_ms.name, derived_vis))
+        return RowMap(src_rows, derived_rows)
+    monkeypatch.setattr(utils, 'make_row_map', make_row_map)
+    monkeypatch.setattr(utils, '_ROW_MAP_CACHE', type(utils._ROW_MAP_CACHE)())
+    src_ms = types.SimpleNamespace(name=str(src_vis), basename=src_vis.name)
+    return src_ms, str(derived_vis), calls
+
+
+def test_row_map_is_shared(synthetic_ms_pair):
+    """Test that the row map is made once, and reused from memory or from the file next to the derived MS."""
+    src_ms, derived_vis, calls = synthetic_ms_pair
+
+    rowmap = utils.make_row_map_between_ms(src_ms, derived_vis)
+    assert len(calls) == 1
+    path = utils.row_map_path(src_ms.name, derived_vis)
+    assert path == derived_vis + '.uid___A002_X1.ms.rowmap.npz'
+    assert os.path.exists(path)
+
+    # reused from memory in this process
+    assert utils.make_row_map_between_ms(src_ms, derived_vis) is rowmap
+
+    # reused from the file by another process, e.g. a later stage
+    utils._ROW_MAP_CACHE.clear()
+    loaded = utils.make_row_map_between_ms(src_ms, derived_vis)
+    assert len(calls) == 1
+    assert numpy.array_equal(loaded.src_rows, rowmap.src_rows)
+    assert numpy.array_equal(loaded.derived_rows, rowmap.derived_rows)
+
+    # made again once the derived MS is modified
+    table_dat = os.path.join(derived_vis, 'table.dat')
+    mtime_ns = os.stat(table_dat).st_mtime_ns + 1_000_000_000
+    os.utime(table_dat, ns=(mtime_ns, mtime_ns))
+    utils.make_row_map_between_ms(src_ms, derived_vis)
+    assert len(calls) == 2
+    utils._ROW_MAP_CACHE.clear()
+    utils.make_row_map_between_ms(src_ms, derived_vis)
+    assert len(calls) == 2
+
+    # no row map is needed for the same MS
+    assert isinstance(utils.make_row_map_between_ms(src_ms, src_ms.name), utils.EchoDictionary)
@@ -50,6 +50,7 @@ class TsysflagInputs(tsysflag.TsysflagInputs):
                  metric_order: str | None = None,
                  normalize_tsys: bool | str | None = None,
                  filetemplate: str | None = None,
+                 parallel_spws: str | bool | None = None,
                  parallel: str | bool | None = None):
         """Construct TsysflagInputs instance for SD Tsysflag task.
 
@@ -157,6 +158,11 @@ class TsysflagInputs(tsysflag.TsysflagInputs):
                 Tsys flagging template. If the template flags file is undefined,
                 a name of the form 'msname.flagtsystemplate.txt' is assumed.
 
+            parallel_spws: Calculate the flagging views of the spws of a MS
+                concurrently, if CASA HPC functionality is available.
+
+                Default: None (equivalent to False)
+
             parallel: Execute using CASA HPC functionality, if available.
                 Default is None, which intends to turn on parallel
                 processing if possible.
@@ -169,7 +175,8 @@ class TsysflagInputs(tsysflag.TsysflagInputs):
             flag_fieldshape=flag_fieldshape, ff_refintent=ff_refintent, ff_max_limit=ff_max_limit,
             flag_birdies=flag_birdies, fb_sharps_limit=fb_sharps_limit,
             flag_toomany=flag_toomany, tmf1_limit=tmf1_limit, tmef1_limit=tmef1_limit,
-            metric_order=metric_order, normalize_tsys=normalize_tsys, filetemplate=filetemplate)
+            metric_order=metric_order, normalize_tsys=normalize_tsys, filetemplate=filetemplate,
+            parallel_spws=parallel_spws)
 
         self.parallel = parallel
 
@@ -30,6 +30,8 @@ LOG = logging.get_logger(__name__)
 MIN_CASA_REVISION = [6, 7, 4, 2]
 # maximum allowed CASA revision. Set to 0 or None to disable
 MAX_CASA_REVISION = None
+# name of the directory of the MS metadata cache in the working directory
+METADATA_CACHE_DIRNAME = 'pipeline_metadata_cache'
 
 # Define the thread-safe context variable here for the current task executaton state
 current_task_name = contextvars.ContextVar('current_task_name', default=None)
@@ -184,6 +186,17 @@ class Context:
         LOG.trace('Setting products_dir: %s', value)
         self._products_dir = value
 
+    @property
+    def metadata_cache_dir(self) -> str:
+        """Return path to the directory of the MS metadata cache.
+
+        The tasks that import MSes cache the metadata of each MS in this
+        directory under the working directory, and read it back when the same,
+        unchanged MS is imported again. The pipeline only reads metadata from
+        this cache that it wrote itself.
+        """
+        return os.path.join(self.output_dir, METADATA_CACHE_DIRNAME)
+
     def save(self, filename: str | None = None) -> None:
         """Save a pickle of the Context to a file with given filename.
 
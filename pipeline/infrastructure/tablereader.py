@@ -5,10 +5,13 @@ import bisect
 import collections
 import datetime
 import functools
+import hashlib
 import itertools
 import operator
 import os
+import pickle
 import re
+import time
 import traceback
 import xml
 from typing import TYPE_CHECKING, Generic, TypedDict, TypeVar
@@ -16,7 +19,7 @@ from typing import TYPE_CHECKING, Generic, TypedDict, TypeVar
 import cachetools
 import numpy as np
 
-from pipeline import domain, infrastructure
+from pipeline import domain, environment, infrastructure
 from pipeline.domain import measures
 from pipeline.infrastructure import casa_tools, utils
 
@@ -153,15 +156,85 @@ def _get_science_goal_value(
     return value
 
 
+# Layout version of the on-disk MS metadata cache. Increment it whenever the
+# domain classes change in a way that makes previously cached objects invalid.
+METADATA_CACHE_VERSION = 1
+
+# Suffix of the metadata cache file of an MS, which is written to the cache
+# directory under the basename of the MS
+METADATA_CACHE_SUFFIX = '.pl_metadata.pkl'
+
+
+def _get_metadata_cache_name(ms_file: str, cache_dir: str) -> str:
+    """Return the name of the metadata cache file of an MS in a cache directory."""
+    return os.path.join(cache_dir, os.path.basename(os.path.normpath(ms_file)) + METADATA_CACHE_SUFFIX)
+
+
+def _get_ms_fingerprint(ms_file: str) -> tuple:
+    """Return a fingerprint of the current state of an MS on disk.
+
+    The fingerprint holds the size and modification time of every file of the
+    main table and its subtables, and a checksum of every table descriptor
+    (table.dat), so that any write to the MS invalidates cached metadata. The
+    table lock files are ignored as they are touched by read-only access too.
+    """
+    files = []
+    checksums = []
+    for dirpath, dirnames, filenames in os.walk(ms_file):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename == 'table.lock':
+                continue
+            path = os.path.join(dirpath, filename)
+            stat = os.stat(path)
+            relpath = os.path.relpath(path, ms_file)
+            files.append((relpath, stat.st_size, stat.st_mtime_ns))
+            if filename == 'table.dat':
+                with open(path, 'rb') as f:
+                    checksums.append((relpath, hashlib.sha1(f.read()).hexdigest()))
+
+    return METADATA_CACHE_VERSION, environment.pipeline_revision, tuple(files), tuple(checksums)
+
+
+class _ImportPhaseTimer:
+    """Log the phases of an MS import along with the time spent in each of them."""
+
+    def __init__(self, ms_file: str) -> None:
+        self.ms_file = ms_file
+        self.timings = []
+        self._start = time.perf_counter()
+        self._phase = None
+        self._phase_start = self._start
+
+    def phase(self, message: str) -> None:
+        """Log the start of the next import phase, ending the current one."""
+        self._end_phase()
+        LOG.info(message)
+        self._phase = message.rstrip('.')
+        self._phase_start = time.perf_counter()
+
+    def finish(self) -> None:
+        """End the current import phase and log the time spent per phase."""
+        self._end_phase()
+        LOG.info('Analysed %s in %.2f s', self.ms_file, time.perf_counter() - self._start)
+        for phase, elapsed in self.timings:
+            LOG.debug('  %s: %.3f s', phase, elapsed)
+
+    def _end_phase(self) -> None:
+        if self._phase is not None:
+            self.timings.append((self._phase, time.perf_counter() - self._phase_start))
+
+
 class ObservingRunReader:
     @staticmethod
-    def get_observing_run(ms_files: str | list) -> ObservingRun:
+    def get_observing_run(ms_files: str | list, cache_dir: str | None = None,
+                          rebuild_cache: bool = False) -> ObservingRun:
         if isinstance(ms_files, str):
             ms_files = [ms_files]
 
         observing_run = domain.ObservingRun()
         for ms_file in ms_files:
-            ms = MeasurementSetReader.get_measurement_set(ms_file)
+            ms = MeasurementSetReader.get_measurement_set(ms_file, cache_dir=cache_dir, rebuild_cache=rebuild_cache)
             observing_run.add_measurement_set(ms)
         return observing_run
 
@@ -184,13 +257,23 @@ class MeasurementSetReader:
         mt = casa_tools.measures
         qt = casa_tools.quanta
 
+        # Antennas, data descriptions and time ranges of all scans, from a
+        # single sorted pass over the main table columns
+        scan_rows = MeasurementSetReader._get_scan_row_summaries(scan_number_col, antenna1_col, antenna2_col,
+                                                                 data_desc_id_col, time_col)
+
+        # The same midpoints usually recur across the data descriptions of a
+        # scan, so create each epoch only once.
+        epochs = {}
+
+        def get_epoch(value: float) -> dict:
+            if value not in epochs:
+                epochs[value] = mt.epoch(time_ref, qt.quantity(value, time_unit))
+            return epochs[value]
+
         # For each Observation ID, retrieve info on scans.
         scans = []
 
-        data_desc_mask_dict = {}
-        for dd in ms.data_descriptions:
-            data_desc_mask_dict[dd.id] = (data_desc_id_col == dd.id)
-
         for obs_id in range(msmd.nobservations()):
             statesforscans = msmd.statesforscans(obsid=obs_id)
             fieldsforscans = msmd.fieldsforscans(obsid=obs_id, arrayid=0, asmap=True)
@@ -207,33 +290,18 @@ class MeasurementSetReader:
                 exposures = {spw_id: msmd.exposuretime(scan=scan_id, spwid=spw_id, obsid=obs_id)
                              for spw_id in spwsforscans[str(scan_id)]}
 
-                scan_mask = (scan_number_col == scan_id)
+                antenna_ids, dd_time_ranges = scan_rows.get(scan_id, (set(), {}))
 
                 # get the antennas used for this scan
-                LOG.trace('Calculating antennas used for scan %s', scan_id)
-                antenna_ids = set()
-                scan_antenna1 = antenna1_col[scan_mask]
-                scan_antenna2 = antenna2_col[scan_mask] 
-                antenna_ids.update(scan_antenna1)
-                antenna_ids.update(scan_antenna2)
                 antennas = [o for o in ms.antennas if o.id in antenna_ids]
 
                 # get the data descriptions for this scan
-                LOG.trace('Calculating data descriptions used for scan %s', scan_id)
-                scan_data_desc_id = set(data_desc_id_col[scan_mask])
-                data_descriptions = [o for o in ms.data_descriptions if o.id in scan_data_desc_id]
-
-                # times are specified per data description, so we must
-                # re-mask and calculate times per dd
-                scan_times = {}  
-                LOG.trace('Processing scan times for scan %s', scan_id)
-                for dd in data_descriptions:
-                    dd_mask = scan_mask & data_desc_mask_dict[dd.id]
-
-                    raw_midpoints = list(time_col[dd_mask])
-                    epoch_midpoints = [mt.epoch(time_ref, qt.quantity(o, time_unit))
-                                       for o in (np.min(raw_midpoints), np.max(raw_midpoints))]
+                data_descriptions = [o for o in ms.data_descriptions if o.id in dd_time_ranges]
 
+                # times are specified per data description
+                scan_times = {}
+                for dd in data_descriptions:
+                    epoch_midpoints = [get_epoch(o) for o in dd_time_ranges[dd.id]]
                     scan_times[dd.spw.id] = list(zip(epoch_midpoints, itertools.repeat(exposures[dd.spw.id])))
 
                 LOG.trace('Creating domain object for scan %s', scan_id)
@@ -245,6 +313,50 @@ class MeasurementSetReader:
 
         return scans
 
+    @staticmethod
+    def _get_scan_row_summaries(scan_number_col: NDArray, antenna1_col: NDArray, antenna2_col: NDArray,
+                                data_desc_id_col: NDArray, time_col: NDArray) -> dict[int, tuple[set, dict]]:
+        """Summarise the main table rows of every scan in one sorted pass.
+
+        Args:
+            scan_number_col: SCAN_NUMBER column of the main table.
+            antenna1_col: ANTENNA1 column of the main table.
+            antenna2_col: ANTENNA2 column of the main table.
+            data_desc_id_col: DATA_DESC_ID column of the main table.
+            time_col: TIME column of the main table.
+
+        Returns:
+            Dictionary mapping scan number to a tuple of the set of antenna IDs
+            in the scan and a dictionary mapping the data description IDs of
+            the scan to their (minimum, maximum) row time.
+        """
+        summaries = {}
+        if len(scan_number_col) == 0:
+            return summaries
+
+        # group the rows by scan and data description
+        order = np.lexsort((data_desc_id_col, scan_number_col))
+        sorted_scans = scan_number_col[order]
+        sorted_dds = data_desc_id_col[order]
+        sorted_times = time_col[order]
+        starts = np.flatnonzero(np.concatenate(([True], (sorted_scans[1:] != sorted_scans[:-1]) |
+                                                (sorted_dds[1:] != sorted_dds[:-1]))))
+        min_times = np.minimum.reduceat(sorted_times, starts)
+        max_times = np.maximum.reduceat(sorted_times, starts)
+
+        for scan_id, dd_id, min_time, max_time in zip(sorted_scans[starts].tolist(), sorted_dds[starts].tolist(),
+                                                       min_times.tolist(), max_times.tolist()):
+            summaries.setdefault(scan_id, (set(), {}))[1][dd_id] = (min_time, max_time)
+
+        # unique (scan, antenna) pairs over both antenna columns
+        nant = int(max(antenna1_col.max(), antenna2_col.max())) + 1
+        scan_antennas = np.unique(np.concatenate((scan_number_col.astype(np.int64) * nant + antenna1_col,
+                                                  scan_number_col.astype(np.int64) * nant + antenna2_col)))
+        for scan_id, antenna_id in zip(*(o.tolist() for o in np.divmod(scan_antennas, nant))):
+            summaries[scan_id][0].add(antenna_id)
+
+        return summaries
+
     @staticmethod
     def add_band_to_spws(ms: domain.MeasurementSet) -> None:
         """Sets spw.band, which is a string describing a band."""
@@ -417,31 +529,108 @@ class MeasurementSetReader:
             field.set_zd_telmjd(observatory)
 
     @staticmethod
-    def get_measurement_set(ms_file: str) -> MeasurementSet:
+    def get_measurement_set(ms_file: str, cache_dir: str | None = None, rebuild_cache: bool = False) -> MeasurementSet:
+        """Return the domain object of an MS.
+
+        By default the domain object is built from the MS. If a cache
+        directory is given, as the tasks that import MSes do with the
+        metadata_cache_dir of the context under the working directory, the
+        domain object is read from the metadata cache in that directory
+        when the MS is unchanged since the cache was written, and is otherwise
+        built from the MS and written to the cache. The cache is never read
+        from the directory of the MS unless it is given as cache directory.
+
+        Args:
+            ms_file: Path to the MS.
+            cache_dir: Directory of the metadata cache, created if needed, or
+                None to not use the metadata cache.
+            rebuild_cache: Rebuild the domain object from the MS and rewrite
+                the cache even if the cache is up to date.
+
+        Returns:
+            The MeasurementSet domain object.
+        """
+        if cache_dir is None:
+            return MeasurementSetReader._read_measurement_set(ms_file)
+
+        fingerprint = _get_ms_fingerprint(ms_file)
+        if not rebuild_cache:
+            ms = MeasurementSetReader._load_cached_measurement_set(ms_file, cache_dir, fingerprint)
+            if ms is not None:
+                return ms
+
+        ms = MeasurementSetReader._read_measurement_set(ms_file)
+        MeasurementSetReader._save_cached_measurement_set(ms, cache_dir, fingerprint)
+        return ms
+
+    @staticmethod
+    def _load_cached_measurement_set(ms_file: str, cache_dir: str, fingerprint: tuple) -> MeasurementSet | None:
+        """Return the cached domain object of an MS, or None if the cache is missing or stale."""
+        cache_name = _get_metadata_cache_name(ms_file, cache_dir)
+        if not os.path.exists(cache_name):
+            return None
+
+        t0 = time.perf_counter()
+        try:
+            with open(cache_name, 'rb') as f:
+                cached_fingerprint, ms = utils.pickle_load(f)
+        except Exception as e:
+            LOG.debug('Could not read metadata cache %s: %s', cache_name, e)
+            return None
+
+        if cached_fingerprint != fingerprint:
+            LOG.debug('Metadata cache %s is out of date', cache_name)
+            return None
+
+        # the MS may be imported under a different path than when it was cached
+        ms.name = ms.origin_ms = ms_file
+        LOG.info('Read metadata of {0} from cache in {1:.2f} s'.format(ms_file, time.perf_counter() - t0))
+        return ms
+
+    @staticmethod
+    def _save_cached_measurement_set(ms: MeasurementSet, cache_dir: str, fingerprint: tuple) -> None:
+        """Write the domain object of an MS to the metadata cache in the cache directory."""
+        cache_name = _get_metadata_cache_name(ms.name, cache_dir)
+        tmp_name = '{}.{}.tmp'.format(cache_name, os.getpid())
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(tmp_name, 'wb') as f:
+                pickle.dump((fingerprint, ms), f, protocol=-1)
+            # replace atomically so that concurrent imports never see a partial file
+            os.replace(tmp_name, cache_name)
+        except Exception as e:
+            LOG.debug('Could not write metadata cache %s: %s', cache_name, e)
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+
+    @staticmethod
+    def _read_measurement_set(ms_file: str) -> MeasurementSet:
         LOG.info('Analysing {0}'.format(ms_file))
+        timer = _ImportPhaseTimer(ms_file)
         ms = domain.MeasurementSet(ms_file)
 
         # populate ms properties with results of table readers
         with casa_tools.MSMDReader(ms_file) as msmd:
-            LOG.info('Populating ms.antenna_array...')
+            timer.phase('Populating ms.antenna_array...')
             ms.antenna_array = AntennaTable.get_antenna_array(msmd)
-            LOG.info('Populating ms.spectral_windows...')
+            timer.phase('Populating ms.spectral_windows...')
             ms.spectral_windows = RetrieveByIndexContainer(SpectralWindowTable.get_spectral_windows(msmd, ms))
-            LOG.info('Populating ms.states...')
+            timer.phase('Populating ms.states...')
             ms.states = RetrieveByIndexContainer(StateTable.get_states(msmd))
-            LOG.info('Populating ms.fields...')
+            timer.phase('Populating ms.fields...')
             ms.fields = RetrieveByIndexContainer(FieldTable.get_fields(msmd))
-            LOG.info('Populating ms.sources...')
+            timer.phase('Populating ms.sources...')
             ms.sources = RetrieveByIndexContainer(SourceTable.get_sources(msmd))
-            LOG.info('Populating ms.data_descriptions...')
+            timer.phase('Populating ms.data_descriptions...')
             ms.data_descriptions = RetrieveByIndexContainer(DataDescriptionTable.get_descriptions(msmd, ms))
-            LOG.info('Populating ms.polarizations...')
+            timer.phase('Populating ms.polarizations...')
             ms.polarizations = PolarizationTable.get_polarizations(msmd)
-            LOG.info('Populating ms.correlator_name...')
+            timer.phase('Populating ms.correlator_name...')
             ms.correlator_name = MeasurementSetReader._get_correlator_name(ms)
 
             # For now the SBSummary table is ALMA specific
             if 'ALMA' in msmd.observatorynames():
+                timer.phase('Reading SBSummary table...')
                 sbinfo = SBSummaryTable.get_sbsummary_info(ms, msmd.observatorynames())
 
                 if sbinfo.repSource is None:
@@ -451,14 +640,14 @@ class MeasurementSetReader:
                     if sbinfo.repSource == 'none':
                         LOG.warning('Representative target for %s is set to "none". Will try to fall back to existing'
                                     ' science target sources or calibrators in the imaging tasks.' % ms.basename)
-                    LOG.info('Populating ms.representative_target ...')
+                    timer.phase('Populating ms.representative_target ...')
                     ms.representative_target = (sbinfo.repSource, sbinfo.repFrequency, sbinfo.repBandwidth)
                     ms.representative_window = sbinfo.repWindow
 
-                LOG.info('Populating ms.observing_modes...')
+                timer.phase('Populating ms.observing_modes...')
                 ms.observing_modes = SBSummaryTable.get_observing_modes(ms)
 
-                LOG.info('Populating ms.science_goals...')
+                timer.phase('Populating ms.science_goals...')
                 if sbinfo.minAngResolution is None and sbinfo.maxAngResolution is None:
                     # Only warn if the number of 12m antennas is greater than the number of 7m antennas
                     # and if the observation is not single dish
@@ -492,14 +681,15 @@ class MeasurementSetReader:
                 ms.science_goals['sbName'] = sbinfo.sbName
 
                 # Populate the online ALMA Control Software names
-                LOG.info('Populating ms.acs_software_version and ms.acs_software_build_version...')
+                timer.phase('Populating ms.acs_software_version and ms.acs_software_build_version...')
                 ms.acs_software_version, ms.acs_software_build_version = \
                     MeasurementSetReader.get_acs_software_version(ms, msmd)
 
-            LOG.info('Populating ms.array_name...')
+            timer.phase('Populating ms.array_name...')
             # No MSMD functions to help populating the ASDM_EXECBLOCK table
             ms.array_name = ExecblockTable.get_execblock_info(ms)
 
+            timer.phase('Populating data description times and axes...')
             with casa_tools.MSReader(ms.name) as openms:
                 for dd in ms.data_descriptions:
                     openms.selectinit(reset=True)
@@ -517,22 +707,24 @@ class MeasurementSetReader:
                         dd.corr_axis = ms_info['axis_info']['corr_axis'].tolist()
 
             # now back to pure MSMD calls
-            LOG.info('Linking fields to states...')
+            timer.phase('Linking fields to states...')
             MeasurementSetReader.link_fields_to_states(msmd, ms)
-            LOG.info('Linking fields to sources...')
+            timer.phase('Linking fields to sources...')
             MeasurementSetReader.link_fields_to_sources(msmd, ms)
-            LOG.info('Linking intents to spws...')
+            timer.phase('Linking intents to spws...')
             MeasurementSetReader.link_intents_to_spws(msmd, ms)
-            LOG.info('Linking spectral windows to fields...')
+            timer.phase('Linking spectral windows to fields...')
             MeasurementSetReader.link_spws_to_fields(msmd, ms)
-            LOG.info('Setting zenith angle and telmjd to fields...')
+            timer.phase('Setting zenith angle and telmjd to fields...')
             MeasurementSetReader.set_field_zd_telmjd(ms)
-            LOG.info('Populating ms.scans...')
+            timer.phase('Populating ms.scans...')
             ms.scans = MeasurementSetReader.get_scans(msmd, ms)
 
+            timer.phase('Populating project information...')
             (observer, project_id, schedblock_id, execblock_id) = ObservationTable.get_project_info(msmd)
 
         # Update spectral windows in ms with band and spectralspec.
+        timer.phase('Populating spectral window bands and spectral specs...')
         MeasurementSetReader.add_band_to_spws(ms)
         MeasurementSetReader.add_spectralspec_and_groupingid_to_spws(ms)
 
@@ -547,6 +739,7 @@ class MeasurementSetReader:
         ms.schedblock_id = schedblock_id
         ms.execblock_id = execblock_id
 
+        timer.finish()
         return ms
 
     @staticmethod
@@ -1613,7 +1806,7 @@ class RetrieveByIndexContainer(Generic[T]):
             raise TypeError(
                 'list indices must be integers, not {}'.format(index.__class__.__name__))
 
-        with_id = [i for i in self.__items if self.__index_fn(i) == index]
+        with_id = list(self._get_items_by_index().get(index, ()))
         if not with_id:
             raise IndexError('list index out of range: {}'.format(index))
         if len(with_id) > 1:
@@ -1622,3 +1815,14 @@ class RetrieveByIndexContainer(Generic[T]):
 
     def __str__(self) -> str:
         return '<RetrieveByIndexContainer({})>'.format(str(self.__items))
+
+    def _get_items_by_index(self) -> dict[int, list[T]]:
+        """Return the items grouped by index, building the lookup on first use."""
+        # not set on containers restored from older pickled contexts
+        by_index = self.__dict__.get('_by_index')
+        if by_index is None or by_index[0] != len(self.__items):
+            items_by_index = collections.defaultdict(list)
+            for item in self.__items:
+                items_by_index[self.__index_fn(item)].append(item)
+            by_index = self._by_index = (len(self.__items), dict(items_by_index))
+        return by_index[1]
@@ -0,0 +1,160 @@
+"""Tests for the pipeline.infrastructure.tablereader module."""
+import os
+import shutil
+import time
+
+import numpy as np
+import pytest
+
+from . import casa_tools, logging
+from .tablereader import MeasurementSetReader, ObservingRunReader, _get_metadata_cache_name
+
+LOG = logging.get_logger(__name__)
+
+# Tests that depend on the pipeline-testdata repository
+TEST_DATA_PATH = casa_tools.utils.resolve('pl-unittest/casa_data')
+# Skip tests if CASA cannot resolve to an absolute path
+skip_data_tests = not TEST_DATA_PATH.startswith('/')
+# Create decorator with reason to skip tests
+skip_if_no_data_repo = pytest.mark.skipif(
+    skip_data_tests,
+    reason="The repo pipeline-testdata is not set up for the tests"
+)
+
+MS_NAME = casa_tools.utils.resolve('pl-unittest/uid___A002_Xc46ab2_X15ae_repSPW_spw16_17_small.ms')
+
+
+@pytest.fixture
+def ms_copy(tmp_path):
+    """Writable copy of the small test MS placed in a temporary directory."""
+    dst = str(tmp_path / os.path.basename(MS_NAME))
+    shutil.copytree(MS_NAME, dst)
+    return dst
+
+
+def _summarise_ms(ms):
+    """Comparable summary of the metadata of an MS domain object."""
+    return (ms.name, ms.project_id, ms.execblock_id, ms.representative_target, ms.science_goals,
+            [(spw.id, spw.name, spw.band, spw.num_channels) for spw in ms.spectral_windows],
+            [(f.id, f.name, sorted(f.intents)) for f in ms.fields],
+            [(s.id, sorted(s.intents), s.start_time, s.end_time, sorted(a.id for a in s.antennas))
+             for s in ms.scans],
+            [(dd.id, dd.obs_time, dd.corr_axis) for dd in ms.data_descriptions])
+
+
+def _synthetic_main_table(nscan, nant=12, ndd=4, nint=10, seed=3):
+    """SCAN_NUMBER, ANTENNA1, ANTENNA2, DATA_DESC_ID and TIME columns of a synthetic interferometric MS."""
+    rng = np.random.default_rng(seed)
+    ant1, ant2 = np.triu_indices(nant)
+    nbl = len(ant1)
+    rows_per_scan = nbl * ndd * nint
+
+    scan = np.repeat(np.arange(1, nscan + 1), rows_per_scan)
+    dd = np.tile(np.repeat(np.arange(ndd), nbl), nscan * nint)
+    time_col = 5e9 + np.repeat(np.arange(nscan * nint) * 6.0, nbl * ndd)
+    antenna1 = np.tile(ant1, nscan * ndd * nint)
+    antenna2 = np.tile(ant2, nscan * ndd * nint)
+
+    # drop one antenna from some scans and one data description from others
+    keep = ~((scan % 3 == 0) & ((antenna1 == 5) | (antenna2 == 5))) & ~((scan % 4 == 0) & (dd == 2))
+    order = rng.permutation(np.count_nonzero(keep))
+    return tuple(col[keep][order] for col in (scan, antenna1, antenna2, dd, time_col))
+
+
+def _masked_scan_row_summaries(scan_number_col, antenna1_col, antenna2_col, data_desc_id_col, time_col):
+    """Reference scan summaries computed with one row mask per scan and data description."""
+    summaries = {}
+    for scan_id in np.unique(scan_number_col):
+        scan_mask = scan_number_col == scan_id
+        antenna_ids = set(antenna1_col[scan_mask]) | set(antenna2_col[scan_mask])
+        dd_time_ranges = {}
+        for dd_id in set(data_desc_id_col[scan_mask]):
+            dd_times = time_col[scan_mask & (data_desc_id_col == dd_id)]
+            dd_time_ranges[dd_id] = (np.min(dd_times), np.max(dd_times))
+        summaries[scan_id] = (antenna_ids, dd_time_ranges)
+    return summaries
+
+
+@pytest.mark.parametrize('nscan', [1, 12])
+def test_get_scan_row_summaries_matches_row_masks(nscan):
+    """Test that the sorted scan summaries match the summaries from per-scan row masks."""
+    columns = _synthetic_main_table(nscan)
+
+    expected = _masked_scan_row_summaries(*columns)
+    summaries = MeasurementSetReader._get_scan_row_summaries(*columns)
+
+    assert summaries == expected
+    if nscan >= 4:
+        assert 5 not in summaries[3][0] and 2 not in summaries[4][1]
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('nscan', [10, 100, 400])
+def test_get_scan_row_summaries_benchmark(nscan):
+    """Benchmark the sorted scan summaries against per-scan row masks for increasing scan counts."""
+    columns = _synthetic_main_table(nscan)
+
+    t0 = time.perf_counter()
+    expected = _masked_scan_row_summaries(*columns)
+    t_masked = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    summaries = MeasurementSetReader._get_scan_row_summaries(*columns)
+    t_sorted = time.perf_counter() - t0
+    LOG.info('Scan summaries of %d scans, %d rows: row masks %.3f s, sorted %.3f s',
+             nscan, len(columns[0]), t_masked, t_sorted)
+
+    assert summaries == expected
+
+
+def test_get_scan_row_summaries_empty_table():
+    """Test that an MS without rows has no scan summaries."""
+    columns = [np.array([], dtype=int)] * 4 + [np.array([], dtype=float)]
+    assert MeasurementSetReader._get_scan_row_summaries(*columns) == {}
+
+
+@skip_if_no_data_repo
+def test_get_measurement_set_metadata_cache(ms_copy, tmp_path):
+    """Test that re-importing an unchanged MS from the metadata cache gives the domain object of a full import."""
+    # the cache directory is created by the first import
+    cache_dir = str(tmp_path / 'cache')
+    expected = MeasurementSetReader.get_measurement_set(ms_copy, cache_dir=cache_dir)
+    assert os.path.exists(_get_metadata_cache_name(ms_copy, cache_dir))
+
+    ms = ObservingRunReader.get_observing_run(ms_copy, cache_dir=cache_dir).measurement_sets[0]
+
+    assert ms is not expected
+    assert _summarise_ms(ms) == _summarise_ms(expected)
+    # domain objects shared between containers keep their identity
+    states = {id(state) for state in ms.states}
+    assert all(id(state) in states for scan in ms.scans for state in scan.states)
+
+
+@skip_if_no_data_repo
+def test_get_measurement_set_without_metadata_cache(ms_copy):
+    """Test that no metadata cache is written or read unless a cache directory is given."""
+    MeasurementSetReader.get_measurement_set(ms_copy)
+    assert os.listdir(os.path.dirname(ms_copy)) == [os.path.basename(ms_copy)]
+
+
+@skip_if_no_data_repo
+def test_get_measurement_set_metadata_cache_invalidation(ms_copy, tmp_path):
+    """Test that a changed MS or a forced rebuild bypasses the metadata cache."""
+    cache_dir = str(tmp_path / 'cache')
+    os.mkdir(cache_dir)
+    cache_name = _get_metadata_cache_name(ms_copy, cache_dir)
+    MeasurementSetReader.get_measurement_set(ms_copy, cache_dir=cache_dir)
+
+    with casa_tools.TableReader(os.path.join(ms_copy, 'FIELD'), nomodify=False) as table:
+        names = table.getcol('NAME')
+        names[0] = 'renamed'
+        table.putcol('NAME', names)
+    assert MeasurementSetReader.get_measurement_set(ms_copy, cache_dir=cache_dir).fields[0].name == 'renamed'
+
+    with open(cache_name, 'wb') as f:
+        f.write(b'corrupt')
+    assert MeasurementSetReader.get_measurement_set(ms_copy, cache_dir=cache_dir).fields[0].name == 'renamed'
+
+    cache_mtime = os.stat(cache_name).st_mtime_ns
+    MeasurementSetReader.get_measurement_set(ms_copy, cache_dir=cache_dir, rebuild_cache=True)
+    assert os.stat(cache_name).st_mtime_ns != cache_mtime
@@ -15,6 +15,7 @@ Modules:
     casa_data: Utilities for handling CASA data structures
     conversion: Data conversion utilities
     diagnostics: Diagnostic and debugging tools
+    flagsummary: Cached flag summaries of measurement sets
     framework: Pipeline framework utilities
     imaging: Image processing utilities
     math: Mathematical functions and algorithms
@@ -35,6 +36,7 @@ from .casa_data import *
 from .casa_types import *
 from .conversion import *
 from .diagnostics import *
+from .flagsummary import *
 from .flagversion_tools import *
 from .framework import *
 from .imaging import *
@@ -53,6 +55,7 @@ _all_modules = [
     'casa_types',
     'conversion',
     'diagnostics',
+    'flagsummary',
     'flagversion_tools',
     'framework',
     'imaging',
@@ -0,0 +1,325 @@
+"""Cached flag summaries of measurement sets.
+
+Each flagdata(mode='summary') call rescans the FLAG column of the selected
+data. :func:`get_flag_summary` instead reads the FLAG column of the MS once,
+in chunks of rows, and accumulates the flagged and total visibility counts
+per (data description, field, scan, state, antenna1, antenna2, correlation).
+The accumulated counts are cached, keyed by a fingerprint of the files of the
+MS main table, and every later summary with any combination of spw, field,
+scan, antenna and intent selection is answered from the cached counts. The
+cache entry is recomputed automatically once the flags of the MS change.
+
+The returned dictionaries follow the layout of the flagdata summary report:
+
+    {'flagged': ..., 'total': ...,
+     'antenna': {<antenna name>: {'flagged': ..., 'total': ...}, ...},
+     'spw': {<spw id as string>: {...}, ...},
+     'field': {<field name>: {...}, ...},
+     'scan': {<scan number as string>: {...}, ...},
+     'correlation': {<correlation name>: {...}, ...}}
+
+As in flagdata, a baseline contributes to the counts of both of its antennas,
+and an autocorrelation contributes once.
+
+Only id lists, id ranges ('3~5') and names are supported as selections.
+Channel and time selections are not supported; use flagdata for those.
+"""
+from __future__ import annotations
+
+import fnmatch
+import os
+import time
+from collections.abc import Iterable
+
+import cachetools
+import numpy as np
+
+from pipeline.infrastructure import casa_tools, logging
+
+LOG = logging.get_logger(__name__)
+
+__all__ = ['get_flag_summary']
+
+# Upper limit on the size of the FLAG data read in one chunk
+_MAX_CHUNK_BYTES = 128 * 1024 ** 2
+
+# Cache of the accumulated flag counts, keyed by absolute MS path
+_FLAG_COUNTS_CACHE = cachetools.LRUCache(maxsize=8)
+
+# Names of the casacore Stokes types, indexed by CORR_TYPE
+_STOKES_NAMES = ('Undefined', 'I', 'Q', 'U', 'V', 'RR', 'RL', 'LR', 'LL', 'XX', 'XY', 'YX', 'YY',
+                 'RX', 'RY', 'LX', 'LY', 'XR', 'XL', 'YR', 'YL')
+
+
+def get_flag_summary(vis: str, spw=None, field=None, scan=None, antenna=None, intent: str | None = None,
+                     use_cache: bool = True) -> dict:
+    """Return the flagged and total visibility counts of an MS selection.
+
+    Args:
+        vis: Name of the measurement set.
+        spw: Spectral window ids, given as an int, an iterable of ints or a
+            comma-separated string of ids and id ranges. None selects all.
+        field: Field ids or names, given as for spw. None selects all.
+        scan: Scan numbers, given as for spw. None selects all.
+        antenna: Antenna ids or names, given as for spw. Baselines containing
+            any of the selected antennas are selected. None selects all.
+        intent: Intent pattern matched against the OBS_MODE of the STATE
+            table, e.g. '*CALIBRATE*'. None selects all.
+        use_cache: If True, reuse the counts from a previous call when the
+            MS has not been modified since.
+
+    Returns:
+        Dictionary in the layout of the flagdata summary report.
+
+    Raises:
+        ValueError: if a selection cannot be parsed or matches no metadata.
+    """
+    counts = _get_flag_counts(vis, use_cache=use_cache)
+    return counts.summary(spw=spw, field=field, scan=scan, antenna=antenna, intent=intent)
+
+
+def _get_flag_counts(vis: str, use_cache: bool = True) -> _FlagCounts:
+    """Return the flag counts of an MS, from the cache if the MS is unchanged."""
+    key = os.path.abspath(vis)
+    fingerprint = _flag_fingerprint(vis)
+    if use_cache:
+        cached = _FLAG_COUNTS_CACHE.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            LOG.debug('Reusing cached flag counts of %s', vis)
+            return cached[1]
+
+    counts = _FlagCounts.from_ms(vis)
+    _FLAG_COUNTS_CACHE[key] = (fingerprint, counts)
+    return counts
+
+
+def _flag_fingerprint(vis: str) -> tuple:
+    """Return an inexpensive fingerprint of the state of the MS main table.
+
+    The fingerprint consists of the name, size and modification time of every
+    file of the main table, which includes the storage manager files of the
+    FLAG column. Subtables are directories and are not included.
+    """
+    with os.scandir(vis) as entries:
+        return tuple(sorted((e.name, e.stat().st_size, e.stat().st_mtime_ns) for e in entries if e.is_file()))
+
+
+class _FlagCounts:
+    """Flagged and total visibility counts of an MS, per row key and correlation.
+
+    Each entry i holds the counts of all rows with DATA_DESC_ID ddid[i],
+    FIELD_ID field[i], SCAN_NUMBER scan[i], STATE_ID state[i], ANTENNA1
+    ant1[i] and ANTENNA2 ant2[i]. Columns of the flagged and total arrays
+    beyond the number of correlations of a data description are zero.
+    """
+
+    def __init__(self, keys: np.ndarray, flagged: np.ndarray, total: np.ndarray, dd_spw: np.ndarray,
+                 dd_corr_names: list[list[str]], antenna_names: list[str], field_names: list[str],
+                 state_obs_modes: list[str]):
+        self.ddid, self.field, self.scan, self.state, self.ant1, self.ant2 = keys.T
+        self.flagged = flagged
+        self.total = total
+        self.dd_spw = dd_spw
+        self.dd_corr_names = dd_corr_names
+        self.antenna_names = antenna_names
+        self.field_names = field_names
+        self.state_obs_modes = state_obs_modes
+
+    @classmethod
+    def from_ms(cls, vis: str) -> _FlagCounts:
+        """Accumulate the flag counts of an MS in one chunked pass over the FLAG column."""
+        t0 = time.perf_counter()
+        with casa_tools.TableReader(os.path.join(vis, 'ANTENNA')) as table:
+            antenna_names = list(table.getcol('NAME'))
+        with casa_tools.TableReader(os.path.join(vis, 'FIELD')) as table:
+            field_names = list(table.getcol('NAME'))
+        with casa_tools.TableReader(os.path.join(vis, 'STATE')) as table:
+            state_obs_modes = list(table.getcol('OBS_MODE')) if table.nrows() > 0 else []
+        with casa_tools.TableReader(os.path.join(vis, 'SPECTRAL_WINDOW')) as table:
+            spw_nchan = table.getcol('NUM_CHAN')
+        with casa_tools.TableReader(os.path.join(vis, 'POLARIZATION')) as table:
+            pol_corr_types = [table.getcell('CORR_TYPE', row) for row in range(table.nrows())]
+        with casa_tools.TableReader(os.path.join(vis, 'DATA_DESCRIPTION')) as table:
+            dd_spw = table.getcol('SPECTRAL_WINDOW_ID')
+            dd_pol = table.getcol('POLARIZATION_ID')
+        dd_corr_names = [[_STOKES_NAMES[c] if 0 <= c < len(_STOKES_NAMES) else str(c)
+                          for c in pol_corr_types[pol]] for pol in dd_pol]
+        max_ncorr = max(len(names) for names in dd_corr_names)
+
+        all_keys, all_flagged, all_total = [], [], []
+        nchunks = 0
+        with casa_tools.TableReader(vis) as table:
+            ddids = np.unique(table.getcol('DATA_DESC_ID'))
+            for ddid in ddids:
+                ncorr = len(dd_corr_names[ddid])
+                nchan = int(spw_nchan[dd_spw[ddid]])
+                chunk_rows = max(1, _MAX_CHUNK_BYTES // (ncorr * nchan))
+                subtable = table.query('DATA_DESC_ID == %d' % ddid)
+                try:
+                    nrows = subtable.nrows()
+                    for startrow in range(0, nrows, chunk_rows):
+                        nrow = min(chunk_rows, nrows - startrow)
+                        keys = np.column_stack(
+                            [np.full(nrow, ddid)] +
+                            [subtable.getcol(col, startrow, nrow)
+                             for col in ('FIELD_ID', 'SCAN_NUMBER', 'STATE_ID', 'ANTENNA1', 'ANTENNA2')])
+                        # number of flagged channels per correlation and row, shape (nrow, ncorr)
+                        nflagged = subtable.getcol('FLAG', startrow, nrow).sum(axis=1).T
+                        keys, flagged, total = _reduce_by_key(keys, nflagged, np.full((nrow, ncorr), nchan))
+                        all_keys.append(keys)
+                        all_flagged.append(_pad_columns(flagged, max_ncorr))
+                        all_total.append(_pad_columns(total, max_ncorr))
+                        nchunks += 1
+                finally:
+                    subtable.close()
+
+        if all_keys:
+            keys, flagged, total = _reduce_by_key(np.concatenate(all_keys), np.concatenate(all_flagged),
+                                                  np.concatenate(all_total))
+        else:
+            keys = np.zeros((0, 6), dtype=np.int64)
+            flagged = total = np.zeros((0, max_ncorr), dtype=np.int64)
+        LOG.debug('Accumulated flag counts of %s in %d chunks: %d row keys in %.3f s',
+                  vis, nchunks, len(keys), time.perf_counter() - t0)
+
+        return cls(keys, flagged, total, dd_spw, dd_corr_names, antenna_names, field_names, state_obs_modes)
+
+    def summary(self, spw=None, field=None, scan=None, antenna=None, intent: str | None = None) -> dict:
+        """Return the flagdata-like summary of a selection; see get_flag_summary."""
+        spw_of_entry = self.dd_spw[self.ddid]
+        select = np.ones(len(self.ddid), dtype=bool)
+        if spw is not None:
+            select &= np.isin(spw_of_entry, _parse_selection(spw, 'spw'))
+        if field is not None:
+            select &= np.isin(self.field, _parse_selection(field, 'field', self.field_names))
+        if scan is not None:
+            select &= np.isin(self.scan, _parse_selection(scan, 'scan'))
+        if antenna is not None:
+            antenna_ids = _parse_selection(antenna, 'antenna', self.antenna_names)
+            select &= np.isin(self.ant1, antenna_ids) | np.isin(self.ant2, antenna_ids)
+        if intent is not None:
+            state_ids = [state_id for state_id, obs_mode in enumerate(self.state_obs_modes)
+                         if _intent_matches(obs_mode, intent)]
+            select &= np.isin(self.state, state_ids)
+
+        flagged = self.flagged[select]
+        total = self.total[select]
+        row_flagged = flagged.sum(axis=1)
+        row_total = total.sum(axis=1)
+
+        ant1 = self.ant1[select]
+        ant2 = self.ant2[select]
+        cross = ant1 != ant2
+        nant = len(self.antenna_names)
+        antenna_flagged = (np.bincount(ant1, row_flagged, nant) +
+                           np.bincount(ant2[cross], row_flagged[cross], nant))
+        antenna_total = (np.bincount(ant1, row_total, nant) +
+                         np.bincount(ant2[cross], row_total[cross], nant))
+
+        result = {
+            'flagged': float(row_flagged.sum()),
+            'total': float(row_total.sum()),
+            'antenna': _group_counts(self.antenna_names, antenna_flagged, antenna_total),
+            'spw': _group_sum(spw_of_entry[select], row_flagged, row_total, str),
+            'field': _group_sum(self.field[select], row_flagged, row_total, lambda i: self.field_names[i]),
+            'scan': _group_sum(self.scan[select], row_flagged, row_total, str),
+            'correlation': {},
+        }
+
+        ddid = self.ddid[select]
+        for dd in np.unique(ddid):
+            in_dd = ddid == dd
+            for icorr, name in enumerate(self.dd_corr_names[dd]):
+                counts = result['correlation'].setdefault(name, {'flagged': 0.0, 'total': 0.0})
+                counts['flagged'] += float(flagged[in_dd, icorr].sum())
+                counts['total'] += float(total[in_dd, icorr].sum())
+
+        return result
+
+
+def _reduce_by_key(keys: np.ndarray, flagged: np.ndarray, total: np.ndarray) \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sum the flagged and total counts of rows with identical keys."""
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    nkeys = len(unique_keys)
+    summed_flagged = np.column_stack([np.bincount(inverse, flagged[:, i], nkeys) for i in range(flagged.shape[1])])
+    summed_total = np.column_stack([np.bincount(inverse, total[:, i], nkeys) for i in range(total.shape[1])])
+    return unique_keys, summed_flagged.astype(np.int64), summed_total.astype(np.int64)
+
+
+def _pad_columns(counts: np.ndarray, ncolumns: int) -> np.ndarray:
+    """Pad a 2D array of counts with zero columns up to ncolumns."""
+    return np.pad(counts, ((0, 0), (0, ncolumns - counts.shape[1])))
+
+
+def _group_sum(groups: np.ndarray, flagged: np.ndarray, total: np.ndarray, name_of) -> dict:
+    """Return the per-group flagged and total counts, keyed by group name."""
+    result = {}
+    for group in np.unique(groups):
+        in_group = groups == group
+        counts = result.setdefault(name_of(group), {'flagged': 0.0, 'total': 0.0})
+        counts['flagged'] += float(flagged[in_group].sum())
+        counts['total'] += float(total[in_group].sum())
+    return result
+
+
+def _group_counts(names: list[str], flagged: np.ndarray, total: np.ndarray) -> dict:
+    """Return the flagged and total counts of the names with data."""
+    result = {}
+    for name, f, t in zip(names, flagged, total):
+        if t > 0:
+            counts = result.setdefault(name, {'flagged': 0.0, 'total': 0.0})
+            counts['flagged'] += float(f)
+            counts['total'] += float(t)
+    return result
+
+
+def _intent_matches(obs_mode: str, intent: str) -> bool:
+    """Return True if an OBS_MODE, or one of its comma-separated modes, matches the intent pattern."""
+    patterns = [p.strip() for p in intent.split(',') if p.strip()]
+    modes = [obs_mode] + obs_mode.split(',')
+    return any(fnmatch.fnmatchcase(mode, pattern) for pattern in patterns for mode in modes)
+
+
+def _parse_selection(selection, kind: str, names: list[str] | None = None) -> list[int]:
+    """Convert a selection of ids, id ranges and names into a list of ids.
+
+    Args:
+        selection: An int, an iterable of ints or strings, or a comma-separated
+            string of ids, id ranges ('3~5') and, if names is given, names.
+        kind: Kind of selection, for error messages.
+        names: Names indexed by id, if name selection is supported.
+
+    Returns:
+        List of the selected ids.
+
+    Raises:
+        ValueError: if an element of the selection cannot be parsed.
+    """
+    if isinstance(selection, (int, np.integer)):
+        return [int(selection)]
+    if isinstance(selection, str):
+        selection = selection.split(',')
+    elif not isinstance(selection, Iterable):
+        raise ValueError('Unsupported {} selection: {!r}'.format(kind, selection))
+
+    ids = []
+    for element in selection:
+        if isinstance(element, (int, np.integer)):
+            ids.append(int(element))
+            continue
+        element = str(element).strip()
+        if not element:
+            continue
+        if element.isdigit():
+            ids.append(int(element))
+        elif '~' in element and all(part.strip().isdigit() for part in element.split('~', 1)):
+            first, last = (int(part) for part in element.split('~', 1))
+            ids.extend(range(first, last + 1))
+        elif names is not None and element.strip('"') in names:
+            name = element.strip('"')
+            ids.extend(i for i, n in enumerate(names) if n == name)
+        else:
+            raise ValueError('Unsupported {} selection: {!r}'.format(kind, element))
+    return ids
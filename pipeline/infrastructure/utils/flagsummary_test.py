@@ -0,0 +1,73 @@
+"""Tests for pipeline.infrastructure.utils.flagsummary."""
+from __future__ import annotations
+
+import os
+import shutil
+
+import casatasks
+import pytest
+
+from .. import casa_tools
+from .flagsummary import _FLAG_COUNTS_CACHE, get_flag_summary
+
+# Tests that depend on the pipeline-testdata repository
+TEST_DATA_PATH = casa_tools.utils.resolve('pl-unittest/casa_data')
+# Skip tests if CASA cannot resolve to an absolute path
+skip_data_tests = not TEST_DATA_PATH.startswith('/')
+# Create decorator with reason to skip tests
+skip_if_no_data_repo = pytest.mark.skipif(
+    skip_data_tests,
+    reason="The repo pipeline-testdata is not set up for the tests"
+)
+
+_MS_SMALL = 'pl-unittest/uid___A002_Xc46ab2_X15ae_repSPW_spw16_17_small.ms'
+
+_SUMMARY_KEYS = ('antenna', 'spw', 'field', 'scan', 'correlation')
+
+
+@pytest.fixture
+def ms_copy(tmp_path):
+    """Writable copy of the small test MS placed in a temporary directory."""
+    src = casa_tools.utils.resolve(_MS_SMALL)
+    dst = str(tmp_path / os.path.basename(src))
+    shutil.copytree(src, dst)
+    return dst
+
+
+def _assert_summaries_equal(summary, expected):
+    """Assert that the flagged and total counts of two flag summaries are identical."""
+    assert (summary['flagged'], summary['total']) == (expected['flagged'], expected['total'])
+    for key in _SUMMARY_KEYS:
+        counts = {name: (v['flagged'], v['total']) for name, v in summary[key].items()}
+        expected_counts = {name: (v['flagged'], v['total']) for name, v in expected[key].items()
+                           if v['total'] > 0}
+        assert counts == expected_counts, key
+
+
+@skip_if_no_data_repo
+@pytest.mark.parametrize('selection', [{}, {'spw': '17'}, {'scan': '7'}, {'antenna': '0,3'},
+                                       {'intent': '*PHASE*'}])
+def test_get_flag_summary_matches_flagdata(ms_copy, selection):
+    """Summaries answered from the cached counts match flagdata(mode='summary')."""
+    casatasks.flagdata(vis=ms_copy, mode='manual', antenna='1', flagbackup=False)
+    casatasks.flagdata(vis=ms_copy, mode='manual', spw='16:0~10', flagbackup=False)
+
+    expected = casatasks.flagdata(vis=ms_copy, mode='summary', **selection)
+    get_flag_summary(ms_copy)
+    summary = get_flag_summary(ms_copy, **selection)
+
+    _assert_summaries_equal(summary, expected)
+
+
+@skip_if_no_data_repo
+def test_get_flag_summary_follows_flag_changes(ms_copy):
+    """The cached counts are recomputed once the flags of the MS change."""
+    casatasks.flagdata(vis=ms_copy, mode='unflag', flagbackup=False)
+    assert get_flag_summary(ms_copy)['flagged'] == 0
+    cached = _FLAG_COUNTS_CACHE[os.path.abspath(ms_copy)]
+
+    casatasks.flagdata(vis=ms_copy, mode='manual', antenna='0', flagbackup=False)
+    summary = get_flag_summary(ms_copy)
+
+    assert _FLAG_COUNTS_CACHE[os.path.abspath(ms_copy)] is not cached
+    _assert_summaries_equal(summary, casatasks.flagdata(vis=ms_copy, mode='summary'))
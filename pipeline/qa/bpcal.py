@@ -43,6 +43,9 @@
 #                       iteration.
 # bpcal_score_delay   - This function calculates the delay score for a given
 #                       iteration.
+# bpcal_score_flatness_batch, bpcal_score_derivative_deviation_batch
+#                     - These functions calculate the flatness and derivative
+#                       deviation scores of many iterations at once.
 #
 # bpcal_plot          - This function is the top-level interface to other
 #                       functions that create bandpass calibration plots.
@@ -83,6 +86,7 @@
 # -------
 import math
 import os
+import time
 
 import matplotlib.pyplot as plt
 import numpy
@@ -177,6 +181,7 @@ def bpcal(in_table, out_dir, logobj='PYTHON', create_plots=False):
 
     # Calculate the bandpass calibration statistics
 
+    t0 = time.perf_counter()
     try:
         bpcal_stats = bpcal_calc(in_table, logger=logger)
     except Exception as err:
@@ -189,16 +194,20 @@ def bpcal(in_table, out_dir, logobj='PYTHON', create_plots=False):
     logger.info(msg, origin=origin)
 
     # Write the bandpass calibration statistics to the table
+    t1 = time.perf_counter()
     status = bpcal_write(bpcal_stats, out_table)
     msg = 'Bandpass statistics written in ' + out_table + ' ...'
     origin = root
     logger.info(msg, origin=origin)
 
     # Calculate the bandpass calibration scores
+    t2 = time.perf_counter()
     bpcal_scores = bpcal_score(bpcal_stats)
     msg = 'Bandpass scores of ' + in_table + ' calculated ...'
     origin = root
     logger.info(msg, origin=origin)
+    LOG.debug('Bandpass QA of %s: statistics %.3f s, table %.3f s, scores %.3f s',
+              in_table, t1 - t0, t2 - t1, time.perf_counter() - t2)
 
     # Create the bandpass calibration statistics plots
     if create_plots:
@@ -382,24 +391,15 @@ def bpcal_calc(in_table, logger=''):
 
         # Initialize the bandpass calibration statistics dictionary
         bpcal_stats = dict()
+        for key in ('AMPLITUDE_FIT', 'PHASE_FIT', 'AMPLITUDE', 'AMPLITUDE_SNR', 'PHASE'):
+            bpcal_stats[key] = dict()
 
-        # Get the amplitude fit statistics for each spectral window and time.
-        # The spectral window and channel range elements are appended to the
-        # result from ca.fit().  Effectively, the spectral window is another
-        # iteration axis.
-        bpcal_stats['AMPLITUDE_FIT'] = dict()
+        # Get the statistics of each spectral window in turn, with the
+        # calibration analysis tool opened once for all of them.
         try:
-            for s in range(len(spwList)):
-                chanRange = bpcal_chanRangeList(numchanList[s])
-                if chanRange == []:
-                    continue
-                spw = bpcal_spwChanString(spwList[s], chanRange)
-                f = caLoc.fit(spw=spw, axis='TIME', ap='AMPLITUDE',
-                              norm=True, order='LINEAR', type='LSQ',
-                              weight=False)
-                f['spw'] = int(spwList[s])
-                f['chanRange'] = chanRange
-                bpcal_stats['AMPLITUDE_FIT'][spwList[s]] = f
+            for spwid, numchan in zip(spwList, numchanList):
+                for key, value in bpcal_calc_spw(caLoc, spwid, numchan).items():
+                    bpcal_stats[key][spwid] = value
 
         except Exception as err:
             origin = 'bpcal.bpcal_calc'
@@ -407,75 +407,82 @@ def bpcal_calc(in_table, logger=''):
                 logger.error(err.args[0], origin=origin)
             raise Exception(err.args[0])
 
-        # Get the phase fit statistics for each spectral window and time.  The
-        # spectral window and channel range elements are appended to the result
-        # from ca.fit().
-        bpcal_stats['PHASE_FIT'] = dict()
-        try:
-            # TODO: Use spwList directly, using "range" seems wrong.
-            for s in range(len(spwList)):
-                chanRange = bpcal_chanRangeList(numchanList[s])
-                if chanRange == []:
-                    continue
-                spw = bpcal_spwChanString(spwList[s], chanRange)
-                f = caLoc.fit(spw=spw, axis='TIME', ap='PHASE',
-                              unwrap=True, jumpmax=0.1, order='LINEAR',
-                              type='LSQ', weight=False)
-                f['spw'] = int(spwList[s])
-                f['chanRange'] = chanRange
-                bpcal_stats['PHASE_FIT'][spwList[s]] = f
+    # Return the dictionary containing the bandpass calibration statistics
+    return bpcal_stats
 
-        except Exception as err:
-            origin = 'bpcal.bpcal_calc'
-            if logger != '':
-                logger.error(err.args[0], origin=origin)
-            raise Exception(err.args[0])
 
-        # Get the amplitudes and phases and calculate signal-to-noise ratios
-        bpcal_stats['AMPLITUDE'] = dict()
-        bpcal_stats['AMPLITUDE_SNR'] = dict()
-        bpcal_stats['PHASE'] = dict()
-        try:
-            for s in range(len(spwList)):
-                chanRange = [0, numchanList[s]-1]
-
-                # Consider full channel range. Any roll-off should be flagged
-                # already.
-                spw = spwList[s]
-
-                bpcal_stats['AMPLITUDE'][spwList[s]] = dict()
-                bpcal_stats['AMPLITUDE'][spwList[s]]['spw'] = int(spwList[s])
-                bpcal_stats['AMPLITUDE'][spwList[s]]['chanRange'] = chanRange
-                bpcal_stats['PHASE'][spwList[s]] = dict()
-                bpcal_stats['PHASE'][spwList[s]]['spw'] = int(spwList[s])
-                bpcal_stats['PHASE'][spwList[s]]['chanRange'] = chanRange
-                bpcal_stats['AMPLITUDE_SNR'][spwList[s]] = dict()
-                bpcal_stats['AMPLITUDE_SNR'][spwList[s]]['spw'] = int(spwList[s])
-                bpcal_stats['AMPLITUDE_SNR'][spwList[s]]['chanRange'] = chanRange
-
-                # Amplitude
-                bp_data = caLoc.get(spw=spw)
-                for pol in bp_data:
-                    amp_values = numpy.ma.array(bp_data[pol]['value'], mask=bp_data[pol]['flag'])
-                    bpcal_stats['AMPLITUDE'][spwList[s]][pol] = amp_values
-                    amp_mean = numpy.ma.average(bpcal_stats['AMPLITUDE'][spwList[s]][pol])
-                    amp_rms = rms(amp_values-amp_mean)
-                    bpcal_stats['AMPLITUDE_SNR'][spwList[s]][pol] = amp_mean / amp_rms
-
-                # Phase
-                bp_data = caLoc.get(spw=spw, ap='PHASE')
-                for pol in bp_data:
-                    phase_values = numpy.ma.array(bp_data[pol]['value'], mask=bp_data[pol]['flag'])
-                    bpcal_stats['PHASE'][spwList[s]][pol] = phase_values
+# ------------------------------------------------------------------------------
 
-        except Exception as err:
-            origin = 'bpcal.bpcal_calc'
-            if logger != '':
-                logger.error(err.args[0], origin=origin)
-            raise Exception(err.args[0])
+# bpcal_calc_spw
 
-    # Return the dictionary containing the bandpass calibration statistics
-    return bpcal_stats
+# Description:
+# ------------
+# This function calculates the bandpass calibration statistics of one spectral
+# window, as described for bpcal_calc().
+
+# Inputs:
+# -------
+# caLoc    - This python variable contains the calibration analysis tool,
+#            with the input bandpass calibration table open.
+# spwid    - This python string contains the spectral window id.
+# numchan  - This python integer contains the number of channels of the
+#            spectral window.
+
+# Outputs:
+# --------
+# The dictionary containing the 'AMPLITUDE_FIT', 'PHASE_FIT', 'AMPLITUDE',
+# 'AMPLITUDE_SNR' and 'PHASE' statistics of the spectral window, returned via
+# the function value.  The fit statistics are missing if the trimmed channel
+# range of the spectral window is empty.
+# ------------------------------------------------------------------------------
+def bpcal_calc_spw(caLoc, spwid, numchan):
+
+    spw_stats = dict()
+
+    # Get the amplitude and phase fit statistics for each time. The
+    # spectral window and channel range elements are appended to the
+    # result from ca.fit().  Effectively, the spectral window is another
+    # iteration axis.
+    chanRange = bpcal_chanRangeList(numchan)
+    if chanRange != []:
+        spw = bpcal_spwChanString(spwid, chanRange)
+        f = caLoc.fit(spw=spw, axis='TIME', ap='AMPLITUDE',
+                      norm=True, order='LINEAR', type='LSQ',
+                      weight=False)
+        f['spw'] = int(spwid)
+        f['chanRange'] = chanRange
+        spw_stats['AMPLITUDE_FIT'] = f
+
+        f = caLoc.fit(spw=spw, axis='TIME', ap='PHASE',
+                      unwrap=True, jumpmax=0.1, order='LINEAR',
+                      type='LSQ', weight=False)
+        f['spw'] = int(spwid)
+        f['chanRange'] = chanRange
+        spw_stats['PHASE_FIT'] = f
+
+    # Get the amplitudes and phases and calculate signal-to-noise ratios.
+    # Consider full channel range. Any roll-off should be flagged
+    # already.
+    chanRange = [0, numchan-1]
+    for key in ('AMPLITUDE', 'AMPLITUDE_SNR', 'PHASE'):
+        spw_stats[key] = {'spw': int(spwid), 'chanRange': chanRange}
+
+    # Amplitude
+    bp_data = caLoc.get(spw=spwid)
+    for pol in bp_data:
+        amp_values = numpy.ma.array(bp_data[pol]['value'], mask=bp_data[pol]['flag'])
+        spw_stats['AMPLITUDE'][pol] = amp_values
+        amp_mean = numpy.ma.average(amp_values)
+        amp_rms = rms(amp_values-amp_mean)
+        spw_stats['AMPLITUDE_SNR'][pol] = amp_mean / amp_rms
+
+    # Phase
+    bp_data = caLoc.get(spw=spwid, ap='PHASE')
+    for pol in bp_data:
+        phase_values = numpy.ma.array(bp_data[pol]['value'], mask=bp_data[pol]['flag'])
+        spw_stats['PHASE'][pol] = phase_values
+
+    return spw_stats
 
 
 # ------------------------------------------------------------------------------
@@ -1040,6 +1047,10 @@ def bpcal_spwChanString(spw, sschan):
 # -------
 # bpcal_stats - This python dictionary contains the bandpass calibation
 #               statistics.
+# batch       - This python boolean selects whether the flatness and derivative
+#               deviation scores of all iterations of a spectral window are
+#               calculated at once (True) or for each iteration (False).  The
+#               default is True.
 
 # Outputs:
 # --------
@@ -1097,7 +1108,7 @@ def bpcal_spwChanString(spw, sschan):
 #               Renamed SHAPE to FLATNESS (FN)
 #               Added derivative deviation scoring
 # ------------------------------------------------------------------------------
-def bpcal_score(bpcal_stats):
+def bpcal_score(bpcal_stats, batch=True):
 
     # Initialize the score dictionary
     bpcal_scores = dict()
@@ -1143,10 +1154,16 @@ def bpcal_score(bpcal_stats):
         bpcal_scores['AMPLITUDE_SCORE_DD'][s] = dict()
         bpcal_scores['AMPLITUDE_SCORE_TOTAL'][s] = dict()
 
-        for k in keys:
+        keys = [k for k in keys if len(amp[s][k]['pars']) != 0]
 
-            if len(amp[s][k]['pars']) == 0:
-                continue
+        # Score the flatness and derivative deviation of all iterations of
+        # the spectral window at once.
+        if batch:
+            values = [bpcal_stats['AMPLITUDE'][s][k] for k in keys]
+            fnScores = dict(zip(keys, bpcal_score_flatness_batch(values)))
+            ddScores = dict(zip(keys, bpcal_score_derivative_deviation_batch(values, 'amp', s, keys)))
+
+        for k in keys:
 
             bpcal_scores['AMPLITUDE_SCORE_FLAG'][s][k] = \
                 bpcal_score_flag(amp[s][k]['flag'], chanRange)
@@ -1157,11 +1174,15 @@ def bpcal_score(bpcal_stats):
             bpcal_scores['AMPLITUDE_SCORE_SNR'][s][k] = \
                 bpcal_score_SNR(bpcal_stats['AMPLITUDE_SNR'][s][k])
 
-            bpcal_scores['AMPLITUDE_SCORE_FN'][s][k] = \
-                bpcal_score_flatness(bpcal_stats['AMPLITUDE'][s][k])
+            if batch:
+                bpcal_scores['AMPLITUDE_SCORE_FN'][s][k] = fnScores[k]
+                bpcal_scores['AMPLITUDE_SCORE_DD'][s][k] = ddScores[k]
+            else:
+                bpcal_scores['AMPLITUDE_SCORE_FN'][s][k] = \
+                    bpcal_score_flatness(bpcal_stats['AMPLITUDE'][s][k])
 
-            bpcal_scores['AMPLITUDE_SCORE_DD'][s][k] = \
-                bpcal_score_derivative_deviation(bpcal_stats['AMPLITUDE'][s][k], 'amp', s, k)
+                bpcal_scores['AMPLITUDE_SCORE_DD'][s][k] = \
+                    bpcal_score_derivative_deviation(bpcal_stats['AMPLITUDE'][s][k], 'amp', s, k)
 
             bpcal_scores['AMPLITUDE_SCORE_TOTAL'][s][k] = \
                 bpcal_scores['AMPLITUDE_SCORE_FLAG'][s][k] \
@@ -1194,10 +1215,14 @@ def bpcal_score(bpcal_stats):
         bpcal_scores['PHASE_SCORE_DELAY'][s] = dict()
         bpcal_scores['PHASE_SCORE_TOTAL'][s] = dict()
 
-        for k in keys:
+        keys = [k for k in keys if len(phase[s][k]['pars']) != 0]
 
-            if len(phase[s][k]['pars']) == 0:
-                continue
+        if batch:
+            values = [bpcal_stats['PHASE'][s][k] for k in keys]
+            fnScores = dict(zip(keys, bpcal_score_flatness_batch(values)))
+            ddScores = dict(zip(keys, bpcal_score_derivative_deviation_batch(values, 'phase', s, keys)))
+
+        for k in keys:
 
             bpcal_scores['PHASE_SCORE_FLAG'][s][k] = \
                 bpcal_score_flag(phase[s][k]['flag'], chanRange)
@@ -1205,11 +1230,15 @@ def bpcal_score(bpcal_stats):
             bpcal_scores['PHASE_SCORE_RMS'][s][k] = \
                 bpcal_score_RMS(math.sqrt(phase[s][k]['resVar']), 0.05)
 
-            bpcal_scores['PHASE_SCORE_FN'][s][k] = \
-                bpcal_score_flatness(bpcal_stats['PHASE'][s][k])
+            if batch:
+                bpcal_scores['PHASE_SCORE_FN'][s][k] = fnScores[k]
+                bpcal_scores['PHASE_SCORE_DD'][s][k] = ddScores[k]
+            else:
+                bpcal_scores['PHASE_SCORE_FN'][s][k] = \
+                    bpcal_score_flatness(bpcal_stats['PHASE'][s][k])
 
-            bpcal_scores['PHASE_SCORE_DD'][s][k] = \
-                bpcal_score_derivative_deviation(bpcal_stats['PHASE'][s][k], 'phase', s, k)
+                bpcal_scores['PHASE_SCORE_DD'][s][k] = \
+                    bpcal_score_derivative_deviation(bpcal_stats['PHASE'][s][k], 'phase', s, k)
 
             bpcal_scores['PHASE_SCORE_DELAY'][s][k] = \
                 bpcal_score_delay(
@@ -1451,6 +1480,13 @@ def bpcal_score_flatness(values):
         else:
             wEntropy = scipy.stats.mstats.gmean(values)/numpy.ma.mean(values)
 
+    return bpcal_entropy_flatness_score(wEntropy)
+
+
+def bpcal_entropy_flatness_score(wEntropy):
+    """
+    Returns the flatness score of a Wiener entropy, see bpcal_score_flatness.
+    """
     if wEntropy == 1.0:
         flatnessScore = 1.0
     else:
@@ -1555,52 +1591,162 @@ def bpcal_score_derivative_deviation(values, data_type='UNKNOWN', spw=-1, index=
 
     # Avoid scoring numerical inaccuracies for the reference antenna phase
     if numpy.ma.sum(numpy.abs(values)) < 1e-4:
-        ddScore = 1.0
         mappedDDScore = 1.0
         LOG.info(f"bpcal derivative deviation scorer for data type {data_type} SPW {spw} table index {index}: low data variation, erf based score = 1.0, piecewise linear mapped score = 1.0""")
     else:
         derivative = values[:-1]-values[1:]
         derivativeMAD = MAD(derivative)
         numOutliers = len(numpy.ma.where(derivative > 5.0 * derivativeMAD)[0])
+        mappedDDScore = bpcal_outliers_derivative_deviation_score(numOutliers, len(values), data_type, spw, index)
 
-        if numOutliers == 0:
-            ddScore = 1.0
-            mappedDDScore = 1.0
-            LOG.info(f"bpcal derivative deviation scorer for data type {data_type} SPW {spw} table index {index}: no outliers, erf based score = 1.0, piecewise linear mapped score = 1.0""")
-        else:
-            outliersFraction = float(numOutliers) / float(len(values))
-            toleratedFraction = 0.01
-            fractionRatio = 3.0 * toleratedFraction / outliersFraction
-            try:
-                ddScore = scipy.special.erf(fractionRatio / math.sqrt(2.0))
-            except FloatingPointError:
-                (_, minor_version, _) = scipy.version.short_version.split('.')
-                if int(minor_version) < 12:
-                    under_orig = numpy.geterr()['under']
-                    try:
-                        numpy.seterr(under='warn')
-                        ddScore = scipy.special.erf(fractionRatio / math.sqrt(2.0))
-                    except FloatingPointError:
-                        msg = 'Error calling scipy.special.erf(%s/math.sqrt(2.0))' % fractionRatio
-                        raise FloatingPointError(msg)
-                    finally:
-                        numpy.seterr(under=under_orig)
-                else:
+    return mappedDDScore
+
+
+def bpcal_outliers_derivative_deviation_score(numOutliers, numValues, data_type='UNKNOWN', spw=-1, index='UNKNONWN'):
+    """
+    Returns the derivative deviation score of the number of derivative
+    outliers among a number of values, see bpcal_score_derivative_deviation.
+    """
+    if numOutliers == 0:
+        mappedDDScore = 1.0
+        LOG.info(f"bpcal derivative deviation scorer for data type {data_type} SPW {spw} table index {index}: no outliers, erf based score = 1.0, piecewise linear mapped score = 1.0""")
+    else:
+        outliersFraction = float(numOutliers) / float(numValues)
+        toleratedFraction = 0.01
+        fractionRatio = 3.0 * toleratedFraction / outliersFraction
+        try:
+            ddScore = scipy.special.erf(fractionRatio / math.sqrt(2.0))
+        except FloatingPointError:
+            (_, minor_version, _) = scipy.version.short_version.split('.')
+            if int(minor_version) < 12:
+                under_orig = numpy.geterr()['under']
+                try:
+                    numpy.seterr(under='warn')
+                    ddScore = scipy.special.erf(fractionRatio / math.sqrt(2.0))
+                except FloatingPointError:
                     msg = 'Error calling scipy.special.erf(%s/math.sqrt(2.0))' % fractionRatio
                     raise FloatingPointError(msg)
-
-            if 0.0 <= ddScore < 0.2:
-                mappedDDScore = scorers.linScorer(3.0 * toleratedFraction / math.sqrt(2.0), 0.2, 0.34, 0.66)(ddScore)
-            elif 0.2 <= ddScore < 0.3:
-                mappedDDScore = scorers.linScorer(0.2, 0.3, 0.67, 0.9)(ddScore)
+                finally:
+                    numpy.seterr(under=under_orig)
             else:
-                mappedDDScore = scorers.linScorer(0.3, 1.0, 0.91, 1.0)(ddScore)
+                msg = 'Error calling scipy.special.erf(%s/math.sqrt(2.0))' % fractionRatio
+                raise FloatingPointError(msg)
 
-            LOG.info(f"bpcal derivative deviation scorer for data type {data_type} SPW {spw} table index {index}: fractionRatio = {fractionRatio}, erf based score = {ddScore}, piecewise linear mapped score = {mappedDDScore}""")
+        if 0.0 <= ddScore < 0.2:
+            mappedDDScore = scorers.linScorer(3.0 * toleratedFraction / math.sqrt(2.0), 0.2, 0.34, 0.66)(ddScore)
+        elif 0.2 <= ddScore < 0.3:
+            mappedDDScore = scorers.linScorer(0.2, 0.3, 0.67, 0.9)(ddScore)
+        else:
+            mappedDDScore = scorers.linScorer(0.3, 1.0, 0.91, 1.0)(ddScore)
+
+        LOG.info(f"bpcal derivative deviation scorer for data type {data_type} SPW {spw} table index {index}: fractionRatio = {fractionRatio}, erf based score = {ddScore}, piecewise linear mapped score = {mappedDDScore}""")
 
     return mappedDDScore
 
 
+# ------------------------------------------------------------------------------
+# bpcal_score_flatness_batch
+# bpcal_score_derivative_deviation_batch
+
+# Description:
+# ------------
+# These functions calculate the flatness and derivative deviation scores of
+# many iterations at once.
+
+# Algorithm:
+# ----------
+# * Stack the values of the iterations with the same number of channels, e.g.
+#   all antennas and feeds of a spectral window, into a 2-D masked array.
+# * Evaluate the reductions of bpcal_score_flatness and
+#   bpcal_score_derivative_deviation (means, geometric means, minima, medians,
+#   MADs and outlier counts) along the channel axis of the stacked array,
+#   instead of for each iteration separately.
+# * Map the Wiener entropies and outlier counts to scores as the single
+#   iteration functions do, which gives the same scores up to floating point
+#   rounding.
+
+# Inputs:
+# -------
+# valuesList - This python list contains the (masked) values of the iterations.
+# data_type  - (optional) amp or phase
+# spw        - (optional) spw ID
+# indices    - (optional) bpcal table index of each iteration
+
+# Outputs:
+# --------
+# The python list of floats containing the score of each iteration.
+# ------------------------------------------------------------------------------
+def bpcal_stack_values(valuesList):
+    """
+    Yields the positions in valuesList and the stacked 2-D masked array of
+    each group of values with the same number of channels.
+    """
+    groups = dict()
+    for i, values in enumerate(valuesList):
+        groups.setdefault(numpy.shape(values), []).append(i)
+
+    for positions in groups.values():
+        stacked = ma.array([ma.getdata(valuesList[i]) for i in positions],
+                           mask=[ma.getmaskarray(valuesList[i]) for i in positions])
+        yield positions, stacked
+
+
+def bpcal_score_flatness_batch(valuesList):
+
+    scores = [None] * len(valuesList)
+
+    for positions, values in bpcal_stack_values(valuesList):
+        allFlagged = numpy.all(ma.getmaskarray(values), axis=1)
+        mean = ma.filled(ma.mean(values, axis=1), 0.0)
+        allZero = ma.filled(ma.all(values == 0.0, axis=1), True)
+        allNegative = ma.filled(ma.all(values < 0.0, axis=1), False)
+        anyNonPositive = ma.filled(ma.any(values <= 0.0, axis=1), False)
+
+        # Shift or invert the spectra with non-positive values as
+        # bpcal_score_flatness does, and calculate the Wiener entropies.
+        shifted = values.copy()
+        shifted[allNegative] = -values[allNegative]
+        offset = anyNonPositive & ~allNegative
+        shifted[offset] = values[offset] - ma.min(values[offset], axis=1)[:, numpy.newaxis] + 1e-10
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            wEntropy = ma.filled(scipy.stats.mstats.gmean(shifted, axis=1) / ma.mean(shifted, axis=1), 1.0e10)
+
+        wEntropy[mean == 0.0] = numpy.where(allZero[mean == 0.0], 1.0, 1.0e10)
+        wEntropy[allFlagged] = 1.0e10
+
+        for position, entropy in zip(positions, wEntropy.tolist()):
+            scores[position] = bpcal_entropy_flatness_score(entropy)
+
+    return scores
+
+
+def bpcal_score_derivative_deviation_batch(valuesList, data_type='UNKNOWN', spw=-1, indices=None):
+
+    if indices is None:
+        indices = ['UNKNONWN'] * len(valuesList)
+
+    scores = [None] * len(valuesList)
+
+    for positions, values in bpcal_stack_values(valuesList):
+        # Fully flagged iterations have no data variation to avoid scoring
+        lowVariation = ma.filled(ma.sum(numpy.abs(values), axis=1) < 1e-4, False)
+
+        derivative = values[:, :-1]-values[:, 1:]
+        derivativeMAD = MAD(derivative, axis=1)
+        numOutliers = ma.filled(derivative > 5.0 * derivativeMAD[:, numpy.newaxis], False).sum(axis=1)
+
+        for i, position in enumerate(positions):
+            index = indices[position]
+            if lowVariation[i]:
+                scores[position] = 1.0
+                LOG.info(f"bpcal derivative deviation scorer for data type {data_type} SPW {spw} table index {index}: low data variation, erf based score = 1.0, piecewise linear mapped score = 1.0""")
+            else:
+                scores[position] = bpcal_outliers_derivative_deviation_score(
+                    int(numOutliers[i]), values.shape[1], data_type, spw, index)
+
+    return scores
+
+
 # ------------------------------------------------------------------------------
 # bpcal_score_delay
 
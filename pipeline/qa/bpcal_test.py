@@ -0,0 +1,200 @@
+"""Tests for the pipeline.qa.bpcal module."""
+import contextlib
+import copy
+import time
+import types
+
+import numpy as np
+import numpy.ma as ma
+import pytest
+
+from pipeline.infrastructure import logging
+
+from . import bpcal
+from .bpcal import bpcal_score
+
+LOG = logging.get_logger(__name__)
+
+
+def _synthetic_bpcal_stats(nant, nspw, nchan, npol=2, seed=7):
+    """Bandpass statistics of a synthetic bandpass table, with one iteration per antenna and feed.
+
+    The statistics are in the layout of bpcal_calc.
+    """
+    rng = np.random.default_rng(seed)
+    stats = {'AMPLITUDE_FIT': {}, 'PHASE_FIT': {}, 'AMPLITUDE': {}, 'PHASE': {}, 'AMPLITUDE_SNR': {}}
+    freqs = 1.0e11 + 1.0e6 * np.arange(nchan)
+    for spw in range(nspw):
+        chanRange = [int(0.1 * nchan), int(0.9 * nchan) - 1]
+        for name in stats:
+            stats[name][spw] = {'spw': spw, 'chanRange': chanRange if 'FIT' in name else [0, nchan - 1]}
+        for i in range(nant * npol):
+            k = str(i)
+            amp = 1.0 + 0.02 * rng.normal(size=nchan) + 0.1 * np.sin(np.linspace(0.0, rng.uniform(1.0, 5.0), nchan))
+            phase = 0.05 * rng.normal(size=nchan) + rng.uniform(-0.5, 0.5) * np.linspace(-1.0, 1.0, nchan)
+            flag = rng.uniform(size=nchan) < 0.02
+            if i % 13 == 0:
+                # outliers of the derivative
+                amp[rng.integers(0, nchan, 4)] += 2.0
+            if i % 11 == 0:
+                # reference antenna
+                phase[:] = 0.0
+            if i % 17 == 0:
+                flag[:] = True
+            stats['AMPLITUDE'][spw][k] = ma.array(amp, mask=flag)
+            stats['PHASE'][spw][k] = ma.array(phase, mask=flag)
+            stats['AMPLITUDE_SNR'][spw][k] = ma.average(stats['AMPLITUDE'][spw][k]) / 0.02
+            for name, values in (('AMPLITUDE_FIT', amp), ('PHASE_FIT', phase)):
+                # no valid fit of fully flagged iterations
+                pars = np.array([]) if flag.all() else np.array([values.mean(), np.ptp(values) * 1e-9])
+                stats[name][spw][k] = {'pars': pars,
+                                       'vars': np.array([1e-6, 1e-12]), 'resVar': float(np.var(values)),
+                                       'frequency': freqs, 'value': values, 'flag': flag}
+    return stats
+
+
+class _SyntheticCalAnalysis:
+    """Calibration analysis tool on a synthetic bandpass table, recording how often it is opened and called."""
+
+    def __init__(self, numchans, seed=5):
+        self.numchans = numchans
+        self.seed = seed
+        self.opened = 0
+        self.calls = []
+
+    def __call__(self, in_table):
+        self.opened += 1
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def spw(self, name=False):
+        return [str(spw) for spw in range(len(self.numchans))]
+
+    def numchannel(self):
+        return list(self.numchans)
+
+    def _values(self, spw, ap):
+        """Amplitudes or phases and flags of two feeds, deterministic per spw and data type."""
+        spw = int(spw.split(':')[0])
+        rng = np.random.default_rng([self.seed, spw, ap == 'PHASE'])
+        nchan = self.numchans[spw]
+        return {feed: {'value': rng.normal(1.0, 0.1, nchan), 'flag': rng.uniform(size=nchan) < 0.05}
+                for feed in ('X', 'Y')}
+
+    def fit(self, spw, ap, **kwargs):
+        self.calls.append(('fit', spw, ap))
+        return {str(i): {'pars': np.array([d['value'].mean(), 1e-9]), 'value': d['value'], 'flag': d['flag']}
+                for i, d in enumerate(self._values(spw, ap).values())}
+
+    def get(self, spw, ap='AMPLITUDE'):
+        self.calls.append(('get', spw, ap))
+        return self._values(spw, ap)
+
+
+@contextlib.contextmanager
+def _synthetic_table_reader(spws_in_table):
+    """Table reader of the spectral window IDs of a synthetic bandpass table."""
+    yield types.SimpleNamespace(getcol=lambda colname: np.array(spws_in_table))
+
+
+def _synthetic_casa_tools(numchans, spws_in_table):
+    """casa_tools of which the CalAnalysis and TableReader read a synthetic bandpass table."""
+    return types.SimpleNamespace(CalAnalysis=_SyntheticCalAnalysis(numchans),
+                                 TableReader=lambda in_table: _synthetic_table_reader(spws_in_table))
+
+
+def _bpcal_calc_per_loop(caLoc, spwList, numchanList):
+    """Reference statistics of the previous bpcal_calc, with one loop over the spws per fit and data type."""
+    bpcal_stats = {'AMPLITUDE_FIT': {}, 'PHASE_FIT': {}}
+    for key, kwargs in (('AMPLITUDE_FIT', {'ap': 'AMPLITUDE', 'norm': True}),
+                        ('PHASE_FIT', {'ap': 'PHASE', 'unwrap': True, 'jumpmax': 0.1})):
+        for spwid, numchan in zip(spwList, numchanList):
+            chanRange = bpcal.bpcal_chanRangeList(numchan)
+            if chanRange == []:
+                continue
+            f = caLoc.fit(spw=bpcal.bpcal_spwChanString(spwid, chanRange), axis='TIME', order='LINEAR',
+                          type='LSQ', weight=False, **kwargs)
+            f['spw'] = int(spwid)
+            f['chanRange'] = chanRange
+            bpcal_stats[key][spwid] = f
+
+    bpcal_stats.update({'AMPLITUDE': {}, 'AMPLITUDE_SNR': {}, 'PHASE': {}})
+    for spwid, numchan in zip(spwList, numchanList):
+        for key in ('AMPLITUDE', 'AMPLITUDE_SNR', 'PHASE'):
+            bpcal_stats[key][spwid] = {'spw': int(spwid), 'chanRange': [0, numchan - 1]}
+        for pol, d in caLoc.get(spw=spwid).items():
+            amp_values = ma.array(d['value'], mask=d['flag'])
+            bpcal_stats['AMPLITUDE'][spwid][pol] = amp_values
+            amp_mean = ma.average(amp_values)
+            bpcal_stats['AMPLITUDE_SNR'][spwid][pol] = amp_mean / bpcal.rms(amp_values - amp_mean)
+        for pol, d in caLoc.get(spw=spwid, ap='PHASE').items():
+            bpcal_stats['PHASE'][spwid][pol] = ma.array(d['value'], mask=d['flag'])
+    return bpcal_stats
+
+
+def _assert_stats_equal(stats, expected):
+    """Assert that two nested dictionaries of bandpass statistics have the same keys, order and values."""
+    assert isinstance(stats, dict) == isinstance(expected, dict)
+    if isinstance(expected, dict):
+        assert list(stats) == list(expected)
+        for key in expected:
+            _assert_stats_equal(stats[key], expected[key])
+    elif isinstance(expected, np.ndarray):
+        assert np.array_equal(ma.getdata(stats), ma.getdata(expected))
+        assert np.array_equal(ma.getmaskarray(stats), ma.getmaskarray(expected))
+    else:
+        assert stats == expected
+
+
+# the signal-to-noise ratio of the spw without channels is NaN
+@pytest.mark.filterwarnings('ignore:invalid value encountered:RuntimeWarning')
+def test_bpcal_calc_matches_per_loop(monkeypatch):
+    """Test that evaluating the spws in turn on one tool gives the statistics of one loop per fit and data type."""
+    numchans = [128, 0, 64, 480, 8]
+    synthetic_tools = _synthetic_casa_tools(numchans, spws_in_table=[0, 1, 3, 4])
+    monkeypatch.setattr(bpcal, 'casa_tools', synthetic_tools)
+    caLoc = synthetic_tools.CalAnalysis
+
+    stats = bpcal.bpcal_calc('synthetic.bcal.tbl')
+    calls = caLoc.calls
+    caLoc.calls = []
+    expected = _bpcal_calc_per_loop(caLoc, ['0', '1', '3', '4'], [128, 0, 480, 8])
+
+    _assert_stats_equal(stats, expected)
+    assert caLoc.opened == 1
+    assert sorted(calls) == sorted(caLoc.calls)
+
+
+def test_batch_scores_match_iteration_scores():
+    """Test that scoring the iterations of each spw at once gives the scores of each iteration."""
+    stats = _synthetic_bpcal_stats(nant=12, nspw=4, nchan=128)
+
+    expected = bpcal_score(copy.deepcopy(stats), batch=False)
+    scores = bpcal_score(stats)
+
+    assert scores == expected
+    assert min(scores['AMPLITUDE_SCORE_DD'][0].values()) < 1.0
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('nant, nspw, nchan', [(12, 4, 128), (43, 16, 480)])
+def test_bpcal_score_benchmark(nant, nspw, nchan):
+    """Benchmark scoring the iterations of each spw at once against scoring each iteration."""
+    stats = _synthetic_bpcal_stats(nant, nspw, nchan)
+
+    t0 = time.perf_counter()
+    expected = bpcal_score(copy.deepcopy(stats), batch=False)
+    t_iteration = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    scores = bpcal_score(stats)
+    t_batch = time.perf_counter() - t0
+    LOG.info('Bandpass scores of %d antennas in %d spws of %d channels: per iteration %.3f s, batched %.3f s',
+             nant, nspw, nchan, t_iteration, t_batch)
+
+    assert scores == expected
@@ -0,0 +1,219 @@
+"""Statistics of calibration table columns for QA scoring.
+
+The columns of a calibration table are read once into memory, and
+reductions such as maxima, medians and counts above a threshold are
+evaluated per spw, field, antenna, time and/or polarisation on the
+in-memory columns, instead of querying the table for each of them.
+"""
+from __future__ import annotations
+
+import itertools
+from typing import TYPE_CHECKING, Callable
+
+import numpy as np
+
+from pipeline import infrastructure
+from pipeline.h.tasks.common.calibrationtableaccess import CalibrationTableDataFiller, ColumnarCalibrationTableData
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+LOG = infrastructure.get_logger(__name__)
+
+
+class CaltableStatistics:
+    """Grouped reductions of the columns of a calibration table.
+
+    Reductions are grouped by any of the row selection axes of the table
+    ('spw', 'field', 'antenna', 'time') and by the polarisation axis ('pol')
+    of its array columns. The result of a reduction is a dictionary that
+    maps each group to its value: the group key is the value of the axis if
+    grouped by a single axis (e.g. by='spw'), or a tuple of values in the
+    order of the given axes (e.g. by=('spw', 'antenna')). If not grouped
+    (by=None), the reduction over all values is returned.
+
+    Groups without any values, e.g. when all values are flagged and flagged
+    values are excluded, are left out of the result.
+    """
+    AXES = tuple(ColumnarCalibrationTableData.GROUP_COLUMNS) + ('pol',)
+
+    def __init__(self, table: ColumnarCalibrationTableData):
+        """Initialize the statistics of the columns of the given calibration table data."""
+        self.table = table
+
+    @classmethod
+    def from_caltable(cls, caltable: str) -> CaltableStatistics:
+        """Return statistics of the given calibration table, reading each of its columns once when first needed."""
+        return cls(CalibrationTableDataFiller.getcal(caltable))
+
+    @property
+    def name(self) -> str:
+        """Name of the calibration table."""
+        return self.table.name
+
+    def column(self, colname: str) -> NDArray | list[NDArray]:
+        """Return the data of a column, as read from the table."""
+        return self.table.get_column(colname)
+
+    def max(self, colname: str, by: str | tuple[str, ...] | None = None, transform: Callable | None = None,
+            exclude_flagged: bool = False):
+        """Return the maximum of the (transformed) values of a column, per group."""
+        return self._accumulate(colname, np.maximum, -np.inf, by=by, transform=transform,
+                                exclude_flagged=exclude_flagged)
+
+    def median(self, colname: str, by: str | tuple[str, ...] | None = None, transform: Callable | None = None,
+               exclude_flagged: bool = False):
+        """Return the median of the (transformed) values of a column, per group."""
+        return self.reduce(colname, np.median, by=by, transform=transform, exclude_flagged=exclude_flagged)
+
+    def count_above(self, colname: str, threshold: float, by: str | tuple[str, ...] | None = None,
+                    transform: Callable | None = None, exclude_flagged: bool = False):
+        """Return the number of (transformed) values of a column that exceed the threshold, per group."""
+        def above(values):
+            values = values if transform is None else transform(values)
+            return values > threshold
+        counts = self._accumulate(colname, np.add, 0, by=by, transform=above, exclude_flagged=exclude_flagged)
+        if by is None:
+            return None if counts is None else int(counts)
+        return {key: int(count) for key, count in counts.items()}
+
+    def reduce(self, colname: str, reduction: Callable, by: str | tuple[str, ...] | None = None,
+               transform: Callable | None = None, exclude_flagged: bool = False):
+        """Return the reduction of the values of a column, per group.
+
+        Args:
+            colname: name of the column to reduce.
+            reduction: function reducing a 1-D array of values to a value.
+            by: axis, or tuple of axes, to group the values by; see class
+                docstring.
+            transform: function applied to the column data before reduction,
+                e.g. np.abs.
+            exclude_flagged: if True, leave out the values flagged in the
+                FLAG column.
+
+        Returns:
+            Dictionary of group key to reduced value, or the reduced value
+            of all values if by is None.
+        """
+        axes = self._axes(by)
+        values = self._values(colname, transform)
+        flag = self.column('FLAG') if exclude_flagged else None
+
+        row_keys, order, starts = self._row_groups([axis for axis in axes if axis != 'pol'])
+        result = {}
+        for row_key, row_ids in zip(row_keys, np.split(order, starts[1:])):
+            group_values = self._group_values(values, row_ids)
+            group_flag = self._group_values(flag, row_ids) if flag is not None else None
+            pols = range(group_values.shape[0]) if 'pol' in axes else [None]
+            for key, pol in zip(self._keys(by, axes, [row_key], pols), pols):
+                pol_values = group_values.ravel() if pol is None else group_values[pol]
+                if group_flag is not None:
+                    pol_values = pol_values[~(group_flag.ravel() if pol is None else group_flag[pol])]
+                if pol_values.size > 0:
+                    result[key] = reduction(pol_values)
+        return result.get(()) if by is None else result
+
+    def _accumulate(self, colname: str, ufunc: np.ufunc, initial, by: str | tuple[str, ...] | None,
+                    transform: Callable | None, exclude_flagged: bool):
+        """Return the reduction of the values of a column per group with a binary ufunc, e.g. np.maximum.
+
+        The values are first reduced per row and polarisation, and the rows
+        of each group then reduced at once, without iterating over groups.
+        """
+        axes = self._axes(by)
+        values = self._values(colname, transform)
+        flag = self.column('FLAG') if exclude_flagged else None
+
+        # Reduce the values of each row and polarisation to arrays of
+        # shape (npol, nrow), counting the values that were reduced.
+        if isinstance(values, np.ndarray) and (flag is None or isinstance(flag, np.ndarray)):
+            row_values, row_counts = self._reduce_rows(values, flag, ufunc, initial)
+        else:
+            reduced = [self._reduce_rows(v, None if flag is None else flag[i], ufunc, initial)
+                       for i, v in enumerate(values)]
+            row_values = np.concatenate([v for v, _ in reduced], axis=1)
+            row_counts = np.concatenate([c for _, c in reduced], axis=1)
+        if 'pol' not in axes:
+            row_values = ufunc.reduce(row_values, axis=0, keepdims=True)
+            row_counts = row_counts.sum(axis=0, keepdims=True)
+
+        # Reduce the rows of each group.
+        row_keys, order, starts = self._row_groups([axis for axis in axes if axis != 'pol'])
+        if len(order) == 0:
+            return None if by is None else {}
+        group_values = ufunc.reduceat(row_values[:, order], starts, axis=1).T
+        group_counts = np.add.reduceat(row_counts[:, order], starts, axis=1).T
+
+        pols = range(group_values.shape[1]) if 'pol' in axes else [None]
+        result = {key: value for key, value, count in zip(self._keys(by, axes, row_keys, pols),
+                                                          group_values.ravel().tolist(), group_counts.ravel())
+                  if count > 0}
+        return result.get(()) if by is None else result
+
+    @staticmethod
+    def _reduce_rows(values: NDArray, flag: NDArray | None, ufunc: np.ufunc, initial):
+        """Return the reduction of a column, or a row, of shape (npol, ..., nrow), and the number of values reduced.
+
+        The values are reduced over all but the first and last axes, into
+        arrays of shape (npol, nrow).
+        """
+        values = values.reshape(values.shape[0], -1, values.shape[-1])
+        if flag is None:
+            return ufunc.reduce(values, axis=1), np.full((values.shape[0], values.shape[-1]), values.shape[1])
+        valid = ~flag.reshape(values.shape)
+        return ufunc.reduce(values, axis=1, where=valid, initial=initial), np.count_nonzero(valid, axis=1)
+
+    def _axes(self, by: str | tuple[str, ...] | None) -> tuple[str, ...]:
+        axes = () if by is None else (by,) if isinstance(by, str) else tuple(by)
+        unknown = [axis for axis in axes if axis not in self.AXES]
+        if unknown:
+            raise ValueError(f'Cannot group {self.name} by {", ".join(unknown)}; valid axes are {self.AXES}')
+        return axes
+
+    def _values(self, colname: str, transform: Callable | None) -> NDArray | list[NDArray]:
+        values = self.column(colname)
+        if transform is None:
+            return values
+        return transform(values) if isinstance(values, np.ndarray) else [transform(v) for v in values]
+
+    @staticmethod
+    def _keys(by, axes: tuple[str, ...], row_keys: list[tuple], pols) -> list:
+        """Return the keys of the groups, in the order of the given axes, for each row key and polarisation."""
+        ipol = axes.index('pol') if 'pol' in axes else None
+        keys = []
+        for row_key, pol in itertools.product(row_keys, pols):
+            key = row_key if ipol is None else row_key[:ipol] + (pol,) + row_key[ipol:]
+            keys.append(key[0] if isinstance(by, str) else key)
+        return keys
+
+    def _row_groups(self, row_axes: list[str]) -> tuple[list[tuple], NDArray, NDArray]:
+        """Return the sorted combinations of values of the given axes present in the table.
+
+        Also returns the indices of the rows sorted by combination, and the
+        index of the first row of each combination in that order.
+        """
+        if not row_axes:
+            return [()], np.arange(self.table.nrows), np.array([0])
+        keycols = [np.asarray(self.column(ColumnarCalibrationTableData.GROUP_COLUMNS[axis])) for axis in row_axes]
+        # np.lexsort sorts by the last key first
+        order = np.lexsort(keycols[::-1])
+        if len(order) == 0:
+            return [], order, order
+        changed = np.zeros(len(order), dtype=bool)
+        changed[0] = True
+        for col in keycols:
+            changed[1:] |= col[order[1:]] != col[order[:-1]]
+        starts = np.flatnonzero(changed)
+        row_keys = list(zip(*(col[order[starts]].tolist() for col in keycols)))
+        return row_keys, order, starts
+
+    @staticmethod
+    def _group_values(coldata: NDArray | list[NDArray], row_ids: NDArray) -> NDArray:
+        """Return the values of the given rows as an array of shape (npol, nvalues)."""
+        if isinstance(coldata, np.ndarray):
+            values = coldata[..., row_ids]
+            if values.ndim == 1:
+                return values[np.newaxis, :]
+            # move the row axis next to the polarisation axis, such that values are grouped per row
+            return np.moveaxis(values, -1, 1).reshape(values.shape[0], -1)
+        return np.concatenate([np.reshape(coldata[i], (np.shape(coldata[i])[0], -1)) for i in row_ids], axis=1)
@@ -0,0 +1,173 @@
+"""Tests for the pipeline.qa.caltablestats module."""
+import time
+
+import numpy as np
+import pytest
+
+from pipeline.h.tasks.common.calibrationtableaccess import ColumnarCalibrationTableData
+from pipeline.infrastructure import logging
+
+from .caltablestats import CaltableStatistics
+
+LOG = logging.get_logger(__name__)
+
+
+def _synthetic_delay_columns(nant, nspw, nsol=1, seed=3):
+    """Columns of a synthetic delay table, with nsol solutions per antenna and spw."""
+    rng = np.random.default_rng(seed)
+    sol, spw, ant = (a.ravel() for a in np.meshgrid(np.arange(nsol), np.arange(nspw), np.arange(nant),
+                                                    indexing='ij'))
+    nrow = len(sol)
+    fparam = rng.normal(0.0, 50.0, (2, 1, nrow))
+    fparam[rng.uniform(size=fparam.shape) < 0.05] *= 10.0
+    return {
+        'TIME': 5.0e9 + 60.0 * sol,
+        'FIELD_ID': np.zeros(nrow, dtype=np.int32),
+        'SPECTRAL_WINDOW_ID': (spw + 2).astype(np.int32),
+        'ANTENNA1': ant.astype(np.int32),
+        'FPARAM': fparam,
+        'FLAG': rng.uniform(size=fparam.shape) < 0.1,
+    }
+
+
+def _statistics(columns, reads=None):
+    def read_column(colname):
+        if reads is not None:
+            reads.append(colname)
+        return columns[colname]
+    return CaltableStatistics(ColumnarCalibrationTableData('synthetic.K.tbl', list(columns), read_column))
+
+
+class _QueriedTable:
+    """Rows of a table selected by a query, copying the selected rows of each column as a table query would."""
+    def __init__(self, columns, reads=None):
+        self.columns = columns
+        self.reads = [] if reads is None else reads
+
+    def query(self, colname, value):
+        selected = self.columns[colname] == value
+        return _QueriedTable({name: data[..., selected] for name, data in self.columns.items()}, self.reads)
+
+    def getcol(self, colname):
+        self.reads.append(colname)
+        return self.columns[colname].copy()
+
+
+def _count_bad_delays_per_query(table, delaymax):
+    """Maximum delay and number of delays above delaymax per spw and antenna, querying the table for each."""
+    maxdelays = {}
+    numbaddelays = {}
+    for ispw in np.unique(table.getcol('SPECTRAL_WINDOW_ID')):
+        tbspw = table.query('SPECTRAL_WINDOW_ID', ispw)
+        for iant in np.unique(tbspw.getcol('ANTENNA1')):
+            absdel = np.absolute(tbspw.query('ANTENNA1', iant).getcol('FPARAM'))
+            maxdelays[(ispw, iant)] = np.max(absdel)
+            numbaddelays[(ispw, iant)] = (absdel > delaymax).sum()
+    return maxdelays, numbaddelays
+
+
+def test_grouped_reductions():
+    """Test reductions per spw, antenna and polarisation against selecting the rows of each group."""
+    columns = _synthetic_delay_columns(nant=5, nspw=3, nsol=4)
+    stats = _statistics(columns)
+    absdel = np.abs(columns['FPARAM'])
+
+    maxdelays = stats.max('FPARAM', by=('spw', 'antenna'), transform=np.abs)
+    assert list(maxdelays) == [(spw, ant) for spw in range(2, 5) for ant in range(5)]
+    for (spw, ant), maxdelay in maxdelays.items():
+        rows = (columns['SPECTRAL_WINDOW_ID'] == spw) & (columns['ANTENNA1'] == ant)
+        assert maxdelay == np.max(absdel[..., rows])
+
+    medians = stats.median('FPARAM', by=('antenna', 'pol'), transform=np.abs, exclude_flagged=True)
+    assert len(medians) == 5 * 2
+    for (ant, pol), median in medians.items():
+        rows = columns['ANTENNA1'] == ant
+        assert median == np.median(absdel[pol][..., rows][~columns['FLAG'][pol][..., rows]])
+
+    counts = stats.count_above('FPARAM', 100.0, by='spw', transform=np.abs)
+    assert counts == {spw: np.count_nonzero(absdel[..., columns['SPECTRAL_WINDOW_ID'] == spw] > 100.0)
+                      for spw in range(2, 5)}
+
+    assert stats.max('FPARAM', transform=np.abs) == np.max(absdel)
+    with pytest.raises(ValueError):
+        stats.max('FPARAM', by='baseline')
+
+
+def test_fully_flagged_groups_are_left_out():
+    """Test that groups without unflagged values are left out when flagged values are excluded."""
+    columns = _synthetic_delay_columns(nant=3, nspw=2)
+    columns['FLAG'][..., columns['ANTENNA1'] == 1] = True
+    stats = _statistics(columns)
+
+    assert list(stats.max('FPARAM', by='antenna', exclude_flagged=True)) == [0, 2]
+    assert list(stats.max('FPARAM', by='antenna')) == [0, 1, 2]
+
+
+def test_variable_shape_column():
+    """Test reductions of a column with a different number of channels per spw, read as one array per row."""
+    rng = np.random.default_rng(4)
+    nchan = {0: 4, 1: 16}
+    spws = np.array([0, 0, 1, 1, 1], dtype=np.int32)
+    columns = {
+        'SPECTRAL_WINDOW_ID': spws,
+        'ANTENNA1': np.array([0, 1, 0, 1, 2], dtype=np.int32),
+        'CPARAM': [rng.normal(size=(2, nchan[spw], 1)) + 1j * rng.normal(size=(2, nchan[spw], 1)) for spw in spws],
+    }
+    stats = _statistics(columns)
+
+    assert stats.max('CPARAM', by=('spw', 'pol'), transform=np.abs) == {
+        (spw, pol): max(np.max(np.abs(cparam[pol])) for cparam, s in zip(columns['CPARAM'], spws) if s == spw)
+        for spw in nchan for pol in range(2)}
+
+
+def test_columns_are_read_once():
+    """Test that each column is read once for all reductions."""
+    reads = []
+    stats = _statistics(_synthetic_delay_columns(nant=4, nspw=2), reads)
+
+    stats.max('FPARAM', by=('spw', 'antenna'), transform=np.abs)
+    stats.count_above('FPARAM', 200.0, by=('spw', 'antenna'), transform=np.abs)
+    stats.median('FPARAM', by='spw', exclude_flagged=True)
+    assert sorted(reads) == ['ANTENNA1', 'FLAG', 'FPARAM', 'SPECTRAL_WINDOW_ID']
+
+
+def _count_bad_delays_in_memory(columns, limit):
+    """Maximum and bad delay counts per spw and antenna from the in-memory statistics."""
+    stats = _statistics(columns)
+    maxdelays = stats.max('FPARAM', by=('spw', 'antenna'), transform=np.absolute)
+    numbaddelays = stats.count_above('FPARAM', limit, by=('spw', 'antenna'), transform=np.absolute)
+    return maxdelays, numbaddelays
+
+
+@pytest.mark.parametrize('nant, nspw, nsol', [(6, 2, 1), (8, 4, 3)])
+def test_count_bad_delays_matches_queries(nant, nspw, nsol):
+    """Test maximum and bad delay counts per spw and antenna against querying the table for each."""
+    columns = _synthetic_delay_columns(nant=nant, nspw=nspw, nsol=nsol)
+    table = _QueriedTable(columns)
+
+    expected_maxdelays, expected_numbaddelays = _count_bad_delays_per_query(table, 200.0)
+    maxdelays, numbaddelays = _count_bad_delays_in_memory(columns, 200.0)
+
+    assert maxdelays == expected_maxdelays
+    assert numbaddelays == expected_numbaddelays
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('nant, nspw, nsol', [(27, 4, 1), (50, 16, 1), (50, 32, 8)])
+def test_count_bad_delays_benchmark(nant, nspw, nsol):
+    """Benchmark maximum and bad delay counts per spw and antenna against querying the table, by table size."""
+    columns = _synthetic_delay_columns(nant=nant, nspw=nspw, nsol=nsol)
+    table = _QueriedTable(columns)
+
+    t0 = time.perf_counter()
+    expected_maxdelays, expected_numbaddelays = _count_bad_delays_per_query(table, 200.0)
+    t_query = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    maxdelays, numbaddelays = _count_bad_delays_in_memory(columns, 200.0)
+    t_stats = time.perf_counter() - t0
+    LOG.info('Bad delays of %d antennas in %d spws in %d rows: per query %.3f s (%d column reads),'
+             ' in memory %.3f s', nant, nspw, len(columns['TIME']), t_query, len(table.reads), t_stats)
+
+    assert maxdelays == expected_maxdelays
+    assert numbaddelays == expected_numbaddelays
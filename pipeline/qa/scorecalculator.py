@@ -14,7 +14,7 @@ import math
 import operator
 import os
 import re
-import shutil
+import time
 import traceback
 from collections import defaultdict
 from typing import TYPE_CHECKING, Any
@@ -31,8 +31,10 @@ from pipeline.domain import measures
 from pipeline.infrastructure import basetask, casa_tasks, casa_tools, utils
 from pipeline.infrastructure.renderer import rendererutils
 from pipeline.infrastructure.utils import ous_parallactic_range
+from pipeline.hsd.tasks.common import direction_utils
 from pipeline.hsd.tasks.common import utils as sdutils
 from pipeline.qa import checksource
+from pipeline.qa.caltablestats import CaltableStatistics
 
 if TYPE_CHECKING:
     from numpy import generic
@@ -1405,27 +1407,16 @@ def countbaddelays(m, delaytable, delaymax):
         Dictionary with antenna name as key
     """
     delaydict = collections.defaultdict(list)
-    with casa_tools.TableReader(delaytable) as tb:
-        spws = np.unique(tb.getcol('SPECTRAL_WINDOW_ID'))
-        for ispw in spws:
-            # byspw table must be written to disk in outer layer to avoid 'Table does not exist' error
-            tbspw = tb.query(query='SPECTRAL_WINDOW_ID==' + str(ispw), name='byspw')
-            ants = np.unique(tbspw.getcol('ANTENNA1'))
-            for iant in ants:
-                tbant = tbspw.query(query='ANTENNA1==' + str(iant))
-                absdel = np.absolute(tbant.getcol('FPARAM'))
-                if np.max(absdel) > delaymax:
-                    antname = m.get_antenna(iant)[0].name
-                    delaydict[antname].append((absdel > delaymax).sum())
-                    LOG.info('Spw=' + str(ispw) + ' Ant=' + antname
-                             + '  Delays greater than 200 ns ='
-                             + str((absdel > delaymax).sum()))
-                tbant.close()
-            tbspw.close()
-            # clean up byspw table after each iteration
-            byspw = os.getcwd() + '/byspw'
-            if os.path.exists(byspw):
-                shutil.rmtree(byspw)
+    stats = CaltableStatistics.from_caltable(delaytable)
+    maxdelays = stats.max('FPARAM', by=('spw', 'antenna'), transform=np.absolute)
+    numbaddelays = stats.count_above('FPARAM', delaymax, by=('spw', 'antenna'), transform=np.absolute)
+    for (ispw, iant), maxdelay in maxdelays.items():
+        if maxdelay > delaymax:
+            antname = m.get_antenna(iant)[0].name
+            delaydict[antname].append(numbaddelays[(ispw, iant)])
+            LOG.info('Spw=' + str(ispw) + ' Ant=' + antname
+                     + '  Delays greater than 200 ns ='
+                     + str(numbaddelays[(ispw, iant)]))
 
     return delaydict
 
@@ -1438,10 +1429,8 @@ def score_total_data_vla_delay(filename, vis, bandname=None):
     decreases linearly with increasing delay, down to a minimum of 0.3.
     """
 
-    with casa_tools.TableReader(filename) as tb:
-        fpar = tb.getcol('FPARAM')
-        delays = np.abs(fpar)  # Units of nanoseconds
-        maxdelay = np.max(delays)
+    # Units of nanoseconds
+    maxdelay = CaltableStatistics.from_caltable(filename).max('FPARAM', transform=np.abs)
     # PIPE-2582: if delays > 15 ns, QA score < 0.5
     if maxdelay < 15.0:
         score = 1.0
@@ -3767,44 +3756,26 @@ def generate_metric_mask(
             origin_ms_rows = tsel.getcol('ROW')
             tsel.close()
 
+        t0 = time.perf_counter()
         if org_direction is None:
             ra_deg = ofs_ra
             dec_deg = ofs_dec
         else:
-            ra_deg = np.empty(len(ofs_ra), dtype=float)
-            dec_deg = np.empty(len(ofs_dec), dtype=float)
-            for i, rr, dd in zip(range(len(ofs_ra)), ofs_ra, ofs_dec):
-                shift_ra, shift_dec = direction_recover(rr, dd, org_direction)
-                ra_deg[i] = shift_ra
-                dec_deg[i] = shift_dec
+            ra_deg, dec_deg = direction_utils.direction_recover_many(ofs_ra, ofs_dec, org_direction)
+        t1 = time.perf_counter()
 
         rowmap = sdutils.make_row_map_between_ms(
             context.observing_run.get_ms(target_ms.origin_ms),
             target_ms.name
         )
+        ms_rows = rowmap.lookup(origin_ms_rows)
 
         with casa_tools.TableReader(target_ms.name) as tb:
-            flag = map(
-                lambda irow: tb.getcell('FLAG', rowmap[irow]),
-                origin_ms_rows
-            )
-            # invert flag: True for valid data
-            ms_mask = map(
-                lambda f: np.logical_not(f),
-                flag
-            )
-            # data will contribute to the image if all polarizations are valid
-            ms_mask_collapsed_pol = map(
-                lambda f: np.all(f, axis=0),
-                ms_mask
-            )
-            # data will contribute to the image if there are any valid channels
-            ms_mask_per_row = map(
-                lambda f: np.any(f),
-                ms_mask_collapsed_pol
-            )
             # validity mask for each row: True for valid data
-            validity_mask = np.fromiter(ms_mask_per_row, dtype=bool)
+            validity_mask = _get_valid_rows(tb, ms_rows)
+        t2 = time.perf_counter()
+        LOG.debug('MS %s spw %s: converted %d offsets in %.3f s, read FLAG of %d rows in %.3f s',
+                  target_ms.basename, spw_id, len(ofs_ra), t1 - t0, len(ms_rows), t2 - t1)
 
         # world-pixel conversion using cs.topixelmany
         ra_deg = ra_deg[validity_mask]
@@ -3847,20 +3818,33 @@ def generate_metric_mask(
     return metric_mask
 
 
-def direction_recover( ra, dec, org_direction ):
-    me = casa_tools.measures
-    qa = casa_tools.quanta
+def _get_valid_rows(tb, rows: NDArray, chunk_size: int = 1024) -> NDArray:
+    """
+    Return whether each of the given rows of an MS holds valid data.
 
-    direction = me.direction( org_direction['refer'],
-                              str(ra)+'deg', str(dec)+'deg' )
-    zero_direction  = me.direction( org_direction['refer'], '0deg', '0deg' )
-    offset = me.separation( zero_direction, direction )
-    posang = me.posangle( zero_direction, direction )
-    new_direction = me.shift( org_direction, offset=offset, pa=posang )
-    new_ra  = qa.convert( new_direction['m0'], 'deg' )['value']
-    new_dec = qa.convert( new_direction['m1'], 'deg' )['value']
+    Data will contribute to the image if there is any channel in which all
+    polarizations are valid, i.e. not flagged. The FLAG column is read for
+    the rows in ascending order, in chunks of at most chunk_size contiguous
+    rows.
 
-    return new_ra, new_dec
+    Args:
+        tb: CASA table tool instance of the MS
+        rows: row IDs of the MS
+        chunk_size: maximum number of rows to read FLAG for at once
+
+    Returns:
+        bool array -- validity of each row (True: valid, False: invalid)
+    """
+    unique_rows, inverse = np.unique(rows, return_inverse=True)
+    valid = np.zeros(len(unique_rows), dtype=bool)
+    # boundaries of runs of contiguous rows
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(unique_rows) != 1) + 1, [len(unique_rows)]))
+    for run_start, run_end in zip(bounds[:-1], bounds[1:]):
+        for start in range(run_start, run_end, chunk_size):
+            nrow = min(chunk_size, run_end - start)
+            flag = tb.getcol('FLAG', int(unique_rows[start]), nrow)
+            valid[start:start + nrow] = np.any(np.all(np.logical_not(flag), axis=0), axis=0)
+    return valid[inverse.ravel()]
 
 
 @log_qa
@@ -4312,10 +4296,10 @@ def score_polcal_gain_ratio(session_name: str, ant_names: dict, xyratio_result:
     # Score each caltable in result.
     for calapp in xyratio_result.final:
         # Retrieve data from caltable.
-        with casa_tools.TableReader(calapp.gaintable) as table:
-            gains = np.squeeze(table.getcol('CPARAM'))
-            spws = table.getcol('SPECTRAL_WINDOW_ID')
-            ants = table.getcol('ANTENNA1')
+        stats = CaltableStatistics.from_caltable(calapp.gaintable)
+        gains = np.squeeze(stats.column('CPARAM'))
+        spws = stats.column('SPECTRAL_WINDOW_ID')
+        ants = stats.column('ANTENNA1')
 
         # Score each SpW separately.
         for spwid in sorted(set(spws)):
@@ -4409,64 +4393,45 @@ def score_polcal_leakage(session_name: str, ant_names: dict, leakage_result: Pol
     scores = []
     # Score each caltable in result.
     for calapp in leakage_result.final:
-        # Retrieve data from leakage solutions caltable.
-        with casa_tools.TableReader(calapp.gaintable) as table:
-            # Retrieve unique SpWs and antennas.
-            uniq_spws = sorted(set(table.getcol('SPECTRAL_WINDOW_ID')))
-            uniq_ants = sorted(set(table.getcol('ANTENNA1')))
-
-            # Score each SpW separately.
-            for spwid in uniq_spws:
-                # Retrieve D-terms for current SpW.
-                data = table.query(f"SPECTRAL_WINDOW_ID=={spwid}", columns='CPARAM')
-                dterms = data.getcol('CPARAM')
-
-                # For each antenna, check if the D-terms solutions exceed the
-                # threshold.
-                bad_antids = []
-                poor_antids = []
-                for antid in uniq_ants:
-                    pol1 = dterms[0, :, antid]
-                    pol2 = dterms[1, :, antid]
-
-                    rpol1 = abs(np.real(pol1)) > th_bad
-                    ipol1 = abs(np.imag(pol1)) > th_bad
-                    rpol2 = abs(np.real(pol2)) > th_bad
-                    ipol2 = abs(np.imag(pol2)) > th_bad
-
-                    if rpol1.any() or ipol1.any() or rpol2.any() or ipol2.any():
-                        bad_antids.append(antid)
-                        continue
-
-                    rpol1 = abs(np.real(pol1)) > th_poor
-                    ipol1 = abs(np.imag(pol1)) > th_poor
-                    rpol2 = abs(np.real(pol2)) > th_poor
-                    ipol2 = abs(np.imag(pol2)) > th_poor
-
-                    if rpol1.any() or ipol1.any() or rpol2.any() or ipol2.any():
-                        poor_antids.append(antid)
-
-                if poor_antids:
-                    score = 0.75
-                    longmsg = f"Session '{session_name}' has D-terms solutions that deviate by {th_poor}-{th_bad} for" \
-                              f" SpW {spwid}, antenna(s)" \
-                              f" {utils.commafy([ant_names[i] for i in poor_antids], quotes=False)}."
-                    shortmsg = "Large deviation D-terms solutions"
-                    origin = pqa.QAOrigin(metric_name='score_polcal_leakage',
-                                          metric_score=score,
-                                          metric_units='D-terms solutions deviation')
-                    scores.append(pqa.QAScore(score, longmsg=longmsg, shortmsg=shortmsg, origin=origin))
-
-                if bad_antids:
-                    score = 0.55
-                    longmsg = f"Session '{session_name}' has D-terms solutions that deviate by more than {th_bad} for" \
-                              f" SpW {spwid}, antenna(s)" \
-                              f" {utils.commafy([ant_names[i] for i in bad_antids], quotes=False)}."
-                    shortmsg = "Very large deviation D-terms solutions"
-                    origin = pqa.QAOrigin(metric_name='score_polcal_leakage',
-                                          metric_score=score,
-                                          metric_units='D-terms solutions deviation')
-                    scores.append(pqa.QAScore(score, longmsg=longmsg, shortmsg=shortmsg, origin=origin))
+        # Retrieve the largest deviation from zero of the real and imaginary
+        # part of the D-terms solutions, for each SpW and antenna.
+        stats = CaltableStatistics.from_caltable(calapp.gaintable)
+        max_dterms = stats.max('CPARAM', by=('spw', 'antenna'),
+                               transform=lambda dterms: np.maximum(np.abs(dterms.real), np.abs(dterms.imag)))
+
+        # Score each SpW separately.
+        for spwid, spw_max_dterms in itertools.groupby(max_dterms.items(), key=lambda item: item[0][0]):
+            # For each antenna, check if the D-terms solutions exceed the
+            # threshold.
+            bad_antids = []
+            poor_antids = []
+            for (_, antid), max_dterm in spw_max_dterms:
+                if max_dterm > th_bad:
+                    bad_antids.append(antid)
+                elif max_dterm > th_poor:
+                    poor_antids.append(antid)
+
+            if poor_antids:
+                score = 0.75
+                longmsg = f"Session '{session_name}' has D-terms solutions that deviate by {th_poor}-{th_bad} for" \
+                          f" SpW {spwid}, antenna(s)" \
+                          f" {utils.commafy([ant_names[i] for i in poor_antids], quotes=False)}."
+                shortmsg = "Large deviation D-terms solutions"
+                origin = pqa.QAOrigin(metric_name='score_polcal_leakage',
+                                      metric_score=score,
+                                      metric_units='D-terms solutions deviation')
+                scores.append(pqa.QAScore(score, longmsg=longmsg, shortmsg=shortmsg, origin=origin))
+
+            if bad_antids:
+                score = 0.55
+                longmsg = f"Session '{session_name}' has D-terms solutions that deviate by more than {th_bad} for" \
+                          f" SpW {spwid}, antenna(s)" \
+                          f" {utils.commafy([ant_names[i] for i in bad_antids], quotes=False)}."
+                shortmsg = "Very large deviation D-terms solutions"
+                origin = pqa.QAOrigin(metric_name='score_polcal_leakage',
+                                      metric_score=score,
+                                      metric_units='D-terms solutions deviation')
+                scores.append(pqa.QAScore(score, longmsg=longmsg, shortmsg=shortmsg, origin=origin))
 
     # If no poor D-terms solutions are found, then create a good score.
     if not scores:
@@ -5389,10 +5354,7 @@ def score_testBPdcals_delay(vis: str, caltable: str, bandname: str) -> pqa.QASco
     """Evaluate QA score based on median delay per baseband."""
     applies_to = pqa.TargetDataSelection(vis={vis})
     # PIPE-2580: if median delay per baseband > 15 ms, QA score < 0.5
-    with casa_tools.TableReader(caltable) as tb:
-        fpar = tb.getcol('FPARAM')
-        delays = np.abs(fpar)
-        median_delay = np.median(delays)
+    median_delay = CaltableStatistics.from_caltable(caltable).median('FPARAM', transform=np.abs)
     qa = casa_tools.quanta
     median_delay_val = qa.convert(qa.quantity(median_delay, "ns"), "ms")["value"]
 
@@ -5484,8 +5446,7 @@ def score_fluxboot(context, result) -> list[pqa.QAScore]:
     ms = context.observing_run.get_ms(result.vis)
     sci_spws = ms.get_spectral_windows(science_windows_only=True)
     total_sci_spws = len(sci_spws)
-    flagdata_task = casa_tasks.flagdata(vis=calms, mode="summary")
-    flagdata_result = flagdata_task.execute()
+    flagdata_result = utils.get_flag_summary(calms)
     flag_spw = flagdata_result["spw"]
     ignored_spw_count = 0
 
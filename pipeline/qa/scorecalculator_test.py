@@ -4,6 +4,7 @@ scorecalculator_test.py : Unit tests for "qa/scorecalculator.py".
 Unit tests for "qa/scorecalculator.py"
 """
 
+import numpy as np
 import pytest
 
 import pipeline.qa.scorecalculator as qacalc
@@ -98,3 +99,43 @@ def test_examine_sd_wide_lines(lines: list[tuple[int, int]], nchan: int, edge: t
 def test_channel_ranges_for_image(edge: tuple[int, int], nchan: int, sideband: int, ranges: list[tuple[int, int]], expected: list[tuple[int, int]]):
     ranges_image = qacalc.channel_ranges_for_image(edge, nchan, sideband, ranges)
     assert ranges_image == expected
+
+
+class _FlagTable:
+    """Table tool reading the FLAG column of a synthetic MS, counting the number of reads."""
+
+    def __init__(self, flag: np.ndarray):
+        self.flag = flag
+        self.reads = 0
+
+    def getcell(self, colname: str, row: int) -> np.ndarray:
+        self.reads += 1
+        return self.flag[..., row].copy()
+
+    def getcol(self, colname: str, startrow: int, nrow: int) -> np.ndarray:
+        self.reads += 1
+        return self.flag[..., startrow:startrow + nrow].copy()
+
+
+@pytest.mark.parametrize('nrow, nchan, chunk_size', [(100, 16, 1024), (600, 32, 1024), (600, 32, 7)])
+def test_get_valid_rows(nrow: int, nchan: int, chunk_size: int):
+    """Test the validity of rows read in chunks against reading FLAG row by row."""
+    rng = np.random.default_rng(6)
+    flag = rng.uniform(size=(2, nchan, nrow)) < 0.3
+    flag[..., rng.uniform(size=nrow) < 0.1] = True
+    flag[0, :, rng.uniform(size=nrow) < 0.1] = True
+    # mapped rows of one spw and field: unsorted, with gaps and repeated rows
+    rows = rng.permutation(np.flatnonzero(rng.uniform(size=nrow) < 0.7))
+    rows = np.concatenate((rows, rows[:10]))
+
+    table = _FlagTable(flag)
+    expected = np.fromiter((np.any(np.all(np.logical_not(table.getcell('FLAG', row)), axis=0)) for row in rows),
+                           dtype=bool)
+    nreads_rows = table.reads
+
+    table.reads = 0
+    valid = qacalc._get_valid_rows(table, rows, chunk_size=chunk_size)
+
+    assert np.array_equal(valid, expected)
+    assert np.any(valid) and not np.all(valid)
+    assert table.reads < nreads_rows